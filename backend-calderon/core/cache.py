@@ -0,0 +1,234 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """
+    Caché en memoria con expiración por TTL y desalojo LRU.
+    Es segura para hilos: los endpoints síncronos de FastAPI corren en un threadpool.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: float = 3600.0,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._on_evict = on_evict
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.expired = 0
+        self.evicted = 0
+
+    def _is_expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - stored_at > self.ttl_seconds
+
+    def _remove(self, key: Hashable):
+        _, value = self._data.pop(key)
+        if self._on_evict:
+            self._on_evict(key, value)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            stored_at, value = item
+            if self._is_expired(stored_at, time.monotonic()):
+                self._remove(key)
+                self.expired += 1
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (time.monotonic(), value)
+            while len(self._data) > self.max_entries:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evicted += 1
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Devuelve el valor vigente o lo crea con `factory` de forma atómica."""
+        with self._lock:
+            value = self.get(key, _MISSING)
+            if value is _MISSING:
+                value = factory()
+                self.set(key, value)
+            return value
+
+    def purge_expired(self) -> int:
+        """Elimina las entradas vencidas y devuelve cuántas se borraron."""
+        with self._lock:
+            now = time.monotonic()
+            vencidas = [k for k, (t, _) in self._data.items() if self._is_expired(t, now)]
+            for key in vencidas:
+                self._remove(key)
+            self.expired += len(vencidas)
+            return len(vencidas)
+
+    def items(self) -> list:
+        """Copia de las entradas vigentes (sin alterar el orden LRU)."""
+        with self._lock:
+            now = time.monotonic()
+            return [(k, v) for k, (t, v) in self._data.items() if not self._is_expired(t, now)]
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._data):
+                self._remove(key)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+
+_MISSING = object()
+
+
+class DiskCache:
+    """
+    Caché persistente en SQLite para valores serializables a JSON. Sobrevive a los
+    reinicios; las entradas vencen por TTL y, al superar `max_entries`, se borran
+    las usadas hace más tiempo. El archivo y su esquema se crean en el primer uso,
+    no al construir la caché (que suele ser al importar el módulo).
+    """
+
+    def __init__(self, path: str, max_entries: int = 2000, ttl_seconds: float = 7 * 86400):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._esquema_lock = threading.Lock()
+        self._esquema_listo = False
+
+    def _preparar(self):
+        with self._esquema_lock:
+            if self._esquema_listo:
+                return
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5)
+            try:
+                with conn:
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS cache ("
+                        "clave TEXT PRIMARY KEY, valor TEXT NOT NULL, creada REAL NOT NULL, usada REAL NOT NULL)"
+                    )
+                    conn.execute("CREATE INDEX IF NOT EXISTS cache_usada ON cache (usada)")
+            finally:
+                conn.close()
+            self._esquema_listo = True
+
+    @contextmanager
+    def _db(self):
+        if not self._esquema_listo:
+            self._preparar()
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        ahora = time.time()
+        with self._lock, self._db() as conn:
+            fila = conn.execute("SELECT valor, creada FROM cache WHERE clave = ?", (key,)).fetchone()
+            if fila is None:
+                return default
+            if self.ttl_seconds > 0 and ahora - fila[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM cache WHERE clave = ?", (key,))
+                return default
+            conn.execute("UPDATE cache SET usada = ? WHERE clave = ?", (ahora, key))
+        return json.loads(fila[0])
+
+    def set(self, key: str, value: Any):
+        ahora = time.time()
+        with self._lock, self._db() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (clave, valor, creada, usada) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), ahora, ahora),
+            )
+            exceso = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_entries
+            if exceso > 0:
+                conn.execute(
+                    "DELETE FROM cache WHERE clave IN (SELECT clave FROM cache ORDER BY usada LIMIT ?)",
+                    (exceso,),
+                )
+
+    def delete(self, key: str):
+        with self._lock, self._db() as conn:
+            conn.execute("DELETE FROM cache WHERE clave = ?", (key,))
+
+    def clear(self):
+        with self._lock, self._db() as conn:
+            conn.execute("DELETE FROM cache")
+
+    def __len__(self) -> int:
+        if not self._esquema_listo and not Path(self.path).exists():
+            return 0
+        with self._db() as conn:
+            return conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+class _Llamada:
+    def __init__(self):
+        self.listo = threading.Event()
+        self.valor = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Agrupa llamadas concurrentes con la misma clave: la primera ejecuta la función
+    y las demás esperan y reciben su mismo resultado (o su misma excepción).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._en_vuelo = {}
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Devuelve (resultado, compartido); compartido es True si se reutilizó otra llamada."""
+        with self._lock:
+            llamada = self._en_vuelo.get(key)
+            lider = llamada is None
+            if lider:
+                llamada = self._en_vuelo[key] = _Llamada()
+            else:
+                self.coalesced += 1
+
+        if not lider:
+            llamada.listo.wait()
+            if llamada.error is not None:
+                raise llamada.error
+            return llamada.valor, True
+
+        try:
+            llamada.valor = fn()
+        except BaseException as e:
+            llamada.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._en_vuelo[key]
+            llamada.listo.set()
+        return llamada.valor, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._en_vuelo)
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -19,3 +20,151 @@ CORS_ORIGINS = [
     "http://127.0.0.1:3000",
     "*"  # Se puede usar * solo en desarrollo
 ]
+
+# Caché de respuestas del chatbot
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", 512))
+CHAT_CACHE_TTL_SECONDS = float(os.getenv("CHAT_CACHE_TTL_SECONDS", 6 * 3600))
+CHAT_CACHE_SIMILARITY = float(os.getenv("CHAT_CACHE_SIMILARITY", 0.85))
+
+# Secciones de contexto del chatbot memorizadas por versión de los insumos
+CONTEXT_SNAPSHOT_TTL_SECONDS = float(os.getenv("CONTEXT_SNAPSHOT_TTL_SECONDS", 3600))
+
+# Orquestación de proveedores LLM (respaldo y peticiones de cobertura)
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", 8.0))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", 1.0))
+LLM_ORCHESTRATOR_TIMEOUT = float(os.getenv("LLM_ORCHESTRATOR_TIMEOUT", 60.0))
+LLM_STATS_WINDOW = int(os.getenv("LLM_STATS_WINDOW", 100))
+
+# Endpoints de los proveedores LLM; permiten apuntar a un servidor local
+# (p. ej. tools/fake_llm_server.py) para pruebas de carga sin claves reales
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None  # None: endpoint oficial de OpenAI
+HF_BASE_URL = os.getenv("HF_BASE_URL", "https://router.huggingface.co/v1")
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT", "")  # vacío: endpoint oficial de Google
+
+# Resiliencia de proveedores LLM: circuito, cuota y concurrencia por proveedor
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", 30.0))
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", 5))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", 30.0))
+LLM_LIMITER_MAX_WAIT = float(os.getenv("LLM_LIMITER_MAX_WAIT", 2.0))
+LLM_PROVIDER_LIMITS = {
+    "openai": {
+        "requests_per_minute": float(os.getenv("OPENAI_RPM", 500)),
+        "burst": int(os.getenv("OPENAI_BURST", 20)),
+        "max_concurrency": int(os.getenv("OPENAI_MAX_CONCURRENCY", 8)),
+    },
+    "zephyr": {
+        "requests_per_minute": float(os.getenv("HF_RPM", 60)),
+        "burst": int(os.getenv("HF_BURST", 5)),
+        "max_concurrency": int(os.getenv("HF_MAX_CONCURRENCY", 4)),
+    },
+    "gemini": {
+        "requests_per_minute": float(os.getenv("GEMINI_RPM", 15)),
+        "burst": int(os.getenv("GEMINI_BURST", 5)),
+        "max_concurrency": int(os.getenv("GEMINI_MAX_CONCURRENCY", 4)),
+    },
+}
+
+# Precarga de datos, modelo, snapshot de contexto y SDKs al arrancar (en segundo plano);
+# /ready responde 503 hasta que termina
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+WARMUP_WORKERS = int(os.getenv("WARMUP_WORKERS", 4))  # componentes precargados en paralelo
+
+# Sesiones de conversación del chatbot
+CHAT_SESSIONS_MAX = int(os.getenv("CHAT_SESSIONS_MAX", 1000))
+CHAT_SESSIONS_DB = os.getenv("CHAT_SESSIONS_DB", "")  # ruta SQLite opcional para volcar sesiones desalojadas
+CHAT_SESSION_RECENT_TURNS = int(os.getenv("CHAT_SESSION_RECENT_TURNS", 3))
+CHAT_SESSION_DIGEST_MAX_TOKENS = int(os.getenv("CHAT_SESSION_DIGEST_MAX_TOKENS", 400))
+
+# Lotes de preguntas al chatbot (/chat/batch)
+CHAT_BATCH_MAX_ITEMS = int(os.getenv("CHAT_BATCH_MAX_ITEMS", 1000))
+CHAT_BATCH_CONCURRENCY = int(os.getenv("CHAT_BATCH_CONCURRENCY", 4))  # preguntas simultáneas por proveedor
+
+# Caché de interpretaciones (/ia/interpretar): memoria LRU delante de un nivel en disco
+INTERPRETACION_CACHE_MAX_ENTRIES = int(os.getenv("INTERPRETACION_CACHE_MAX_ENTRIES", 256))
+INTERPRETACION_CACHE_TTL_SECONDS = float(os.getenv("INTERPRETACION_CACHE_TTL_SECONDS", 24 * 3600))
+INTERPRETACION_CACHE_DB = os.getenv("INTERPRETACION_CACHE_DB", "cache/interpretaciones.sqlite3")  # vacío: sin disco
+INTERPRETACION_CACHE_DISK_MAX_ENTRIES = int(os.getenv("INTERPRETACION_CACHE_DISK_MAX_ENTRIES", 5000))
+INTERPRETACION_CACHE_DISK_TTL_SECONDS = float(os.getenv("INTERPRETACION_CACHE_DISK_TTL_SECONDS", 7 * 86400))
+
+# Almacén de series de las estaciones (interpretación por referencia)
+SERIES_STORE_MAX_TABLAS = int(os.getenv("SERIES_STORE_MAX_TABLAS", 32))
+SERIES_CACHE_DIR = os.getenv("SERIES_CACHE_DIR", "cache/series")  # copia columnar .npz; vacío: solo memoria
+
+# Cola de trabajos de reportes (render en un pool de procesos)
+REPORT_JOBS_WORKERS = int(os.getenv("REPORT_JOBS_WORKERS", 2))
+REPORT_JOBS_MAX_PENDING = int(os.getenv("REPORT_JOBS_MAX_PENDING", 16))  # en cola + en curso; por encima, 429
+REPORT_JOBS_HISTORY = int(os.getenv("REPORT_JOBS_HISTORY", 200))         # trabajos terminados que se conservan
+REPORT_JOBS_START_METHOD = os.getenv("REPORT_JOBS_START_METHOD", "spawn")  # spawn: seguro con los hilos de la API
+
+# Reportes direccionados por contenido: índice de artefactos ya generados
+REPORT_ARTIFACTS_DB = os.getenv("REPORT_ARTIFACTS_DB", "cache/reportes.sqlite3")
+REPORT_ARTIFACTS_MAX_ENTRIES = int(os.getenv("REPORT_ARTIFACTS_MAX_ENTRIES", 100000))
+REPORT_IDEMPOTENCY_TTL_SECONDS = float(os.getenv("REPORT_IDEMPOTENCY_TTL_SECONDS", 24 * 3600))
+
+# Manifiesto de reportes generados (JSONL de solo anexado + índice en memoria)
+REPORT_MANIFEST_PATH = os.getenv("REPORT_MANIFEST_PATH", "cache/report_manifest.jsonl")
+
+# Árbol de artefactos generados (reportes fuera de data4/, que guarda los datos fuente)
+ARTIFACTS_DIR = Path(os.getenv("ARTIFACTS_DIR", "artifacts"))
+REPORTS_ARTIFACTS_DIRS = {
+    "CSV": ARTIFACTS_DIR / "reports" / "csv",
+    "PDF": ARTIFACTS_DIR / "reports" / "pdf",
+    "XLSX": ARTIFACTS_DIR / "reports" / "xlsx",  # exportaciones guardadas (/reports/export/xlsx?guardar=true)
+}
+
+# Retención de reportes: antigüedad máxima y cuota de espacio por tipo (0: sin límite)
+REPORT_RETENTION_ENABLED = os.getenv("REPORT_RETENTION_ENABLED", "true").lower() in ("1", "true", "yes")
+REPORT_RETENTION_INTERVAL_SECONDS = float(os.getenv("REPORT_RETENTION_INTERVAL_SECONDS", 3600))
+REPORT_RETENTION = {
+    "CSV": {
+        "max_dias": float(os.getenv("REPORT_RETENTION_CSV_MAX_DAYS", 30)),
+        "max_mb": float(os.getenv("REPORT_RETENTION_CSV_MAX_MB", 200)),
+    },
+    "PDF": {
+        "max_dias": float(os.getenv("REPORT_RETENTION_PDF_MAX_DAYS", 90)),
+        "max_mb": float(os.getenv("REPORT_RETENTION_PDF_MAX_MB", 1024)),
+    },
+    "XLSX": {
+        "max_dias": float(os.getenv("REPORT_RETENTION_XLSX_MAX_DAYS", 30)),
+        "max_mb": float(os.getenv("REPORT_RETENTION_XLSX_MAX_MB", 200)),
+    },
+}
+REPORT_RETENTION_BATCH = int(os.getenv("REPORT_RETENTION_BATCH", 50))              # archivos por tanda
+REPORT_RETENTION_PAUSE_SECONDS = float(os.getenv("REPORT_RETENTION_PAUSE_SECONDS", 0.2))  # pausa entre tandas
+
+# Descargas de archivos: variantes gzip/brotli cacheadas en disco y revalidación por ETag
+DOWNLOAD_CACHE_DIR = os.getenv("DOWNLOAD_CACHE_DIR", "cache/downloads")
+DOWNLOAD_COMPRESS_MIN_BYTES = int(os.getenv("DOWNLOAD_COMPRESS_MIN_BYTES", 1024))
+DOWNLOAD_CACHE_CONTROL = os.getenv("DOWNLOAD_CACHE_CONTROL", "no-cache")  # siempre revalidar con ETag
+
+# Exportaciones en streaming (/reports/export/{csv,xlsx}): límites por petición
+REPORT_EXPORT_MAX_SCENARIOS = int(os.getenv("REPORT_EXPORT_MAX_SCENARIOS", 50))
+REPORT_EXPORT_MAX_MONTHS = int(os.getenv("REPORT_EXPORT_MAX_MONTHS", 1200))
+
+# Bandeja de salida de correos (SQLite) con reintentos y backoff exponencial
+EMAIL_OUTBOX_DB = os.getenv("EMAIL_OUTBOX_DB", "cache/outbox.sqlite3")
+EMAIL_OUTBOX_WORKERS = int(os.getenv("EMAIL_OUTBOX_WORKERS", 1))
+EMAIL_OUTBOX_BATCH = int(os.getenv("EMAIL_OUTBOX_BATCH", 50))                    # mensajes por tanda
+EMAIL_OUTBOX_POLL_SECONDS = float(os.getenv("EMAIL_OUTBOX_POLL_SECONDS", 2))      # encolados desde otros procesos
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", 6))
+EMAIL_OUTBOX_BACKOFF_BASE_SECONDS = float(os.getenv("EMAIL_OUTBOX_BACKOFF_BASE_SECONDS", 30))
+EMAIL_OUTBOX_BACKOFF_MAX_SECONDS = float(os.getenv("EMAIL_OUTBOX_BACKOFF_MAX_SECONDS", 3600))
+EMAIL_OUTBOX_LEASE_SECONDS = float(os.getenv("EMAIL_OUTBOX_LEASE_SECONDS", 600))  # "enviando" huérfano tras una caída
+EMAIL_MAX_RECIPIENTS = int(os.getenv("EMAIL_MAX_RECIPIENTS", 500))                 # lista de distribución por petición
+
+# Suscripciones: listas de destinatarios con envío programado de reportes
+SUBSCRIPTIONS_DB = os.getenv("SUBSCRIPTIONS_DB", "cache/suscripciones.sqlite3")
+SUBSCRIPTIONS_SCHEDULER_ENABLED = os.getenv("SUBSCRIPTIONS_SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+SUBSCRIPTIONS_CHECK_SECONDS = float(os.getenv("SUBSCRIPTIONS_CHECK_SECONDS", 60))
+SUBSCRIPTIONS_MAX_SUBSCRIBERS = int(os.getenv("SUBSCRIPTIONS_MAX_SUBSCRIBERS", 10000))  # por lista
+SUBSCRIPTIONS_RENDER_LEASE_SECONDS = float(os.getenv("SUBSCRIPTIONS_RENDER_LEASE_SECONDS", 1800))  # "renderizando" huérfano tras una caída
+SUBSCRIPTIONS_MAX_ATTEMPTS = int(os.getenv("SUBSCRIPTIONS_MAX_ATTEMPTS", 3))  # intentos por periodo si el render falla
+
+# Catálogo de archivos de datos: índice en memoria vigilado con watchfiles
+FILE_CATALOG_WATCH = os.getenv("FILE_CATALOG_WATCH", "true").lower() in ("1", "true", "yes")
+FILE_CATALOG_POLL_SECONDS = float(os.getenv("FILE_CATALOG_POLL_SECONDS", 5))  # sin vigilante: revalidación
+
+# Ingesta de CSV nuevos (POST /files/ingest/{directory}): validación en streaming
+INGEST_STAGING_DIR = os.getenv("INGEST_STAGING_DIR", "cache/ingest")
+INGEST_MAX_MB = float(os.getenv("INGEST_MAX_MB", 50))
+INGEST_MAX_ERRORS = int(os.getenv("INGEST_MAX_ERRORS", 20))  # se corta la subida al llegar a este número
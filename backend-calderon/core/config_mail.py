@@ -1,47 +1,69 @@
+import logging
 import os
-import smtplib
 from email.message import EmailMessage
 from dotenv import load_dotenv
 
+from core.smtp_pool import SMTPPool
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Variables de entorno para email (compatibilidad con ambas configuraciones)
 EMAIL_HOST = os.getenv("EMAIL_HOST") or os.getenv("SMTP_HOST", "smtp.gmail.com")
 EMAIL_PORT = int(os.getenv("EMAIL_PORT") or os.getenv("SMTP_PORT", 587))
 EMAIL_USER = os.getenv("EMAIL_USER") or os.getenv("SMTP_USER")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD") or os.getenv("SMTP_PASSWORD")
+EMAIL_FROM = os.getenv("EMAIL_FROM") or EMAIL_USER
+EMAIL_SMTP_SECURITY = os.getenv("EMAIL_SMTP_SECURITY", "starttls").lower()  # starttls | ssl | none
+EMAIL_SMTP_TIMEOUT = float(os.getenv("EMAIL_SMTP_TIMEOUT", 30))
+
+# Conexiones SMTP autenticadas que se reutilizan entre mensajes
+EMAIL_SMTP_POOL_SIZE = int(os.getenv("EMAIL_SMTP_POOL_SIZE", 2))
+EMAIL_SMTP_IDLE_SECONDS = float(os.getenv("EMAIL_SMTP_IDLE_SECONDS", 60))
+EMAIL_SMTP_MAX_MESSAGES = int(os.getenv("EMAIL_SMTP_MAX_MESSAGES", 100))  # por conexión, luego se recicla
+
+smtp_pool = SMTPPool(
+    EMAIL_HOST, EMAIL_PORT, EMAIL_USER, EMAIL_PASSWORD,
+    seguridad=EMAIL_SMTP_SECURITY,
+    timeout=EMAIL_SMTP_TIMEOUT,
+    max_conexiones=EMAIL_SMTP_POOL_SIZE,
+    max_inactividad=EMAIL_SMTP_IDLE_SECONDS,
+    max_mensajes=EMAIL_SMTP_MAX_MESSAGES,
+)
+
+def construir_mensaje(asunto, cuerpo, destinatario, adjunto=None, nombre_adjunto=None):
+    """Mensaje con un PDF adjunto opcional (bytes ya leídos, para reutilizarlos entre destinatarios)."""
+    mensaje = EmailMessage()
+    mensaje["From"] = EMAIL_FROM
+    mensaje["To"] = destinatario
+    mensaje["Subject"] = asunto
+    mensaje.set_content(cuerpo)
+    if adjunto is not None:
+        mensaje.add_attachment(adjunto, maintype="application", subtype="pdf", filename=nombre_adjunto)
+    return mensaje
 
 def enviar_correo_con_adjunto(asunto, cuerpo, ruta_pdf, destinatario):
     try:
-        if not EMAIL_USER or not EMAIL_PASSWORD:
-            print("Error: Configuración de email incompleta")
-            print(f"EMAIL_USER: {EMAIL_USER}")
-            print(f"EMAIL_PASSWORD: {'Configurado' if EMAIL_PASSWORD else 'No configurado'}")
+        if not smtp_pool.configurado:
+            logger.error(
+                "Configuración de email incompleta (EMAIL_USER: %s, EMAIL_PASSWORD: %s)",
+                EMAIL_USER, "configurado" if EMAIL_PASSWORD else "no configurado",
+            )
             return False
-            
-        print(f"Enviando email a {destinatario} usando {EMAIL_HOST}:{EMAIL_PORT}")
-        
-        mensaje = EmailMessage()
-        mensaje["From"] = EMAIL_USER
-        mensaje["To"] = destinatario
-        mensaje["Subject"] = asunto
-        mensaje.set_content(cuerpo)
+
+        logger.debug("Enviando email a %s usando %s:%s", destinatario, EMAIL_HOST, EMAIL_PORT)
 
         with open(ruta_pdf, "rb") as f:
             pdf_data = f.read()
-        mensaje.add_attachment(pdf_data, maintype="application", subtype="pdf", filename=os.path.basename(ruta_pdf))
-
-        with smtplib.SMTP(EMAIL_HOST, EMAIL_PORT) as server:
-            print("Conectando al servidor SMTP...")
-            server.starttls()
-            print("TLS iniciado, intentando login...")
-            server.login(EMAIL_USER, EMAIL_PASSWORD)
-            print("Login exitoso, enviando mensaje...")
+        mensaje = construir_mensaje(asunto, cuerpo, destinatario, pdf_data, os.path.basename(ruta_pdf))
+
+        # Conexión del pool: STARTTLS y login solo la primera vez
+        with smtp_pool.conexion() as server:
             server.send_message(mensaje)
-            print("Mensaje enviado exitosamente")
-        
-        print(f"Email enviado exitosamente a: {destinatario}")
+
+        logger.debug("Email enviado a %s", destinatario)
         return True
     except Exception as e:
-        print(f"Error al enviar correo: {e}")
+        logger.warning("Error al enviar correo a %s: %s", destinatario, e)
         return False
@@ -0,0 +1,208 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+try:
+    import brotli
+except ImportError:  # sin el paquete brotli solo se ofrece gzip
+    brotli = None
+
+from core.cache import SingleFlight, TTLCache
+from core.config import DOWNLOAD_CACHE_CONTROL, DOWNLOAD_CACHE_DIR, DOWNLOAD_COMPRESS_MIN_BYTES
+
+# Tipos de texto que vale la pena comprimir (los CSV diarios de data/ pesan cientos de KB)
+EXTENSIONES_COMPRIMIBLES = {".csv", ".json", ".txt", ".tsv", ".xml"}
+EXTENSION_VARIANTE = {"br": "br", "gzip": "gz"}
+_BLOQUE = 1024 * 1024
+
+
+def _codificaciones_aceptadas(cabecera: str) -> Dict[str, float]:
+    """Accept-Encoding → {codificación: q}; "*" vale para las que no se nombran."""
+    aceptadas = {}
+    for parte in cabecera.split(","):
+        nombre, _, parametros = parte.strip().partition(";")
+        if not nombre:
+            continue
+        q = 1.0
+        for parametro in parametros.split(";"):
+            clave, _, valor = parametro.strip().partition("=")
+            if clave == "q":
+                try:
+                    q = float(valor)
+                except ValueError:
+                    q = 0.0
+        aceptadas[nombre.strip().lower()] = q
+    return aceptadas
+
+
+class Descargas:
+    """
+    Capa de descarga de archivos: ETag fuerte (SHA-256 del contenido, calculado una vez
+    por versión del archivo), revalidación con If-None-Match / If-Modified-Since (304),
+    rangos HTTP (los resuelve FileResponse, también con If-Range) y variantes gzip/brotli
+    de los archivos de texto, generadas una sola vez y guardadas en disco. La variante se
+    elige por Accept-Encoding; las peticiones con Range reciben siempre el original.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = DOWNLOAD_CACHE_DIR,
+        min_bytes: int = DOWNLOAD_COMPRESS_MIN_BYTES,
+        cache_control: str = DOWNLOAD_CACHE_CONTROL,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.min_bytes = min_bytes
+        self.cache_control = cache_control
+        self._huellas = TTLCache(max_entries=4096, ttl_seconds=0)
+        self._vuelo = SingleFlight()
+        self._lock = threading.Lock()
+        self._contadores = {"respuestas": 0, "no_modificado": 0, "rangos": 0, "variantes_servidas": 0,
+                            "variantes_generadas": 0, "huellas_calculadas": 0}
+
+    def _contar(self, nombre: str):
+        with self._lock:
+            self._contadores[nombre] += 1
+
+    # --- ETag ---
+
+    def huella(self, ruta: Path, st: Optional[os.stat_result] = None) -> str:
+        """SHA-256 del contenido; se recalcula solo si cambian inodo, tamaño o mtime."""
+        st = st or ruta.stat()
+        clave = (str(ruta), st.st_ino, st.st_size, st.st_mtime_ns)
+        valor = self._huellas.get(clave)
+        if valor is None:
+            valor, _ = self._vuelo.do(clave, lambda: self._calcular_huella(ruta))
+            self._huellas.set(clave, valor)
+        return valor
+
+    def _calcular_huella(self, ruta: Path) -> str:
+        digest = hashlib.sha256()
+        with open(ruta, "rb") as f:
+            while bloque := f.read(_BLOQUE):
+                digest.update(bloque)
+        self._contar("huellas_calculadas")
+        return digest.hexdigest()
+
+    # --- Variantes comprimidas ---
+
+    def _elegir_codificacion(self, request: Request, ruta: Path, size: int) -> Optional[str]:
+        if ruta.suffix.lower() not in EXTENSIONES_COMPRIMIBLES or size < self.min_bytes:
+            return None
+        if "range" in request.headers:
+            return None
+        aceptadas = _codificaciones_aceptadas(request.headers.get("accept-encoding", ""))
+        comodin = aceptadas.get("*", 0.0)
+        candidatas = (["br"] if brotli is not None else []) + ["gzip"]
+        puntuadas = [(aceptadas.get(c, comodin), -i, c) for i, c in enumerate(candidatas)]
+        q, _, codificacion = max(puntuadas)
+        return codificacion if q > 0 else None
+
+    def variante(self, ruta: Path, huella: str, codificacion: str) -> Optional[Path]:
+        """Ruta de la variante comprimida (la genera la primera vez); None si no reduce el tamaño."""
+        prefijo = hashlib.sha1(str(ruta.resolve()).encode()).hexdigest()[:16]
+        extension = EXTENSION_VARIANTE[codificacion]
+        destino = self.cache_dir / f"{prefijo}-{huella[:16]}.{extension}"
+        inutil = destino.with_suffix(".inutil")
+        if destino.exists():
+            return destino
+        if inutil.exists():
+            return None
+        return self._vuelo.do(str(destino), lambda: self._generar(ruta, destino, inutil, prefijo, codificacion))[0]
+
+    def _generar(self, ruta: Path, destino: Path, inutil: Path, prefijo: str, codificacion: str) -> Optional[Path]:
+        if destino.exists():
+            return destino
+        datos = ruta.read_bytes()
+        if codificacion == "br":
+            comprimido = brotli.compress(datos, quality=9)
+        else:
+            comprimido = gzip.compress(datos, compresslevel=9, mtime=0)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Versiones anteriores del mismo archivo ya no se sirven
+        for vieja in self.cache_dir.glob(f"{prefijo}-*"):
+            if vieja.suffix in (destino.suffix, ".inutil") and vieja not in (destino, inutil):
+                vieja.unlink(missing_ok=True)
+        if len(comprimido) >= len(datos) * 0.9:
+            inutil.touch()  # no vale la pena: se recuerda para no volver a intentarlo
+            return None
+        temporal = destino.with_name(f".{destino.name}.{os.getpid()}.tmp")
+        temporal.write_bytes(comprimido)
+        os.replace(temporal, destino)
+        self._contar("variantes_generadas")
+        return destino
+
+    # --- Respuesta ---
+
+    @staticmethod
+    def _no_modificado(request: Request, etag: str, mtime: float) -> bool:
+        si_no_coincide = request.headers.get("if-none-match")
+        if si_no_coincide is not None:
+            # Comparación débil (RFC 9110): se ignora el prefijo W/
+            etiquetas = {etiqueta.strip().removeprefix("W/") for etiqueta in si_no_coincide.split(",")}
+            return "*" in etiquetas or etag in etiquetas
+        si_modificado = request.headers.get("if-modified-since")
+        if si_modificado:
+            try:
+                return int(mtime) <= parsedate_to_datetime(si_modificado).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def responder(
+        self,
+        request: Request,
+        ruta: Path,
+        media_type: Optional[str] = None,
+        filename: Optional[str] = None,
+    ) -> Response:
+        ruta = Path(ruta)
+        st = ruta.stat()
+        huella = self.huella(ruta, st)
+        codificacion = self._elegir_codificacion(request, ruta, st.st_size)
+        archivo = self.variante(ruta, huella, codificacion) if codificacion else None
+        if archivo is None:
+            codificacion = None
+
+        etag = f'"{huella}-{EXTENSION_VARIANTE[codificacion]}"' if codificacion else f'"{huella}"'
+        cabeceras = {
+            "etag": etag,
+            "last-modified": formatdate(st.st_mtime, usegmt=True),
+            "cache-control": self.cache_control,
+        }
+        if ruta.suffix.lower() in EXTENSIONES_COMPRIMIBLES:
+            cabeceras["vary"] = "Accept-Encoding"
+
+        self._contar("respuestas")
+        if self._no_modificado(request, etag, st.st_mtime):
+            self._contar("no_modificado")
+            return Response(status_code=304, headers=cabeceras)
+
+        media_type = media_type or mimetypes.guess_type(filename or ruta.name)[0] or "application/octet-stream"
+        if codificacion:
+            self._contar("variantes_servidas")
+            cabeceras["content-encoding"] = codificacion
+        elif "range" in request.headers:
+            self._contar("rangos")
+        return FileResponse(archivo or ruta, media_type=media_type, filename=filename, headers=cabeceras)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            contadores = dict(self._contadores)
+        variantes = list(self.cache_dir.glob("*.gz")) + list(self.cache_dir.glob("*.br")) if self.cache_dir.exists() else []
+        return {
+            **contadores,
+            "brotli": brotli is not None,
+            "variantes_en_disco": len(variantes),
+            "bytes_variantes": sum(v.stat().st_size for v in variantes),
+        }
+
+
+descargas = Descargas()
@@ -0,0 +1,231 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Exposición en formato de texto de Prometheus (versión 0.0.4) sin dependencias externas:
+# contadores e histogramas con etiquetas, más colectores que leen estadísticas ya existentes
+# (cachés, colas) en el momento del scrape.
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BUCKETS_LOTE = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 10000)
+BUCKETS_TOKENS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _numero(valor: float) -> str:
+    if valor == math.inf:
+        return "+Inf"
+    if isinstance(valor, float) and valor.is_integer() and abs(valor) < 1e15:
+        return str(int(valor))
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def _etiquetas(nombres: Sequence[str], valores: Sequence[str], extra: str = "") -> str:
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._lock = threading.Lock()
+
+    def _clave(self, etiquetas: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(etiquetas.get(n, "")) for n in self.etiquetas)
+
+    def cabecera(self) -> List[str]:
+        return [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        super().__init__(nombre, ayuda, etiquetas)
+        self._valores: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, valor: float = 1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + valor
+
+    def valor(self, **etiquetas) -> float:
+        with self._lock:
+            return self._valores.get(self._clave(etiquetas), 0)
+
+    def lineas(self) -> List[str]:
+        with self._lock:
+            valores = sorted(self._valores.items())
+        return [f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(v)}" for clave, v in valores]
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (), buckets: Sequence[float] = BUCKETS_LATENCIA):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(sorted(buckets))
+        # Por serie: [cuentas por bucket (no acumuladas, la última es +Inf), suma]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observar(self, valor: float, **etiquetas):
+        clave = self._clave(etiquetas)
+        indice = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][indice] += 1
+            serie[1] += valor
+
+    @contextmanager
+    def medir(self, **etiquetas):
+        """Observa la duración del bloque en segundos (también si termina con excepción)."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **etiquetas)
+
+    def cuenta(self, **etiquetas) -> int:
+        with self._lock:
+            serie = self._series.get(self._clave(etiquetas))
+            return sum(serie[0]) if serie else 0
+
+    def lineas(self) -> List[str]:
+        with self._lock:
+            series = sorted((clave, list(cuentas), suma) for clave, (cuentas, suma) in self._series.items())
+        lineas = []
+        for clave, cuentas, suma in series:
+            acumulado = 0
+            for limite, cuenta in zip((*self.buckets, math.inf), cuentas):
+                acumulado += cuenta
+                le = f'le="{_numero(float(limite))}"'
+                lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, clave, le)} {acumulado}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {_numero(suma)}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {acumulado}")
+        return lineas
+
+
+# Colector: función sin argumentos que devuelve familias (nombre, tipo, ayuda, [(etiquetas, valor)])
+Familia = Tuple[str, str, str, Iterable[Tuple[Dict[str, str], float]]]
+
+
+class Registro:
+    def __init__(self):
+        self._metricas: Dict[str, _Metrica] = {}
+        self._colectores: List[Callable[[], Iterable[Familia]]] = []
+        self._lock = threading.Lock()
+
+    def _registrar(self, metrica: _Metrica) -> _Metrica:
+        with self._lock:
+            existente = self._metricas.get(metrica.nombre)
+            if existente is not None:
+                return existente
+            self._metricas[metrica.nombre] = metrica
+            return metrica
+
+    def contador(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()) -> Contador:
+        return self._registrar(Contador(nombre, ayuda, etiquetas))
+
+    def histograma(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (), buckets: Sequence[float] = BUCKETS_LATENCIA) -> Histograma:
+        return self._registrar(Histograma(nombre, ayuda, etiquetas, buckets))
+
+    def colector(self, fn: Callable[[], Iterable[Familia]]):
+        with self._lock:
+            self._colectores.append(fn)
+        return fn
+
+    def exponer(self) -> str:
+        with self._lock:
+            metricas = sorted(self._metricas.values(), key=lambda m: m.nombre)
+            colectores = list(self._colectores)
+        lineas = []
+        for metrica in metricas:
+            lineas += metrica.cabecera() + metrica.lineas()
+        for colector in colectores:
+            try:
+                familias = list(colector())
+            except Exception as e:  # un colector roto no tumba el resto del scrape
+                print(f"[WARN] Colector de métricas {getattr(colector, '__name__', colector)}: {e}")
+                continue
+            for nombre, tipo, ayuda, muestras in familias:
+                lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} {tipo}"]
+                for etiquetas, valor in muestras:
+                    if valor is None:
+                        continue
+                    lineas.append(f"{nombre}{_etiquetas(list(etiquetas), list(etiquetas.values()))} {_numero(valor)}")
+        return "\n".join(lineas) + "\n"
+
+
+metricas = Registro()
+
+# --- Métricas compartidas (los servicios las alimentan con ganchos explícitos) ---
+
+HTTP_DURACION = metricas.histograma(
+    "http_request_duration_seconds", "Duración de las peticiones HTTP por ruta, método y código", ("method", "route", "status")
+)
+LLM_DURACION = metricas.histograma(
+    "llm_request_duration_seconds", "Duración de las llamadas a proveedores LLM", ("provider", "outcome")
+)
+LLM_ERRORES = metricas.contador(
+    "llm_errors_total", "Errores de proveedores LLM por tipo de excepción (incluye rechazos de la capa de resiliencia)", ("provider", "error")
+)
+INFERENCIA_LOTE = metricas.histograma(
+    "model_inference_batch_rows", "Filas por llamada de inferencia del modelo de consumo", ("operation",), BUCKETS_LOTE
+)
+# stage="pregunta": historial + pregunta sin contexto (línea base); stage="enriquecido": prompt enviado;
+# stage="interpretacion": resumen de la serie enviado a Gemini para interpretarla
+PROMPT_TOKENS = metricas.histograma(
+    "llm_prompt_tokens", "Tokens estimados de los prompts del LLM por etapa de construcción", ("stage",), BUCKETS_TOKENS
+)
+CONTEXTO_SECCIONES = metricas.contador(
+    "chat_context_sections_total", "Secciones de contexto anexadas a los prompts del chatbot", ("section",)
+)
+PARSEO_DURACION = metricas.histograma(
+    "data_parse_duration_seconds", "Tiempo de lectura y parseo de archivos CSV/XLSX", ("format", "source")
+)
+
+
+class MiddlewareMetricas:
+    """
+    Middleware ASGI de bajo costo: mide cada petición HTTP hasta el último byte de la
+    respuesta (incluidas las descargas en streaming) y la etiqueta con la plantilla de la
+    ruta ("/files/{directory}"), no con la URL, para acotar el número de series.
+    """
+
+    def __init__(self, app, histograma: Optional[Histograma] = None):
+        self.app = app
+        self.histograma = histograma or HTTP_DURACION
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        inicio = time.perf_counter()
+        estado = [500]
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado[0] = mensaje["status"]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            ruta = getattr(scope.get("route"), "path", None) or "sin_ruta"
+            self.histograma.observar(
+                time.perf_counter() - inicio, method=scope["method"], route=ruta, status=str(estado[0])
+            )
@@ -0,0 +1,171 @@
+import smtplib
+import ssl
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+def es_error_de_conexion(error: BaseException) -> bool:
+    """
+    True si el error invalida la conexión (hay que descartarla y abrir otra). Un rechazo
+    del servidor con respuesta (5xx, 4xx salvo 421) deja la conexión utilizable.
+    """
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code == 421
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return False
+    return isinstance(error, OSError)
+
+
+class _Conexion:
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.creada = time.monotonic()
+        self.usada = self.creada
+        self.mensajes = 0
+
+
+class SMTPPool:
+    """
+    Conexiones SMTP autenticadas reutilizables. Abrir la conexión, negociar STARTTLS y
+    hacer login cuesta varios viajes de ida y vuelta; con el pool se paga una vez y la
+    conexión se reutiliza para los mensajes siguientes. Las conexiones inactivas más de
+    `max_inactividad` segundos o que ya enviaron `max_mensajes` se cierran, y una
+    conexión que estuvo un rato sin usarse se valida con NOOP antes de devolverla.
+
+    `seguridad`: "starttls" (puerto 587), "ssl" (puerto 465) o "none" (relay local / pruebas).
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        usuario: Optional[str] = None,
+        password: Optional[str] = None,
+        seguridad: str = "starttls",
+        timeout: float = 30.0,
+        max_conexiones: int = 2,
+        max_inactividad: float = 60.0,
+        max_mensajes: int = 100,
+    ):
+        self.host = host
+        self.port = port
+        self.usuario = usuario
+        self.password = password
+        self.seguridad = seguridad
+        self.timeout = timeout
+        self.max_conexiones = max_conexiones
+        self.max_inactividad = max_inactividad
+        self.max_mensajes = max_mensajes
+        self._libres: List[_Conexion] = []
+        self._semaforo = threading.BoundedSemaphore(max_conexiones)
+        self._lock = threading.Lock()
+        self.abiertas = 0
+        self.reutilizadas = 0
+        self.descartadas = 0
+
+    @property
+    def configurado(self) -> bool:
+        """Con seguridad "none" no se exige usuario (relay local); en otro caso sí."""
+        return bool(self.host) and (bool(self.usuario and self.password) or self.seguridad == "none")
+
+    def _abrir(self) -> _Conexion:
+        if self.seguridad == "ssl":
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout, context=ssl.create_default_context())
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.seguridad == "starttls":
+                smtp.starttls(context=ssl.create_default_context())
+        if self.usuario and self.password:
+            smtp.login(self.usuario, self.password)
+        with self._lock:
+            self.abiertas += 1
+        return _Conexion(smtp)
+
+    @staticmethod
+    def _cerrar(conexion: _Conexion):
+        try:
+            conexion.smtp.quit()
+        except Exception:
+            conexion.smtp.close()
+
+    def _tomar(self) -> _Conexion:
+        ahora = time.monotonic()
+        while True:
+            with self._lock:
+                conexion = self._libres.pop() if self._libres else None
+            if conexion is None:
+                return self._abrir()
+            if ahora - conexion.usada > self.max_inactividad:
+                self._cerrar(conexion)
+                continue
+            # Tras unos segundos sin uso el servidor pudo cortarla: se valida antes de enviar
+            if ahora - conexion.usada > 5:
+                try:
+                    if conexion.smtp.noop()[0] != 250:
+                        raise smtplib.SMTPServerDisconnected("NOOP rechazado")
+                except Exception:
+                    conexion.smtp.close()
+                    continue
+            with self._lock:
+                self.reutilizadas += 1
+            return conexion
+
+    @contextmanager
+    def conexion(self):
+        """
+        Presta una conexión lista para send_message(). Si el bloque lanza un error de
+        conexión, la conexión se descarta; si no, vuelve al pool.
+        """
+        with self._semaforo:
+            conexion = self._tomar()
+            try:
+                yield _Prestada(conexion)
+            except BaseException as e:
+                if es_error_de_conexion(e):
+                    conexion.smtp.close()
+                    with self._lock:
+                        self.descartadas += 1
+                else:
+                    self._devolver(conexion)
+                raise
+            self._devolver(conexion)
+
+    def _devolver(self, conexion: _Conexion):
+        conexion.usada = time.monotonic()
+        if conexion.mensajes >= self.max_mensajes:
+            self._cerrar(conexion)
+            return
+        with self._lock:
+            self._libres.append(conexion)
+
+    def cerrar(self):
+        with self._lock:
+            libres, self._libres = self._libres, []
+        for conexion in libres:
+            self._cerrar(conexion)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "host": f"{self.host}:{self.port}",
+                "seguridad": self.seguridad,
+                "libres": len(self._libres),
+                "max_conexiones": self.max_conexiones,
+                "abiertas": self.abiertas,
+                "reutilizadas": self.reutilizadas,
+                "descartadas": self.descartadas,
+            }
+
+
+class _Prestada:
+    """Envoltorio que cuenta los mensajes enviados por la conexión prestada."""
+
+    def __init__(self, conexion: _Conexion):
+        self._conexion = conexion
+
+    def send_message(self, mensaje, **kwargs):
+        resultado = self._conexion.smtp.send_message(mensaje, **kwargs)
+        self._conexion.mensajes += 1
+        return resultado
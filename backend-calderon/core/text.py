@@ -0,0 +1,22 @@
+import unicodedata
+
+
+def fold_accents(texto: str) -> str:
+    """Elimina tildes y diacríticos (sequía -> sequia)."""
+    normalizado = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in normalizado if not unicodedata.combining(c))
+
+
+def estimate_tokens(texto: str) -> int:
+    """Estimación rápida de tokens (~4 caracteres por token), sin depender del tokenizador del proveedor."""
+    return max(1, (len(texto) + 3) // 4) if texto else 0
+
+
+def compact_lines(texto: str) -> str:
+    """Quita la sangría y las líneas vacías repetidas de los bloques de texto del prompt."""
+    lineas = [linea.strip() for linea in texto.strip().splitlines()]
+    compactas = []
+    for linea in lineas:
+        if linea or (compactas and compactas[-1]):
+            compactas.append(linea)
+    return "\n".join(compactas)
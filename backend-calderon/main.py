@@ -1,9 +1,39 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from routers import files_router, precipitation_router, chats_router, interpretacion_router, water_router, reports_router
-from core.config import CORS_ORIGINS
+from routers import files_router, precipitation_router, chats_router, interpretacion_router, water_router, reports_router, admin_router, subscriptions_router
+from core.config import CORS_ORIGINS, WARMUP_ON_STARTUP, REPORT_RETENTION_ENABLED, SUBSCRIPTIONS_SCHEDULER_ENABLED
+from core.metrics import CONTENT_TYPE, MiddlewareMetricas
+from services.file_catalog import file_catalog
+from services.metrics_service import exponer_metricas
+from services.warmup_service import start_warmup_thread, marcar_listo, readiness
+from services.report_jobs import report_jobs
+from services.report_retention import report_retention
+from services.email_outbox import email_outbox
+from services.subscriptions import subscription_service
 
-app = FastAPI(title="Asistente predictor", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # La precarga corre en un hilo: el servidor acepta peticiones (y el healthcheck) de inmediato
+    if WARMUP_ON_STARTUP:
+        start_warmup_thread()
+    else:
+        marcar_listo()
+    file_catalog.iniciar()
+    if REPORT_RETENTION_ENABLED:
+        report_retention.iniciar()
+    email_outbox.iniciar()
+    if SUBSCRIPTIONS_SCHEDULER_ENABLED:
+        subscription_service.iniciar()
+    yield
+    subscription_service.detener()
+    email_outbox.detener()
+    report_retention.detener()
+    file_catalog.detener()
+    report_jobs.shutdown()
+
+app = FastAPI(title="Asistente predictor", version="1.0.0", lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -13,6 +43,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Latencia por ruta y código de estado (expuesta en /metrics)
+app.add_middleware(MiddlewareMetricas)
 
 # Routers
 app.include_router(files_router.router)
@@ -21,7 +53,23 @@ app.include_router(chats_router.router)
 app.include_router(interpretacion_router.router)
 app.include_router(water_router.router)
 app.include_router(reports_router.router)
+app.include_router(admin_router.router)
+app.include_router(subscriptions_router.router)
 
 @app.get("/")
 def root():
     return {"message": "API funcionando correctamente"}
+
+@app.get("/ready")
+def ready():
+    """
+    Readiness: 200 solo cuando terminó la precarga (con los tiempos por componente), 503 mientras tanto.
+    La raíz "/" sigue siendo el chequeo de vida (HEALTHCHECK del Dockerfile).
+    """
+    estado = readiness()
+    return JSONResponse(estado, status_code=200 if estado["listo"] else 503)
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Métricas en formato de texto de Prometheus."""
+    return Response(exponer_metricas(), media_type=CONTENT_TYPE)
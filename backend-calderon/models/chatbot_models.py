@@ -1,17 +1,60 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, conint
 from enum import Enum
 from datetime import datetime
+from typing import Optional, Dict, List
 
 class ModeloLLM(str, Enum):
     openai = "openai"
     zephyr = "zephyr"
     gemini = "gemini"
 
+class EstrategiaLLM(str, Enum):
+    simple = "simple"        # un solo proveedor
+    fallback = "fallback"    # respaldo ordenado entre proveedores ante errores
+    hedged = "hedged"        # respaldo + petición de cobertura si se supera el p95
+
 class PreguntaInput(BaseModel):
     pregunta: str
     modelo: ModeloLLM = ModeloLLM.openai
+    usar_cache: bool = True
+    estrategia: EstrategiaLLM = EstrategiaLLM.simple
+    session_id: Optional[str] = None  # si se indica, la pregunta usa el historial de la sesión
 
 class ChatbotResponse(BaseModel):
     modelo: ModeloLLM
     respuesta: str
+    proveedor: Optional[ModeloLLM] = None
+    cache: bool = False
+    session_id: Optional[str] = None
+    tokens: Optional[Dict[str, int]] = None
     timestamp: datetime
+
+class SesionTurno(BaseModel):
+    pregunta: str
+    respuesta: str
+    tokens_prompt: int
+    tokens_respuesta: int
+    timestamp: float
+
+class SesionResponse(BaseModel):
+    session_id: str
+    creada: float
+    actualizada: float
+    turnos: List[SesionTurno]
+    resumen: List[str]
+    turnos_totales: int
+    tokens_prompt: int
+    tokens_respuesta: int
+    tokens_historial: int
+
+class LotePregunta(BaseModel):
+    pregunta: str
+    id: Optional[str] = None                  # identificador libre del caso de prueba
+    modelo: Optional[ModeloLLM] = None        # por defecto, el modelo del lote
+
+class LoteInput(BaseModel):
+    preguntas: List[LotePregunta] = Field(..., min_length=1)
+    modelo: ModeloLLM = ModeloLLM.openai
+    estrategia: EstrategiaLLM = EstrategiaLLM.simple
+    usar_cache: bool = False                  # las evaluaciones suelen querer respuestas frescas
+    concurrencia: Optional[conint(ge=1, le=32)] = Field(None, description="Preguntas simultáneas por proveedor")
@@ -0,0 +1,63 @@
+from fastapi import APIRouter, HTTPException
+
+from core.downloads import descargas
+from services.chatbot import orchestrator
+from services.file_catalog import file_catalog
+from services.llm_resilience import guards_snapshot, reset_guard
+from services.report_retention import report_retention
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+@router.get("/llm")
+def llm_status():
+    """
+    Estado de la capa de resiliencia por proveedor LLM (circuito, cuota, concurrencia)
+    junto con las estadísticas de latencia y errores del orquestador.
+    """
+    return {
+        "proveedores": guards_snapshot(),
+        "estadisticas": orchestrator.stats_snapshot(),
+    }
+
+
+@router.post("/llm/{proveedor}/reset")
+def llm_reset(proveedor: str):
+    """
+    Cierra manualmente el circuito de un proveedor (p. ej. tras resolver una caída).
+    """
+    snapshot = reset_guard(proveedor)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail=f"Proveedor '{proveedor}' no existe")
+    return snapshot
+
+
+@router.get("/retention")
+def retention_status():
+    """
+    Políticas de retención de reportes, espacio ocupado por tipo y resultado de la última pasada.
+    """
+    return report_retention.stats()
+
+
+@router.post("/retention/run")
+def retention_run():
+    """
+    Ejecuta una pasada de retención inmediata (migración, antigüedad y cuotas).
+    """
+    return report_retention.ejecutar()
+
+
+@router.get("/downloads")
+def downloads_status():
+    """
+    Descargas: respuestas 304, rangos y variantes comprimidas generadas y servidas.
+    """
+    return descargas.stats()
+
+
+@router.get("/catalog")
+def catalog_status():
+    """
+    Catálogo de archivos: archivos indexados por directorio, sincronizaciones, lecturas y eventos vigilados.
+    """
+    return file_catalog.stats()
@@ -1,7 +1,13 @@
+import json
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from datetime import datetime, timezone
-from models.chatbot_models import PreguntaInput, ChatbotResponse
-from services.chatbot import responder_pregunta
+from models.chatbot_models import PreguntaInput, ChatbotResponse, SesionResponse, LoteInput
+from core.config import CHAT_BATCH_MAX_ITEMS
+from services.chat_batch_service import ejecutar_lote
+from services.chatbot import responder_pregunta_detallada, orchestrator
+from services.chat_cache import chat_cache
+from services.session_service import session_store, responder_en_sesion
 
 router = APIRouter(prefix="/chat", tags=["Chats"])
 
@@ -11,11 +17,110 @@ def chat_endpoint(input: PreguntaInput):
     Endpoint para interactuar con el chatbot.
     """
     try:
-        respuesta = responder_pregunta(input.pregunta, input.modelo.value)
+        if input.session_id:
+            resultado = responder_en_sesion(
+                input.session_id,
+                input.pregunta,
+                input.modelo.value,
+                estrategia=input.estrategia.value,
+                usar_cache=input.usar_cache
+            )
+        else:
+            resultado = responder_pregunta_detallada(
+                input.pregunta,
+                input.modelo.value,
+                usar_cache=input.usar_cache,
+                estrategia=input.estrategia.value
+            )
         return ChatbotResponse(
             modelo=input.modelo,
-            respuesta=respuesta,
+            respuesta=resultado["respuesta"],
+            proveedor=resultado["proveedor"],
+            cache=resultado["cache"],
+            session_id=resultado.get("session_id"),
+            tokens=resultado.get("tokens"),
             timestamp=datetime.now(timezone.utc)
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error en chatbot: {e}")
+
+
+@router.post("/batch")
+def chat_batch_endpoint(input: LoteInput):
+    """
+    Responde un lote de preguntas con concurrencia acotada por proveedor.
+    Devuelve NDJSON: una línea por pregunta (en orden de finalización, con su
+    `indice`, latencia y tokens) y una última línea con el `resumen` del lote.
+    """
+    if len(input.preguntas) > CHAT_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"El lote admite como máximo {CHAT_BATCH_MAX_ITEMS} preguntas"
+        )
+    items = [
+        {"pregunta": p.pregunta, "id": p.id, "modelo": p.modelo.value if p.modelo else None}
+        for p in input.preguntas
+    ]
+    resultados = ejecutar_lote(
+        items,
+        modelo=input.modelo.value,
+        estrategia=input.estrategia.value,
+        usar_cache=input.usar_cache,
+        concurrencia=input.concurrencia
+    )
+    lineas = (json.dumps(r, ensure_ascii=False) + "\n" for r in resultados)
+    return StreamingResponse(lineas, media_type="application/x-ndjson")
+
+
+@router.get("/cache/stats")
+def chat_cache_stats():
+    """
+    Estadísticas de la caché de respuestas: tasa de aciertos y latencia ahorrada.
+    """
+    return chat_cache.stats()
+
+
+@router.delete("/cache")
+def clear_chat_cache():
+    """
+    Vacía la caché de respuestas del chatbot.
+    """
+    chat_cache.clear()
+    return {"message": "Caché del chatbot vaciada"}
+
+
+@router.get("/providers/stats")
+def chat_providers_stats():
+    """
+    Latencia (media y p95) y errores recientes por proveedor LLM, usados para el enrutamiento.
+    """
+    return orchestrator.stats_snapshot()
+
+
+@router.post("/sessions", response_model=SesionResponse)
+def create_chat_session():
+    """
+    Crea una sesión de conversación; su session_id se envía luego en /chat/chatbot.
+    """
+    return session_store.create().to_dict()
+
+
+@router.get("/sessions/{session_id}", response_model=SesionResponse)
+def get_chat_session(session_id: str):
+    """
+    Devuelve el historial acotado de la sesión (resumen + turnos recientes) y su consumo de tokens.
+    """
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Sesión no encontrada")
+    return session.to_dict()
+
+
+@router.delete("/sessions/{session_id}")
+def delete_chat_session(session_id: str):
+    """
+    Elimina una sesión de conversación.
+    """
+    if not session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail="Sesión no encontrada")
+    return {"message": "Sesión eliminada"}
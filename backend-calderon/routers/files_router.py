@@ -1,27 +1,64 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
+from typing import Optional
 
+from fastapi import APIRouter, HTTPException, Query, Request
+
+from core.downloads import descargas
 from services.files_service import list_files_service, get_file_path
+from services.ingest_service import ingest_file_service
 
 router = APIRouter(prefix="/files", tags=["Files"])
 
 @router.get("/{directory}")
-def list_files(directory: str):
+def list_files(
+    directory: str,
+    variable: Optional[str] = Query(None, description="Precipitación, Radiación solar, Temperatura ambiente, Consumo..."),
+    estacion: Optional[str] = Query(None, description="Código (C05) o nombre completo (C05-Bellavista)"),
+    extension: Optional[str] = Query(None, description="csv, xlsx..."),
+    frecuencia: Optional[str] = Query(None, pattern="^(?i:diario|mensual)$"),
+    orden: str = Query("nombre", pattern="^(nombre|tamano|modificado|filas|fecha_inicio|fecha_fin)$"),
+    desc: bool = False,
+):
+    """
+    Lista los archivos dentro de un directorio específico (data, data2, etc.) con sus
+    metadatos (tamaño, filas, rango de fechas, estaciones, variable), desde el catálogo en memoria.
+    """
+    result = list_files_service(
+        directory, variable=variable, estacion=estacion, extension=extension,
+        frecuencia=frecuencia, orden=orden, desc=desc,
+    )
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+
+@router.post("/ingest/{directory}")
+async def ingest_file(
+    directory: str,
+    request: Request,
+    filename: Optional[str] = Query(None, description="Archivo destino; por defecto, el nombre del archivo subido"),
+):
     """
-    Lista los archivos dentro de un directorio específico (data, data2, etc.).
+    Ingesta de un CSV (campo multipart "file") en data/ (fecha,valor,completo_mediciones,completo_umbral)
+    o data4/ (Fecha,Consumo_m3,...). Se valida mientras se recibe; si el archivo ya existe
+    solo se agregan las filas con fecha posterior a la última registrada.
     """
-    result = list_files_service(directory)
+    result = await ingest_file_service(request, directory, filename)
     if "error" in result:
+        if "limite_bytes" in result:
+            raise HTTPException(status_code=413, detail=result["error"])
+        if "errores" in result:
+            raise HTTPException(status_code=422, detail={"error": result["error"], "errores": result["errores"]})
         raise HTTPException(status_code=400, detail=result["error"])
     return result
 
 
 @router.get("/download/{directory}/{filename}")
-def download_file(directory: str, filename: str):
+def download_file(directory: str, filename: str, request: Request):
     """
     Descarga un archivo específico desde el directorio indicado.
+    Admite revalidación por ETag (304), rangos y variantes gzip/brotli de los CSV.
     """
     file_path = get_file_path(directory, filename)
     if not file_path:
         raise HTTPException(status_code=404, detail="Archivo no encontrado")
-    return FileResponse(file_path)
+    return descargas.responder(request, file_path)
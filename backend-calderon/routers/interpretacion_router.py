@@ -1,8 +1,14 @@
 from fastapi import APIRouter, HTTPException
-from datetime import datetime, timezone
-from pydantic import BaseModel
+from datetime import date, datetime, timezone
+from pydantic import BaseModel, model_validator
 from enum import Enum
-from services.interpretacion_service import interpretar_datos_climaticos
+from typing import Any, Dict, List, Optional
+from services.interpretacion_service import (
+    interpretar_datos_climaticos_detallado,
+    interpretar_referencia_detallado,
+)
+from services.interpretacion_cache import interpretacion_cache
+from services.series_store import series_store
 
 # --- FastAPI Router para el endpoint de interpretación ---
 router = APIRouter(prefix="/ia", tags=["Interpretación"])
@@ -10,32 +16,151 @@ router = APIRouter(prefix="/ia", tags=["Interpretación"])
 class ModeloIA(str, Enum):
     gemini = "gemini"
 
+class Frecuencia(str, Enum):
+    diario = "Diario"
+    mensual = "Mensual"
+
+class ReferenciaSerie(BaseModel):
+    """Serie guardada en el servidor: directorio/archivo, o variable de data3 + estaciones."""
+    directorio: Optional[str] = None   # ej. "data", "data2", "data3"
+    archivo: Optional[str] = None      # ej. "C20-Calderón_Precipitación-Diario.csv"
+    variable: Optional[str] = None     # ej. "Precipitación", "Radiación solar", "Temperatura ambiente"
+    frecuencia: Frecuencia = Frecuencia.mensual
+    estaciones: Optional[List[str]] = None  # códigos ("C05") o nombres ("C05-Bellavista"); varias se promedian
+    desde: Optional[date] = None
+    hasta: Optional[date] = None
+
+    @model_validator(mode="after")
+    def _validar_origen(self):
+        if bool(self.variable) == bool(self.directorio and self.archivo):
+            raise ValueError("Indique 'variable' o bien 'directorio' y 'archivo'")
+        if self.desde and self.hasta and self.desde > self.hasta:
+            raise ValueError("'desde' no puede ser posterior a 'hasta'")
+        return self
+
 class AnalisisClimaticoInput(BaseModel):
     modelo: ModeloIA
     titulo: str
     tipo_dato: str  # ej. "precipitación mensual", "radiación solar", "temperatura"
-    datos: list     # lista de dicts, ej. [{"fecha": "2025-01", "valor": 12.5}, ...]
+    datos: Optional[list] = None  # lista de dicts, ej. [{"fecha": "2025-01", "valor": 12.5}, ...]
+    referencia: Optional[ReferenciaSerie] = None  # alternativa a `datos`: la serie se lee en el servidor
+    usar_cache: bool = True
+
+    @model_validator(mode="after")
+    def _validar_datos(self):
+        if (self.datos is None) == (self.referencia is None):
+            raise ValueError("Envíe 'datos' o 'referencia' (uno de los dos)")
+        return self
+
+class Percentiles(BaseModel):
+    p5: float
+    p25: float
+    p50: float
+    p75: float
+    p95: float
+
+class RegresionLineal(BaseModel):
+    pendiente: float       # por unidad de tiempo (mes u observación)
+    intercepto: float
+    r2: float
+
+class PendienteSen(BaseModel):
+    pendiente: float
+    metodo: str            # "exacto" o "muestreo" (series largas)
+    ic95_inferior: Optional[float] = None
+    ic95_superior: Optional[float] = None
+
+class MannKendall(BaseModel):
+    s: int
+    concordantes: int
+    discordantes: int
+    varianza: float
+    z: float
+    p_valor: float
+    tau: float
+    significativa: bool
+
+class Estacionalidad(BaseModel):
+    periodo: int
+    indices: Dict[str, float]
+    mes_maximo: str
+    mes_minimo: str
+    amplitud: float
+    fuerza: float
+
+class AnalisisEstadistico(BaseModel):
+    n: int = 0
+    promedio: Optional[float] = None
+    maximo: Optional[float] = None
+    minimo: Optional[float] = None
+    tendencia: str
+    desviacion_estandar: Optional[float] = None
+    percentiles: Optional[Percentiles] = None
+    regresion: Optional[RegresionLineal] = None
+    sen: Optional[PendienteSen] = None
+    mann_kendall: Optional[MannKendall] = None
+    estacionalidad: Optional[Estacionalidad] = None
+    unidad_tiempo: Optional[str] = None
+
+class InterpretacionResponse(BaseModel):
+    modelo: ModeloIA
+    tipo_dato: str
+    analisis_estadistico: AnalisisEstadistico
+    interpretacion: Dict[str, Any]
+    cache: Optional[str] = None  # "memoria", "disco", "compartida" o None si se calculó
+    fuente: Optional[Dict[str, Any]] = None  # archivo y estaciones usados si se pidió por referencia
+    timestamp: str
 
-@router.post("/interpretar")
+@router.post("/interpretar", response_model=InterpretacionResponse)
 def interpretar_endpoint(input: AnalisisClimaticoInput):
     """
-    Endpoint que recibe datos climáticos y devuelve análisis estadístico
-    e interpretación natural mediante Gemini.
+    Endpoint que recibe datos climáticos (o una referencia a una serie guardada en el
+    servidor) y devuelve análisis estadístico e interpretación natural mediante Gemini.
     """
     try:
-        if input.modelo == ModeloIA.gemini:
-            interpretacion, analisis = interpretar_datos_climaticos(
-                input.titulo, input.tipo_dato, input.datos
+        if input.modelo != ModeloIA.gemini:
+            raise HTTPException(status_code=400, detail="Modelo no soportado")
+        if input.referencia is not None:
+            resultado = interpretar_referencia_detallado(
+                input.titulo, input.tipo_dato,
+                input.referencia.model_dump(mode="json"),
+                usar_cache=input.usar_cache,
             )
+            if "error" in resultado:
+                raise HTTPException(status_code=400, detail=resultado["error"])
         else:
-            raise HTTPException(status_code=400, detail="Modelo no soportado")
+            resultado = interpretar_datos_climaticos_detallado(
+                input.titulo, input.tipo_dato, input.datos, usar_cache=input.usar_cache
+            )
         
         return {
             "modelo": input.modelo,
             "tipo_dato": input.tipo_dato,
-            "analisis_estadistico": analisis,
-            "interpretacion": interpretacion,
+            "analisis_estadistico": resultado["analisis"],
+            "interpretacion": resultado["interpretacion"],
+            "cache": resultado["cache"],
+            "fuente": resultado.get("fuente"),
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error interno: {e}")
+
+
+@router.get("/cache/stats")
+def interpretacion_cache_stats():
+    """
+    Estadísticas de la caché de interpretaciones (memoria, disco y peticiones agrupadas)
+    y del almacén de series usado por las peticiones por referencia.
+    """
+    return {**interpretacion_cache.stats(), "series": series_store.stats()}
+
+
+@router.delete("/cache")
+def clear_interpretacion_cache():
+    """
+    Vacía la caché de interpretaciones en memoria y en disco.
+    """
+    interpretacion_cache.clear()
+    return {"message": "Caché de interpretaciones vaciada"}
@@ -1,16 +1,25 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
-from pydantic import BaseModel, EmailStr
+from fastapi import APIRouter, HTTPException, Header, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List
+import asyncio
 import os
-from pathlib import Path
+from datetime import datetime
 
 from services.report_service import (
     generate_csv_report,
     generate_pdf_report,
+    generate_pdf_report_and_send,
     send_email_with_pdf,
-    get_report_history
+    query_report_history,
+    resolve_report_path
 )
+from services.report_jobs import report_jobs, ColaLlena, ConflictoIdempotencia
+from services.report_artifacts import clave_reporte
+from services.report_export import exportar
+from services.email_outbox import email_outbox
+from core.downloads import descargas
+from core.config import EMAIL_MAX_RECIPIENTS, REPORT_EXPORT_MAX_SCENARIOS, REPORT_EXPORT_MAX_MONTHS
 
 router = APIRouter(prefix="/reports", tags=["Reports"])
 
@@ -23,22 +32,70 @@ class ForecastRequest(BaseModel):
 
 class EmailRequest(BaseModel):
     email_to: EmailStr
+    # Lista de distribución: el PDF se genera una vez y cada destinatario recibe su propio correo
+    recipients: List[EmailStr] = Field(default_factory=list, max_length=EMAIL_MAX_RECIPIENTS)
     subject: str = "Reporte de Predicción de Consumo de Agua"
     body: str = "Adjunto encontrará el reporte de predicción de consumo de agua generado por nuestro modelo."
 
-@router.post("/generate/csv")
-async def generate_csv_report_endpoint(request: ForecastRequest):
+    def destinatarios(self) -> List[str]:
+        return [self.email_to, *self.recipients]
+
+class EscenarioExport(BaseModel):
+    nombre: Optional[str] = Field(None, max_length=100)
+    months_ahead: int = Field(..., ge=1, le=REPORT_EXPORT_MAX_MONTHS)
+    start_year: Optional[int] = None
+    start_month: Optional[int] = Field(None, ge=1, le=12)
+    poblacion_estimada: Optional[float] = None
+    precipitacion_promedio: Optional[float] = None
+
+class ExportRequest(BaseModel):
+    escenarios: List[EscenarioExport] = Field(..., min_length=1, max_length=REPORT_EXPORT_MAX_SCENARIOS)
+    guardar: bool = False   # además de descargarla, guardarla como reporte en el árbol de artefactos
+
+def _clave(tipo: str, request: ForecastRequest) -> Optional[str]:
+    try:
+        return clave_reporte(tipo, request.model_dump())
+    except FileNotFoundError:
+        return None  # sin modelo o datos no se deduplica; el generador informará el error
+
+def _encolar(tipo: str, fn, request: ForecastRequest, clave: Optional[str] = None,
+             idempotency_key: Optional[str] = None, **extra):
     """
-    Genera un reporte CSV con las predicciones de consumo de agua
+    Encola el reporte en el pool de procesos. Si ya existe uno con el mismo contenido
+    se devuelve sin renderizar. 429 si la cola está llena, 409 si la clave de
+    idempotencia se usó con otros parámetros.
     """
     try:
-        result = generate_csv_report(
-            months_ahead=request.months_ahead,
-            start_year=request.start_year,
-            start_month=request.start_month,
-            poblacion_estimada=request.poblacion_estimada,
-            precipitacion_promedio=request.precipitacion_promedio
+        return report_jobs.enviar(
+            tipo, fn, request.model_dump(), clave=clave, idempotency_key=idempotency_key, **extra
         )
+    except ColaLlena as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    except ConflictoIdempotencia as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+async def _renderizar(tipo: str, fn, request: ForecastRequest, idempotency_key: Optional[str] = None) -> dict:
+    """
+    Render en el pool de procesos esperando el resultado sin bloquear el event loop.
+    La clave (hash de datos y modelo) y el encolado (búsqueda en SQLite, flock del
+    manifiesto) también son bloqueantes, así que corren en el threadpool.
+    """
+    job = await asyncio.to_thread(
+        lambda: _encolar(tipo, fn, request, clave=_clave(tipo, request), idempotency_key=idempotency_key)
+    )
+    return await asyncio.wrap_future(job.future)
+
+@router.post("/generate/csv")
+async def generate_csv_report_endpoint(
+    request: ForecastRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """
+    Genera un reporte CSV con las predicciones de consumo de agua.
+    Si ya existe uno con los mismos parámetros, modelo y datos se devuelve ese.
+    """
+    try:
+        result = await _renderizar("csv", generate_csv_report, request, idempotency_key)
         
         if "error" in result:
             raise HTTPException(status_code=400, detail=result["error"])
@@ -48,22 +105,22 @@ async def generate_csv_report_endpoint(request: ForecastRequest):
             "data": result
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generando reporte CSV: {str(e)}")
 
 @router.post("/generate/pdf")
-async def generate_pdf_report_endpoint(request: ForecastRequest):
+async def generate_pdf_report_endpoint(
+    request: ForecastRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """
-    Genera un reporte PDF con las predicciones de consumo de agua
+    Genera un reporte PDF con las predicciones de consumo de agua.
+    Si ya existe uno con los mismos parámetros, modelo y datos se devuelve ese.
     """
     try:
-        result = generate_pdf_report(
-            months_ahead=request.months_ahead,
-            start_year=request.start_year,
-            start_month=request.start_month,
-            poblacion_estimada=request.poblacion_estimada,
-            precipitacion_promedio=request.precipitacion_promedio
-        )
+        result = await _renderizar("pdf", generate_pdf_report, request, idempotency_key)
         
         if "error" in result:
             raise HTTPException(status_code=400, detail=result["error"])
@@ -73,148 +130,281 @@ async def generate_pdf_report_endpoint(request: ForecastRequest):
             "data": result
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generando reporte PDF: {str(e)}")
 
 @router.post("/generate/pdf-and-email")
 async def generate_pdf_and_send_email(
     forecast_request: ForecastRequest,
-    email_request: EmailRequest,
-    background_tasks: BackgroundTasks
+    email_request: EmailRequest
 ):
     """
-    Genera un reporte PDF y lo envía por email
+    Genera un reporte PDF y lo encola por email para el destinatario y la lista de
+    distribución. El envío lo hace la bandeja de salida, con reintentos; el estado
+    se consulta en /reports/emails/{lote}.
     """
     try:
-        # Generar PDF
-        pdf_result = generate_pdf_report(
-            months_ahead=forecast_request.months_ahead,
-            start_year=forecast_request.start_year,
-            start_month=forecast_request.start_month,
-            poblacion_estimada=forecast_request.poblacion_estimada,
-            precipitacion_promedio=forecast_request.precipitacion_promedio
-        )
+        # Generar PDF (o reutilizar uno idéntico)
+        pdf_result = await _renderizar("pdf", generate_pdf_report, forecast_request)
         
         if "error" in pdf_result:
             raise HTTPException(status_code=400, detail=pdf_result["error"])
         
-        # Enviar email en background
-        def send_email_task():
-            email_result = send_email_with_pdf(
-                email_to=email_request.email_to,
-                subject=email_request.subject,
-                body=email_request.body,
-                pdf_filepath=pdf_result["filepath"]
-            )
-            return email_result
-        
-        background_tasks.add_task(send_email_task)
+        email_result = await asyncio.to_thread(
+            send_email_with_pdf,
+            email_to=email_request.destinatarios(),
+            subject=email_request.subject,
+            body=email_request.body,
+            pdf_filepath=pdf_result["filepath"]
+        )
+        if "error" in email_result:
+            raise HTTPException(status_code=503, detail=email_result["error"])
         
         return {
-            "message": "Reporte PDF generado y email enviado exitosamente",
+            "message": "Reporte PDF generado y email encolado para envío",
             "data": {
                 "pdf_report": pdf_result,
-                "email_sent_to": email_request.email_to
+                "email_sent_to": email_request.email_to,
+                "recipients": email_request.recipients,
+                "email_batch": email_result["lote"],
+                "status_url": f"/reports/emails/{email_result['lote']}"
             }
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error en el proceso: {str(e)}")
 
-@router.get("/download/csv/{filename}")
-async def download_csv_report(filename: str):
+def _job_aceptado(job) -> JSONResponse:
+    # 200 si el reporte ya existía (trabajo completado al instante), 202 si quedó en cola
+    return JSONResponse(
+        status_code=202 if job.pendiente else 200,
+        content={**job.to_dict(), "status_url": f"/reports/jobs/{job.job_id}"},
+        headers={"Location": f"/reports/jobs/{job.job_id}"},
+    )
+
+@router.post("/jobs/csv", status_code=202)
+def create_csv_report_job(
+    request: ForecastRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """
+    Encola la generación de un reporte CSV y devuelve el id del trabajo (202).
+    Un reporte idéntico ya generado devuelve un trabajo completado.
+    """
+    return _job_aceptado(_encolar(
+        "csv", generate_csv_report, request, clave=_clave("csv", request), idempotency_key=idempotency_key
+    ))
+
+@router.post("/jobs/pdf", status_code=202)
+def create_pdf_report_job(
+    request: ForecastRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """
+    Encola la generación de un reporte PDF y devuelve el id del trabajo (202).
+    Un reporte idéntico ya generado devuelve un trabajo completado.
+    """
+    return _job_aceptado(_encolar(
+        "pdf", generate_pdf_report, request, clave=_clave("pdf", request), idempotency_key=idempotency_key
+    ))
+
+@router.post("/jobs/pdf-and-email", status_code=202)
+def create_pdf_and_email_job(
+    forecast_request: ForecastRequest,
+    email_request: EmailRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """
+    Encola la generación de un reporte PDF y su envío por email (202).
+    El PDF se reutiliza si ya existe; el correo se envía una vez por clave de idempotencia.
+    """
+    job = _encolar(
+        "pdf-and-email", generate_pdf_report_and_send, forecast_request,
+        idempotency_key=idempotency_key, report_id=_clave("pdf", forecast_request),
+        email_to=email_request.destinatarios(), subject=email_request.subject, body=email_request.body,
+    )
+    return _job_aceptado(job)
+
+@router.get("/jobs")
+def list_report_jobs(estado: Optional[str] = None, limit: int = 50):
+    """
+    Lista los trabajos de reportes recientes y el estado de la cola
+    """
+    return {"cola": report_jobs.stats(), "jobs": report_jobs.listar(estado, limit)}
+
+@router.get("/jobs/{job_id}")
+def get_report_job(job_id: str):
+    """
+    Estado y progreso de un trabajo de reporte; al completarse incluye el resultado
+    """
+    job = report_jobs.obtener(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return job.to_dict()
+
+@router.delete("/jobs/{job_id}")
+def cancel_report_job(job_id: str):
     """
-    Descarga un reporte CSV específico
+    Cancela un trabajo que todavía no empezó
     """
+    cancelado = report_jobs.cancelar(job_id)
+    if cancelado is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    if not cancelado:
+        raise HTTPException(status_code=409, detail="El trabajo ya está en curso o terminado")
+    return {"message": "Trabajo cancelado", "job_id": job_id}
+
+def _descargar(tipo: str, filename: str, media_type: str, request: Request):
+    if not filename.startswith("reporte_consumo_agua_"):
+        raise HTTPException(status_code=400, detail="Archivo no válido")
+    file_path = resolve_report_path(tipo, filename)
+    if file_path is None:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
     try:
-        file_path = Path("data4") / filename
-        
-        if not file_path.exists():
-            raise HTTPException(status_code=404, detail="Archivo no encontrado")
-        
-        if not filename.startswith("reporte_consumo_agua_"):
-            raise HTTPException(status_code=400, detail="Archivo no válido")
-        
-        return FileResponse(
-            path=str(file_path),
-            filename=filename,
-            media_type="text/csv"
-        )
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error descargando archivo: {str(e)}")
+        return descargas.responder(request, file_path, media_type=media_type, filename=filename)
+    except FileNotFoundError:
+        # La retención lo borró o movió entre la búsqueda y la lectura
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+
+def _exportacion(formato: str, escenarios: List[dict], guardar: bool) -> StreamingResponse:
+    result = exportar(formato, escenarios, guardar)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return StreamingResponse(
+        result["bloques"],
+        media_type=result["media_type"],
+        headers={"Content-Disposition": f'attachment; filename="{result["filename"]}"'}
+    )
+
+@router.post("/export/{formato}")
+def export_report(formato: str, request: ExportRequest):
+    """
+    Exporta uno o varios escenarios de predicción como CSV o XLSX en streaming:
+    la descarga empieza de inmediato y la memoria no depende del tamaño.
+    Con guardar=true también queda como reporte (historial y /download).
+    """
+    escenarios = [escenario.model_dump() for escenario in request.escenarios]
+    return _exportacion(formato, escenarios, request.guardar)
+
+@router.get("/export/{formato}")
+def export_report_single(
+    formato: str,
+    months_ahead: int = Query(..., ge=1, le=REPORT_EXPORT_MAX_MONTHS),
+    start_year: Optional[int] = None,
+    start_month: Optional[int] = Query(None, ge=1, le=12),
+    poblacion_estimada: Optional[float] = None,
+    precipitacion_promedio: Optional[float] = None,
+    guardar: bool = False
+):
+    """
+    Exportación en streaming de un único escenario (enlace descargable desde el navegador)
+    """
+    escenario = {
+        "months_ahead": months_ahead,
+        "start_year": start_year,
+        "start_month": start_month,
+        "poblacion_estimada": poblacion_estimada,
+        "precipitacion_promedio": precipitacion_promedio
+    }
+    return _exportacion(formato, [escenario], guardar)
+
+@router.get("/download/csv/{filename}")
+def download_csv_report(filename: str, request: Request):
+    """
+    Descarga un reporte CSV específico (con ETag, rangos y variante comprimida)
+    """
+    return _descargar("CSV", filename, "text/csv", request)
+
+@router.get("/download/xlsx/{filename}")
+def download_xlsx_report(filename: str, request: Request):
+    """
+    Descarga una exportación XLSX guardada
+    """
+    return _descargar("XLSX", filename, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", request)
 
 @router.get("/download/pdf/{filename}")
-async def download_pdf_report(filename: str):
+def download_pdf_report(filename: str, request: Request):
     """
     Descarga un reporte PDF específico
     """
-    try:
-        file_path = Path("reports") / filename
-        
-        if not file_path.exists():
-            raise HTTPException(status_code=404, detail="Archivo no encontrado")
-        
-        if not filename.startswith("reporte_consumo_agua_"):
-            raise HTTPException(status_code=400, detail="Archivo no válido")
-        
-        return FileResponse(
-            path=str(file_path),
-            filename=filename,
-            media_type="application/pdf"
-        )
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error descargando archivo: {str(e)}")
+    return _descargar("PDF", filename, "application/pdf", request)
+
+def _historial(mensaje: str, tipo: Optional[str], desde, hasta, params: dict, limit: int, offset: int) -> dict:
+    result = query_report_history(tipo, desde, hasta, params, limit, offset)
+    if "error" in result:
+        raise HTTPException(status_code=500, detail=result["error"])
+    return {
+        "message": mensaje,
+        "data": result["items"],
+        "total": result["total"],
+        "limit": result["limit"],
+        "offset": result["offset"]
+    }
 
 @router.get("/history")
-async def get_reports_history():
+def get_reports_history(
+    type: Optional[str] = Query(None, pattern="^(CSV|PDF|XLSX)$"),
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    months_ahead: Optional[int] = None,
+    start_year: Optional[int] = None,
+    start_month: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0)
+):
     """
-    Obtiene el historial de reportes generados
+    Obtiene el historial de reportes generados (paginado, del más reciente al más antiguo),
+    filtrable por tipo, fecha de creación y parámetros de la predicción
     """
-    try:
-        reports = get_report_history()
-        return {
-            "message": "Historial de reportes obtenido exitosamente",
-            "data": reports
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error obteniendo historial: {str(e)}")
+    params = {"months_ahead": months_ahead, "start_year": start_year, "start_month": start_month}
+    return _historial("Historial de reportes obtenido exitosamente", type, desde, hasta, params, limit, offset)
 
 @router.get("/history/csv")
-async def get_csv_reports_history():
+def get_csv_reports_history(limit: int = Query(100, ge=1, le=1000), offset: int = Query(0, ge=0)):
     """
     Obtiene solo el historial de reportes CSV
     """
-    try:
-        all_reports = get_report_history()
-        csv_reports = [report for report in all_reports if report.get("type") == "CSV"]
-        
-        return {
-            "message": "Historial de reportes CSV obtenido exitosamente",
-            "data": csv_reports
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error obteniendo historial CSV: {str(e)}")
+    return _historial("Historial de reportes CSV obtenido exitosamente", "CSV", None, None, {}, limit, offset)
 
 @router.get("/history/pdf")
-async def get_pdf_reports_history():
+def get_pdf_reports_history(limit: int = Query(100, ge=1, le=1000), offset: int = Query(0, ge=0)):
     """
     Obtiene solo el historial de reportes PDF
     """
-    try:
-        all_reports = get_report_history()
-        pdf_reports = [report for report in all_reports if report.get("type") == "PDF"]
-        
-        return {
-            "message": "Historial de reportes PDF obtenido exitosamente",
-            "data": pdf_reports
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error obteniendo historial PDF: {str(e)}")
+    return _historial("Historial de reportes PDF obtenido exitosamente", "PDF", None, None, {}, limit, offset)
+
+@router.get("/emails")
+def email_outbox_status():
+    """
+    Estado de la bandeja de salida: mensajes por estado y conexiones SMTP del pool
+    """
+    return email_outbox.stats()
+
+@router.get("/emails/{lote}")
+def email_batch_status(lote: str):
+    """
+    Estado de un envío (un mensaje por destinatario)
+    """
+    resultado = email_outbox.lote(lote)
+    if resultado is None:
+        raise HTTPException(status_code=404, detail="Envío no encontrado")
+    return resultado
+
+@router.post("/emails/messages/{mensaje_id}/retry")
+def retry_email_message(mensaje_id: str):
+    """
+    Vuelve a encolar un mensaje que falló definitivamente
+    """
+    reintentado = email_outbox.reintentar(mensaje_id)
+    if reintentado is None:
+        raise HTTPException(status_code=404, detail="Mensaje no encontrado")
+    if not reintentado:
+        raise HTTPException(status_code=409, detail="Solo se pueden reintentar mensajes fallidos")
+    return {"message": "Mensaje encolado de nuevo", "mensaje": email_outbox.mensaje(mensaje_id)}
 
 @router.post("/test-email-config")
 async def test_email_configuration():
@@ -0,0 +1,134 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, EmailStr, Field, model_validator
+from enum import Enum
+from typing import List, Optional
+
+from core.config import SUBSCRIPTIONS_MAX_SUBSCRIBERS
+from services.subscriptions import subscription_service
+
+router = APIRouter(prefix="/subscriptions", tags=["Suscripciones"])
+
+class Frecuencia(str, Enum):
+    mensual = "mensual"   # pronóstico mensual
+    semanal = "semanal"   # resumen semanal
+
+class ParametrosReporte(BaseModel):
+    months_ahead: Optional[int] = Field(None, ge=1, le=120)
+    start_year: Optional[int] = None
+    start_month: Optional[int] = Field(None, ge=1, le=12)
+    poblacion_estimada: Optional[float] = None
+    precipitacion_promedio: Optional[float] = None
+
+class ListaInput(BaseModel):
+    nombre: str
+    frecuencia: Frecuencia
+    dia: int = 1    # día del mes (1-28) o de la semana (0 = lunes ... 6 = domingo)
+    hora: int = Field(6, ge=0, le=23)
+    params: ParametrosReporte = Field(default_factory=ParametrosReporte)
+    asunto: str = "Reporte de consumo de agua ({periodo})"
+    cuerpo: str = "Adjunto encontrará el reporte de predicción de consumo de agua del periodo {periodo}."
+    suscriptores: List[EmailStr] = Field(default_factory=list, max_length=SUBSCRIPTIONS_MAX_SUBSCRIBERS)
+
+    @model_validator(mode="after")
+    def _validar_dia(self):
+        maximo = (1, 28) if self.frecuencia == Frecuencia.mensual else (0, 6)
+        if not maximo[0] <= self.dia <= maximo[1]:
+            raise ValueError(f"'dia' debe estar entre {maximo[0]} y {maximo[1]} para la frecuencia {self.frecuencia.value}")
+        return self
+
+class SuscriptoresInput(BaseModel):
+    emails: List[EmailStr] = Field(min_length=1, max_length=SUBSCRIPTIONS_MAX_SUBSCRIBERS)
+
+class EstadoLista(BaseModel):
+    activa: bool
+
+def _lista_o_404(lista_id: str) -> dict:
+    lista = subscription_service.obtener_lista(lista_id)
+    if lista is None:
+        raise HTTPException(status_code=404, detail="Lista no encontrada")
+    return lista
+
+@router.post("", status_code=201)
+def create_subscription_list(data: ListaInput):
+    """
+    Crea una lista de distribución con su programación y, opcionalmente, sus suscriptores
+    """
+    result = subscription_service.crear_lista(
+        data.nombre, data.frecuencia.value, data.dia, data.hora,
+        data.params.model_dump(), data.asunto, data.cuerpo, data.suscriptores,
+    )
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+@router.get("")
+def list_subscription_lists():
+    """
+    Listas de distribución y estado del planificador
+    """
+    return {"listas": subscription_service.listar_listas(), "estado": subscription_service.stats()}
+
+@router.get("/{lista_id}")
+def get_subscription_list(lista_id: str):
+    return {**_lista_o_404(lista_id), "ejecuciones": subscription_service.ejecuciones(lista_id)}
+
+@router.patch("/{lista_id}")
+def set_subscription_list_state(lista_id: str, data: EstadoLista):
+    """
+    Pausa o reanuda los envíos programados de una lista
+    """
+    _lista_o_404(lista_id)
+    return subscription_service.activar(lista_id, data.activa)
+
+@router.delete("/{lista_id}")
+def delete_subscription_list(lista_id: str):
+    if not subscription_service.eliminar_lista(lista_id):
+        raise HTTPException(status_code=404, detail="Lista no encontrada")
+    return {"message": "Lista eliminada", "id": lista_id}
+
+@router.get("/{lista_id}/subscribers")
+def get_subscribers(lista_id: str):
+    _lista_o_404(lista_id)
+    return {"id": lista_id, "suscriptores": subscription_service.suscriptores(lista_id)}
+
+@router.post("/{lista_id}/subscribers")
+def add_subscribers(lista_id: str, data: SuscriptoresInput):
+    """
+    Agrega suscriptores (los repetidos se ignoran)
+    """
+    result = subscription_service.agregar_suscriptores(lista_id, data.emails)
+    if "error" in result:
+        status = 404 if result["error"] == "Lista no encontrada" else 400
+        raise HTTPException(status_code=status, detail=result["error"])
+    return result
+
+@router.delete("/{lista_id}/subscribers/{email}")
+def remove_subscriber(lista_id: str, email: str):
+    if not subscription_service.quitar_suscriptor(lista_id, email):
+        raise HTTPException(status_code=404, detail="Suscriptor no encontrado")
+    return {"message": "Suscriptor eliminado", "email": email}
+
+@router.post("/{lista_id}/run", status_code=202)
+def run_subscription_list(lista_id: str, forzar: bool = False):
+    """
+    Envía ya el reporte del periodo en curso (un render para todos los suscriptores).
+    409 si ese periodo ya se envió o se está enviando, salvo con forzar=true;
+    429 si la cola de reportes está llena.
+    """
+    result = subscription_service.ejecutar_lista(lista_id, forzar)
+    if "error" in result:
+        if result.get("cola_llena"):
+            raise HTTPException(status_code=429, detail=result["error"], headers={"Retry-After": "5"})
+        status = 404 if result["error"] == "Lista no encontrada" else 409
+        raise HTTPException(status_code=status, detail=result["error"])
+    return result
+
+@router.get("/{lista_id}/runs/{periodo}")
+def get_subscription_run(lista_id: str, periodo: str):
+    """
+    Estado de un envío, con el resultado de cada destinatario
+    """
+    result = subscription_service.ejecucion(lista_id, periodo)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Ejecución no encontrada")
+    return result
@@ -0,0 +1,115 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional
+
+from core.config import CHAT_BATCH_CONCURRENCY
+from core.text import estimate_tokens
+from services.chatbot import (
+    context_snapshot,
+    fijar_snapshot,
+    responder_pregunta_detallada,
+    reiniciar_prompt_tokens,
+    ultimo_prompt_tokens,
+    _es_respuesta_cacheable,
+)
+
+
+def _percentil(valores: List[float], q: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(q * len(ordenados)))]
+
+
+def _responder_item(indice: int, item: Dict, estrategia: str, usar_cache: bool, snapshot) -> Dict:
+    """Responde una pregunta del lote midiendo su latencia y sus tokens."""
+    with fijar_snapshot(snapshot):
+        reiniciar_prompt_tokens()
+        inicio = time.perf_counter()
+        resultado = responder_pregunta_detallada(
+            item["pregunta"], item["modelo"], usar_cache=usar_cache, estrategia=estrategia
+        )
+        latencia = time.perf_counter() - inicio
+        tokens_prompt = ultimo_prompt_tokens()
+    return {
+        "indice": indice,
+        "id": item.get("id"),
+        "pregunta": item["pregunta"],
+        "modelo": item["modelo"],
+        "proveedor": resultado["proveedor"],
+        "respuesta": resultado["respuesta"],
+        "cache": resultado["cache"],
+        "valida": _es_respuesta_cacheable(resultado["respuesta"]),
+        "latencia_s": round(latencia, 3),
+        "tokens": {
+            "prompt": tokens_prompt,
+            "respuesta": estimate_tokens(resultado["respuesta"]),
+        },
+    }
+
+
+def ejecutar_lote(
+    items: List[Dict],
+    modelo: str = "openai",
+    estrategia: str = "simple",
+    usar_cache: bool = False,
+    concurrencia: Optional[int] = None
+) -> Iterator[Dict]:
+    """
+    Ejecuta un lote de preguntas con concurrencia acotada por proveedor (un pool de
+    hilos por modelo) y devuelve los resultados a medida que terminan, seguidos de
+    un resumen. Todas las preguntas comparten el mismo snapshot de contexto.
+    """
+    concurrencia = concurrencia or CHAT_BATCH_CONCURRENCY
+    items = [{**item, "modelo": (item.get("modelo") or modelo).lower()} for item in items]
+    snapshot = context_snapshot()
+    inicio = time.perf_counter()
+
+    pools = {
+        m: ThreadPoolExecutor(max_workers=concurrencia, thread_name_prefix=f"lote-{m}")
+        for m in sorted({item["modelo"] for item in items})
+    }
+    futuros = [
+        pools[item["modelo"]].submit(_responder_item, i, item, estrategia, usar_cache, snapshot)
+        for i, item in enumerate(items)
+    ]
+    resultados = []
+    try:
+        for futuro in as_completed(futuros):
+            resultado = futuro.result()
+            resultados.append(resultado)
+            yield resultado
+    finally:
+        # Si el cliente se desconecta se descartan las preguntas pendientes
+        for pool in pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    yield {"resumen": resumir_lote(resultados, time.perf_counter() - inicio, snapshot.version)}
+
+
+def resumir_lote(resultados: List[Dict], duracion: float, version: str) -> Dict:
+    latencias = [r["latencia_s"] for r in resultados]
+    por_proveedor: Dict[str, Dict] = {}
+    for r in resultados:
+        datos = por_proveedor.setdefault(r["proveedor"], {"preguntas": 0, "validas": 0, "latencias": []})
+        datos["preguntas"] += 1
+        datos["validas"] += int(r["valida"])
+        datos["latencias"].append(r["latencia_s"])
+    for datos in por_proveedor.values():
+        lat = datos.pop("latencias")
+        datos["latencia_media_s"] = round(sum(lat) / len(lat), 3)
+        datos["latencia_p95_s"] = round(_percentil(lat, 0.95), 3)
+
+    return {
+        "preguntas": len(resultados),
+        "validas": sum(r["valida"] for r in resultados),
+        "desde_cache": sum(r["cache"] for r in resultados),
+        "duracion_s": round(duracion, 3),
+        "latencia_media_s": round(sum(latencias) / len(latencias), 3) if latencias else 0.0,
+        "latencia_p50_s": round(_percentil(latencias, 0.50), 3),
+        "latencia_p95_s": round(_percentil(latencias, 0.95), 3),
+        "tokens_prompt": sum(r["tokens"]["prompt"] for r in resultados),
+        "tokens_respuesta": sum(r["tokens"]["respuesta"] for r in resultados),
+        "por_proveedor": por_proveedor,
+        "version_contexto": version,
+    }
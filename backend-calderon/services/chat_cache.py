@@ -0,0 +1,197 @@
+import math
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from core.cache import TTLCache
+from core.text import fold_accents
+from core.config import CHAT_CACHE_MAX_ENTRIES, CHAT_CACHE_TTL_SECONDS, CHAT_CACHE_SIMILARITY
+
+# Palabras vacías del español que no aportan al significado de la pregunta. No incluye
+# negaciones, comparativos ni marcas temporales ("sin", "con", "mas", "antes", "desde"...):
+# quitarlas haría que preguntas opuestas compartan la misma clave.
+STOPWORDS_ES = frozenset("""
+a al algo algun alguna algunas alguno algunos como cual cuales cuando
+de del donde el ella ellas ellos en era es esa esas ese eso esos esta estan
+estas este esto estos fue ha hay la las le les lo los me mi mis muy nos o para pero por
+porque que quien se ser si su sus tambien te tiene tienen un una uno unos y
+cual cuanto cuanta cuantos cuantas puedes podrias dime dame decir favor hola quiero saber
+""".split())
+
+# Términos que invierten o acotan el sentido de la pregunta: una coincidencia por
+# similitud solo se acepta si ambas preguntas contienen exactamente los mismos
+# (igual que con los números: "próximos 6 meses" no responde a "próximos 24 meses").
+_PALABRAS_POLARES = """
+no ni sin con contra nunca ningun ninguna antes despues desde hasta durante ante entre
+sobre bajo mas menos mayor menor mejor peor ya aun todavia
+""".split()
+
+# Números escritos con letras: se canonizan a dígitos para que "seis meses" y
+# "6 meses" coincidan y para compararlos como el resto de cantidades
+_NUMERALES = {
+    "dos": "2", "tres": "3", "cuatro": "4", "cinco": "5", "seis": "6", "siete": "7",
+    "ocho": "8", "nueve": "9", "diez": "10", "once": "11", "doce": "12", "veinticuatro": "24",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _stem(token: str) -> str:
+    # Stemming mínimo para plurales: "predicciones" -> "prediccion", "meses" -> "mes"
+    if len(token) > 4 and token.endswith("es"):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s"):
+        return token[:-1]
+    return token
+
+
+POLARES = frozenset(_stem(t) for t in _PALABRAS_POLARES)
+
+
+def tokenize_question(pregunta: str) -> list:
+    """Tokeniza una pregunta: minúsculas, sin tildes y sin palabras vacías."""
+    texto = fold_accents(pregunta.lower())
+    return [_stem(_NUMERALES.get(t, t)) for t in _TOKEN_RE.findall(texto) if t not in STOPWORDS_ES]
+
+
+def _anclas(tokens) -> frozenset:
+    """Términos polares y cantidades (años, horizontes): deben coincidir para un acierto por similitud."""
+    return frozenset(t for t in tokens if t in POLARES or t.isdigit())
+
+
+def normalize_question(pregunta: str) -> str:
+    """Forma canónica de la pregunta, usada como parte de la clave exacta."""
+    return " ".join(tokenize_question(pregunta))
+
+
+@dataclass
+class _CachedAnswer:
+    respuesta: str
+    terminos: Counter
+    latencia: float
+    hits: int = 0
+    metadata: Dict = field(default_factory=dict)
+
+
+class ChatResponseCache:
+    """
+    Caché de respuestas del chatbot.
+
+    La clave exacta es (modelo, versión del contexto, pregunta normalizada). Si no hay
+    coincidencia exacta se busca la pregunta más parecida del mismo modelo y versión
+    mediante similitud coseno TF-IDF, aceptándola si supera el umbral configurado.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = CHAT_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = CHAT_CACHE_TTL_SECONDS,
+        similarity_threshold: float = CHAT_CACHE_SIMILARITY
+    ):
+        self.similarity_threshold = similarity_threshold
+        self._store = TTLCache(max_entries, ttl_seconds, on_evict=self._on_evict)
+        self._doc_freq: Counter = Counter()
+        self._lock = threading.RLock()
+        self._reset_counters()
+
+    def _reset_counters(self):
+        self.lookups = 0
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.latency_saved = 0.0
+
+    def _on_evict(self, key: Tuple, entry: _CachedAnswer):
+        self._doc_freq.subtract(entry.terminos.keys())
+        self._doc_freq += Counter()  # descarta conteos en cero
+
+    def _idf(self, termino: str) -> float:
+        n_docs = len(self._store)
+        return math.log((1 + n_docs) / (1 + self._doc_freq.get(termino, 0))) + 1.0
+
+    def _weights(self, terminos: Counter) -> Dict[str, float]:
+        return {t: tf * self._idf(t) for t, tf in terminos.items()}
+
+    @staticmethod
+    def _cosine(a: Dict[str, float], b: Dict[str, float]) -> float:
+        if not a or not b:
+            return 0.0
+        if len(a) > len(b):
+            a, b = b, a
+        dot = sum(w * b.get(t, 0.0) for t, w in a.items())
+        norm = math.sqrt(sum(w * w for w in a.values())) * math.sqrt(sum(w * w for w in b.values()))
+        return dot / norm if norm else 0.0
+
+    def _register_hit(self, entry: _CachedAnswer, exacto: bool) -> str:
+        entry.hits += 1
+        self.latency_saved += entry.latencia
+        if exacto:
+            self.exact_hits += 1
+        else:
+            self.semantic_hits += 1
+        return entry.respuesta
+
+    def get(self, pregunta: str, modelo: str, version: str) -> Optional[str]:
+        """Devuelve la respuesta almacenada para la pregunta o None si no hay coincidencia."""
+        tokens = tokenize_question(pregunta)
+        clave = (modelo, version, " ".join(tokens))
+        with self._lock:
+            self.lookups += 1
+            entry = self._store.get(clave)
+            if entry is not None:
+                return self._register_hit(entry, exacto=True)
+
+            if not tokens or self.similarity_threshold >= 1:
+                return None
+
+            consulta = self._weights(Counter(tokens))
+            anclas = _anclas(tokens)
+            mejor, mejor_score = None, 0.0
+            for (m, v, _), candidato in self._store.items():
+                if m != modelo or v != version or _anclas(candidato.terminos) != anclas:
+                    continue
+                score = self._cosine(consulta, self._weights(candidato.terminos))
+                if score > mejor_score:
+                    mejor, mejor_score = candidato, score
+
+            if mejor is not None and mejor_score >= self.similarity_threshold:
+                return self._register_hit(mejor, exacto=False)
+            return None
+
+    def put(self, pregunta: str, modelo: str, version: str, respuesta: str, latencia: float):
+        """Guarda una respuesta junto con la latencia que costó obtenerla."""
+        tokens = tokenize_question(pregunta)
+        if not tokens:
+            return
+        terminos = Counter(tokens)
+        with self._lock:
+            self._store.set((modelo, version, " ".join(tokens)), _CachedAnswer(respuesta, terminos, latencia))
+            self._doc_freq.update(terminos.keys())
+
+    def clear(self):
+        with self._lock:
+            self._store.clear()
+            self._doc_freq.clear()
+            self._reset_counters()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            return {
+                "entradas": len(self._store),
+                "consultas": self.lookups,
+                "aciertos_exactos": self.exact_hits,
+                "aciertos_semanticos": self.semantic_hits,
+                "fallos": self.lookups - hits,
+                "tasa_aciertos": round(hits / self.lookups, 4) if self.lookups else 0.0,
+                "latencia_ahorrada_s": round(self.latency_saved, 3),
+                "expiradas": self._store.expired,
+                "desalojadas": self._store.evicted,
+                "umbral_similitud": self.similarity_threshold,
+                "ttl_segundos": self._store.ttl_seconds,
+                "max_entradas": self._store.max_entries,
+            }
+
+
+chat_cache = ChatResponseCache()
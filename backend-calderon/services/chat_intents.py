@@ -0,0 +1,96 @@
+import re
+from dataclasses import dataclass
+from typing import FrozenSet
+
+from core.text import fold_accents
+
+# Secciones de contexto que se pueden anexar al prompt
+SECCION_ACTUAL = "actual"
+SECCION_PREDICCION = "prediccion"
+SECCION_HISTORICO = "historico"
+SECCION_REPORTE = "reporte"
+SECCIONES = (SECCION_ACTUAL, SECCION_PREDICCION, SECCION_HISTORICO, SECCION_REPORTE)
+
+# Palabras clave del dominio (sin tildes); la pregunta también se compara sin tildes
+KEYWORDS_DOMINIO = [
+    "sequia", "precipitacion", "lluvia", "hidrico", "agua", "calderon",
+    "pluviometria", "radiacion solar", "pronostico", "clima", "meteorologia",
+    "nivel de agua", "consumo", "prediccion", "modelo", "datos", "estadisticas",
+    "tendencia", "analisis", "reporte", "informe", "historic", "estacional", "poblacion",
+]
+
+_KEYWORDS_SECCION = {
+    SECCION_ACTUAL: [
+        r"actual", r"hoy", r"ahora", r"reciente", r"ultimo ano", r"este ano", r"promedio",
+        r"poblacion", r"habitantes", r"total", r"cuant[oa]s?", r"situacion", r"estado",
+        r"tendencia", r"precipitacion", r"lluvia", r"sequia",
+    ],
+    SECCION_PREDICCION: [
+        r"predic\w*", r"pronostic\w*", r"proyecci\w*", r"futur\w*", r"proxim[oa]s?",
+        r"siguientes?", r"estim\w*", r"esperar?", r"sera", r"habra", r"modelo", r"\b20[3-9]\d\b",
+    ],
+    SECCION_HISTORICO: [
+        r"histori\w*", r"decada", r"estacional\w*", r"temporada", r"patron\w*", r"evolucion",
+        r"pasad[oa]s?", r"anteriores", r"desde\s+(?:el\s+)?(?:ano\s+)?(?:19|20)\d\d", r"mes(?:es)?\s+con\s+(?:mayor|menor)",
+        r"compar\w*", r"tendencia", r"\b200\d\b", r"\b201\d\b",
+    ],
+    SECCION_REPORTE: [
+        r"reporte", r"informe", r"generad[oa]", r"ultimo pronostico", r"ultima prediccion",
+    ],
+}
+
+# Patrones precompilados (se construyen una sola vez al importar el módulo)
+_DOMINIO_RE = re.compile(r"|".join(re.escape(k) for k in KEYWORDS_DOMINIO))
+_SECCION_RE = {
+    seccion: re.compile(r"\b(?:" + r"|".join(patrones) + r")\b")
+    for seccion, patrones in _KEYWORDS_SECCION.items()
+}
+_HORIZONTE_RE = re.compile(r"\b(\d{1,3}|un|una|dos|tres|cuatro|cinco|seis|doce)\s+(mes(?:es)?|anos?|semestres?|trimestres?)\b")
+_PROXIMO_ANO_RE = re.compile(r"\b(?:proximo|siguiente)\s+ano\b")
+
+_NUMEROS = {"un": 1, "una": 1, "dos": 2, "tres": 3, "cuatro": 4, "cinco": 5, "seis": 6, "doce": 12}
+_MESES_POR_UNIDAD = {"mes": 1, "ano": 12, "semestre": 6, "trimestre": 3}
+
+HORIZONTE_POR_DEFECTO = 6
+HORIZONTE_MAXIMO = 36
+
+
+@dataclass(frozen=True)
+class Intencion:
+    secciones: FrozenSet[str]
+    meses_prediccion: int = HORIZONTE_POR_DEFECTO
+
+
+def normalizar_texto(texto: str) -> str:
+    return fold_accents(texto.lower())
+
+
+def es_pregunta_del_dominio(pregunta: str) -> bool:
+    """Equivalente a la validación por palabras clave, insensible a tildes."""
+    return bool(_DOMINIO_RE.search(normalizar_texto(pregunta)))
+
+
+def _horizonte(texto: str) -> int:
+    match = _HORIZONTE_RE.search(texto)
+    if match:
+        cantidad = _NUMEROS.get(match.group(1)) or int(match.group(1))
+        unidad = match.group(2).rstrip("s")
+        unidad = "mes" if unidad.startswith("mes") else unidad
+        return max(1, min(HORIZONTE_MAXIMO, cantidad * _MESES_POR_UNIDAD.get(unidad, 1)))
+    if _PROXIMO_ANO_RE.search(texto):
+        return 12
+    return HORIZONTE_POR_DEFECTO
+
+
+def clasificar_pregunta(pregunta: str) -> Intencion:
+    """
+    Decide qué secciones de contexto necesita la pregunta y, si pide predicciones,
+    con qué horizonte. Si no se reconoce ninguna intención concreta se usa el
+    contexto actual, que es el más barato de construir.
+    """
+    texto = normalizar_texto(pregunta)
+    secciones = {s for s, patron in _SECCION_RE.items() if patron.search(texto)}
+    if not secciones:
+        secciones = {SECCION_ACTUAL}
+    meses = _horizonte(texto) if SECCION_PREDICCION in secciones else HORIZONTE_POR_DEFECTO
+    return Intencion(frozenset(secciones), meses)
@@ -1,24 +1,42 @@
+import logging
 import os
 import time
+import random
+import hashlib
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
 from typing import Literal
-import re
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
 
-try:
-    from openai import OpenAI
-    OPENAI_V1 = True
-except ImportError:
-    import openai
-    OPENAI_V1 = False
-
-from huggingface_hub import InferenceClient
-import google.generativeai as genai
+from functools import lru_cache
 from dotenv import load_dotenv
 
+from services.chat_cache import chat_cache
+from services.chat_intents import (
+    Intencion, clasificar_pregunta, es_pregunta_del_dominio,
+    SECCION_ACTUAL, SECCION_PREDICCION, SECCION_HISTORICO, SECCION_REPORTE,
+)
+from services.llm_orchestrator import ProviderOrchestrator, DEFAULT_PROVIDER_ORDER
+from services.llm_resilience import guarded_call, llm_guards, ProveedorNoDisponible
+from core.cache import TTLCache
+from core.metrics import CONTEXTO_SECCIONES, PROMPT_TOKENS
+from services.report_manifest import report_manifest
+from core.config import (
+    LLM_REQUEST_TIMEOUT,
+    CONTEXT_SNAPSHOT_TTL_SECONDS,
+    OPENAI_BASE_URL,
+    HF_BASE_URL,
+    GEMINI_API_ENDPOINT,
+)
+from core.text import compact_lines, estimate_tokens
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 HF_API_KEY = os.getenv("HF_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -27,6 +45,31 @@ ZEPHYR_MODEL = "HuggingFaceH4/zephyr-7b-beta"
 OPENAI_MODEL = "gpt-4o-mini"
 GEMINI_MODEL = "gemini-1.5-flash"
 
+# =========================
+# SDKs de proveedores (carga diferida)
+# =========================
+# Los SDKs tardan en importarse; se cargan en la primera llamada a cada proveedor
+# para no penalizar el arranque del servidor.
+@lru_cache(maxsize=None)
+def _openai_sdk():
+    """Devuelve (módulo openai, usa_api_v1)"""
+    import openai
+    return openai, hasattr(openai, "OpenAI")
+
+@lru_cache(maxsize=None)
+def _genai_sdk():
+    import google.generativeai as genai
+    return genai
+
+def _configurar_gemini():
+    """Configura el SDK de Gemini; con GEMINI_API_ENDPOINT usa REST contra ese endpoint"""
+    genai = _genai_sdk()
+    opciones = {}
+    if GEMINI_API_ENDPOINT:
+        opciones = {"transport": "rest", "client_options": {"api_endpoint": GEMINI_API_ENDPOINT}}
+    genai.configure(api_key=_ensure_env("GEMINI_API_KEY"), **opciones)
+    return genai
+
 # =========================
 # Datos y Modelo de Consumo
 # =========================
@@ -46,18 +89,23 @@ def _load_consumption_data():
         print(f"Error cargando datos de consumo: {e}")
         return None, None
 
+def _latest_report_path():
+    """Ruta del reporte CSV más reciente según el manifiesto (o None si no hay reportes)"""
+    latest = report_manifest.ultimo("CSV")
+    return Path(latest["path"]) if latest else None
+
 def _load_latest_report():
     """Carga el reporte CSV más reciente generado"""
     try:
-        # Buscar reportes CSV en data4
-        csv_files = list(Path("data4").glob("reporte_consumo_agua_*.csv"))
-        if not csv_files:
+        latest_file = _latest_report_path()
+        if latest_file is None:
             return None
         
-        # Obtener el archivo más reciente
-        latest_file = max(csv_files, key=lambda x: x.stat().st_mtime)
         report_data = pd.read_csv(latest_file)
-        
+        # Exportación con varios escenarios: el contexto usa solo el primero
+        if "escenario" in report_data.columns:
+            report_data = report_data[report_data["escenario"] == report_data["escenario"].iloc[0]]
+
         return {
             "filename": latest_file.name,
             "data": report_data,
@@ -67,7 +115,40 @@ def _load_latest_report():
         print(f"Error cargando reporte: {e}")
         return None
 
-def _get_consumption_context():
+def _context_snapshot_version() -> str:
+    """
+    Huella de los insumos del contexto (datos de consumo, modelo y último reporte).
+    Cambia cuando alguno se modifica, invalidando las respuestas cacheadas.
+    """
+    sources = [
+        Path("data4/Consumo_Lluvia_Poblacion_Calderon_2005_2025.csv"),
+        Path("data4/Consumo_Lluvia_Poblacion_Diario_2005_2024.csv"),
+        Path("models/consumption_hgb.pkl"),
+        _latest_report_path(),
+    ]
+    firma = []
+    for path in sources:
+        if path is not None and path.exists():
+            stats = path.stat()
+            firma.append(f"{path.name}:{stats.st_mtime_ns}:{stats.st_size}")
+    return hashlib.sha1("|".join(firma).encode()).hexdigest()[:12]
+
+def _get_latest_report_context():
+    """Resumen del reporte de predicción más reciente (cadena vacía si no hay reportes)"""
+    latest_report = _load_latest_report()
+    if not latest_report or len(latest_report['data']) == 0:
+        return ""
+    report_data = latest_report['data']
+    total_predicted = report_data['consumo_predicho_m3'].sum()
+    avg_predicted = report_data['consumo_predicho_m3'].mean()
+    return f"""
+        Reporte de predicción más reciente ({latest_report['created']}):
+        - Consumo total predicho: {total_predicted:.0f} m³
+        - Consumo promedio predicho: {avg_predicted:.0f} m³/mes
+        - Período de predicción: {len(report_data)} meses
+        """
+
+def _get_consumption_context(incluir_reporte: bool = True):
     """Obtiene contexto actual del consumo de agua"""
     try:
         monthly_data, daily_data = _load_consumption_data()
@@ -101,19 +182,8 @@ def _get_consumption_context():
         """
         
         # Agregar información del reporte más reciente si existe
-        latest_report = _load_latest_report()
-        if latest_report:
-            report_data = latest_report['data']
-            if len(report_data) > 0:
-                total_predicted = report_data['consumo_predicho_m3'].sum()
-                avg_predicted = report_data['consumo_predicho_m3'].mean()
-                context += f"""
-        
-        Reporte de predicción más reciente ({latest_report['created']}):
-        - Consumo total predicho: {total_predicted:.0f} m³
-        - Consumo promedio predicho: {avg_predicted:.0f} m³/mes
-        - Período de predicción: {len(report_data)} meses
-        """
+        if incluir_reporte:
+            context += _get_latest_report_context()
         
         return context
     except Exception as e:
@@ -196,6 +266,71 @@ def _get_historical_analysis():
     except Exception as e:
         return f"Error en análisis histórico: {e}"
 
+class ContextSnapshot:
+    """
+    Secciones de contexto de una misma versión de los insumos, construidas a demanda
+    y memorizadas. Todas las preguntas que llegan con la misma versión (p. ej. las de
+    un lote) comparten el snapshot en lugar de recalcular datos y predicciones.
+    """
+
+    def __init__(self, version: str):
+        self.version = version
+        self._valores = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _seccion(self, clave, builder):
+        if clave in self._valores:
+            return self._valores[clave]
+        with self._lock:
+            lock = self._locks.setdefault(clave, threading.Lock())
+        with lock:
+            if clave not in self._valores:
+                valor = builder()
+                if valor.startswith(("Error", "No se pudieron")):
+                    return valor  # los errores no se memorizan
+                self._valores[clave] = valor
+            return self._valores[clave]
+
+    def actual(self) -> str:
+        return self._seccion(SECCION_ACTUAL, lambda: _get_consumption_context(incluir_reporte=False))
+
+    def prediccion(self, meses: int) -> str:
+        return self._seccion((SECCION_PREDICCION, meses), lambda: _get_consumption_prediction(meses))
+
+    def historico(self) -> str:
+        return self._seccion(SECCION_HISTORICO, _get_historical_analysis)
+
+    def reporte(self) -> str:
+        return self._seccion(SECCION_REPORTE, _get_latest_report_context)
+
+    def secciones_construidas(self) -> int:
+        return len(self._valores)
+
+_snapshots = TTLCache(max_entries=4, ttl_seconds=CONTEXT_SNAPSHOT_TTL_SECONDS)
+
+_snapshot_fijado: ContextVar = ContextVar("snapshot_fijado", default=None)
+
+def context_snapshot() -> ContextSnapshot:
+    """
+    Snapshot de contexto de la versión actual de los insumos (se crea si no existe),
+    o el fijado con `fijar_snapshot` en el hilo actual.
+    """
+    fijado = _snapshot_fijado.get()
+    if fijado is not None:
+        return fijado
+    version = _context_snapshot_version()
+    return _snapshots.get_or_set(version, lambda: ContextSnapshot(version))
+
+@contextmanager
+def fijar_snapshot(snapshot: ContextSnapshot):
+    """Hace que todas las preguntas del bloque usen el mismo snapshot aunque cambien los insumos"""
+    token = _snapshot_fijado.set(snapshot)
+    try:
+        yield snapshot
+    finally:
+        _snapshot_fijado.reset(token)
+
 # =========================
 # Utilidades
 # =========================
@@ -206,180 +341,299 @@ def _ensure_env(var_name: str):
     return value
 
 def _log_debug(modelo: str, prompt: str):
-    print(f"[DEBUG] Modelo: {modelo} | Pregunta: {prompt[:100]}...")
+    # Camino caliente: con el nivel DEBUG desactivado no se formatea nada
+    logger.debug("Modelo: %s | Pregunta: %.100s...", modelo, prompt)
+
+_MENSAJE_FUERA_DE_CONTEXTO = "Lo siento, no puedo ayudar con esa pregunta porque está fuera del contexto de gestión hídrica en Calderón."
 
-def _validar_contexto(pregunta: str) -> bool:
+def _validar_contexto(pregunta: str, historial: str = "") -> bool:
     """
     Verifica si la pregunta está dentro del contexto de sequías, recursos hídricos o Calderón.
+    En una sesión la pregunta se valida junto con el historial: las repreguntas
+    ("¿Y el año anterior?", "¿Por qué?") heredan el tema de la conversación.
     """
-    keywords = [
-        "sequia", "sequía", "precipitacion", "precipitación",
-        "lluvia", "hidrico", "hídrico", "agua", "calderon", "calderón",
-        "pluviometria", "pluviometría", "radiacion solar", "radiación solar",
-        "pronostico", "pronóstico", "clima", "meteorologia", "meteorología",
-        "nivel de agua", "consumo", "prediccion", "predicción", "modelo",
-        "datos", "estadisticas", "estadísticas", "tendencia", "analisis", "análisis"
-    ]
-    # Crear regex flexible
-    pattern = r"|".join(keywords)
-    return bool(re.search(pattern, pregunta.lower()))
-
-def _enrich_prompt_with_context(prompt: str) -> str:
-    """Enriquece el prompt con contexto de datos y predicciones"""
-    context = _get_consumption_context()
-    prediction = _get_consumption_prediction(6)  # 6 meses
-    historical = _get_historical_analysis()
-    
-    enriched_prompt = f"""
-    {prompt}
+    return es_pregunta_del_dominio(f"{historial}\n{pregunta}" if historial else pregunta)
 
-    CONTEXTO DE DATOS ACTUALES:
-    {context}
+_prompt_stats = threading.local()
 
-    PREDICCIONES:
-    {prediction}
+def ultimo_prompt_tokens() -> int:
+    """Tokens estimados del último prompt enriquecido construido en este hilo (0 si no hubo)"""
+    return getattr(_prompt_stats, "tokens", 0)
 
-    ANÁLISIS HISTÓRICO:
-    {historical}
+def reiniciar_prompt_tokens():
+    _prompt_stats.tokens = 0
 
-    Responde basándote en estos datos reales y predicciones del modelo de consumo de agua de Calderón.
+def _enrich_prompt_with_context(
+    prompt: str,
+    intencion: Intencion = None,
+    historial: str = "",
+    snapshot: ContextSnapshot = None
+) -> str:
+    """
+    Enriquece el prompt solo con las secciones de contexto que la pregunta necesita
+    (contexto actual, predicción con su horizonte, análisis histórico, último reporte).
+    Si la pregunta pertenece a una sesión, `historial` antepone la conversación previa.
+    Las secciones salen del snapshot de la versión vigente de los insumos.
     """
-    
+    if intencion is None:
+        intencion = clasificar_pregunta(prompt)
+    if snapshot is None:
+        snapshot = context_snapshot()
+
+    bloques = []
+    if SECCION_ACTUAL in intencion.secciones:
+        bloques.append(("CONTEXTO DE DATOS ACTUALES", snapshot.actual()))
+    if SECCION_PREDICCION in intencion.secciones:
+        bloques.append(("PREDICCIONES", snapshot.prediccion(intencion.meses_prediccion)))
+    if SECCION_HISTORICO in intencion.secciones:
+        bloques.append(("ANÁLISIS HISTÓRICO", snapshot.historico()))
+    if SECCION_REPORTE in intencion.secciones:
+        bloques.append(("ÚLTIMO REPORTE GENERADO", snapshot.reporte() or "No hay reportes generados."))
+
+    base = f"{historial}\n\nPregunta actual: {prompt.strip()}" if historial else prompt.strip()
+    partes = [base] + [f"{titulo}:\n{compact_lines(contenido)}" for titulo, contenido in bloques]
+    partes.append("Responde basándote en estos datos reales y predicciones del modelo de consumo de agua de Calderón.")
+    enriched_prompt = "\n\n".join(partes)
+
+    # Antes y después del contexto selectivo: la diferencia es lo que aportan las secciones
+    _prompt_stats.tokens = estimate_tokens(enriched_prompt)
+    PROMPT_TOKENS.observar(estimate_tokens(base), stage="pregunta")
+    PROMPT_TOKENS.observar(_prompt_stats.tokens, stage="enriquecido")
+    for seccion in intencion.secciones:
+        CONTEXTO_SECCIONES.inc(section=seccion)
     return enriched_prompt
 
 # =========================
 # OpenAI
 # =========================
-def generar_respuesta_openai(prompt: str) -> str:
+def _llamar_openai(enriched_prompt: str, cancel_token=None) -> str:
+    """Llama a OpenAI con el prompt ya enriquecido. Lanza excepción si falla."""
+    system_prompt = (
+        "Eres un asistente técnico especializado en gestión de sequías y recursos hídricos. "
+        "Tienes acceso a datos reales de consumo de agua de Calderón y un modelo de predicción entrenado. "
+        "Responde de manera clara, técnica y basada en datos científicos sobre la situación en Calderón. "
+        "Siempre responderás en español y usarás los datos proporcionados para dar respuestas precisas."
+    )
+
+    openai, openai_v1 = _openai_sdk()
+    if openai_v1:
+        client = openai.OpenAI(
+            api_key=_ensure_env("OPENAI_API_KEY"),
+            base_url=OPENAI_BASE_URL,
+            timeout=LLM_REQUEST_TIMEOUT,
+            max_retries=0
+        )
+        if cancel_token is not None:
+            cancel_token.on_cancel(client.close)
+        response = guarded_call(
+            "openai",
+            client.chat.completions.create,
+            cancel_token=cancel_token,
+            model=OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": enriched_prompt}
+            ],
+            temperature=0.3,
+            max_tokens=500,
+        )
+        return response.choices[0].message.content.strip()
+    else:
+        openai.api_key = _ensure_env("OPENAI_API_KEY")
+        response = guarded_call(
+            "openai",
+            openai.ChatCompletion.create,
+            model=OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": enriched_prompt}
+            ],
+            temperature=0.3,
+            max_tokens=500,
+        )
+        return response.choices[0].message.content.strip()
+
+def generar_respuesta_openai(prompt: str, historial: str = "") -> str:
     try:
-        if not _validar_contexto(prompt):
-            return "Lo siento, no puedo ayudar con esa pregunta porque está fuera del contexto de gestión hídrica en Calderón."
+        if not _validar_contexto(prompt, historial):
+            return _MENSAJE_FUERA_DE_CONTEXTO
 
         _ensure_env("OPENAI_API_KEY")
         _log_debug("OpenAI", prompt)
         
         # Enriquecer el prompt con contexto de datos
-        enriched_prompt = _enrich_prompt_with_context(prompt)
-        
-        system_prompt = (
-            "Eres un asistente técnico especializado en gestión de sequías y recursos hídricos. "
-            "Tienes acceso a datos reales de consumo de agua de Calderón y un modelo de predicción entrenado. "
-            "Responde de manera clara, técnica y basada en datos científicos sobre la situación en Calderón. "
-            "Siempre responderás en español y usarás los datos proporcionados para dar respuestas precisas."
-        )
+        enriched_prompt = _enrich_prompt_with_context(prompt, historial=historial)
+        return _llamar_openai(enriched_prompt)
+    except Exception as e:
+        return f"Error en la API OpenAI: {e}"
 
-        if OPENAI_V1:
-            client = OpenAI(api_key=OPENAI_API_KEY)
-            response = client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": enriched_prompt}
-                ],
-                temperature=0.3,
-                max_tokens=500,
-            )
-            return response.choices[0].message.content.strip()
-        else:
-            openai.api_key = OPENAI_API_KEY
-            response = openai.ChatCompletion.create(
-                model=OPENAI_MODEL,
+# =========================
+# Zephyr
+# =========================
+def _llamar_zephyr(
+    enriched_prompt: str,
+    cancel_token=None,
+    max_retries: int = 3,
+    backoff: float = 2.0,
+    max_tokens: int = 500,
+    temperature: float = 0.4
+) -> str:
+    """
+    Llama a Zephyr vía el router de Hugging Face. Reintenta errores transitorios
+    con backoff exponencial con jitter; lanza excepción si todos los intentos fallan.
+    """
+    openai, _ = _openai_sdk()
+    client = openai.OpenAI(
+        base_url=HF_BASE_URL,
+        api_key=_ensure_env("HF_API_KEY"),
+        timeout=LLM_REQUEST_TIMEOUT,
+        max_retries=0
+    )
+    if cancel_token is not None:
+        cancel_token.on_cancel(client.close)
+
+    system_prompt = (
+        "Eres un experto asistente técnico en gestión de sequías y recursos hídricos. "
+        "Tienes acceso a datos reales de consumo de agua de Calderón y un modelo de predicción entrenado. "
+        "Responde con claridad, detalle técnico y base científica, enfocándote en Calderón, Quito, Ecuador. "
+        "Siempre responderás en español y usarás los datos proporcionados para dar respuestas precisas."
+    )
+
+    for attempt in range(max_retries):
+        try:
+            completion = guarded_call(
+                "zephyr",
+                client.chat.completions.create,
+                cancel_token=cancel_token,
+                model="HuggingFaceH4/zephyr-7b-beta:featherless-ai",
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": enriched_prompt}
                 ],
-                temperature=0.3,
-                max_tokens=500,
+                temperature=temperature,
+                max_tokens=max_tokens
             )
-            return response.choices[0].message.content.strip()
-    except Exception as e:
-        return f"Error en la API OpenAI: {e}"
+            return completion.choices[0].message.content.strip()
+        except ProveedorNoDisponible:
+            raise
+        except Exception as inner_e:
+            if cancel_token is not None and cancel_token.cancelled:
+                raise
+            msg = str(inner_e).lower()
+            if any(err in msg for err in ["503", "rate limit", "timeout"]):
+                if attempt < max_retries - 1:
+                    espera = backoff * (2 ** attempt) * random.uniform(0.5, 1.0)
+                    # Una cancelación interrumpe el backoff en lugar de esperar a que venza
+                    if cancel_token is not None:
+                        if cancel_token.wait(espera):
+                            raise
+                    else:
+                        time.sleep(espera)
+                    continue
+            raise inner_e
+    raise RuntimeError("No se pudo obtener respuesta de Zephyr tras varios intentos.")
 
-# =========================
-# Zephyr
-# =========================
 def generar_respuesta_zephyr(
     prompt: str,
     max_retries: int = 3,
     backoff: float = 2.0,
     max_tokens: int = 500,
-    temperature: float = 0.4
+    temperature: float = 0.4,
+    historial: str = ""
 ) -> str:
     try:
-        if not _validar_contexto(prompt):
-            return "Lo siento, no puedo ayudar con esa pregunta porque está fuera del contexto de gestión hídrica en Calderón."
+        if not _validar_contexto(prompt, historial):
+            return _MENSAJE_FUERA_DE_CONTEXTO
 
-        api_key = _ensure_env("HF_API_KEY")
+        _ensure_env("HF_API_KEY")
         _log_debug("Zephyr", prompt)
         
         # Enriquecer el prompt con contexto de datos
-        enriched_prompt = _enrich_prompt_with_context(prompt)
-        
-        client = OpenAI(base_url="https://router.huggingface.co/v1", api_key=api_key)
-
-        system_prompt = (
-            "Eres un experto asistente técnico en gestión de sequías y recursos hídricos. "
-            "Tienes acceso a datos reales de consumo de agua de Calderón y un modelo de predicción entrenado. "
-            "Responde con claridad, detalle técnico y base científica, enfocándote en Calderón, Quito, Ecuador. "
-            "Siempre responderás en español y usarás los datos proporcionados para dar respuestas precisas."
+        enriched_prompt = _enrich_prompt_with_context(prompt, historial=historial)
+        return _llamar_zephyr(
+            enriched_prompt,
+            max_retries=max_retries,
+            backoff=backoff,
+            max_tokens=max_tokens,
+            temperature=temperature
         )
-
-        for attempt in range(max_retries):
-            try:
-                completion = client.chat.completions.create(
-                    model="HuggingFaceH4/zephyr-7b-beta:featherless-ai",
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": enriched_prompt}
-                    ],
-                    temperature=temperature,
-                    max_tokens=max_tokens
-                )
-                return completion.choices[0].message.content.strip()
-            except Exception as inner_e:
-                msg = str(inner_e).lower()
-                if any(err in msg for err in ["503", "rate limit", "timeout"]):
-                    if attempt < max_retries - 1:
-                        time.sleep(backoff * (attempt + 1))
-                        continue
-                raise inner_e
-        return "No se pudo obtener respuesta de Zephyr tras varios intentos."
     except Exception as e:
         return f"Error en la API Hugging Face: {e}"
 
 # =========================
 # Gemini
 # =========================
-def generar_respuesta_gemini(prompt: str) -> str:
+def _abandonable(fn, cancel_token):
+    """
+    Envuelve una llamada bloqueante que el SDK no permite abortar (Gemini no expone un
+    cliente por llamada que cerrar): corre en un hilo aparte y, si se cancela, se deja
+    de esperar y se lanza la excepción en el acto. La petición HTTP sigue hasta su
+    timeout en segundo plano, pero el hilo del orquestador y el cupo de concurrencia
+    del proveedor se liberan de inmediato.
+    """
+    if cancel_token is None:
+        return fn
+
+    def llamada(*args, **kwargs):
+        listo = threading.Event()
+        resultado = {}
+
+        def correr():
+            try:
+                resultado["valor"] = fn(*args, **kwargs)
+            except BaseException as e:
+                resultado["error"] = e
+            finally:
+                listo.set()
+
+        threading.Thread(target=correr, name="llm-abandonable", daemon=True).start()
+        cancel_token.on_cancel(listo.set)
+        listo.wait()
+        if "error" in resultado:
+            raise resultado["error"]
+        if "valor" in resultado:
+            return resultado["valor"]
+        raise ConnectionAbortedError("llamada cancelada")
+
+    return llamada
+
+def _llamar_gemini(enriched_prompt: str, cancel_token=None) -> str:
+    """Llama a Gemini con el prompt ya enriquecido. Lanza excepción si falla."""
+    genai = _configurar_gemini()
+    system_prompt = (
+        "Eres un experto asistente técnico en gestión de sequías y recursos hídricos. "
+        "Tienes acceso a datos reales de consumo de agua de Calderón y un modelo de predicción entrenado. "
+        "Responde con claridad, detalle técnico y base científica, enfocado en la situación de Calderón, Quito, Ecuador. "
+        "Siempre responderás en español y usarás los datos proporcionados para dar respuestas precisas."
+    )
+    model = genai.GenerativeModel(GEMINI_MODEL)
+    response = guarded_call(
+        "gemini",
+        _abandonable(model.generate_content, cancel_token),
+        [
+            {"role": "user", "parts": [system_prompt]},
+            {"role": "user", "parts": [enriched_prompt]},
+        ],
+        cancel_token=cancel_token,
+        generation_config={
+            "temperature": 0.3,
+            "max_output_tokens": 500
+        },
+        request_options={"timeout": LLM_REQUEST_TIMEOUT}
+    )
+    return (response.text or "").strip() if hasattr(response, "text") else "Sin respuesta."
+
+def generar_respuesta_gemini(prompt: str, historial: str = "") -> str:
     try:
-        if not _validar_contexto(prompt):
-            return "Lo siento, no puedo ayudar con esa pregunta porque está fuera del contexto de gestión hídrica en Calderón."
+        if not _validar_contexto(prompt, historial):
+            return _MENSAJE_FUERA_DE_CONTEXTO
 
         _ensure_env("GEMINI_API_KEY")
         _log_debug("Gemini", prompt)
         
         # Enriquecer el prompt con contexto de datos
-        enriched_prompt = _enrich_prompt_with_context(prompt)
-        
-        genai.configure(api_key=GEMINI_API_KEY)
-        system_prompt = (
-            "Eres un experto asistente técnico en gestión de sequías y recursos hídricos. "
-            "Tienes acceso a datos reales de consumo de agua de Calderón y un modelo de predicción entrenado. "
-            "Responde con claridad, detalle técnico y base científica, enfocado en la situación de Calderón, Quito, Ecuador. "
-            "Siempre responderás en español y usarás los datos proporcionados para dar respuestas precisas."
-        )
-        model = genai.GenerativeModel(GEMINI_MODEL)
-        response = model.generate_content(
-            [
-                {"role": "user", "parts": [system_prompt]},
-                {"role": "user", "parts": [enriched_prompt]},
-            ],
-            generation_config={
-                "temperature": 0.3,
-                "max_output_tokens": 500
-            }
-        )
-        return (response.text or "").strip() if hasattr(response, "text") else "Sin respuesta."
+        enriched_prompt = _enrich_prompt_with_context(prompt, historial=historial)
+        return _llamar_gemini(enriched_prompt)
     except Exception as e:
         return f"Error en la API Gemini: {e}"
 
@@ -388,12 +642,16 @@ def generar_respuesta_gemini(prompt: str) -> str:
 def interpretar_datos_gemini(titulo: str, resumen: str) -> str:
     try:
         _ensure_env("GEMINI_API_KEY")
-        genai.configure(api_key=GEMINI_API_KEY)
+        # Falla rápido antes de construir el contexto si Gemini está caído
+        if not llm_guards["gemini"].available():
+            raise ProveedorNoDisponible("gemini", "circuito abierto")
+        genai = _configurar_gemini()
         model = genai.GenerativeModel(GEMINI_MODEL)
 
         # Obtener contexto adicional para la interpretación
-        context = _get_consumption_context()
-        prediction = _get_consumption_prediction(3)  # 3 meses para interpretación
+        snapshot = context_snapshot()
+        context = snapshot.actual() + snapshot.reporte()
+        prediction = snapshot.prediccion(3)  # 3 meses para interpretación
 
         system_prompt = (
             f"Eres un experto en análisis meteorológico y gestión hídrica. "
@@ -407,9 +665,12 @@ def interpretar_datos_gemini(titulo: str, resumen: str) -> str:
             "Resumen:\n" + resumen
         )
 
-        response = model.generate_content(
+        response = guarded_call(
+            "gemini",
+            model.generate_content,
             [{"role": "user", "parts": [system_prompt]}],
-            generation_config={"temperature": 0.3, "max_output_tokens": 500}
+            generation_config={"temperature": 0.3, "max_output_tokens": 500},
+            request_options={"timeout": LLM_REQUEST_TIMEOUT}
         )
 
         return (response.text or "").strip()
@@ -421,13 +682,96 @@ def interpretar_datos_gemini(titulo: str, resumen: str) -> str:
 # =========================
 # Orquestador
 # =========================
-def responder_pregunta(pregunta: str, modelo: Literal["openai", "zephyr", "gemini"] = "openai") -> str:
+# Clave de entorno que habilita a cada proveedor
+_PROVIDER_ENV = {
+    "openai": "OPENAI_API_KEY",
+    "zephyr": "HF_API_KEY",
+    "gemini": "GEMINI_API_KEY",
+}
+
+orchestrator = ProviderOrchestrator({
+    "openai": _llamar_openai,
+    "zephyr": lambda prompt, cancel_token=None: _llamar_zephyr(prompt, cancel_token, max_retries=1),
+    "gemini": _llamar_gemini,
+})
+
+def _proveedores_disponibles() -> list:
+    """Proveedores con API key configurada y circuito no abierto, en el orden de respaldo por defecto"""
+    return [
+        p for p in DEFAULT_PROVIDER_ORDER
+        if os.getenv(_PROVIDER_ENV[p]) and llm_guards[p].available()
+    ]
+
+def _es_respuesta_cacheable(respuesta: str) -> bool:
+    """Los errores y rechazos por contexto no se guardan en caché"""
+    prefijos_no_cacheables = ("Error", "No se pudo", "Lo siento", "Sin respuesta")
+    return bool(respuesta) and not respuesta.startswith(prefijos_no_cacheables)
+
+def _despachar_orquestado(pregunta: str, modelo: str, estrategia: str, historial: str = "") -> dict:
+    """
+    Ejecuta la pregunta con respaldo entre proveedores ("fallback") o con
+    peticiones de cobertura cuando el proveedor supera su p95 ("hedged").
+    El contexto se construye una sola vez y se comparte entre proveedores.
+    """
+    if not _validar_contexto(pregunta, historial):
+        return {"respuesta": _MENSAJE_FUERA_DE_CONTEXTO, "proveedor": modelo}
+
+    orden = orchestrator.plan(modelo, _proveedores_disponibles())
+    if not orden:
+        return {"respuesta": "Error en los proveedores LLM: no hay ninguna API key configurada", "proveedor": modelo}
+    _log_debug(f"{estrategia}:{'>'.join(orden)}", pregunta)
+    enriched_prompt = _enrich_prompt_with_context(pregunta, historial=historial)
+    try:
+        resultado = orchestrator.execute(enriched_prompt, orden, hedged=(estrategia == "hedged"))
+    except Exception as e:
+        return {"respuesta": f"Error en los proveedores LLM: {e}", "proveedor": modelo}
+    return {"respuesta": resultado["respuesta"], "proveedor": resultado["proveedor"]}
+
+def _despachar_pregunta(pregunta: str, modelo: str, estrategia: str = "simple", historial: str = "") -> dict:
+    if estrategia != "simple":
+        return _despachar_orquestado(pregunta, modelo, estrategia, historial)
+    if modelo == "zephyr":
+        return {"respuesta": generar_respuesta_zephyr(pregunta, historial=historial), "proveedor": modelo}
+    if modelo == "gemini":
+        return {"respuesta": generar_respuesta_gemini(pregunta, historial=historial), "proveedor": modelo}
+    return {"respuesta": generar_respuesta_openai(pregunta, historial=historial), "proveedor": "openai"}
+
+def responder_pregunta_detallada(
+    pregunta: str,
+    modelo: Literal["openai", "zephyr", "gemini"] = "openai",
+    usar_cache: bool = True,
+    estrategia: Literal["simple", "fallback", "hedged"] = "simple",
+    historial: str = ""
+) -> dict:
+    """
+    Responde una pregunta e indica qué proveedor la respondió y si vino de la caché.
+    Las preguntas con historial de sesión no se cachean: su respuesta depende de la conversación.
+    """
     try:
         modelo = modelo.lower()
-        if modelo == "zephyr":
-            return generar_respuesta_zephyr(pregunta)
-        if modelo == "gemini":
-            return generar_respuesta_gemini(pregunta)
-        return generar_respuesta_openai(pregunta)
+        if not usar_cache or historial:
+            return {**_despachar_pregunta(pregunta, modelo, estrategia, historial), "cache": False}
+
+        version = context_snapshot().version
+        cached = chat_cache.get(pregunta, modelo, version)
+        if cached is not None:
+            _log_debug(f"{modelo} (caché)", pregunta)
+            return {"respuesta": cached, "proveedor": modelo, "cache": True}
+
+        inicio = time.perf_counter()
+        resultado = _despachar_pregunta(pregunta, modelo, estrategia)
+        # Una respuesta de un proveedor de respaldo no se guarda bajo el modelo solicitado:
+        # los aciertos posteriores informarían un proveedor que no respondió
+        if resultado["proveedor"] == modelo and _es_respuesta_cacheable(resultado["respuesta"]):
+            chat_cache.put(pregunta, modelo, version, resultado["respuesta"], time.perf_counter() - inicio)
+        return {**resultado, "cache": False}
     except Exception as e:
-        return f"Error procesando pregunta: {e}"
+        return {"respuesta": f"Error procesando pregunta: {e}", "proveedor": modelo, "cache": False}
+
+def responder_pregunta(
+    pregunta: str,
+    modelo: Literal["openai", "zephyr", "gemini"] = "openai",
+    usar_cache: bool = True,
+    estrategia: Literal["simple", "fallback", "hedged"] = "simple"
+) -> str:
+    return responder_pregunta_detallada(pregunta, modelo, usar_cache, estrategia)["respuesta"]
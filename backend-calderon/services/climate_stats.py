@@ -0,0 +1,345 @@
+import math
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# Umbral de significancia del test de Mann-Kendall
+ALFA_TENDENCIA = 0.05
+# Hasta este tamaño la pendiente de Sen usa todos los pares; por encima, una muestra aleatoria
+SEN_MAX_EXACTO = 1500
+SEN_PARES_MUESTRA = 200_000
+
+# Tamaño fijo del resumen que se envía al LLM
+RESUMEN_PUNTOS = 24
+RESUMEN_EXTREMOS = 3
+RESUMEN_ANOMALIAS = 5
+RESUMEN_ANIOS = 10
+UMBRAL_ANOMALIA = 3.5  # |z| robusto (Iglewicz y Hoaglin)
+
+_BLOQUE_BASE = 32
+_PARES_BASE = np.triu_indices(_BLOQUE_BASE, 1)
+_PESOS_MEDIA_MOVIL_12 = np.r_[0.5, np.ones(11), 0.5] / 12
+
+MESES = ["enero", "febrero", "marzo", "abril", "mayo", "junio", "julio",
+         "agosto", "septiembre", "octubre", "noviembre", "diciembre"]
+
+
+def extraer_serie(datos: list) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """
+    Convierte la lista de dicts {"fecha", "valor"} en arreglos de valores finitos y sus
+    fechas (texto). Si todas las fechas tienen forma "AAAA-MM[...]" devuelve además el
+    índice de mes absoluto (año * 12 + mes - 1) de cada valor; si no, None.
+    """
+    validos = [
+        d for d in datos
+        if isinstance(d, dict) and isinstance(d.get("valor"), (int, float))
+    ]
+    valores = np.fromiter((d["valor"] for d in validos), dtype=np.float64, count=len(validos))
+    finitos = np.isfinite(valores)
+    valores = valores[finitos]
+    fechas = np.array([str(d.get("fecha", "")) for d in validos], dtype=str)[finitos]
+    if not len(valores):
+        return valores, fechas, None
+    return valores, fechas, meses_absolutos(fechas)
+
+
+def meses_absolutos(fechas: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Índice de mes absoluto (año * 12 + mes - 1) de fechas de texto "AAAA-MM[...]",
+    o None si alguna no tiene esa forma.
+    """
+    if not len(fechas):
+        return None
+    cars = fechas.astype("U7").view(np.uint32).reshape(-1, 7).astype(np.int64)
+    digitos = cars[:, [0, 1, 2, 3, 5, 6]]
+    if not (np.all((digitos >= 48) & (digitos <= 57)) and np.all(cars[:, 4] == 45)):
+        return None
+    anio = (cars[:, :4] - 48) @ np.array([1000, 100, 10, 1])
+    mes = (cars[:, 5:7] - 48) @ np.array([10, 1])
+    if np.any((mes < 1) | (mes > 12)):
+        return None
+    return anio * 12 + mes - 1
+
+
+def es_mensual(mes_absoluto: Optional[np.ndarray]) -> bool:
+    """Serie con un valor por mes, sin huecos."""
+    return mes_absoluto is not None and bool(np.all(np.diff(mes_absoluto) == 1))
+
+
+def contar_pares(x: np.ndarray) -> Tuple[int, int]:
+    """
+    Cuenta los pares (i < j) con x[j] > x[i] (concordantes) y x[j] < x[i] (discordantes)
+    en O(n log n): mergesort de abajo hacia arriba vectorizado. Cada bloque se guarda
+    ordenado con clave bloque * n + rango, así una sola búsqueda binaria global ubica
+    cada elemento del bloque derecho dentro de su bloque izquierdo.
+    """
+    n = len(x)
+    if n < 2:
+        return 0, 0
+    _, rango = np.unique(x, return_inverse=True)
+    rango = rango.astype(np.int64).ravel()
+
+    # Bloques base: comparación directa de todos los pares dentro de cada bloque
+    total = -(-n // _BLOQUE_BASE) * _BLOQUE_BASE
+    relleno = np.full(total, -1, dtype=np.int64)
+    relleno[:n] = rango
+    bloques = relleno.reshape(-1, _BLOQUE_BASE)
+    a, b = bloques[:, _PARES_BASE[0]], bloques[:, _PARES_BASE[1]]
+    validos = b >= 0
+    concordantes = int(((b > a) & validos).sum())
+    discordantes = int(((b < a) & validos).sum())
+
+    pos = np.arange(n, dtype=np.int64)
+    tamano = _BLOQUE_BASE
+    claves = np.sort((pos // tamano) * n + rango)
+    while tamano < n:
+        bloque = pos // tamano
+        derecha = (bloque & 1) == 1
+        b = bloque[derecha]
+        consulta = claves[derecha] - n  # mismo rango, en el bloque izquierdo
+        concordantes += int((np.searchsorted(claves, consulta, "left") - (b - 1) * tamano).sum())
+        discordantes += int((b * tamano - np.searchsorted(claves, consulta, "right")).sum())
+        tamano *= 2
+        claves = np.sort(claves - (bloque - pos // tamano) * n, kind="stable")
+    return concordantes, discordantes
+
+
+def mann_kendall(x: np.ndarray) -> Optional[Dict]:
+    """Test de Mann-Kendall con corrección de varianza por empates (p-valor bilateral)."""
+    n = len(x)
+    if n < 3:
+        return None
+    concordantes, discordantes = contar_pares(x)
+    s = concordantes - discordantes
+    _, empates = np.unique(x, return_counts=True)
+    empates = empates[empates > 1].astype(np.float64)
+    varianza = (n * (n - 1) * (2 * n + 5) - np.sum(empates * (empates - 1) * (2 * empates + 5))) / 18.0
+    if varianza <= 0:
+        z = 0.0
+    else:
+        z = (s - np.sign(s)) / math.sqrt(varianza)
+    p_valor = math.erfc(abs(z) / math.sqrt(2))
+    return {
+        "s": int(s),
+        "concordantes": concordantes,
+        "discordantes": discordantes,
+        "varianza": float(varianza),
+        "z": round(float(z), 4),
+        "p_valor": float(p_valor),
+        "tau": round(s / (n * (n - 1) / 2), 4),
+        "significativa": bool(p_valor < ALFA_TENDENCIA),
+    }
+
+
+def pendiente_sen(x: np.ndarray, varianza_s: Optional[float] = None, semilla: int = 0) -> Optional[Dict]:
+    """
+    Pendiente de Sen (mediana de las pendientes entre pares) con su intervalo de confianza
+    del 95 % derivado de la varianza de Mann-Kendall. Exacta hasta SEN_MAX_EXACTO puntos;
+    por encima se estima con una muestra aleatoria de pares.
+    """
+    n = len(x)
+    if n < 2:
+        return None
+    if n <= SEN_MAX_EXACTO:
+        i, j = np.triu_indices(n, 1)
+        metodo = "exacto"
+    else:
+        rng = np.random.default_rng(semilla)
+        i = rng.integers(0, n, SEN_PARES_MUESTRA)
+        j = rng.integers(0, n, SEN_PARES_MUESTRA)
+        distintos = i != j
+        i, j = np.minimum(i, j)[distintos], np.maximum(i, j)[distintos]
+        metodo = "muestreo"
+    pendientes = np.sort((x[j] - x[i]) / (j - i))
+    resultado = {"pendiente": float(np.median(pendientes)), "metodo": metodo}
+
+    if varianza_s:
+        pares = n * (n - 1) / 2
+        c = 1.96 * math.sqrt(varianza_s)
+        inferior = max(0.0, (pares - c) / 2 / pares)
+        superior = min(1.0, (pares + c) / 2 / pares)
+        resultado["ic95_inferior"] = float(np.quantile(pendientes, inferior))
+        resultado["ic95_superior"] = float(np.quantile(pendientes, superior))
+    return resultado
+
+
+def regresion_lineal(x: np.ndarray) -> Optional[Dict]:
+    """Pendiente por mínimos cuadrados contra el índice temporal."""
+    n = len(x)
+    if n < 2:
+        return None
+    t = np.arange(n, dtype=np.float64)
+    t_c = t - t.mean()
+    x_c = x - x.mean()
+    sxx = float(t_c @ t_c)
+    pendiente = float(t_c @ x_c) / sxx
+    sst = float(x_c @ x_c)
+    residuo = x_c - pendiente * t_c
+    return {
+        "pendiente": pendiente,
+        "intercepto": float(x.mean() - pendiente * t.mean()),
+        "r2": round(1 - float(residuo @ residuo) / sst, 4) if sst > 0 else 0.0,
+    }
+
+
+def descomposicion_estacional(x: np.ndarray, mes_absoluto: Optional[np.ndarray]) -> Optional[Dict]:
+    """
+    Descomposición aditiva clásica para series mensuales contiguas de al menos dos años:
+    tendencia por media móvil centrada 2x12, índices estacionales por mes y residuo.
+    La fuerza estacional es 1 - Var(residuo) / Var(serie sin tendencia).
+    """
+    if len(x) < 24 or not es_mensual(mes_absoluto):
+        return None
+    tendencia = np.convolve(x, _PESOS_MEDIA_MOVIL_12, mode="valid")
+    sin_tendencia = x[6:len(x) - 6] - tendencia
+    mes = (mes_absoluto[6:len(x) - 6] % 12).astype(np.int64)
+    indices = np.bincount(mes, sin_tendencia, 12) / np.bincount(mes, minlength=12)
+    indices -= indices.mean()
+    residuo = sin_tendencia - indices[mes]
+    var_sin_tendencia = float(np.var(sin_tendencia))
+    fuerza = max(0.0, 1 - float(np.var(residuo)) / var_sin_tendencia) if var_sin_tendencia > 0 else 0.0
+    return {
+        "periodo": 12,
+        "indices": {MESES[m]: round(float(indices[m]), 4) for m in range(12)},
+        "mes_maximo": MESES[int(np.argmax(indices))],
+        "mes_minimo": MESES[int(np.argmin(indices))],
+        "amplitud": round(float(indices.max() - indices.min()), 4),
+        "fuerza": round(fuerza, 4),
+    }
+
+
+def clasificar_tendencia(mk: Optional[Dict], sen: Optional[Dict]) -> str:
+    """
+    "Creciente"/"Decreciente" si la serie es monótona o si Mann-Kendall es significativo
+    (con el signo de la pendiente de Sen); "Variable" en otro caso.
+    """
+    if mk is None:
+        # Menos de tres puntos: basta el signo de la pendiente
+        if sen and sen["pendiente"] != 0:
+            return "Creciente" if sen["pendiente"] > 0 else "Decreciente"
+        return "Variable"
+    if mk["discordantes"] == 0 and mk["concordantes"] > 0:
+        return "Creciente"
+    if mk["concordantes"] == 0 and mk["discordantes"] > 0:
+        return "Decreciente"
+    if mk["significativa"]:
+        pendiente = sen["pendiente"] if sen and sen["pendiente"] != 0 else mk["s"]
+        return "Creciente" if pendiente > 0 else "Decreciente"
+    return "Variable"
+
+
+def describir_serie(valores: np.ndarray, mes_absoluto: Optional[np.ndarray] = None) -> Dict:
+    """Estadísticas descriptivas, de tendencia y estacionales de una serie."""
+    n = len(valores)
+    p5, p25, p50, p75, p95 = np.percentile(valores, [5, 25, 50, 75, 95])
+    mk = mann_kendall(valores)
+    sen = pendiente_sen(valores, mk["varianza"] if mk else None)
+    return {
+        "n": n,
+        "promedio": round(float(valores.mean()), 2),
+        "maximo": float(valores.max()),
+        "minimo": float(valores.min()),
+        "desviacion_estandar": round(float(valores.std(ddof=1)), 4) if n > 1 else None,
+        "percentiles": {
+            "p5": float(p5), "p25": float(p25), "p50": float(p50), "p75": float(p75), "p95": float(p95),
+        },
+        "tendencia": clasificar_tendencia(mk, sen),
+        "regresion": regresion_lineal(valores),
+        "sen": sen,
+        "mann_kendall": mk,
+        "estacionalidad": descomposicion_estacional(valores, mes_absoluto),
+        "unidad_tiempo": "mes" if es_mensual(mes_absoluto) else "observacion",
+    }
+
+
+def _etiqueta(fechas: np.ndarray, i: int) -> str:
+    return fechas[i] if fechas[i] else f"#{i}"
+
+
+def resumir_serie(
+    valores: np.ndarray,
+    fechas: np.ndarray,
+    mes_absoluto: Optional[np.ndarray] = None,
+    puntos: int = RESUMEN_PUNTOS,
+    extremos: int = RESUMEN_EXTREMOS,
+    anomalias: int = RESUMEN_ANOMALIAS,
+    anios: int = RESUMEN_ANIOS,
+) -> Dict:
+    """
+    Resumen de tamaño fijo de la serie para el prompt, independiente de su longitud:
+    - serie reducida a `puntos` tramos consecutivos (rango de fechas, media, mín, máx)
+    - climatología por mes del año y promedio de los últimos `anios` años (si hay fechas AAAA-MM)
+    - los `extremos` valores más altos y más bajos con su fecha
+    - las `anomalias` mayores según el z-score robusto (mediana/MAD); si hay meses,
+      respecto de la media de su mes del año para no confundir estacionalidad con anomalía
+    """
+    n = len(valores)
+    resumen = {"n": n, "desde": _etiqueta(fechas, 0), "hasta": _etiqueta(fechas, n - 1)}
+
+    # Serie reducida: medias por tramos consecutivos
+    cortes = np.unique(np.linspace(0, n, min(puntos, n) + 1).astype(np.int64))[:-1]
+    fines = np.r_[cortes[1:], n] - 1
+    tamanos = np.diff(np.r_[cortes, n])
+    resumen["serie_reducida"] = [
+        {
+            "desde": _etiqueta(fechas, int(ini)),
+            "hasta": _etiqueta(fechas, int(fin)),
+            "media": round(float(media), 3),
+            "minimo": float(minimo),
+            "maximo": float(maximo),
+        }
+        for ini, fin, media, minimo, maximo in zip(
+            cortes, fines,
+            np.add.reduceat(valores, cortes) / tamanos,
+            np.minimum.reduceat(valores, cortes),
+            np.maximum.reduceat(valores, cortes),
+        )
+    ]
+
+    # Agregados mensuales
+    referencia = np.full(n, np.median(valores))
+    if mes_absoluto is not None:
+        mes = (mes_absoluto % 12).astype(np.int64)
+        conteo = np.bincount(mes, minlength=12)
+        medias_mes = np.bincount(mes, valores, 12) / np.maximum(conteo, 1)
+        resumen["climatologia_mensual"] = {
+            MESES[m]: round(float(medias_mes[m]), 3) for m in range(12) if conteo[m]
+        }
+        anio = (mes_absoluto // 12).astype(np.int64)
+        anio_rel = anio - anio.min()
+        conteo_anio = np.bincount(anio_rel)
+        medias_anio = np.bincount(anio_rel, valores) / np.maximum(conteo_anio, 1)
+        presentes = np.flatnonzero(conteo_anio)[-anios:]
+        resumen["promedios_anuales"] = {
+            str(int(a + anio.min())): round(float(medias_anio[a]), 3) for a in presentes
+        }
+        referencia = medias_mes[mes]
+
+    # Extremos
+    k = min(extremos, n)
+    altos = np.argpartition(valores, n - k)[n - k:]
+    bajos = np.argpartition(valores, k - 1)[:k]
+    resumen["maximos"] = [
+        {"fecha": _etiqueta(fechas, int(i)), "valor": float(valores[i])} for i in altos[np.argsort(-valores[altos])]
+    ]
+    resumen["minimos"] = [
+        {"fecha": _etiqueta(fechas, int(i)), "valor": float(valores[i])} for i in bajos[np.argsort(valores[bajos])]
+    ]
+
+    # Anomalías por z-score robusto
+    desvio = valores - referencia
+    mad = float(np.median(np.abs(desvio - np.median(desvio))))
+    if mad > 0:
+        z = 0.6745 * (desvio - np.median(desvio)) / mad
+        candidatos = np.flatnonzero(np.abs(z) > UMBRAL_ANOMALIA)
+        top = candidatos[np.argsort(-np.abs(z[candidatos]))[:anomalias]]
+        resumen["anomalias"] = {
+            "total": int(len(candidatos)),
+            "principales": [
+                {"fecha": _etiqueta(fechas, int(i)), "valor": float(valores[i]), "z": round(float(z[i]), 2)}
+                for i in top
+            ],
+        }
+    else:
+        resumen["anomalias"] = {"total": 0, "principales": []}
+    return resumen
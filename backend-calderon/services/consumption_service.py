@@ -1,13 +1,16 @@
 import pandas as pd
 import math
+import threading
 import numpy as np
 from pathlib import Path
-from typing import Optional, List, Tuple, Dict
-from joblib import dump, load
+from typing import Optional, List, Tuple, Dict, TYPE_CHECKING
 
-from sklearn.pipeline import Pipeline
-from sklearn.ensemble import HistGradientBoostingRegressor
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from core.metrics import INFERENCIA_LOTE, PARSEO_DURACION
+
+# sklearn y joblib se importan de forma diferida dentro de las funciones que los usan
+# para no retrasar el arranque de la API.
+if TYPE_CHECKING:
+    from sklearn.pipeline import Pipeline
 
 # Rutas base
 DATA_DIR = Path("data4")
@@ -15,13 +18,35 @@ MODELS_DIR = Path("models")
 CSV_NAME = "Consumo_Lluvia_Poblacion_Diario_2005_2024.csv"
 MODEL_PATH = MODELS_DIR / "consumption_hgb.pkl"
 
+# Cachés en memoria de los datos mensuales y del modelo, invalidadas por mtime del archivo
+_cache_lock = threading.Lock()
+_raw_cache: Dict[str, tuple] = {}
+_model_cache: Dict[str, tuple] = {}
+
+def _cached(cache: Dict[str, tuple], path: Path, loader):
+    mtime = path.stat().st_mtime_ns
+    with _cache_lock:
+        entry = cache.get(str(path))
+        if entry and entry[0] == mtime:
+            return entry[1]
+    value = loader(path)
+    with _cache_lock:
+        cache[str(path)] = (mtime, value)
+    return value
+
 # Cargar y transformar datos diarios a agregados mensuales
 def _load_raw() -> pd.DataFrame:
     file_path = DATA_DIR / CSV_NAME
     if not file_path.exists():
         raise FileNotFoundError(f"No se encontró el archivo en {file_path}")
-    
-    df = pd.read_csv(file_path, parse_dates=["Fecha"])
+    return _cached(_raw_cache, file_path, _read_monthly).copy()
+
+def _read_monthly(file_path: Path) -> pd.DataFrame:
+    with PARSEO_DURACION.medir(format="csv", source="consumo"):
+        df = pd.read_csv(file_path, parse_dates=["Fecha"])
+    return _agregar_mensual(df)
+
+def _agregar_mensual(df: pd.DataFrame) -> pd.DataFrame:
     df.columns = df.columns.str.strip()
 
     # Crear columnas de año y mes
@@ -44,6 +69,34 @@ def _load_raw() -> pd.DataFrame:
 
     return df_mensual
 
+def anexar_diario(file_path: Path, mtime_anterior: int, nuevas: pd.DataFrame) -> bool:
+    """
+    Actualiza el agregado mensual en caché tras agregar filas diarias al final del CSV,
+    sin releerlo: si las filas nuevas empiezan en un mes posterior al último agregado se
+    concatenan sus meses; si completan un mes ya agregado se descarta la caché (la
+    población es un promedio y no se puede combinar sin el número de días).
+    """
+    with _cache_lock:
+        entry = _raw_cache.get(str(file_path))
+    if not entry or entry[0] != mtime_anterior:
+        return False
+    mensual = _agregar_mensual(nuevas.copy())
+    anterior = entry[1]
+    # Mismos tipos que tendría el archivo releído (p. ej. consumos enteros)
+    for columna, tipo in anterior.dtypes.items():
+        if columna in mensual and mensual[columna].dtype != tipo and (mensual[columna] == mensual[columna].astype(tipo)).all():
+            mensual[columna] = mensual[columna].astype(tipo)
+    ultimo = (anterior["anio"].iloc[-1], anterior["mes"].iloc[-1]) if len(anterior) else (0, 0)
+    with _cache_lock:
+        if len(mensual) and (mensual["anio"].iloc[0], mensual["mes"].iloc[0]) <= ultimo:
+            _raw_cache.pop(str(file_path), None)
+            return False
+        _raw_cache[str(file_path)] = (
+            file_path.stat().st_mtime_ns,
+            pd.concat([anterior, mensual], ignore_index=True),
+        )
+    return True
+
 # Filtro opcional por años y meses
 def _apply_filters(
     df: pd.DataFrame,
@@ -80,11 +133,14 @@ def _build_pipeline_hgb(
     random_state: int = 42,
     n_estimators: int = 100,
     max_depth: Optional[int] = None
-) -> Pipeline:
+) -> "Pipeline":
     """
     Construye el pipeline de entrenamiento usando HistGradientBoosting.
     Parámetros opcionales: n_estimators y max_depth.
     """
+    from sklearn.pipeline import Pipeline
+    from sklearn.ensemble import HistGradientBoostingRegressor
+
     model = HistGradientBoostingRegressor(
         random_state=random_state,
         max_iter=n_estimators,  # HistGradientBoosting usa 'max_iter' en lugar de 'n_estimators'
@@ -106,6 +162,8 @@ def train_model(
     months: Optional[List[int]] = None
 ) -> Dict:
     from sklearn.model_selection import train_test_split
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+    from joblib import dump
 
     df = get_data(year_from, year_to, months)
     if len(df) < 20:
@@ -140,16 +198,18 @@ def train_model(
     }
 
 
-# Cargar modelo desde disco
-def _load_model() -> Pipeline:
+# Cargar modelo desde disco (se mantiene en memoria hasta que cambie el archivo)
+def _load_model() -> "Pipeline":
     if not MODEL_PATH.exists():
         raise FileNotFoundError("Modelo no encontrado. Ejecuta primero train_model().")
-    return load(MODEL_PATH)
+    from joblib import load
+    return _cached(_model_cache, MODEL_PATH, load)
 
 # Realizar predicciones a partir de una lista de diccionarios
 def predict(items: List[dict]) -> List[float]:
     model = _load_model()
     df = pd.DataFrame(items)
+    INFERENCIA_LOTE.observar(len(df), operation="predict")
     return model.predict(df).tolist()
 
 # Comparar predicciones reales vs predichas y calcular métricas
@@ -158,10 +218,13 @@ def compare(
     year_to: Optional[int] = None,
     months: Optional[List[int]] = None
 ) -> Tuple[pd.DataFrame, Dict[str, float]]:
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
     df = get_data(year_from, year_to, months)
     model = _load_model()
 
     X, y = _split_Xy(df)
+    INFERENCIA_LOTE.observar(len(X), operation="compare")
     y_pred = model.predict(X)
 
     comp_df = df[["anio", "mes"]].copy()
@@ -194,32 +257,23 @@ def generate_future_features(
     if precipitacion_promedio is None:
         precipitacion_promedio = float(df_hist["precipitacion_mm"].mean())
 
-    # Generar una lista de meses futuros
-    rows = []
-    year, month = start_year, start_month
-
-    for _ in range(months_ahead):
-        rows.append({
-            "anio": year,
-            "mes": month,
-            "precipitacion_mm": precipitacion_promedio,
-            "poblacion": poblacion_estimada
-        })
-        month += 1
-        if month > 12:
-            month = 1
-            year += 1
-
-    return pd.DataFrame(rows)
+    # Meses futuros calculados por columnas (sin construir una fila por mes)
+    desplazamiento = np.arange(months_ahead) + (int(start_month) - 1)
+    return pd.DataFrame({
+        "anio": int(start_year) + desplazamiento // 12,
+        "mes": desplazamiento % 12 + 1,
+        "precipitacion_mm": np.full(months_ahead, precipitacion_promedio, dtype=float),
+        "poblacion": np.full(months_ahead, poblacion_estimada, dtype=float),
+    })
 
-# Generar predicciones para meses futuros
-def forecast_future(
+# Generar predicciones para meses futuros como arreglos (anio, mes, consumo_predicho)
+def forecast_arrays(
     months_ahead: int,
     start_year: Optional[int] = None,
     start_month: Optional[int] = None,
     poblacion_estimada: Optional[float] = None,
     precipitacion_promedio: Optional[float] = None
-) -> List[dict]:
+) -> Dict[str, np.ndarray]:
     df_hist = _load_raw()
     ultimo_anio = df_hist["anio"].max()
     ultimo_mes = df_hist.loc[df_hist["anio"] == ultimo_anio, "mes"].max()
@@ -233,19 +287,30 @@ def forecast_future(
             start_month = 1
             start_year += 1
 
-    # Generar los datos y predecir
+    # Generar los datos y predecir directamente sobre el DataFrame de características
     df_features = generate_future_features(
         start_year, start_month, months_ahead, poblacion_estimada, precipitacion_promedio
     )
+    INFERENCIA_LOTE.observar(len(df_features), operation="forecast")
 
-    preds = predict(df_features.to_dict(orient="records"))
+    return {
+        "anio": df_features["anio"].to_numpy(),
+        "mes": df_features["mes"].to_numpy(),
+        "consumo_predicho": np.asarray(_load_model().predict(df_features), dtype=float),
+    }
 
-    # Combinar con fechas
+# Generar predicciones para meses futuros
+def forecast_future(
+    months_ahead: int,
+    start_year: Optional[int] = None,
+    start_month: Optional[int] = None,
+    poblacion_estimada: Optional[float] = None,
+    precipitacion_promedio: Optional[float] = None
+) -> List[dict]:
+    arrays = forecast_arrays(months_ahead, start_year, start_month, poblacion_estimada, precipitacion_promedio)
     return [
-        {
-            "anio": int(row["anio"]),
-            "mes": int(row["mes"]),
-            "consumo_predicho": float(preds[i])
-        }
-        for i, row in df_features.iterrows()
+        {"anio": anio, "mes": mes, "consumo_predicho": consumo}
+        for anio, mes, consumo in zip(
+            arrays["anio"].tolist(), arrays["mes"].tolist(), arrays["consumo_predicho"].tolist()
+        )
     ]
@@ -0,0 +1,321 @@
+import random
+import smtplib
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from email.utils import make_msgid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from core.config import (
+    EMAIL_OUTBOX_DB,
+    EMAIL_OUTBOX_WORKERS,
+    EMAIL_OUTBOX_BATCH,
+    EMAIL_OUTBOX_POLL_SECONDS,
+    EMAIL_OUTBOX_MAX_ATTEMPTS,
+    EMAIL_OUTBOX_BACKOFF_BASE_SECONDS,
+    EMAIL_OUTBOX_BACKOFF_MAX_SECONDS,
+    EMAIL_OUTBOX_LEASE_SECONDS,
+)
+from core.config_mail import construir_mensaje, smtp_pool
+from core.smtp_pool import SMTPPool, es_error_de_conexion
+
+PENDIENTE = "pendiente"
+ENVIANDO = "enviando"
+ENVIADO = "enviado"
+FALLIDO = "fallido"
+
+_COLUMNAS = ("id", "lote", "destinatario", "asunto", "adjunto", "estado", "intentos",
+             "proximo", "error", "creado", "enviado")
+
+
+class ErrorPermanente(Exception):
+    """El mensaje no se puede enviar y reintentarlo no cambiará el resultado."""
+
+
+def _es_permanente(error: BaseException) -> bool:
+    """5xx del servidor, destinatario rechazado o adjunto inexistente: no se reintenta."""
+    if isinstance(error, (ErrorPermanente, smtplib.SMTPRecipientsRefused)):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return False
+
+
+class EmailOutbox:
+    """
+    Bandeja de salida persistente. Los correos se guardan en SQLite antes de enviarse,
+    así que una caída de la API no los pierde, y los puede encolar cualquier proceso
+    (la API o el pool de reportes). Los hilos de envío reclaman tandas de mensajes
+    vencidos, los envían por conexiones SMTP del pool y, ante errores transitorios,
+    los reprograman con backoff exponencial hasta `max_intentos`.
+
+    Un lote es un mismo correo para una lista de distribución: el adjunto se lee y se
+    codifica una sola vez por tanda y cada destinatario recibe su propio mensaje.
+    Un mensaje reclamado por un proceso que murió vuelve a la cola al vencer `lease`
+    (entrega al menos una vez; el Message-ID estable permite descartar duplicados).
+    """
+
+    def __init__(
+        self,
+        db_path: str = EMAIL_OUTBOX_DB,
+        pool: Optional[SMTPPool] = None,
+        workers: int = EMAIL_OUTBOX_WORKERS,
+        tanda: int = EMAIL_OUTBOX_BATCH,
+        sondeo: float = EMAIL_OUTBOX_POLL_SECONDS,
+        max_intentos: int = EMAIL_OUTBOX_MAX_ATTEMPTS,
+        backoff_base: float = EMAIL_OUTBOX_BACKOFF_BASE_SECONDS,
+        backoff_max: float = EMAIL_OUTBOX_BACKOFF_MAX_SECONDS,
+        lease: float = EMAIL_OUTBOX_LEASE_SECONDS,
+    ):
+        self.db_path = db_path
+        self.pool = pool if pool is not None else smtp_pool
+        self.workers = workers
+        self.tanda = tanda
+        self.sondeo = sondeo
+        self.max_intentos = max_intentos
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease = lease
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._hilos: List[threading.Thread] = []
+        self.enviados = 0
+        self.reintentos = 0
+        self.fallidos = 0
+        # La base se crea en el primer uso, no al importar el módulo
+        self._esquema_lock = threading.Lock()
+        self._esquema_listo = False
+
+    def _conectar(self) -> sqlite3.Connection:
+        # Sin transacción implícita: cada reclamo abre la suya con BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _preparar(self):
+        with self._esquema_lock:
+            if self._esquema_listo:
+                return
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            conn = self._conectar()
+            try:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS mensajes ("
+                    "id TEXT PRIMARY KEY, lote TEXT NOT NULL, destinatario TEXT NOT NULL, "
+                    "asunto TEXT NOT NULL, cuerpo TEXT NOT NULL, adjunto TEXT, estado TEXT NOT NULL, "
+                    "intentos INTEGER NOT NULL DEFAULT 0, proximo REAL NOT NULL, reclamado REAL, "
+                    "error TEXT, creado REAL NOT NULL, enviado REAL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS mensajes_cola ON mensajes (estado, proximo)")
+                conn.execute("CREATE INDEX IF NOT EXISTS mensajes_lote ON mensajes (lote)")
+            finally:
+                conn.close()
+            self._esquema_listo = True
+
+    @contextmanager
+    def _db(self):
+        if not self._esquema_listo:
+            self._preparar()
+        conn = self._conectar()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    # --- Encolar ---
+
+    def encolar(self, destinatarios: List[str], asunto: str, cuerpo: str, adjunto: Optional[str] = None) -> Dict:
+        """Un mensaje por destinatario (sin repetidos) bajo un mismo lote; no espera el envío."""
+        vistos, unicos = set(), []
+        for destinatario in destinatarios:
+            if destinatario.lower() not in vistos:
+                vistos.add(destinatario.lower())
+                unicos.append(destinatario)
+        lote, ahora = uuid.uuid4().hex, time.time()
+        filas = [(uuid.uuid4().hex, lote, d, asunto, cuerpo, adjunto, PENDIENTE, ahora, ahora) for d in unicos]
+        with self._db() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO mensajes (id, lote, destinatario, asunto, cuerpo, adjunto, estado, proximo, creado) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                filas,
+            )
+            conn.execute("COMMIT")
+        self._despertar.set()
+        return {"lote": lote, "mensajes": [f[0] for f in filas], "destinatarios": unicos}
+
+    # --- Envío ---
+
+    def _reclamar(self) -> List[sqlite3.Row]:
+        ahora = time.time()
+        with self._db() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            filas = conn.execute(
+                "SELECT * FROM mensajes WHERE (estado = ? AND proximo <= ?) OR (estado = ? AND reclamado < ?) "
+                "ORDER BY proximo LIMIT ?",
+                (PENDIENTE, ahora, ENVIANDO, ahora - self.lease, self.tanda),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE mensajes SET estado = ?, reclamado = ? WHERE id = ?",
+                [(ENVIANDO, ahora, fila["id"]) for fila in filas],
+            )
+            conn.execute("COMMIT")
+        return filas
+
+    def procesar_tanda(self) -> int:
+        """Envía una tanda de mensajes vencidos; devuelve cuántos se procesaron."""
+        if not self.pool.configurado:
+            return 0
+        filas = self._reclamar()
+        mensajes: Dict[tuple, object] = {}  # (asunto, cuerpo, adjunto) -> mensaje ya codificado
+        for i, fila in enumerate(filas):
+            try:
+                clave = (fila["asunto"], fila["cuerpo"], fila["adjunto"])
+                if clave not in mensajes:
+                    mensajes[clave] = self._construir(fila)
+                mensaje = mensajes[clave]
+                del mensaje["To"], mensaje["Message-ID"]
+                mensaje["To"] = fila["destinatario"]
+                mensaje["Message-ID"] = make_msgid(idstring=fila["id"])
+                with self.pool.conexion() as smtp:
+                    smtp.send_message(mensaje)
+            except Exception as e:
+                proximo = self._fallo(fila, e)
+                if proximo is not None and es_error_de_conexion(e):
+                    # Servidor inaccesible: el resto de la tanda espera lo mismo, sin gastar intentos
+                    for resto in filas[i + 1:]:
+                        self._marcar(resto["id"], PENDIENTE, resto["intentos"], error=resto["error"], proximo=proximo)
+                    break
+            else:
+                self._marcar(fila["id"], ENVIADO, fila["intentos"] + 1, enviado=time.time())
+                self.enviados += 1
+        return len(filas)
+
+    @staticmethod
+    def _construir(fila: sqlite3.Row):
+        if not fila["adjunto"]:
+            return construir_mensaje(fila["asunto"], fila["cuerpo"], fila["destinatario"])
+        ruta = Path(fila["adjunto"])
+        if not ruta.is_file():
+            raise ErrorPermanente(f"El adjunto no existe: {ruta}")
+        return construir_mensaje(fila["asunto"], fila["cuerpo"], fila["destinatario"], ruta.read_bytes(), ruta.name)
+
+    def _fallo(self, fila: sqlite3.Row, error: Exception) -> Optional[float]:
+        """Marca el mensaje como fallido o lo reprograma; devuelve el próximo intento si lo hay."""
+        intentos = fila["intentos"] + 1
+        descripcion = f"{type(error).__name__}: {error}"
+        if _es_permanente(error) or intentos >= self.max_intentos:
+            self._marcar(fila["id"], FALLIDO, intentos, error=descripcion)
+            self.fallidos += 1
+            print(f"[OUTBOX] {fila['destinatario']}: fallido tras {intentos} intento(s): {descripcion}")
+            return None
+        espera = min(self.backoff_max, self.backoff_base * 2 ** (intentos - 1)) * random.uniform(0.8, 1.2)
+        proximo = time.time() + espera
+        self._marcar(fila["id"], PENDIENTE, intentos, error=descripcion, proximo=proximo)
+        self.reintentos += 1
+        return proximo
+
+    def _marcar(self, mensaje_id: str, estado: str, intentos: int, error: Optional[str] = None,
+                proximo: Optional[float] = None, enviado: Optional[float] = None):
+        with self._db() as conn:
+            conn.execute(
+                "UPDATE mensajes SET estado = ?, intentos = ?, error = ?, proximo = COALESCE(?, proximo), "
+                "enviado = ?, reclamado = NULL WHERE id = ?",
+                (estado, intentos, error, proximo, enviado, mensaje_id),
+            )
+
+    def procesar_pendientes(self) -> int:
+        """Envía todo lo que está vencido ahora (hasta vaciar la cola de vencidos)."""
+        total = 0
+        while True:
+            procesados = self.procesar_tanda()
+            if not procesados:
+                return total
+            total += procesados
+
+    # --- Consultas ---
+
+    @staticmethod
+    def _publico(fila: sqlite3.Row) -> Dict:
+        return {columna: fila[columna] for columna in _COLUMNAS}
+
+    def mensaje(self, mensaje_id: str) -> Optional[Dict]:
+        with self._db() as conn:
+            fila = conn.execute("SELECT * FROM mensajes WHERE id = ?", (mensaje_id,)).fetchone()
+        return self._publico(fila) if fila else None
+
+    def lote(self, lote_id: str) -> Optional[Dict]:
+        with self._db() as conn:
+            filas = conn.execute("SELECT * FROM mensajes WHERE lote = ? ORDER BY creado", (lote_id,)).fetchall()
+        if not filas:
+            return None
+        por_estado: Dict[str, int] = {}
+        for fila in filas:
+            por_estado[fila["estado"]] = por_estado.get(fila["estado"], 0) + 1
+        return {"lote": lote_id, "total": len(filas), "por_estado": por_estado,
+                "mensajes": [self._publico(fila) for fila in filas]}
+
+    def reintentar(self, mensaje_id: str) -> Optional[bool]:
+        """Devuelve a la cola un mensaje fallido. None si no existe, False si no estaba fallido."""
+        with self._db() as conn:
+            fila = conn.execute("SELECT estado FROM mensajes WHERE id = ?", (mensaje_id,)).fetchone()
+            if fila is None:
+                return None
+            if fila["estado"] != FALLIDO:
+                return False
+            conn.execute(
+                "UPDATE mensajes SET estado = ?, intentos = 0, proximo = ? WHERE id = ?",
+                (PENDIENTE, time.time(), mensaje_id),
+            )
+        self._despertar.set()
+        return True
+
+    def stats(self) -> Dict:
+        with self._db() as conn:
+            por_estado = dict(conn.execute("SELECT estado, COUNT(*) FROM mensajes GROUP BY estado").fetchall())
+        return {
+            "por_estado": por_estado,
+            "enviados": self.enviados,
+            "reintentos": self.reintentos,
+            "fallidos": self.fallidos,
+            "workers_activos": sum(1 for hilo in self._hilos if hilo.is_alive()),
+            "smtp_configurado": self.pool.configurado,
+            "smtp": self.pool.stats(),
+        }
+
+    # --- Hilos de envío ---
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            try:
+                if self.procesar_tanda():
+                    continue
+            except Exception as e:
+                print(f"[OUTBOX] error: {e}")
+            self._despertar.wait(self.sondeo)
+            self._despertar.clear()
+
+    def iniciar(self):
+        if any(hilo.is_alive() for hilo in self._hilos):
+            return
+        self._detener.clear()
+        self._hilos = [
+            threading.Thread(target=self._bucle, name=f"email-outbox-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for hilo in self._hilos:
+            hilo.start()
+
+    def detener(self, timeout: float = 10.0):
+        self._detener.set()
+        self._despertar.set()
+        for hilo in self._hilos:
+            hilo.join(timeout=timeout)
+        self._hilos = []
+        self.pool.cerrar()
+
+
+email_outbox = EmailOutbox()
@@ -0,0 +1,349 @@
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import watchfiles
+except ImportError:  # sin watchfiles el catálogo se revalida por sondeo
+    watchfiles = None
+
+from core.cache import SingleFlight
+from core.config import DATA_DIRS, FILE_CATALOG_POLL_SECONDS, FILE_CATALOG_WATCH
+from core.metrics import PARSEO_DURACION
+from services.precipitation_service import STATION_MAP
+from services.series_store import _nfc, series_store
+
+# Códigos de estación en nombres de archivo y columnas: C05, P68, M5023...
+_CODIGO = re.compile(r"(?<![A-Z0-9])([CPM]\d{2,4})(?![0-9])")
+# Palabra clave (nombre normalizado) → variable; el orden importa: "reporte_consumo" es un reporte
+_VARIABLES = [
+    ("reporte", "Reporte"),
+    ("precipitación", "Precipitación"),
+    ("radiación solar", "Radiación solar"),
+    ("temperatura ambiente", "Temperatura ambiente"),
+    ("consumo", "Consumo"),
+    ("multianual", "Precipitación"),  # data2/: tablas mensual-multianuales de precipitación
+]
+_MESES = {
+    nombre: i + 1
+    for i, nombre in enumerate(
+        ["enero", "febrero", "marzo", "abril", "mayo", "junio", "julio",
+         "agosto", "septiembre", "octubre", "noviembre", "diciembre"]
+    )
+}
+_EXTENSIONES_TABULARES = {".csv", ".xlsx"}
+ORDENES = ("nombre", "tamano", "modificado", "filas", "fecha_inicio", "fecha_fin")
+
+
+@dataclass
+class EntradaCatalogo:
+    """Metadatos de un archivo de datos, calculados una vez por versión (tamaño, mtime)."""
+    nombre: str
+    extension: str
+    tamano: int
+    modificado: float
+    variable: Optional[str] = None
+    frecuencia: Optional[str] = None
+    estaciones: List[Dict] = field(default_factory=list)
+    filas: Optional[int] = None
+    fecha_inicio: Optional[str] = None
+    fecha_fin: Optional[str] = None
+    error: Optional[str] = None
+    firma: Tuple[int, int] = (0, 0)
+
+    def como_dict(self) -> Dict:
+        datos = asdict(self)
+        datos.pop("firma")
+        return datos
+
+
+def _normalizado(nombre: str) -> str:
+    return _nfc(nombre).casefold().replace("_", " ").replace("-", " ")
+
+
+def _variable(nombre: str) -> Optional[str]:
+    normalizado = _normalizado(nombre)
+    return next((variable for clave, variable in _VARIABLES if clave in normalizado), None)
+
+
+def _frecuencia(nombre: str) -> Optional[str]:
+    normalizado = _normalizado(nombre)
+    if "diario" in normalizado:
+        return "Diario"
+    if "mensual" in normalizado:
+        return "Mensual"
+    return None
+
+
+def _codigos(textos) -> List[str]:
+    codigos = []
+    for texto in textos:
+        for codigo in _CODIGO.findall(_nfc(str(texto)).upper()):
+            if codigo not in codigos:
+                codigos.append(codigo)
+    return codigos
+
+
+def _fechas_tabulares(path: Path) -> Tuple[np.ndarray, List[str]]:
+    """Fechas de un CSV que no es una fuente de series (consumo, reportes): fecha o Anio + Mes."""
+    with PARSEO_DURACION.medir(format="csv", source="catalogo"):
+        df = pd.read_csv(path)
+    columnas = {c.casefold(): c for c in df.columns}
+    if "fecha" in columnas:
+        texto = df[columnas["fecha"]].astype(str).str.replace("/", "-", regex=False)
+        fechas = pd.to_datetime(texto, format="%Y-%m-%d", errors="coerce")
+    elif "anio" in columnas and "mes" in columnas:
+        meses = df[columnas["mes"]]
+        if not pd.api.types.is_numeric_dtype(meses):
+            meses = meses.astype(str).str.strip().str.casefold().map(_MESES)
+        fechas = pd.to_datetime(
+            pd.DataFrame({"year": df[columnas["anio"]], "month": meses, "day": 1}), errors="coerce"
+        )
+    else:
+        raise ValueError("El CSV no tiene columna de fecha ni Anio/Mes")
+    fechas = fechas.to_numpy(dtype="datetime64[D]")
+    return np.sort(fechas[~np.isnat(fechas)]), list(df.columns)
+
+
+def _metadatos(path: Path, entrada: EntradaCatalogo):
+    """Completa filas, rango de fechas, estaciones y frecuencia leyendo el contenido."""
+    columnas: List[str] = []
+    mensual = None
+    try:
+        try:
+            # Las fuentes de series pasan por el almacén columnar: quedan precargadas
+            tabla = series_store.tabla(path)
+            fechas, columnas, mensual = tabla.fechas, list(tabla.columnas), tabla.mensual
+        except ValueError:
+            if path.suffix.lower() != ".csv":
+                raise
+            fechas, columnas = _fechas_tabulares(path)
+        entrada.filas = int(len(fechas))
+        if len(fechas):
+            entrada.fecha_inicio = str(fechas[0])
+            entrada.fecha_fin = str(fechas[-1])
+            if mensual is None and len(fechas) > 1:
+                mensual = bool(np.median(np.diff(fechas).astype(np.int64)) >= 28)
+    except Exception as e:
+        entrada.error = str(e)
+    entrada.frecuencia = entrada.frecuencia or (None if mensual is None else ("Mensual" if mensual else "Diario"))
+    codigos = _codigos([entrada.nombre, *columnas])
+    entrada.estaciones = [{"codigo": codigo, "nombre": STATION_MAP.get(codigo)} for codigo in codigos]
+
+
+def _describir(path: Path, st) -> EntradaCatalogo:
+    entrada = EntradaCatalogo(
+        nombre=path.name,
+        extension=path.suffix.lower().lstrip("."),
+        tamano=st.st_size,
+        modificado=st.st_mtime,
+        variable=_variable(path.name),
+        frecuencia=_frecuencia(path.name),
+        firma=(st.st_mtime_ns, st.st_size),
+    )
+    if path.suffix.lower() in _EXTENSIONES_TABULARES:
+        _metadatos(path, entrada)
+    else:
+        entrada.estaciones = [{"codigo": c, "nombre": STATION_MAP.get(c)} for c in _codigos([path.name])]
+    return entrada
+
+
+class FileCatalog:
+    """
+    Índice en memoria de los archivos de los directorios de datos con sus metadatos
+    (tamaño, fecha de modificación, filas, rango de fechas, estaciones y variable).
+    Un hilo con watchfiles lo mantiene al día; los listados se sirven del índice sin
+    tocar el disco. Los directorios no vigilados (sin watchfiles, con el vigilante
+    desactivado o creados después de arrancarlo) se vuelven a sincronizar como mucho cada `intervalo` segundos o si cambia su mtime.
+    Al sincronizar solo se vuelven a leer los archivos cuyo tamaño o mtime cambió.
+    """
+
+    def __init__(
+        self,
+        directorios: Optional[Dict[str, Path]] = None,
+        vigilar: bool = FILE_CATALOG_WATCH,
+        intervalo: float = FILE_CATALOG_POLL_SECONDS,
+    ):
+        self.directorios = {k: Path(v) for k, v in (directorios if directorios is not None else DATA_DIRS).items()}
+        self.vigilar = vigilar and watchfiles is not None
+        self.intervalo = intervalo
+        self._entradas: Dict[str, Dict[str, EntradaCatalogo]] = {}
+        self._items: Dict[str, Tuple[Tuple[EntradaCatalogo, Dict], ...]] = {}  # ordenados por nombre
+        self._sincronizado: Dict[str, Tuple[float, int]] = {}  # directorio → (monotonic, mtime_ns)
+        self._vuelo = SingleFlight()
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self._vigilados: frozenset = frozenset()  # directorios que watchfiles está vigilando
+        self._contadores = {"sincronizaciones": 0, "lecturas": 0, "eventos": 0}
+
+    # --- Índice ---
+
+    def sincronizar(self, directorio: str) -> Optional[str]:
+        """Compara el directorio con el índice y relee solo lo que cambió. Devuelve un error o None."""
+        return self._vuelo.do(("sync", directorio), lambda: self._sincronizar(directorio))[0]
+
+    def _sincronizar(self, directorio: str) -> Optional[str]:
+        data_dir = self.directorios[directorio]
+        try:
+            mtime_dir = data_dir.stat().st_mtime_ns
+            # Los ocultos son temporales de escritura (p. ej. de la ingesta)
+            archivos = [(p, p.stat()) for p in data_dir.iterdir() if p.is_file() and not p.name.startswith(".")]
+        except FileNotFoundError:
+            with self._lock:
+                self._entradas.pop(directorio, None)
+                self._items.pop(directorio, None)
+                self._sincronizado.pop(directorio, None)
+            return f"El directorio '{directorio}' no existe."
+
+        anteriores = self._entradas.get(directorio, {})
+        nuevas = {}
+        for path, st in archivos:
+            entrada = anteriores.get(path.name)
+            if entrada is None or entrada.firma != (st.st_mtime_ns, st.st_size):
+                entrada = _describir(path, st)
+                self._contar("lecturas")
+            nuevas[path.name] = entrada
+        with self._lock:
+            self._entradas[directorio] = nuevas
+            self._items[directorio] = tuple((nuevas[n], nuevas[n].como_dict()) for n in sorted(nuevas))
+            self._sincronizado[directorio] = (time.monotonic(), mtime_dir)
+            self._contadores["sincronizaciones"] += 1
+        return None
+
+    def _vigente(self, directorio: str) -> bool:
+        sincronizado = self._sincronizado.get(directorio)
+        if sincronizado is None:
+            return False
+        if directorio in self._vigilados:
+            return True
+        instante, mtime_dir = sincronizado
+        if time.monotonic() - instante >= self.intervalo:
+            return False
+        try:
+            return self.directorios[directorio].stat().st_mtime_ns == mtime_dir
+        except OSError:
+            return False
+
+    def _contar(self, nombre: str, n: int = 1):
+        with self._lock:
+            self._contadores[nombre] += n
+
+    # --- Consulta ---
+
+    def listar(
+        self,
+        directorio: str,
+        variable: Optional[str] = None,
+        estacion: Optional[str] = None,
+        extension: Optional[str] = None,
+        frecuencia: Optional[str] = None,
+        orden: str = "nombre",
+        desc: bool = False,
+    ) -> Dict:
+        if directorio not in self.directorios:
+            return {"error": f"Directorio '{directorio}' no está configurado."}
+        if orden not in ORDENES:
+            return {"error": f"Orden '{orden}' no válido. Opciones: {', '.join(ORDENES)}"}
+        if not self._vigente(directorio):
+            error = self.sincronizar(directorio)
+            if error:
+                return {"error": error}
+
+        with self._lock:
+            seleccion = list(self._items.get(directorio, ()))
+        if variable:
+            buscada = _normalizado(variable)
+            seleccion = [(e, d) for e, d in seleccion if e.variable and buscada in _normalizado(e.variable)]
+        if estacion:
+            codigo = estacion.split("-", 1)[0].strip().upper()
+            seleccion = [(e, d) for e, d in seleccion if any(s["codigo"] == codigo for s in e.estaciones)]
+        if extension:
+            buscada = extension.lower().lstrip(".")
+            seleccion = [(e, d) for e, d in seleccion if e.extension == buscada]
+        if frecuencia:
+            seleccion = [(e, d) for e, d in seleccion if (e.frecuencia or "").casefold() == frecuencia.casefold()]
+        if orden != "nombre" or desc:
+            # Los archivos sin el dato (p. ej. sin fechas) quedan siempre al final
+            con_dato = [(e, d) for e, d in seleccion if getattr(e, orden) is not None]
+            sin_dato = [(e, d) for e, d in seleccion if getattr(e, orden) is None]
+            seleccion = sorted(con_dato, key=lambda par: getattr(par[0], orden), reverse=desc) + sin_dato
+
+        return {
+            "files": [e.nombre for e, _ in seleccion],
+            "items": [d for _, d in seleccion],
+            "total": len(seleccion),
+        }
+
+    def entrada(self, directorio: str, nombre: str) -> Optional[Dict]:
+        if directorio not in self.directorios:
+            return None
+        if not self._vigente(directorio) and self.sincronizar(directorio):
+            return None
+        with self._lock:
+            entrada = self._entradas.get(directorio, {}).get(nombre)
+        return entrada.como_dict() if entrada else None
+
+    # --- Vigilancia ---
+
+    def _directorio_de(self, ruta: str) -> Optional[str]:
+        padre = Path(ruta).parent
+        for nombre, data_dir in self.directorios.items():
+            if padre == data_dir or padre.resolve() == data_dir.resolve():
+                return nombre
+        return None
+
+    def _bucle(self):
+        for directorio in self.directorios:
+            if self._detener.is_set():
+                return
+            self.sincronizar(directorio)
+        # Solo se vigilan los que existen ahora; los demás siguen revalidándose por sondeo
+        existentes = {n: d for n, d in self.directorios.items() if d.exists()}
+        if not self.vigilar or not existentes:
+            return
+        self._vigilados = frozenset(existentes)
+        try:
+            for cambios in watchfiles.watch(
+                *existentes.values(), stop_event=self._detener, recursive=False, debounce=400, raise_interrupt=False
+            ):
+                self._contar("eventos", len(cambios))
+                for directorio in {self._directorio_de(ruta) for _, ruta in cambios} - {None}:
+                    self.sincronizar(directorio)
+        except Exception as e:
+            print(f"[WARN] Vigilancia del catálogo de archivos detenida: {e}")
+        finally:
+            self._vigilados = frozenset()
+
+    def iniciar(self):
+        """Indexa todos los directorios en segundo plano y empieza a vigilar cambios."""
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle, name="file-catalog", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo:
+            self._hilo.join(timeout=5)
+            self._hilo = None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self._contadores,
+                "vigilando": bool(self._vigilados),
+                "vigilados": sorted(self._vigilados),
+                "watchfiles": watchfiles is not None,
+                "directorios": {d: len(self._entradas.get(d, {})) for d in self.directorios},
+            }
+
+
+file_catalog = FileCatalog()
@@ -1,19 +1,14 @@
 from pathlib import Path
 from core.config import DATA_DIRS
+from services.file_catalog import file_catalog
 
-def list_files_service(directory: str):
+def list_files_service(directory: str, **filtros):
     """
-    Lista archivos de un directorio de datos (data, data2, etc.).
+    Lista archivos de un directorio de datos (data, data2, etc.) desde el catálogo en memoria.
+    Además de los nombres ("files") devuelve los metadatos de cada archivo ("items");
+    acepta filtros por variable, estación, extensión y frecuencia, y orden por cualquier campo.
     """
-    data_dir = DATA_DIRS.get(directory)
-    if not data_dir:
-        return {"error": f"Directorio '{directory}' no está configurado."}
-
-    if not data_dir.exists():
-        return {"error": f"El directorio '{directory}' no existe."}
-
-    files = [file.name for file in data_dir.iterdir() if file.is_file()]
-    return {"files": files}
+    return file_catalog.listar(directory, **filtros)
 
 
 def get_file_path(directory: str, filename: str) -> Path | None:
@@ -25,4 +20,7 @@ def get_file_path(directory: str, filename: str) -> Path | None:
         return None
 
     file_path = data_dir / filename
-    return file_path if file_path.exists() else None
+    # Solo archivos directamente dentro del directorio configurado (nada de "..")
+    if file_path.resolve().parent != data_dir.resolve() or not file_path.is_file():
+        return None
+    return file_path
@@ -0,0 +1,364 @@
+import asyncio
+import math
+import os
+import re
+import threading
+import uuid
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from fastapi import Request
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from core.config import DATA_DIRS, INGEST_MAX_ERRORS, INGEST_MAX_MB, INGEST_STAGING_DIR
+from services import consumption_service
+from services.file_catalog import file_catalog
+from services.series_store import series_store
+
+# Formatos aceptados: columnas esperadas (exactas o como prefijo) y formato de fecha en disco
+FORMATOS = {
+    "estacion": {
+        "columnas": ["fecha", "valor", "completo_mediciones", "completo_umbral"],
+        "exactas": True,
+        "fecha": "{:04d}/{:02d}/{:02d}",
+    },
+    "consumo": {
+        "columnas": ["Fecha", "Consumo_m3"],
+        "exactas": False,
+        "fecha": "{:04d}-{:02d}-{:02d}",
+    },
+}
+# Directorio de datos → formato que admite la ingesta
+DIRECTORIOS_INGESTA = {"data": "estacion", "data4": "consumo"}
+
+_FECHA = re.compile(r"^(\d{4})[/-](\d{1,2})[/-](\d{1,2})$")
+_NULOS = {"", "nan", "NaN", "--"}
+
+# Un candado por archivo destino: dos ingestas al mismo archivo se aplican en serie
+_candados: Dict[str, threading.Lock] = {}
+_candados_lock = threading.Lock()
+
+
+class IngestaInvalida(Exception):
+    pass
+
+
+def _candado(path: Path) -> threading.Lock:
+    with _candados_lock:
+        return _candados.setdefault(str(path.resolve()), threading.Lock())
+
+
+def _fecha(texto: str) -> Optional[date]:
+    coincide = _FECHA.match(texto)
+    if not coincide:
+        return None
+    try:
+        return date(*map(int, coincide.groups()))
+    except ValueError:
+        return None
+
+
+def _numero(texto: str) -> float:
+    """Valor numérico de una celda; NaN si está vacía. ValueError si no es un número."""
+    if texto in _NULOS:
+        return math.nan
+    return float(texto)
+
+
+class _Recepcion:
+    """
+    Recibe el archivo por bloques: lo escribe en el área de preparación y valida en el
+    camino cada línea completa (encabezado, número de campos, fechas crecientes y valores
+    numéricos). Corta la subida en cuanto se supera el tamaño máximo o el máximo de errores.
+    """
+
+    def __init__(self, destino: Path, formato: str, max_bytes: int, max_errores: int):
+        self.destino = destino
+        self.formato = formato
+        self.max_bytes = max_bytes
+        self.max_errores = max_errores
+        self.encabezado: Optional[List[str]] = None
+        self.errores: List[Dict] = []
+        self.bytes = 0
+        self.filas = 0
+        self.primera: Optional[date] = None
+        self.ultima: Optional[date] = None
+        self._linea = 0
+        self._resto = b""
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        self._archivo = open(destino, "wb")
+
+    def escribir(self, datos: bytes):
+        self.bytes += len(datos)
+        if self.bytes > self.max_bytes:
+            raise IngestaInvalida(f"El archivo supera el máximo de {self.max_bytes // (1024 * 1024)} MB")
+        self._archivo.write(datos)
+        *lineas, self._resto = (self._resto + datos).split(b"\n")
+        for linea in lineas:
+            self._validar(linea)
+
+    def terminar(self):
+        if self._resto.strip():
+            self._validar(self._resto)
+        self._archivo.close()
+        if self.encabezado is None:
+            raise IngestaInvalida("El archivo está vacío")
+        if not self.filas and not self.errores:
+            raise IngestaInvalida("El archivo no tiene filas de datos")
+
+    def cerrar(self):
+        self._archivo.close()
+
+    def _error(self, mensaje: str):
+        self.errores.append({"linea": self._linea, "error": mensaje})
+        if len(self.errores) >= self.max_errores:
+            raise IngestaInvalida(f"Se alcanzó el máximo de {self.max_errores} errores de validación")
+
+    def _validar(self, linea: bytes):
+        self._linea += 1
+        try:
+            texto = linea.decode("utf-8-sig" if self._linea == 1 else "utf-8").rstrip("\r")
+        except UnicodeDecodeError:
+            return self._error("La línea no está codificada en UTF-8")
+        if self.encabezado is None:
+            return self._validar_encabezado(texto)
+        if not texto.strip():
+            return
+        campos = [c.strip() for c in texto.split(",")]
+        if len(campos) != len(self.encabezado):
+            return self._error(f"Se esperaban {len(self.encabezado)} campos y hay {len(campos)}")
+        fecha = _fecha(campos[0])
+        if fecha is None:
+            return self._error(f"Fecha no válida: '{campos[0]}'")
+        if self.ultima is not None and fecha <= self.ultima:
+            return self._error(f"Las fechas deben ser crecientes y sin repetir: {fecha} después de {self.ultima}")
+        for nombre, valor in zip(self.encabezado[1:], campos[1:]):
+            try:
+                _numero(valor)
+            except ValueError:
+                return self._error(f"Valor no numérico en '{nombre}': '{valor}'")
+        self.filas += 1
+        self.primera = self.primera or fecha
+        self.ultima = fecha
+
+    def _validar_encabezado(self, texto: str):
+        columnas = [c.strip() for c in texto.split(",")]
+        esperadas = FORMATOS[self.formato]["columnas"]
+        valido = columnas == esperadas if FORMATOS[self.formato]["exactas"] else columnas[:len(esperadas)] == esperadas
+        if not valido or len(set(columnas)) != len(columnas):
+            sufijo = "" if FORMATOS[self.formato]["exactas"] else ", ..."
+            raise IngestaInvalida(f"Encabezado no válido: se esperaba '{','.join(esperadas)}{sufijo}' y llegó '{texto}'")
+        self.encabezado = columnas
+
+
+async def _recibir(request: Request, crear_recepcion) -> Optional[_Recepcion]:
+    """
+    Procesa el cuerpo multipart a medida que llega (sin cargarlo entero en memoria ni
+    pasar por el formulario de Starlette) y entrega los bytes de la parte "file" a la
+    recepción. Devuelve None si no hubo parte "file".
+    """
+    tipo, opciones = parse_options_header(request.headers.get("content-type", ""))
+    if tipo != b"multipart/form-data" or b"boundary" not in opciones:
+        raise IngestaInvalida("Se esperaba un formulario multipart/form-data con el campo 'file'")
+
+    estado = {"recepcion": None, "campo": b"", "valor": b"", "cabeceras": {}, "actual": None}
+
+    def on_part_begin():
+        estado["cabeceras"] = {}
+        estado["actual"] = None
+
+    def on_header_field(datos, inicio, fin):
+        estado["campo"] += datos[inicio:fin]
+
+    def on_header_value(datos, inicio, fin):
+        estado["valor"] += datos[inicio:fin]
+
+    def on_header_end():
+        estado["cabeceras"][estado["campo"].lower()] = estado["valor"]
+        estado["campo"] = estado["valor"] = b""
+
+    def on_headers_finished():
+        _, disposicion = parse_options_header(estado["cabeceras"].get(b"content-disposition", b""))
+        if disposicion.get(b"name") == b"file" and estado["recepcion"] is None:
+            nombre = disposicion.get(b"filename", b"").decode("utf-8", "replace")
+            estado["recepcion"] = estado["actual"] = crear_recepcion(nombre)
+
+    def on_part_data(datos, inicio, fin):
+        if estado["actual"] is not None:
+            estado["actual"].escribir(datos[inicio:fin])
+
+    parser = MultipartParser(
+        opciones[b"boundary"],
+        callbacks={
+            "on_part_begin": on_part_begin,
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+            "on_part_data": on_part_data,
+        },
+    )
+    try:
+        async for bloque in request.stream():
+            if bloque:
+                # Escritura a disco y validación fuera del event loop
+                await asyncio.to_thread(parser.write, bloque)
+        parser.finalize()
+    except BaseException:
+        if estado["recepcion"] is not None:
+            estado["recepcion"].cerrar()
+        raise
+    return estado["recepcion"]
+
+
+def _columnas_series(encabezado: List[str], formato: str) -> List[str]:
+    # Mismas columnas que guarda el almacén columnar para cada formato (ver series_store._leer_csv)
+    return ["valor"] if formato == "estacion" else encabezado[1:]
+
+
+def _incorporar(recepcion: _Recepcion, destino: Path) -> Dict:
+    """
+    Agrega al archivo destino solo las filas posteriores a su última fecha (o lo crea si
+    no existe) con el formato de fecha del directorio, y extiende en el lugar las cachés
+    del archivo (tabla columnar y agregado mensual de consumo) sin volver a parsearlo.
+    """
+    formato = FORMATOS[recepcion.formato]
+    with _candado(destino):
+        existe = destino.exists()
+        ultima = None
+        firma_anterior = None
+        if existe:
+            with open(destino, "r", encoding="utf-8-sig") as f:
+                encabezado = [c.strip() for c in f.readline().split(",")]
+            if encabezado != recepcion.encabezado:
+                raise IngestaInvalida(
+                    f"Las columnas no coinciden con las de {destino.name}: {','.join(encabezado)}"
+                )
+            stat = destino.stat()
+            firma_anterior = (stat.st_mtime_ns, stat.st_size)
+            try:
+                tabla = series_store.tabla(destino)
+            except Exception as e:
+                raise IngestaInvalida(f"No se pudo leer el archivo existente {destino.name}: {e}")
+            ultima = tabla.fechas[-1].astype(object) if len(tabla.fechas) else None
+
+        lineas, fechas, valores = [], [], []
+        existentes = 0
+        with open(recepcion.destino, "r", encoding="utf-8-sig") as f:
+            next(f)
+            for texto in f:
+                campos = [c.strip() for c in texto.rstrip("\r\n").split(",")]
+                if len(campos) < 2:
+                    continue
+                fecha = _fecha(campos[0])
+                if ultima is not None and fecha <= ultima:
+                    existentes += 1
+                    continue
+                campos[0] = formato["fecha"].format(fecha.year, fecha.month, fecha.day)
+                lineas.append(",".join(campos) + "\n")
+                fechas.append(fecha)
+                valores.append([_numero(c) for c in campos[1:]])
+
+        if existe and lineas:
+            with open(destino, "rb+") as f:
+                # Si el archivo no termina en salto de línea la primera fila nueva iría pegada
+                f.seek(0, os.SEEK_END)
+                if f.tell():
+                    f.seek(-1, os.SEEK_END)
+                    separador = b"" if f.read(1) == b"\n" else b"\n"
+                else:
+                    separador = b""
+                f.write(separador + "".join(lineas).encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+        elif not existe:
+            temporal = destino.with_name(f".ingesta_{uuid.uuid4().hex}.tmp")
+            with open(temporal, "w", encoding="utf-8", newline="") as f:
+                f.write(",".join(recepcion.encabezado) + "\n")
+                f.writelines(lineas)
+            os.replace(temporal, destino)
+
+        cache_extendida = False
+        if existe and lineas:
+            matriz = np.array(valores, dtype=np.float64).reshape(len(valores), -1)
+            indices = {nombre: i for i, nombre in enumerate(recepcion.encabezado[1:])}
+            columnas = {
+                nombre: matriz[:, indices[nombre]] for nombre in _columnas_series(recepcion.encabezado, recepcion.formato)
+            }
+            cache_extendida = series_store.anexar(destino, firma_anterior, np.array(fechas, dtype="datetime64[D]"), columnas)
+            if destino.resolve() == (consumption_service.DATA_DIR / consumption_service.CSV_NAME).resolve():
+                nuevas = pd.DataFrame(matriz, columns=recepcion.encabezado[1:])
+                nuevas.insert(0, "Fecha", pd.to_datetime(fechas))
+                consumption_service.anexar_diario(destino, firma_anterior[0], nuevas)
+
+    return {
+        "archivo": destino.name,
+        "creado": not existe,
+        "filas_recibidas": recepcion.filas,
+        "filas_nuevas": len(lineas),
+        "filas_existentes": existentes,
+        "fecha_inicio": str(fechas[0]) if fechas else None,
+        "fecha_fin": str(fechas[-1]) if fechas else None,
+        "cache_extendida": cache_extendida,
+    }
+
+
+def _nombre_destino(nombre: str) -> Optional[str]:
+    nombre = Path(nombre.replace("\\", "/")).name.strip()
+    if not nombre or nombre.startswith(".") or not nombre.lower().endswith(".csv"):
+        return None
+    return nombre
+
+
+async def ingest_file_service(request: Request, directory: str, filename: Optional[str] = None) -> Dict:
+    """
+    Ingesta en streaming de un CSV (campo multipart "file") en un directorio de datos.
+    El archivo se valida mientras se recibe; si el destino ya existe solo se agregan las
+    filas con fecha posterior a la última que tiene. Devuelve el resumen o {"error"} (más
+    "errores" con la línea de cada problema, o "limite_bytes" si el archivo es muy grande).
+    """
+    data_dir = DATA_DIRS.get(directory)
+    formato = DIRECTORIOS_INGESTA.get(directory)
+    if not data_dir or not formato:
+        return {"error": f"El directorio '{directory}' no admite ingesta. Opciones: {', '.join(DIRECTORIOS_INGESTA)}"}
+
+    max_bytes = int(INGEST_MAX_MB * 1024 * 1024)
+    temporal = Path(INGEST_STAGING_DIR) / f"{uuid.uuid4().hex}.csv"
+    recibido = {}
+
+    def crear_recepcion(nombre_subido: str) -> _Recepcion:
+        recibido["nombre"] = nombre_subido
+        recibido["recepcion"] = _Recepcion(temporal, formato, max_bytes, INGEST_MAX_ERRORS)
+        return recibido["recepcion"]
+
+    try:
+        try:
+            recepcion = await _recibir(request, crear_recepcion)
+            if recepcion is None:
+                return {"error": "Falta el campo 'file' en el formulario"}
+            nombre = _nombre_destino(filename or recibido["nombre"])
+            if nombre is None:
+                return {"error": "El nombre del archivo debe terminar en .csv y no puede empezar con '.'"}
+            await asyncio.to_thread(recepcion.terminar)
+            if recepcion.errores:
+                return {"error": "El archivo no cumple el formato esperado", "errores": recepcion.errores}
+            resultado = await asyncio.to_thread(_incorporar, recepcion, data_dir / nombre)
+        except IngestaInvalida as e:
+            error = {"error": str(e)}
+            recepcion = recibido.get("recepcion")
+            if recepcion is not None and recepcion.bytes > max_bytes:
+                error["limite_bytes"] = max_bytes
+            elif recepcion is not None and recepcion.errores:
+                error["errores"] = recepcion.errores
+            return error
+    finally:
+        # Cualquier salida (nombre no válido, errores, excepción) libera el archivo de preparación
+        if recibido.get("recepcion") is not None:
+            recibido["recepcion"].cerrar()
+        temporal.unlink(missing_ok=True)
+
+    await asyncio.to_thread(file_catalog.sincronizar, directory)
+    return {"directorio": directory, "formato": formato, "bytes": recepcion.bytes, **resultado}
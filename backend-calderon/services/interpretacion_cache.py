@@ -0,0 +1,128 @@
+import hashlib
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from core.cache import TTLCache, DiskCache, SingleFlight
+from core.config import (
+    INTERPRETACION_CACHE_MAX_ENTRIES,
+    INTERPRETACION_CACHE_TTL_SECONDS,
+    INTERPRETACION_CACHE_DB,
+    INTERPRETACION_CACHE_DISK_MAX_ENTRIES,
+    INTERPRETACION_CACHE_DISK_TTL_SECONDS,
+)
+
+
+def clave_interpretacion(titulo: str, tipo_dato: str, valores: np.ndarray, fechas: np.ndarray, version: str) -> str:
+    """
+    Hash del contenido que determina la interpretación. Los datos se canonicalizan
+    como la serie ya extraída (valores float64 + fechas), así el orden de las claves,
+    los campos extra o 12 frente a 12.0 no cambian la clave.
+    """
+    h = hashlib.sha256()
+    for parte in (titulo.strip(), tipo_dato.strip(), version):
+        h.update(parte.encode("utf-8"))
+        h.update(b"\0")
+    h.update(np.ascontiguousarray(valores, dtype=np.float64).tobytes())
+    h.update("\0".join(fechas.tolist()).encode("utf-8"))
+    return h.hexdigest()
+
+
+class InterpretacionCache:
+    """
+    Caché de resultados de /ia/interpretar en dos niveles: LRU en memoria delante de
+    SQLite en disco (sobrevive a reinicios). Las peticiones idénticas concurrentes se
+    agrupan para que solo una llame a Gemini.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = INTERPRETACION_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = INTERPRETACION_CACHE_TTL_SECONDS,
+        db_path: Optional[str] = INTERPRETACION_CACHE_DB
+    ):
+        self._memoria = TTLCache(max_entries, ttl_seconds)
+        self._disco = (
+            DiskCache(db_path, INTERPRETACION_CACHE_DISK_MAX_ENTRIES, INTERPRETACION_CACHE_DISK_TTL_SECONDS)
+            if db_path else None
+        )
+        self._vuelos = SingleFlight()
+        self._lock = threading.Lock()
+        self._reset_counters()
+
+    def _reset_counters(self):
+        self.consultas = 0
+        self.aciertos_memoria = 0
+        self.aciertos_disco = 0
+        self.calculadas = 0
+
+    def _buscar(self, clave: str) -> Tuple[Optional[Dict], Optional[str]]:
+        resultado = self._memoria.get(clave)
+        if resultado is not None:
+            return resultado, "memoria"
+        if self._disco is not None:
+            resultado = self._disco.get(clave)
+            if resultado is not None:
+                self._memoria.set(clave, resultado)
+                return resultado, "disco"
+        return None, None
+
+    def obtener(self, clave: str, calcular: Callable[[], Dict], es_cacheable: Callable[[Dict], bool]) -> Tuple[Dict, Optional[str]]:
+        """
+        Devuelve (resultado, origen) donde origen es "memoria", "disco", "compartida"
+        (otra petición idéntica lo estaba calculando) o None si se calculó ahora.
+        """
+        with self._lock:
+            self.consultas += 1
+        resultado, origen = self._buscar(clave)
+        if resultado is not None:
+            with self._lock:
+                if origen == "memoria":
+                    self.aciertos_memoria += 1
+                else:
+                    self.aciertos_disco += 1
+            return resultado, origen
+
+        def calcular_y_guardar():
+            # Otra petición pudo terminar entre la búsqueda y el inicio del vuelo
+            previo, _ = self._buscar(clave)
+            if previo is not None:
+                return previo
+            nuevo = calcular()
+            with self._lock:
+                self.calculadas += 1
+            if es_cacheable(nuevo):
+                self._memoria.set(clave, nuevo)
+                if self._disco is not None:
+                    self._disco.set(clave, nuevo)
+            return nuevo
+
+        resultado, compartido = self._vuelos.do(clave, calcular_y_guardar)
+        return resultado, "compartida" if compartido else None
+
+    def clear(self):
+        self._memoria.clear()
+        if self._disco is not None:
+            self._disco.clear()
+        with self._lock:
+            self._reset_counters()
+            self._vuelos.coalesced = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            aciertos = self.aciertos_memoria + self.aciertos_disco
+            return {
+                "consultas": self.consultas,
+                "aciertos_memoria": self.aciertos_memoria,
+                "aciertos_disco": self.aciertos_disco,
+                "agrupadas": self._vuelos.coalesced,
+                "calculadas": self.calculadas,
+                "tasa_aciertos": round(aciertos / self.consultas, 4) if self.consultas else 0.0,
+                "entradas_memoria": len(self._memoria),
+                "entradas_disco": len(self._disco) if self._disco is not None else None,
+                "en_curso": self._vuelos.in_flight(),
+            }
+
+
+interpretacion_cache = InterpretacionCache()
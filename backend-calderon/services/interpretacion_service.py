@@ -1,66 +1,111 @@
-import statistics
-from services.chatbot import interpretar_datos_gemini
+from services.chatbot import interpretar_datos_gemini, context_snapshot
+from services.interpretacion_cache import interpretacion_cache, clave_interpretacion
+from services.climate_stats import extraer_serie, describir_serie, resumir_serie
+from services.series_store import resolver_serie
+from core.metrics import PROMPT_TOKENS
+from core.text import estimate_tokens
 
 # --- Lógica de análisis estadístico de datos climáticos ---
 def analizar_datos_climaticos(datos: list):
     """
     Analiza datos climáticos generales (precipitación, temperatura, radiación, etc.):
-    - Promedio
-    - Máximo
-    - Mínimo
-    - Tendencia (creciente, decreciente, variable)
+    - Promedio, máximo, mínimo, desviación estándar y percentiles
+    - Tendencia (creciente, decreciente, variable) según Mann-Kendall
+    - Pendiente por mínimos cuadrados y pendiente de Sen
+    - Descomposición estacional si la serie es mensual
     """
     # Extrae valores numéricos válidos
-    valores = [
-        d['valor'] for d in datos 
-        if isinstance(d, dict) and isinstance(d.get('valor'), (int, float))
-    ]
+    valores, _, mes_absoluto = extraer_serie(datos)
+    return _analizar_serie(valores, mes_absoluto)
 
-    if not valores:
+def _analizar_serie(valores, mes_absoluto):
+    if not len(valores):
         return {
+            "n": 0,
             "promedio": None,
             "maximo": None,
             "minimo": None,
             "tendencia": "No disponible"
         }
 
-    promedio = round(statistics.mean(valores), 2)
-    maximo = max(valores)
-    minimo = min(valores)
+    return describir_serie(valores, mes_absoluto)
 
-    # Detecta tendencia simple (orden ascendente o descendente)
-    if valores == sorted(valores):
-        tendencia = "Creciente"
-    elif valores == sorted(valores, reverse=True):
-        tendencia = "Decreciente"
-    else:
-        tendencia = "Variable"
+def _resumen_tendencia(analisis: dict) -> str:
+    """Líneas adicionales del resumen con la tendencia y la estacionalidad calculadas."""
+    lineas = []
+    if analisis.get("desviacion_estandar") is not None:
+        lineas.append(f"Desviación estándar: {analisis['desviacion_estandar']}")
+    if analisis.get("sen") and analisis.get("mann_kendall"):
+        mk = analisis["mann_kendall"]
+        lineas.append(
+            f"Pendiente de Sen: {analisis['sen']['pendiente']:.4g} por {analisis['unidad_tiempo']} "
+            f"(Mann-Kendall tau={mk['tau']}, p={mk['p_valor']:.3g})"
+        )
+    if analisis.get("estacionalidad"):
+        est = analisis["estacionalidad"]
+        lineas.append(
+            f"Estacionalidad: máximo en {est['mes_maximo']}, mínimo en {est['mes_minimo']}, "
+            f"amplitud {est['amplitud']}, fuerza {est['fuerza']}"
+        )
+    return "".join(f"{linea}\n" for linea in lineas)
+
+def _g(valor: float) -> str:
+    return f"{valor:.4g}"
 
-    return {
-        "promedio": promedio,
-        "maximo": maximo,
-        "minimo": minimo,
-        "tendencia": tendencia
-    }
+def _formatear_resumen_serie(resumen: dict) -> str:
+    """Texto compacto del resumen de tamaño fijo de la serie (sustituye a los datos crudos)."""
+    lineas = [f"Serie: {resumen['n']} valores, de {resumen['desde']} a {resumen['hasta']}"]
+    lineas.append("Serie reducida por tramos (media [mín–máx]): " + "; ".join(
+        f"{t['desde']}..{t['hasta']}: {_g(t['media'])} [{_g(t['minimo'])}–{_g(t['maximo'])}]"
+        if t["desde"] != t["hasta"] else f"{t['desde']}: {_g(t['media'])}"
+        for t in resumen["serie_reducida"]
+    ))
+    if resumen.get("climatologia_mensual"):
+        lineas.append("Promedio por mes del año: " + ", ".join(
+            f"{mes} {_g(v)}" for mes, v in resumen["climatologia_mensual"].items()
+        ))
+    if resumen.get("promedios_anuales"):
+        lineas.append("Promedio anual (últimos años): " + ", ".join(
+            f"{anio} {_g(v)}" for anio, v in resumen["promedios_anuales"].items()
+        ))
+    lineas.append("Valores máximos: " + ", ".join(f"{e['fecha']} ({_g(e['valor'])})" for e in resumen["maximos"]))
+    lineas.append("Valores mínimos: " + ", ".join(f"{e['fecha']} ({_g(e['valor'])})" for e in resumen["minimos"]))
+    anomalias = resumen["anomalias"]
+    if anomalias["total"]:
+        lineas.append(f"Anomalías detectadas: {anomalias['total']}; principales: " + ", ".join(
+            f"{a['fecha']} ({_g(a['valor'])}, z={a['z']})" for a in anomalias["principales"]
+        ))
+    else:
+        lineas.append("Anomalías detectadas: ninguna")
+    return "\n".join(lineas)
 
 # --- Preparar el resumen para enviar a Gemini y obtener interpretación ---
-def interpretar_datos_climaticos(titulo: str, tipo_dato: str, datos: list):
+def _interpretar_serie(titulo: str, tipo_dato: str, valores, fechas, mes_absoluto) -> dict:
     """
     Prepara el análisis estadístico y genera la interpretación contextualizada con Gemini.
     """
-    analisis_estadistico = analizar_datos_climaticos(datos)
+    analisis_estadistico = _analizar_serie(valores, mes_absoluto)
+    # Resumen de tamaño fijo en lugar de los datos crudos: el prompt no crece con la serie
+    resumen_serie = (
+        _formatear_resumen_serie(resumir_serie(valores, fechas, mes_absoluto))
+        if len(valores) else "Sin valores numéricos válidos"
+    )
 
     resumen = (
         f"Título del análisis: {titulo}\n"
         f"Tipo de dato: {tipo_dato}\n"
-        f"Datos originales: {datos}\n"
+        f"{resumen_serie}\n"
         f"Promedio: {analisis_estadistico['promedio']}\n"
         f"Máximo: {analisis_estadistico['maximo']}\n"
         f"Mínimo: {analisis_estadistico['minimo']}\n"
         f"Tendencia: {analisis_estadistico['tendencia']}\n"
+        f"{_resumen_tendencia(analisis_estadistico)}"
         "Proporciona una interpretación técnica de estos datos considerando su contexto climático."
     )
 
+    # Tamaño del resumen enviado a Gemini: fijo aunque la serie tenga miles de puntos
+    PROMPT_TOKENS.observar(estimate_tokens(resumen), stage="interpretacion")
+
     # Llamada al servicio Gemini
     interpretacion_resultado = interpretar_datos_gemini(titulo, resumen)
 
@@ -70,4 +115,47 @@ def interpretar_datos_climaticos(titulo: str, tipo_dato: str, datos: list):
     elif not isinstance(interpretacion_resultado, dict):
         interpretacion_resultado = {"error": "Respuesta no reconocida de Gemini"}
 
-    return interpretacion_resultado, analisis_estadistico
+    return {"interpretacion": interpretacion_resultado, "analisis": analisis_estadistico}
+
+def _es_interpretacion_cacheable(resultado: dict) -> bool:
+    """Los errores de Gemini (circuito abierto, cuota, timeouts) no se guardan"""
+    texto = resultado["interpretacion"].get("texto")
+    return isinstance(texto, str) and bool(texto) and not texto.startswith("Error")
+
+def interpretar_datos_climaticos_detallado(titulo: str, tipo_dato: str, datos: list, usar_cache: bool = True) -> dict:
+    """
+    Interpreta los datos reutilizando resultados previos: la clave es un hash de
+    (título, tipo de dato, serie canonicalizada, versión del contexto). Indica en
+    `cache` si vino de "memoria", "disco", de una petición idéntica en curso
+    ("compartida") o None si se calculó.
+    """
+    valores, fechas, mes_absoluto = extraer_serie(datos)
+    return _interpretar_con_cache(titulo, tipo_dato, valores, fechas, mes_absoluto, usar_cache)
+
+def interpretar_referencia_detallado(titulo: str, tipo_dato: str, referencia: dict, usar_cache: bool = True) -> dict:
+    """
+    Igual que interpretar_datos_climaticos_detallado, pero la serie se resuelve en el
+    servidor a partir de una referencia (directorio/archivo o variable de data3 con
+    estaciones y rango de fechas) en lugar de recibirse en la petición.
+    """
+    serie = resolver_serie(**referencia)
+    if "error" in serie:
+        return serie
+    resultado = _interpretar_con_cache(
+        titulo, tipo_dato, serie["valores"], serie["fechas"], serie["mes_absoluto"], usar_cache
+    )
+    return {**resultado, "fuente": {"archivo": serie["fuente"], "estaciones": serie["estaciones"]}}
+
+def _interpretar_con_cache(titulo: str, tipo_dato: str, valores, fechas, mes_absoluto, usar_cache: bool) -> dict:
+    def calcular():
+        return _interpretar_serie(titulo, tipo_dato, valores, fechas, mes_absoluto)
+
+    if not usar_cache:
+        return {**calcular(), "cache": None}
+    clave = clave_interpretacion(titulo, tipo_dato, valores, fechas, context_snapshot().version)
+    resultado, origen = interpretacion_cache.obtener(clave, calcular, _es_interpretacion_cacheable)
+    return {**resultado, "cache": origen}
+
+def interpretar_datos_climaticos(titulo: str, tipo_dato: str, datos: list, usar_cache: bool = True):
+    resultado = interpretar_datos_climaticos_detallado(titulo, tipo_dato, datos, usar_cache)
+    return resultado["interpretacion"], resultado["analisis"]
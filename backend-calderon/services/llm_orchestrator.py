@@ -0,0 +1,230 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional
+
+from core.config import (
+    LLM_HEDGE_DEFAULT_DELAY,
+    LLM_HEDGE_MIN_DELAY,
+    LLM_ORCHESTRATOR_TIMEOUT,
+    LLM_STATS_WINDOW,
+)
+
+# Orden por defecto de respaldo entre proveedores
+DEFAULT_PROVIDER_ORDER = ["openai", "gemini", "zephyr"]
+
+# Mínimo de muestras antes de confiar en el p95 observado
+_MIN_SAMPLES_P95 = 5
+
+
+class CancelToken:
+    """
+    Permite abortar una llamada en curso: el proveedor registra funciones de cierre
+    (p. ej. client.close) que se ejecutan si la llamada pierde la carrera.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable] = []
+        self._evento = threading.Event()
+        self.cancelled = False
+
+    def on_cancel(self, callback: Callable):
+        with self._lock:
+            if not self.cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def cancel(self):
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            self._evento.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def wait(self, timeout: float) -> bool:
+        """Espera hasta `timeout` segundos; devuelve True si se canceló antes (sirve de backoff interrumpible)."""
+        return self._evento.wait(timeout)
+
+
+class ProviderStats:
+    """Latencias y errores recientes de un proveedor (ventana deslizante)."""
+
+    def __init__(self, window: int = LLM_STATS_WINDOW):
+        self._lock = threading.Lock()
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)  # True = éxito, False = error
+        self.successes = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.last_error: Optional[str] = None
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self.latencies.append(latency)
+            self.outcomes.append(True)
+            self.successes += 1
+
+    def record_error(self, error: Exception):
+        with self._lock:
+            self.outcomes.append(False)
+            self.errors += 1
+            self.last_error = str(error)[:200]
+
+    def record_cancelled(self):
+        with self._lock:
+            self.cancelled += 1
+
+    def p95(self) -> Optional[float]:
+        with self._lock:
+            if len(self.latencies) < _MIN_SAMPLES_P95:
+                return None
+            ordenadas = sorted(self.latencies)
+        return ordenadas[min(len(ordenadas) - 1, int(0.95 * len(ordenadas)))]
+
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self.outcomes:
+                return 0.0
+            return self.outcomes.count(False) / len(self.outcomes)
+
+    def snapshot(self) -> Dict:
+        p95 = self.p95()
+        with self._lock:
+            latencias = list(self.latencies)
+        return {
+            "exitos": self.successes,
+            "errores": self.errors,
+            "canceladas": self.cancelled,
+            "tasa_error_reciente": round(self.error_rate(), 4),
+            "latencia_media_s": round(sum(latencias) / len(latencias), 3) if latencias else None,
+            "latencia_p95_s": round(p95, 3) if p95 is not None else None,
+            "ultimo_error": self.last_error,
+        }
+
+
+class ProviderOrchestrator:
+    """
+    Ejecuta una llamada LLM sobre varios proveedores:
+
+    - "fallback": prueba los proveedores en orden hasta obtener una respuesta válida.
+    - "hedged": además, si el proveedor en curso supera su p95 de latencia, lanza una
+      petición de cobertura al siguiente; gana la primera respuesta válida y la otra
+      se cancela.
+
+    Las estadísticas por proveedor reordenan los respaldos (menos errores y menor p95 primero)
+    y degradan al proveedor solicitado si está fallando de forma sostenida.
+    """
+
+    def __init__(self, providers: Dict[str, Callable], max_workers: int = 8):
+        self.providers = providers
+        self.stats: Dict[str, ProviderStats] = {name: ProviderStats() for name in providers}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+
+    def _routing_key(self, name: str):
+        p95 = self.stats[name].p95()
+        return (round(self.stats[name].error_rate(), 1), p95 if p95 is not None else LLM_HEDGE_DEFAULT_DELAY)
+
+    def plan(self, preferido: str, disponibles: List[str]) -> List[str]:
+        """Orden de proveedores a intentar: el preferido primero salvo que esté fallando."""
+        respaldos = sorted((p for p in disponibles if p != preferido), key=self._routing_key)
+        if preferido not in disponibles:
+            return respaldos
+        if respaldos and self.stats[preferido].error_rate() >= 0.5:
+            return respaldos + [preferido]
+        return [preferido] + respaldos
+
+    def hedge_delay(self, name: str) -> float:
+        p95 = self.stats[name].p95()
+        if p95 is None:
+            return LLM_HEDGE_DEFAULT_DELAY
+        return max(LLM_HEDGE_MIN_DELAY, p95)
+
+    def _run(self, name: str, prompt: str, token: CancelToken) -> str:
+        inicio = time.perf_counter()
+        try:
+            respuesta = self.providers[name](prompt, cancel_token=token)
+            if not respuesta or not respuesta.strip():
+                raise RuntimeError("Respuesta vacía")
+        except Exception as e:
+            if token.cancelled:
+                self.stats[name].record_cancelled()
+            else:
+                self.stats[name].record_error(e)
+            raise
+        self.stats[name].record_success(time.perf_counter() - inicio)
+        return respuesta
+
+    def execute(
+        self,
+        prompt: str,
+        orden: List[str],
+        hedged: bool = True,
+        timeout: float = LLM_ORCHESTRATOR_TIMEOUT
+    ) -> Dict:
+        """
+        Devuelve {"respuesta", "proveedor", "intentos"}; lanza RuntimeError con el detalle
+        de los errores si ningún proveedor respondió.
+        """
+        if not orden:
+            raise RuntimeError("No hay proveedores LLM configurados")
+
+        deadline = time.monotonic() + timeout
+        pendientes = list(orden)
+        en_curso: Dict[Future, tuple] = {}
+        errores: Dict[str, str] = {}
+        intentos: List[str] = []
+
+        def lanzar():
+            name = pendientes.pop(0)
+            token = CancelToken()
+            intentos.append(name)
+            en_curso[self._executor.submit(self._run, name, prompt, token)] = (name, token)
+
+        lanzar()
+        try:
+            while en_curso:
+                restante = deadline - time.monotonic()
+                if restante <= 0:
+                    break
+                espera = restante
+                if hedged and pendientes and len(en_curso) == 1:
+                    actual = next(iter(en_curso.values()))[0]
+                    espera = min(restante, self.hedge_delay(actual))
+
+                terminados, _ = wait(list(en_curso), timeout=espera, return_when=FIRST_COMPLETED)
+                if not terminados:
+                    # El proveedor en curso superó su p95: lanzar petición de cobertura
+                    lanzar()
+                    continue
+
+                for future in terminados:
+                    name, _ = en_curso.pop(future)
+                    try:
+                        respuesta = future.result()
+                        return {"respuesta": respuesta, "proveedor": name, "intentos": intentos}
+                    except Exception as e:
+                        errores[name] = str(e)
+
+                if pendientes and not en_curso:
+                    lanzar()
+        finally:
+            for future, (name, token) in en_curso.items():
+                future.cancel()
+                token.cancel()
+
+        if en_curso:
+            errores["timeout"] = f"Sin respuesta tras {timeout:.0f} s"
+        detalle = "; ".join(f"{name}: {msg}" for name, msg in errores.items())
+        raise RuntimeError(f"Ningún proveedor respondió ({detalle})")
+
+    def stats_snapshot(self) -> Dict:
+        return {name: stats.snapshot() for name, stats in self.stats.items()}
@@ -0,0 +1,278 @@
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from core.config import (
+    LLM_BREAKER_FAILURE_THRESHOLD,
+    LLM_BREAKER_RESET_SECONDS,
+    LLM_LIMITER_MAX_WAIT,
+    LLM_PROVIDER_LIMITS,
+)
+from core.metrics import LLM_DURACION, LLM_ERRORES
+
+
+class ProveedorNoDisponible(RuntimeError):
+    """Se lanza sin llamar al proveedor: circuito abierto, cuota agotada o sin cupo de concurrencia."""
+
+    def __init__(self, proveedor: str, motivo: str):
+        super().__init__(f"Proveedor {proveedor} no disponible: {motivo}")
+        self.proveedor = proveedor
+        self.motivo = motivo
+
+
+class CircuitBreaker:
+    """
+    Interruptor de circuito clásico:
+    - closed: las llamadas pasan; tras N fallos consecutivos se abre.
+    - open: las llamadas fallan de inmediato hasta que vence el tiempo de reinicio.
+    - half_open: se permite una sola llamada de prueba; si tiene éxito se cierra, si falla se reabre.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                return self.HALF_OPEN
+            return self._state
+
+    def retry_in(self) -> float:
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_seconds - (time.monotonic() - self._opened_at))
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_seconds:
+                    return False
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.times_opened += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def record_cancelled(self):
+        """Una llamada cancelada no dice nada del proveedor: solo libera la prueba en half_open."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def reset(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def snapshot(self) -> Dict:
+        state = self.state
+        return {
+            "estado": state,
+            "fallos_consecutivos": self._failures,
+            "veces_abierto": self.times_opened,
+            "reintento_en_s": round(self.retry_in(), 1),
+        }
+
+
+class TokenBucket:
+    """Limitador de tasa: `rate` fichas por segundo con ráfagas de hasta `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, max_wait: float = 0.0) -> bool:
+        """Toma una ficha esperando como máximo `max_wait` segundos."""
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate if self.rate > 0 else float("inf")
+                if now + wait > deadline:
+                    self.rejected += 1
+                    return False
+            time.sleep(wait)
+
+    def drain(self):
+        """Vacía el cubo, p. ej. tras recibir un 429 del proveedor."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = 0
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                "fichas_disponibles": round(self._tokens, 2),
+                "capacidad": self.capacity,
+                "peticiones_por_minuto": round(self.rate * 60, 1),
+                "rechazadas": self.rejected,
+            }
+
+
+def _es_rate_limit(error: Exception) -> bool:
+    msg = str(error).lower()
+    return "429" in msg or "rate limit" in msg or "quota" in msg or "resource_exhausted" in msg
+
+
+class ProviderGuard:
+    """
+    Capa de resiliencia de un proveedor LLM: circuito, cuota (token bucket)
+    y concurrencia acotada. Si alguna condición no se cumple la llamada falla
+    de inmediato con ProveedorNoDisponible en lugar de esperar el timeout.
+
+    Si la llamada recibe el CancelToken del orquestador y falla porque se canceló
+    (p. ej. se cerró el cliente de una petición de cobertura perdedora), la excepción
+    se propaga sin contarse como fallo del proveedor ni tocar el circuito.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float,
+        burst: int,
+        max_concurrency: int,
+        failure_threshold: int = LLM_BREAKER_FAILURE_THRESHOLD,
+        reset_seconds: float = LLM_BREAKER_RESET_SECONDS,
+        max_wait: float = LLM_LIMITER_MAX_WAIT
+    ):
+        self.name = name
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        self.bucket = TokenBucket(requests_per_minute / 60.0, burst)
+        self.max_concurrency = max_concurrency
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self.max_wait = max_wait
+        self.calls = 0
+        self.failures = 0
+        self.cancelled = 0
+        self.fast_failures = 0
+
+    def available(self) -> bool:
+        return self.breaker.state != CircuitBreaker.OPEN
+
+    def _reject(self, motivo: str):
+        with self._lock:
+            self.fast_failures += 1
+        LLM_ERRORES.inc(provider=self.name, error="ProveedorNoDisponible")
+        raise ProveedorNoDisponible(self.name, motivo)
+
+    def call(self, fn: Callable, *args, cancel_token=None, **kwargs):
+        if self.breaker.state == CircuitBreaker.OPEN:
+            self._reject(f"circuito abierto (reintento en {self.breaker.retry_in():.0f} s)")
+        if not self._semaphore.acquire(timeout=self.max_wait):
+            self._reject(f"máximo de {self.max_concurrency} llamadas concurrentes alcanzado")
+        try:
+            if not self.bucket.acquire(self.max_wait):
+                self._reject("cuota de peticiones por minuto agotada")
+            # En half_open solo pasa una llamada de prueba
+            if not self.breaker.allow():
+                self._reject("circuito semiabierto con una llamada de prueba en curso")
+            with self._lock:
+                self.calls += 1
+                self._in_flight += 1
+            inicio = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if cancel_token is not None and cancel_token.cancelled:
+                    LLM_DURACION.observar(time.perf_counter() - inicio, provider=self.name, outcome="cancelled")
+                    with self._lock:
+                        self.cancelled += 1
+                    self.breaker.record_cancelled()
+                    raise
+                LLM_DURACION.observar(time.perf_counter() - inicio, provider=self.name, outcome="error")
+                LLM_ERRORES.inc(provider=self.name, error=type(e).__name__)
+                with self._lock:
+                    self.failures += 1
+                self.breaker.record_failure()
+                if _es_rate_limit(e):
+                    self.bucket.drain()
+                raise
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+            LLM_DURACION.observar(time.perf_counter() - inicio, provider=self.name, outcome="ok")
+            self.breaker.record_success()
+            return result
+        finally:
+            self._semaphore.release()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "circuito": self.breaker.snapshot(),
+                "limitador": self.bucket.snapshot(),
+                "concurrencia": {"en_curso": self._in_flight, "maximo": self.max_concurrency},
+                "llamadas": self.calls,
+                "fallos": self.failures,
+                "canceladas": self.cancelled,
+                "rechazos_inmediatos": self.fast_failures,
+            }
+
+
+llm_guards: Dict[str, ProviderGuard] = {
+    name: ProviderGuard(name, **limits) for name, limits in LLM_PROVIDER_LIMITS.items()
+}
+
+
+def guarded_call(proveedor: str, fn: Callable, *args, cancel_token=None, **kwargs):
+    """Ejecuta `fn` protegido por la capa de resiliencia del proveedor."""
+    return llm_guards[proveedor].call(fn, *args, cancel_token=cancel_token, **kwargs)
+
+
+def guards_snapshot() -> Dict:
+    return {name: guard.snapshot() for name, guard in llm_guards.items()}
+
+
+def reset_guard(proveedor: str) -> Optional[Dict]:
+    guard = llm_guards.get(proveedor)
+    if guard is None:
+        return None
+    guard.breaker.reset()
+    return guard.snapshot()
@@ -0,0 +1,70 @@
+from typing import Dict, Iterable
+
+from core.downloads import descargas
+from core.metrics import Familia, metricas
+from services.chat_cache import chat_cache
+from services.email_outbox import ENVIANDO, PENDIENTE, email_outbox
+from services.file_catalog import file_catalog
+from services.interpretacion_cache import interpretacion_cache
+from services.llm_resilience import guards_snapshot
+from services.report_jobs import report_jobs
+from services.series_store import series_store
+
+# Colectores que leen en cada scrape las estadísticas que los servicios ya llevan,
+# sin instrumentar su camino caliente.
+
+
+def _consultas_y_aciertos() -> Dict[str, tuple]:
+    chat = chat_cache.stats()
+    interpretacion = interpretacion_cache.stats()
+    series = series_store.stats()
+    descarga = descargas.stats()
+    return {
+        "chat_respuestas": (chat["consultas"], chat["aciertos_exactos"] + chat["aciertos_semanticos"]),
+        "interpretacion": (interpretacion["consultas"], interpretacion["aciertos_memoria"] + interpretacion["aciertos_disco"]),
+        # Tablas de series servidas desde memoria o desde la copia columnar (sin parsear el archivo)
+        "series": (series["memoria"] + series["columnar"] + series["lecturas"], series["memoria"] + series["columnar"]),
+        # Revalidaciones de descargas respondidas con 304
+        "descargas_304": (descarga["respuestas"], descarga["no_modificado"]),
+    }
+
+
+@metricas.colector
+def _colector_caches() -> Iterable[Familia]:
+    datos = _consultas_y_aciertos()
+    yield ("cache_requests_total", "counter", "Consultas por caché",
+           [({"cache": nombre}, consultas) for nombre, (consultas, _) in datos.items()])
+    yield ("cache_hits_total", "counter", "Aciertos por caché",
+           [({"cache": nombre}, aciertos) for nombre, (_, aciertos) in datos.items()])
+    yield ("cache_hit_ratio", "gauge", "Proporción de aciertos desde el arranque",
+           [({"cache": nombre}, round(aciertos / consultas, 4) if consultas else None)
+            for nombre, (consultas, aciertos) in datos.items()])
+
+
+@metricas.colector
+def _colector_colas() -> Iterable[Familia]:
+    outbox = email_outbox.stats()
+    por_estado = outbox["por_estado"]
+    yield ("queue_depth", "gauge", "Trabajos pendientes por cola", [
+        ({"queue": "report_jobs"}, report_jobs.pendientes()),
+        ({"queue": "email_outbox"}, por_estado.get(PENDIENTE, 0) + por_estado.get(ENVIANDO, 0)),
+    ])
+    yield ("email_messages_total", "counter", "Correos procesados por la bandeja de salida", [
+        ({"result": "enviado"}, outbox["enviados"]),
+        ({"result": "reintento"}, outbox["reintentos"]),
+        ({"result": "fallido"}, outbox["fallidos"]),
+    ])
+    yield ("llm_in_flight", "gauge", "Llamadas en curso por proveedor LLM", [
+        ({"provider": nombre}, estado["concurrencia"]["en_curso"]) for nombre, estado in guards_snapshot().items()
+    ])
+
+
+@metricas.colector
+def _colector_catalogo() -> Iterable[Familia]:
+    stats = file_catalog.stats()
+    yield ("data_files", "gauge", "Archivos indexados por directorio de datos",
+           [({"directory": d}, n) for d, n in stats["directorios"].items()])
+
+
+def exponer_metricas() -> str:
+    return metricas.exponer()
@@ -0,0 +1,193 @@
+"""
+Maquetación del reporte PDF con ReportLab.
+
+Los estilos de párrafo y de la tabla se construyen una sola vez por proceso (los workers
+de la cola de reportes los precargan y reutilizan en cada render). Las filas
+de la tabla salen de operaciones vectorizadas sobre el DataFrame y la tabla es un
+LongTable que se parte entre páginas repitiendo el encabezado, así que un pronóstico de
+cientos de meses se maqueta en tiempo casi lineal. Se importa solo al generar un PDF.
+"""
+
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+from reportlab.graphics.charts.barcharts import VerticalBarChart
+from reportlab.graphics.charts.lineplots import LinePlot
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import BaseDocTemplate, Frame, LongTable, PageTemplate, Paragraph, Spacer, TableStyle
+
+ENCABEZADO_TABLA = ["Año", "Mes", "Consumo Predicho (m³)"]
+ANCHOS_TABLA = [1 * inch, 2 * inch, 2 * inch]
+# Altos fijos (los que ReportLab calcula con estilo_tabla): evitan medir cada celda al partir la tabla
+ALTO_ENCABEZADO, ALTO_FILA = 27, 18
+ANCHO_GRAFICO, ALTO_GRAFICO = 6.5 * inch, 2.6 * inch
+
+
+@lru_cache(maxsize=1)
+def estilos() -> Dict[str, ParagraphStyle]:
+    """Estilos de párrafo del reporte (getSampleStyleSheet es costoso: una vez por proceso)."""
+    base = getSampleStyleSheet()
+    return {
+        "titulo": ParagraphStyle(
+            "CustomTitle", parent=base["Heading1"], fontSize=18, spaceAfter=30,
+            alignment=TA_CENTER, textColor=colors.darkblue,
+        ),
+        "seccion": ParagraphStyle("Seccion", parent=base["Heading2"], fontSize=13, spaceBefore=10, spaceAfter=8),
+        "info": ParagraphStyle("Info", parent=base["Normal"], fontSize=10, spaceAfter=20),
+        "resumen": ParagraphStyle("Summary", parent=base["Normal"], fontSize=11, spaceAfter=20),
+    }
+
+
+@lru_cache(maxsize=1)
+def estilo_tabla() -> TableStyle:
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ])
+
+
+def _pie_de_pagina(canvas, doc):
+    canvas.saveState()
+    canvas.setFont("Helvetica", 8)
+    canvas.setFillColor(colors.grey)
+    canvas.drawRightString(A4[0] - doc.rightMargin, doc.bottomMargin / 2, f"Página {doc.page}")
+    canvas.drawString(doc.leftMargin, doc.bottomMargin / 2, "Reporte de Predicción de Consumo de Agua")
+    canvas.restoreState()
+
+
+def documento(destino: Path) -> BaseDocTemplate:
+    """Documento A4 con los márgenes de SimpleDocTemplate y pie de página numerado."""
+    doc = BaseDocTemplate(str(destino), pagesize=A4, title="Reporte de Predicción de Consumo de Agua")
+    marco = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height, id="contenido")
+    doc.addPageTemplates([PageTemplate(id="reporte", frames=[marco], onPage=_pie_de_pagina)])
+    return doc
+
+
+def filas_tabla(df: pd.DataFrame) -> List[List[str]]:
+    """Encabezado + filas (año, mes, consumo) formateadas por columnas, sin iterrows."""
+    anios = df['anio'].astype(int).astype(str)
+    consumos = df['consumo_predicho_m3'].map('{:,.2f}'.format)
+    return [ENCABEZADO_TABLA, *map(list, zip(anios, df['mes_nombre'], consumos))]
+
+
+def tabla_predicciones(df: pd.DataFrame) -> LongTable:
+    tabla = LongTable(
+        filas_tabla(df), colWidths=ANCHOS_TABLA, rowHeights=[ALTO_ENCABEZADO] + [ALTO_FILA] * len(df),
+        repeatRows=1, splitByRow=1,
+    )
+    tabla.setStyle(estilo_tabla())
+    return tabla
+
+
+def grafico_mensual(df: pd.DataFrame) -> Drawing:
+    """Consumo predicho mes a mes; el eje X marca el inicio de cada año."""
+    dibujo = Drawing(ANCHO_GRAFICO, ALTO_GRAFICO)
+    grafico = LinePlot()
+    grafico.x, grafico.y = 45, 30
+    grafico.width, grafico.height = ANCHO_GRAFICO - 60, ALTO_GRAFICO - 55
+    valores = df['consumo_predicho_m3'].to_numpy()
+    grafico.data = [list(zip(range(len(valores)), valores.tolist()))]
+    grafico.lines[0].strokeColor = colors.darkblue
+    grafico.lines[0].strokeWidth = 1.5
+    grafico.xValueAxis.valueMin, grafico.xValueAxis.valueMax = 0, max(len(valores) - 1, 1)
+    # Una marca por año (o cada pocos años en horizontes muy largos)
+    inicios = [i for i, mes in enumerate(df['mes'].to_numpy()) if mes == 1 or i == 0]
+    paso = max(1, len(inicios) // 12)
+    grafico.xValueAxis.valueSteps = inicios[::paso]
+    anios = df['anio'].to_numpy()
+    grafico.xValueAxis.labelTextFormat = lambda i: str(anios[min(int(i), len(anios) - 1)])
+    grafico.xValueAxis.labels.fontSize = 7
+    grafico.yValueAxis.labels.fontSize = 7
+    grafico.yValueAxis.labelTextFormat = '{:,.0f}'.format
+    grafico.yValueAxis.valueMin = float(valores.min()) * 0.95
+    dibujo.add(grafico)
+    dibujo.add(String(ANCHO_GRAFICO / 2, ALTO_GRAFICO - 12, "Consumo predicho por mes (m³)",
+                      fontSize=9, textAnchor="middle"))
+    return dibujo
+
+
+def grafico_anual(df: pd.DataFrame) -> Drawing:
+    """Consumo predicho total por año del horizonte."""
+    totales = df.groupby('anio', sort=True)['consumo_predicho_m3'].sum()
+    dibujo = Drawing(ANCHO_GRAFICO, ALTO_GRAFICO)
+    grafico = VerticalBarChart()
+    grafico.x, grafico.y = 55, 30
+    grafico.width, grafico.height = ANCHO_GRAFICO - 70, ALTO_GRAFICO - 55
+    grafico.data = [totales.round(2).tolist()]
+    grafico.bars[0].fillColor = colors.steelblue
+    grafico.categoryAxis.categoryNames = [str(int(anio)) for anio in totales.index]
+    grafico.categoryAxis.labels.fontSize = 7
+    if len(totales) > 15:
+        grafico.categoryAxis.labels.angle = 90
+        grafico.categoryAxis.labels.dy = -12
+    grafico.valueAxis.valueMin = 0
+    grafico.valueAxis.labels.fontSize = 7
+    grafico.valueAxis.labelTextFormat = '{:,.0f}'.format
+    dibujo.add(grafico)
+    dibujo.add(String(ANCHO_GRAFICO / 2, ALTO_GRAFICO - 12, "Consumo predicho por año (m³)",
+                      fontSize=9, textAnchor="middle"))
+    return dibujo
+
+
+def construir_reporte(
+    df: pd.DataFrame,
+    destino: Path,
+    poblacion_estimada: Optional[float] = None,
+    precipitacion_promedio: Optional[float] = None,
+) -> Dict:
+    """
+    Escribe el PDF en `destino` a partir del DataFrame de predicciones (columnas anio,
+    mes, mes_nombre y consumo_predicho_m3) y devuelve los totales usados en el texto.
+    """
+    hoja = estilos()
+    total_consumo = df['consumo_predicho_m3'].sum()
+    promedio_consumo = df['consumo_predicho_m3'].mean()
+    periodo = f"{df['anio'].min()}-{df['mes'].min():02d} a {df['anio'].max()}-{df['mes'].max():02d}"
+
+    info_text = f"""
+    <b>Información del Reporte:</b><br/>
+    • Fecha de generación: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}<br/>
+    • Período de predicción: {periodo}<br/>
+    • Total de meses predichos: {len(df)}<br/>
+    • Consumo total predicho: {total_consumo:,.2f} m³<br/>
+    • Consumo promedio mensual: {promedio_consumo:,.2f} m³<br/>
+    • Población estimada: {poblacion_estimada or 'No especificada'}<br/>
+    • Precipitación promedio: {precipitacion_promedio or 'No especificada'} mm
+    """
+    summary_text = f"""
+    <b>Resumen:</b><br/>
+    El modelo de predicción ha generado un reporte para los próximos {len(df)} meses,
+    con un consumo total estimado de {total_consumo:,.2f} metros cúbicos de agua.
+    El consumo promedio mensual se estima en {promedio_consumo:,.2f} m³.
+    """
+
+    story = [
+        Paragraph("Reporte de Predicción de Consumo de Agua", hoja["titulo"]),
+        Spacer(1, 20),
+        Paragraph(info_text, hoja["info"]),
+        Paragraph(summary_text, hoja["resumen"]),
+        Paragraph("Pronóstico", hoja["seccion"]),
+        grafico_mensual(df),
+    ]
+    if df['anio'].nunique() > 1:
+        story += [Spacer(1, 10), grafico_anual(df)]
+    story += [
+        Paragraph("Detalle mensual", hoja["seccion"]),
+        tabla_predicciones(df),
+    ]
+    documento(destino).build(story)
+    return {"total_consumo": total_consumo, "promedio_consumo": promedio_consumo, "periodo": periodo}
@@ -3,6 +3,7 @@ import numpy as np
 from fastapi.encoders import jsonable_encoder
 from urllib.parse import unquote
 from core.config import DATA_DIRS
+from core.metrics import PARSEO_DURACION
 from pathlib import Path
 
 # Mapeo de columnas a nombres completos
@@ -35,7 +36,8 @@ def extract_precipitation_csv(directory: str, filename: str):
         return {"error": f"Archivo {filename} no encontrado en '{directory}'."}
 
     try:
-        df = pd.read_csv(file_path, na_values=["", " ", "NaN", "nan", "--"])
+        with PARSEO_DURACION.medir(format="csv", source="precipitacion"):
+            df = pd.read_csv(file_path, na_values=["", " ", "NaN", "nan", "--"])
 
         expected_cols = ["fecha", "valor", "completo_mediciones", "completo_umbral"]
         if not all(col in df.columns for col in expected_cols):
@@ -96,7 +98,8 @@ def extract_data3_csv(filename: str):
         return {"error": f"Archivo {filename} no encontrado en data3."}
 
     try:
-        df = pd.read_csv(file_path, na_values=["", " ", "NaN", "nan", "--"])
+        with PARSEO_DURACION.medir(format="csv", source="precipitacion"):
+            df = pd.read_csv(file_path, na_values=["", " ", "NaN", "nan", "--"])
         df.replace([np.inf, -np.inf], np.nan, inplace=True)
 
         # Renombrar estaciones usando STATION_MAP si existe el mapeo
@@ -138,7 +141,8 @@ def extract_precipitation_xlsx(directory: str, filename: str):
         return {"error": f"Archivo {filename} no encontrado en {directory}."}
 
     try:
-        df_raw = pd.read_excel(file_path, header=None)
+        with PARSEO_DURACION.medir(format="xlsx", source="precipitacion"):
+            df_raw = pd.read_excel(file_path, header=None)
 
         header_row = None
         for i, row in df_raw.iterrows():
@@ -149,7 +153,8 @@ def extract_precipitation_xlsx(directory: str, filename: str):
         if header_row is None:
             return {"error": "No se encontró la fila con los encabezados (AÑO, ENE, ... DIC)"}
 
-        df = pd.read_excel(file_path, header=header_row)
+        with PARSEO_DURACION.medir(format="xlsx", source="precipitacion"):
+            df = pd.read_excel(file_path, header=header_row)
 
         expected_cols = ["AÑO", "ENE", "FEB", "MAR", "ABR", "MAY", "JUN", "JUL", "AGO", "SEP", "OCT", "NOV", "DIC"]
         missing = [col for col in expected_cols if col not in df.columns]
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from core.cache import DiskCache
+from core.config import REPORT_ARTIFACTS_DB, REPORT_ARTIFACTS_MAX_ENTRIES
+from services.report_manifest import report_manifest
+
+# Versión de la plantilla de cada tipo de reporte: cambiarla invalida los artefactos previos
+PLANTILLAS = {"csv": "1", "pdf": "1"}
+
+_lock = threading.Lock()
+_huellas: Dict[str, tuple] = {}
+
+
+def huella_archivo(path: Path) -> str:
+    """sha256 del contenido de un archivo, recalculado solo si cambian su mtime o su tamaño."""
+    stat = path.stat()
+    firma = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        entrada = _huellas.get(str(path))
+        if entrada and entrada[0] == firma:
+            return entrada[1]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    with _lock:
+        _huellas[str(path)] = (firma, h.hexdigest())
+    return h.hexdigest()
+
+
+def clave_reporte(tipo: str, params: Dict) -> str:
+    """
+    Identificador del reporte según su contenido: parámetros de la predicción,
+    versión del modelo, huella de los datos y versión de la plantilla.
+    """
+    from services.consumption_service import DATA_DIR, CSV_NAME, MODEL_PATH
+
+    contenido = {
+        "tipo": tipo,
+        "params": {k: params.get(k) for k in sorted(params)},
+        "modelo": huella_archivo(MODEL_PATH),
+        "datos": huella_archivo(DATA_DIR / CSV_NAME),
+        "plantilla": PLANTILLAS[tipo],
+    }
+    canonico = json.dumps(contenido, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonico.encode("utf-8")).hexdigest()[:24]
+
+
+class ReportArtifacts:
+    """
+    Índice persistente clave -> resultado del reporte ya generado. Se comparte entre
+    la API y los procesos del pool (SQLite). Una entrada solo vale mientras exista
+    el archivo; si se borró, se descarta y el reporte se vuelve a generar.
+    """
+
+    def __init__(self, db_path: Optional[str] = REPORT_ARTIFACTS_DB, max_entries: int = REPORT_ARTIFACTS_MAX_ENTRIES):
+        self._disco = DiskCache(db_path, max_entries, ttl_seconds=0) if db_path else None
+        self.reutilizados = 0
+
+    def buscar(self, clave: str) -> Optional[Dict]:
+        if self._disco is None:
+            return None
+        resultado = self._disco.get(clave)
+        if resultado is None:
+            return None
+        path = Path(resultado["filepath"])
+        if not path.exists():
+            self._disco.delete(clave)
+            return None
+        # Lo reutilizado pasa a ser el reporte "más reciente" para el contexto del chatbot
+        report_manifest.tocar(path.name)
+        self.reutilizados += 1
+        return {**resultado, "reutilizado": True}
+
+    def guardar(self, clave: str, resultado: Dict):
+        if self._disco is not None:
+            self._disco.set(clave, jsonable_encoder(resultado))
+
+    def reubicar(self, clave: str, filepath: Path):
+        """Actualiza la ruta de un artefacto que la retención movió de directorio."""
+        if self._disco is None:
+            return
+        resultado = self._disco.get(clave)
+        if resultado is not None:
+            self._disco.set(clave, {**resultado, "filepath": str(filepath)})
+
+    def descartar(self, clave: str):
+        if self._disco is not None:
+            self._disco.delete(clave)
+
+    def stats(self) -> Dict:
+        return {
+            "artefactos": len(self._disco) if self._disco is not None else 0,
+            "reutilizados": self.reutilizados,
+        }
+
+    def clear(self):
+        if self._disco is not None:
+            self._disco.clear()
+
+
+report_artifacts = ReportArtifacts()
@@ -0,0 +1,264 @@
+import calendar
+import csv
+import io
+import os
+import uuid
+import zipfile
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+from core.config import REPORTS_ARTIFACTS_DIRS
+from services import consumption_service
+from services.consumption_service import forecast_arrays
+from services.report_manifest import report_manifest
+
+# Mismas columnas que el reporte CSV; con varios escenarios se antepone "escenario"
+COLUMNAS = ["anio", "mes", "mes_nombre", "fecha", "consumo_predicho_m3"]
+FILAS_POR_BLOQUE = 1000
+TIPOS_MEDIA = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+CAMPOS_ESCENARIO = ("months_ahead", "start_year", "start_month", "poblacion_estimada", "precipitacion_promedio")
+_NOMBRES_MES = np.array(calendar.month_name, dtype=object)
+_EPOCA_EXCEL = date(1899, 12, 30)
+
+
+def _nombre_escenario(escenario: Dict, indice: int) -> str:
+    return escenario.get("nombre") or f"escenario_{indice + 1}"
+
+
+def bloques_pronostico(escenarios: List[Dict]) -> Iterator[Dict]:
+    """
+    Bloques de hasta FILAS_POR_BLOQUE filas, escenario por escenario. Cada escenario se
+    predice cuando le toca (en arreglos) y se descarta al terminar: la memoria no crece
+    con la cantidad de escenarios.
+    """
+    for indice, escenario in enumerate(escenarios):
+        arrays = forecast_arrays(**{campo: escenario.get(campo) for campo in CAMPOS_ESCENARIO})
+        anios, meses = arrays["anio"].astype(int), arrays["mes"].astype(int)
+        consumos = np.round(arrays["consumo_predicho"], 2)
+        nombre = _nombre_escenario(escenario, indice)
+        for inicio in range(0, len(anios), FILAS_POR_BLOQUE):
+            corte = slice(inicio, inicio + FILAS_POR_BLOQUE)
+            yield {
+                "escenario": nombre,
+                "anio": anios[corte].tolist(),
+                "mes": meses[corte].tolist(),
+                "mes_nombre": _NOMBRES_MES[meses[corte]].tolist(),
+                "consumo": consumos[corte].tolist(),
+            }
+
+
+def stream_csv(escenarios: List[Dict]) -> Iterator[bytes]:
+    """CSV en bloques de bytes; con un solo escenario es idéntico al reporte CSV."""
+    varios = len(escenarios) > 1
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator="\n")
+    escritor.writerow((["escenario"] if varios else []) + COLUMNAS)
+    for bloque in bloques_pronostico(escenarios):
+        fechas = [f"{anio:04d}-{mes:02d}-01" for anio, mes in zip(bloque["anio"], bloque["mes"])]
+        filas = zip(bloque["anio"], bloque["mes"], bloque["mes_nombre"], fechas, bloque["consumo"])
+        if varios:
+            filas = ((bloque["escenario"], *fila) for fila in filas)
+        escritor.writerows(filas)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+# --- XLSX ---
+
+class _Salida:
+    """Destino no posicionable del zip: acumula lo escrito hasta que se entrega."""
+
+    def __init__(self):
+        self._partes: List[bytes] = []
+
+    def write(self, datos) -> int:
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self) -> bytes:
+        datos = b"".join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+_XLSX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Pronóstico" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+# Estilos de celda: 0 normal, 1 fecha, 2 número con dos decimales, 3 encabezado en negrita
+_XLSX_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy-mm-dd"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="4">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+
+def _celda_texto(valor: str, estilo: int = 0) -> str:
+    atributo = f' s="{estilo}"' if estilo else ""
+    return f'<c t="inlineStr"{atributo}><is><t>{escape(valor)}</t></is></c>'
+
+
+def _hoja_xlsx(escenarios: List[Dict]) -> Iterator[str]:
+    """XML de la hoja, un fragmento por bloque de filas."""
+    varios = len(escenarios) > 1
+    columnas = (["escenario"] if varios else []) + COLUMNAS
+    anchos = ([18] if varios else []) + [8, 6, 12, 12, 20]
+    yield (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<sheetViews><sheetView workbookViewId="0">'
+        '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+        '</sheetView></sheetViews><cols>'
+        + "".join(f'<col min="{i}" max="{i}" width="{ancho}" customWidth="1"/>' for i, ancho in enumerate(anchos, 1))
+        + '</cols><sheetData><row>'
+        + "".join(_celda_texto(columna, 3) for columna in columnas)
+        + '</row>'
+    )
+    for bloque in bloques_pronostico(escenarios):
+        prefijo = _celda_texto(bloque["escenario"]) if varios else ""
+        filas = []
+        for anio, mes, mes_nombre, consumo in zip(bloque["anio"], bloque["mes"], bloque["mes_nombre"], bloque["consumo"]):
+            serial = (date(anio, mes, 1) - _EPOCA_EXCEL).days
+            filas.append(
+                f'<row>{prefijo}<c><v>{anio}</v></c><c><v>{mes}</v></c>{_celda_texto(mes_nombre)}'
+                f'<c s="1"><v>{serial}</v></c><c s="2"><v>{consumo!r}</v></c></row>'
+            )
+        yield "".join(filas)
+    yield '</sheetData></worksheet>'
+
+
+def stream_xlsx(escenarios: List[Dict]) -> Iterator[bytes]:
+    """
+    Libro XLSX de una hoja escrito en modo solo-escritura directamente sobre el zip de
+    salida: cada bloque de filas se comprime y se entrega sin pasar por un archivo temporal.
+    """
+    salida = _Salida()
+    with zipfile.ZipFile(salida, "w", compression=zipfile.ZIP_DEFLATED) as libro:
+        libro.writestr("[Content_Types].xml", _XLSX_CONTENT_TYPES)
+        libro.writestr("_rels/.rels", _XLSX_RELS)
+        libro.writestr("xl/workbook.xml", _XLSX_WORKBOOK)
+        libro.writestr("xl/_rels/workbook.xml.rels", _XLSX_WORKBOOK_RELS)
+        libro.writestr("xl/styles.xml", _XLSX_STYLES)
+        yield salida.vaciar()
+        with libro.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as hoja:
+            for fragmento in _hoja_xlsx(escenarios):
+                hoja.write(fragmento.encode("utf-8"))
+                datos = salida.vaciar()
+                if datos:
+                    yield datos
+    yield salida.vaciar()
+
+
+GENERADORES = {"csv": stream_csv, "xlsx": stream_xlsx}
+
+
+def nombre_exportacion(formato: str) -> str:
+    # Sufijo aleatorio: dos exportaciones en el mismo segundo no comparten archivo
+    return f"reporte_consumo_agua_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}.{formato}"
+
+
+def persistir(bloques: Iterable[bytes], formato: str, filename: str, params: Dict) -> Iterator[bytes]:
+    """
+    Entrega los bloques y a la vez los guarda en el árbol de artefactos. El archivo solo
+    aparece (y se registra en el manifiesto) si la exportación se completó.
+    """
+    tipo = formato.upper()
+    directorio = REPORTS_ARTIFACTS_DIRS[tipo]
+    directorio.mkdir(parents=True, exist_ok=True)
+    filepath = directorio / filename
+    temporal = filepath.with_name(f".{filename}.{os.getpid()}.tmp")
+    completo = False
+    try:
+        with open(temporal, "wb") as f:
+            for bloque in bloques:
+                f.write(bloque)
+                yield bloque
+        os.replace(temporal, filepath)
+        completo = True
+        report_manifest.registrar(tipo, filepath, params)
+    finally:
+        if not completo:
+            Path(temporal).unlink(missing_ok=True)
+
+
+def exportar(formato: str, escenarios: List[Dict], guardar: bool = False) -> Dict:
+    """
+    Prepara una exportación en streaming. Devuelve el nombre del archivo, el tipo de
+    contenido y el iterador de bytes (o "error" si no se puede exportar).
+    """
+    if formato not in GENERADORES:
+        return {"error": f"Formato '{formato}' no soportado; use {', '.join(GENERADORES)}"}
+    # Datos y modelo se cargan antes de responder: una vez enviado el 200 ya no se puede informar el error
+    try:
+        consumption_service._load_raw()
+        consumption_service._load_model()
+    except Exception as e:
+        return {"error": f"No se pudo preparar la exportación: {str(e)}"}
+    filename = nombre_exportacion(formato)
+    bloques = GENERADORES[formato](escenarios)
+    if guardar:
+        params = (
+            {campo: escenarios[0].get(campo) for campo in CAMPOS_ESCENARIO}
+            if len(escenarios) == 1 else {"escenarios": escenarios}
+        )
+        bloques = persistir(bloques, formato, filename, params)
+    return {"filename": filename, "media_type": TIPOS_MEDIA[formato], "bloques": bloques}
@@ -0,0 +1,330 @@
+import hashlib
+import json
+import multiprocessing
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from core.cache import TTLCache
+from core.config import (
+    REPORT_JOBS_WORKERS,
+    REPORT_JOBS_MAX_PENDING,
+    REPORT_JOBS_HISTORY,
+    REPORT_JOBS_START_METHOD,
+    REPORT_IDEMPOTENCY_TTL_SECONDS,
+)
+from services.report_artifacts import ReportArtifacts, report_artifacts
+
+EN_COLA = "en_cola"
+EN_CURSO = "en_curso"
+COMPLETADO = "completado"
+ERROR = "error"
+CANCELADO = "cancelado"
+
+# --- Lado del proceso hijo ---
+
+_cola_progreso = None
+
+
+def _inicializar_worker(cola):
+    global _cola_progreso
+    _cola_progreso = cola
+
+
+def _ejecutar(job_id: str, fn: Callable[..., Dict], kwargs: Dict) -> Dict:
+    """Corre en el proceso hijo: ejecuta `fn` pasándole un callback de progreso."""
+    def progreso(porcentaje: int, etapa: str):
+        if _cola_progreso is not None:
+            _cola_progreso.put((job_id, porcentaje, etapa))
+
+    progreso(0, "iniciado")
+    return fn(progreso=progreso, **kwargs)
+
+
+def _precargar() -> Dict:
+    """Importa pandas/ReportLab, prepara los estilos del PDF y carga datos y modelo en el proceso hijo."""
+    from services import consumption_service as svc
+    from services import pdf_templates
+    pdf_templates.estilos()
+    pdf_templates.estilo_tabla()
+    svc._load_raw()
+    svc._load_model()
+    return {}
+
+
+# --- Lado de la API ---
+
+class ColaLlena(Exception):
+    """La cola de reportes alcanzó su límite de trabajos pendientes."""
+
+
+class ConflictoIdempotencia(Exception):
+    """La clave de idempotencia ya se usó con otros parámetros."""
+
+
+@dataclass
+class ReportJob:
+    job_id: str
+    tipo: str
+    params: Dict[str, Any]
+    clave: Optional[str] = None        # hash del contenido del reporte (None: sin deduplicar)
+    estado: str = EN_COLA
+    progreso: int = 0
+    etapa: str = EN_COLA
+    creado: float = field(default_factory=time.time)
+    iniciado: Optional[float] = None
+    terminado: Optional[float] = None
+    resultado: Optional[Dict] = None
+    error: Optional[str] = None
+    future: Optional[Future] = field(default=None, repr=False)
+
+    @property
+    def pendiente(self) -> bool:
+        return self.estado in (EN_COLA, EN_CURSO)
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.job_id,
+            "tipo": self.tipo,
+            "clave": self.clave,
+            "estado": self.estado,
+            "progreso": self.progreso,
+            "etapa": self.etapa,
+            "params": self.params,
+            "creado": self.creado,
+            "iniciado": self.iniciado,
+            "terminado": self.terminado,
+            "espera_s": round((self.iniciado or time.time()) - self.creado, 3),
+            "duracion_s": round((self.terminado or time.time()) - self.iniciado, 3) if self.iniciado else None,
+            "resultado": self.resultado,
+            "error": self.error,
+        }
+
+
+class ReportJobQueue:
+    """
+    Cola de trabajos de reportes. El render (pandas, modelo, ReportLab) corre en un
+    pool de procesos, fuera del event loop y del GIL de la API. La cola es acotada:
+    con `max_pendientes` trabajos en cola o en curso, enviar() lanza ColaLlena.
+    El avance lo publican los procesos hijos en una cola que drena un hilo de la API.
+
+    Con `clave` (hash del contenido) un reporte ya generado se devuelve al instante y
+    las peticiones idénticas en curso comparten un único render.
+    """
+
+    def __init__(
+        self,
+        workers: int = REPORT_JOBS_WORKERS,
+        max_pendientes: int = REPORT_JOBS_MAX_PENDING,
+        historial: int = REPORT_JOBS_HISTORY,
+        start_method: str = REPORT_JOBS_START_METHOD,
+        artefactos: Optional[ReportArtifacts] = None,
+    ):
+        self.workers = workers
+        self.max_pendientes = max_pendientes
+        self.historial = historial
+        self._contexto = multiprocessing.get_context(start_method)
+        self._jobs: "OrderedDict[str, ReportJob]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._cola_progreso = None
+        self._escucha: Optional[threading.Thread] = None
+        self.artefactos = artefactos if artefactos is not None else report_artifacts
+        self._en_curso_por_clave: Dict[str, str] = {}
+        self._idempotencia = TTLCache(max_entries=10000, ttl_seconds=REPORT_IDEMPOTENCY_TTL_SECONDS)
+        self.rechazados = 0
+        self.compartidos = 0
+
+    def _asegurar_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            if self._cola_progreso is None:
+                self._cola_progreso = self._contexto.Queue()
+                self._escucha = threading.Thread(target=self._escuchar_progreso, name="report-jobs-progreso", daemon=True)
+                self._escucha.start()
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=self._contexto,
+                initializer=_inicializar_worker,
+                initargs=(self._cola_progreso,),
+            )
+        return self._pool
+
+    def _escuchar_progreso(self):
+        while True:
+            mensaje = self._cola_progreso.get()
+            if mensaje is None:
+                return
+            job_id, porcentaje, etapa = mensaje
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or not job.pendiente:
+                    continue
+                if job.estado == EN_COLA:
+                    job.estado = EN_CURSO
+                    job.iniciado = time.time()
+                job.progreso, job.etapa = porcentaje, etapa
+
+    def precalentar(self):
+        """Arranca los procesos del pool y precarga cada uno (primer reporte sin arranque en frío)."""
+        with self._lock:
+            pool = self._asegurar_pool()
+            futures = [pool.submit(_precargar) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def pendientes(self) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.pendiente)
+
+    def enviar(
+        self,
+        tipo: str,
+        fn: Callable[..., Dict],
+        params: Dict[str, Any],
+        clave: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+        **extra,
+    ) -> ReportJob:
+        """
+        Encola `fn(progreso=..., **params, **extra)` y devuelve el trabajo. `fn` debe ser
+        una función de módulo (se serializa hacia el proceso hijo) que devuelve un dict
+        con "error" si falla. `extra` no se expone en el estado (p. ej. el cuerpo del correo).
+        Con `clave`, `fn` recibe además `report_id=clave`. Una misma `idempotency_key`
+        devuelve siempre el mismo trabajo; con otros parámetros lanza ConflictoIdempotencia.
+        """
+        with self._lock:
+            if idempotency_key:
+                firma = hashlib.sha256(
+                    json.dumps([tipo, params, extra], sort_keys=True, default=str).encode("utf-8")
+                ).hexdigest()
+                previo = self._idempotencia.get(idempotency_key)
+                if previo is not None:
+                    if previo[0] != firma:
+                        raise ConflictoIdempotencia("La clave de idempotencia ya se usó con otros parámetros")
+                    job = self._jobs.get(previo[1])
+                    if job is not None:
+                        return job
+            job = self._resolver(tipo, fn, params, clave, extra)
+            if idempotency_key:
+                self._idempotencia.set(idempotency_key, (firma, job.job_id))
+        return job
+
+    def _resolver(self, tipo: str, fn: Callable[..., Dict], params: Dict, clave: Optional[str], extra: Dict) -> ReportJob:
+        if clave:
+            en_curso = self._jobs.get(self._en_curso_por_clave.get(clave, ""))
+            if en_curso is not None and en_curso.pendiente:
+                self.compartidos += 1
+                return en_curso
+            existente = self.artefactos.buscar(clave)
+            if existente is not None:
+                return self._registrar_existente(tipo, params, clave, existente)
+
+        if self.pendientes() >= self.max_pendientes:
+            self.rechazados += 1
+            raise ColaLlena(f"Hay {self.max_pendientes} reportes pendientes; intente más tarde")
+        job = ReportJob(job_id=uuid.uuid4().hex, tipo=tipo, params=params, clave=clave)
+        kwargs = {**params, **extra, **({"report_id": clave} if clave else {})}
+        try:
+            job.future = self._asegurar_pool().submit(_ejecutar, job.job_id, fn, kwargs)
+        except BrokenProcessPool:
+            self._pool = None
+            job.future = self._asegurar_pool().submit(_ejecutar, job.job_id, fn, kwargs)
+        self._jobs[job.job_id] = job
+        if clave:
+            self._en_curso_por_clave[clave] = job.job_id
+        # Solo al crear el future: los envíos que comparten este trabajo no añaden otro cierre
+        job.future.add_done_callback(lambda future: self._terminar(job, future))
+        self._recortar()
+        return job
+
+    def _registrar_existente(self, tipo: str, params: Dict, clave: str, resultado: Dict) -> ReportJob:
+        """Trabajo ya completado para un reporte que existía: no pasa por el pool."""
+        ahora = time.time()
+        job = ReportJob(
+            job_id=uuid.uuid4().hex, tipo=tipo, params=params, clave=clave,
+            estado=COMPLETADO, progreso=100, etapa=COMPLETADO,
+            iniciado=ahora, terminado=ahora, resultado=resultado,
+        )
+        job.future = Future()
+        job.future.set_result(resultado)
+        self._jobs[job.job_id] = job
+        self._recortar()
+        return job
+
+    def _terminar(self, job: ReportJob, future: Future):
+        with self._lock:
+            if job.clave and self._en_curso_por_clave.get(job.clave) == job.job_id:
+                del self._en_curso_por_clave[job.clave]
+            job.terminado = time.time()
+            job.iniciado = job.iniciado or job.terminado
+            if future.cancelled():
+                job.estado, job.etapa = CANCELADO, CANCELADO
+                return
+            error = future.exception()
+            if isinstance(error, BrokenProcessPool):
+                self._pool = None  # un hijo murió: el próximo envío crea un pool nuevo
+            if error is not None:
+                job.estado, job.error = ERROR, f"{type(error).__name__}: {error}"
+            elif isinstance(future.result(), dict) and "error" in future.result():
+                job.estado, job.error = ERROR, future.result()["error"]
+            else:
+                job.estado, job.progreso, job.resultado = COMPLETADO, 100, future.result()
+            job.etapa = job.estado
+        if job.estado == COMPLETADO and job.clave:
+            self.artefactos.guardar(job.clave, job.resultado)
+
+    def _recortar(self):
+        terminados = [job_id for job_id, job in self._jobs.items() if not job.pendiente]
+        for job_id in terminados[:max(0, len(terminados) - self.historial)]:
+            del self._jobs[job_id]
+
+    def obtener(self, job_id: str) -> Optional[ReportJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancelar(self, job_id: str) -> Optional[bool]:
+        """True si se canceló, False si ya había empezado o terminado, None si no existe."""
+        job = self.obtener(job_id)
+        if job is None:
+            return None
+        return job.estado == EN_COLA and job.future.cancel()
+
+    def listar(self, estado: Optional[str] = None, limite: int = 50) -> List[Dict]:
+        with self._lock:
+            jobs = [job for job in reversed(self._jobs.values()) if estado is None or job.estado == estado]
+            return [job.to_dict() for job in jobs[:limite]]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            por_estado: Dict[str, int] = {}
+            for job in self._jobs.values():
+                por_estado[job.estado] = por_estado.get(job.estado, 0) + 1
+            return {
+                "workers": self.workers,
+                "max_pendientes": self.max_pendientes,
+                "pendientes": self.pendientes(),
+                "por_estado": por_estado,
+                "rechazados": self.rechazados,
+                "compartidos": self.compartidos,
+                "artefactos": self.artefactos.stats(),
+                "pool_activo": self._pool is not None,
+            }
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+        if self._cola_progreso is not None:
+            self._cola_progreso.put(None)
+            if self._escucha is not None:
+                self._escucha.join(timeout=5)
+            self._cola_progreso = None
+
+
+report_jobs = ReportJobQueue()
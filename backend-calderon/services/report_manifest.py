@@ -0,0 +1,288 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+from core.config import REPORT_MANIFEST_PATH, REPORTS_ARTIFACTS_DIRS
+
+PATRONES = {
+    "CSV": "reporte_consumo_agua_*.csv",
+    "PDF": "reporte_consumo_agua_*.pdf",
+    "XLSX": "reporte_consumo_agua_*.xlsx",
+}
+# Ubicación anterior de los reportes; la retención los migra al árbol de artefactos
+DIRECTORIOS_LEGADOS = {"CSV": Path("data4"), "PDF": Path("reports")}
+# Directorios que se escanean una única vez para construir el manifiesto inicial
+DIRECTORIOS_REPORTES = {
+    tipo: [REPORTS_ARTIFACTS_DIRS[tipo]] + ([DIRECTORIOS_LEGADOS[tipo]] if tipo in DIRECTORIOS_LEGADOS else [])
+    for tipo in PATRONES
+}
+# Se reescribe el archivo cuando las líneas obsoletas superan a las entradas vigentes
+_MIN_LINEAS_COMPACTAR = 1000
+
+
+class ReportManifest:
+    """
+    Manifiesto de reportes generados: un JSONL de solo anexado (eventos add/touch/remove)
+    con un índice en memoria. Lo escriben la API y los procesos del pool de reportes;
+    cada proceso lee solo las líneas nuevas desde su último offset, así que consultar
+    el historial o el último reporte no recorre ni hace stat de los directorios.
+    """
+
+    def __init__(self, path: str = REPORT_MANIFEST_PATH, directorios: Optional[Dict] = None):
+        self.path = Path(path)
+        self._lock_path = self.path.with_name(self.path.name + ".lock")
+        self._directorios = directorios if directorios is not None else DIRECTORIOS_REPORTES
+        self._lock = threading.RLock()
+        self._reiniciar_indice()
+
+    def _reiniciar_indice(self):
+        self._entradas: Dict[str, Dict] = {}          # filename -> entrada vigente
+        self._orden: List[Tuple[int, str]] = []       # (secuencia, filename) por orden de alta
+        self._ultimo: Dict[str, str] = {}             # tipo -> filename con la última actividad
+        self._secuencia = 0
+        self._lineas = 0
+        self._offset = 0
+        self._inodo = None
+
+    # --- Archivo ---
+
+    @contextmanager
+    def _bloqueo(self):
+        """Exclusión entre procesos para anexar, construir o compactar el manifiesto."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self._lock_path, "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _anexar(self, evento: Dict):
+        linea = json.dumps(evento, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._bloqueo():
+            if not self.path.exists():
+                self._construir()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(linea)
+
+    def _construir(self):
+        """Manifiesto inicial a partir de los reportes que ya existen en disco (requiere _bloqueo)."""
+        entradas = []
+        for tipo, directorios in self._directorios.items():
+            for directorio in directorios:
+                if not directorio.exists():
+                    continue
+                for archivo in directorio.glob(PATRONES[tipo]):
+                    stat = archivo.stat()
+                    entradas.append(_entrada(tipo, archivo, stat.st_size, stat.st_mtime))
+        entradas.sort(key=lambda e: e["creado"])
+        self._escribir([{"op": "add", "entrada": e} for e in entradas])
+
+    def _escribir(self, eventos: List[Dict]):
+        temporal = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        with open(temporal, "w", encoding="utf-8") as f:
+            for evento in eventos:
+                f.write(json.dumps(evento, ensure_ascii=False, separators=(",", ":")) + "\n")
+        os.replace(temporal, self.path)
+
+    def _sincronizar(self):
+        """Aplica las líneas nuevas del archivo; si fue reemplazado (compactado), lo relee entero."""
+        if not self.path.exists():
+            with self._bloqueo():
+                if not self.path.exists():
+                    self._construir()
+        stat = self.path.stat()
+        if stat.st_ino != self._inodo or stat.st_size < self._offset:
+            self._reiniciar_indice()
+            self._inodo = stat.st_ino
+        if stat.st_size == self._offset:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            datos = f.read()
+        completas = datos[:datos.rfind(b"\n") + 1]  # una línea a medio escribir se lee la próxima vez
+        for linea in completas.splitlines():
+            if linea.strip():
+                self._aplicar(json.loads(linea))
+                self._lineas += 1
+        self._offset += len(completas)
+
+    def _aplicar(self, evento: Dict):
+        op = evento["op"]
+        if op == "add":
+            entrada = dict(evento["entrada"])
+            self._secuencia += 1
+            entrada["_secuencia"] = self._secuencia
+            self._entradas[entrada["filename"]] = entrada
+            self._orden.append((self._secuencia, entrada["filename"]))
+            self._ultimo[entrada["type"]] = entrada["filename"]
+        elif op == "touch":
+            entrada = self._entradas.get(evento["filename"])
+            if entrada is not None:
+                entrada["usado"] = evento["ts"]
+                self._ultimo[entrada["type"]] = entrada["filename"]
+        elif op == "move":
+            entrada = self._entradas.get(evento["filename"])
+            if entrada is not None:
+                entrada["path"] = evento["path"]
+        elif op == "remove":
+            entrada = self._entradas.pop(evento["filename"], None)
+            if entrada is not None and self._ultimo.get(entrada["type"]) == entrada["filename"]:
+                self._recalcular_ultimo(entrada["type"])
+
+    def _recalcular_ultimo(self, tipo: str):
+        candidatas = [e for e in self._entradas.values() if e["type"] == tipo]
+        if candidatas:
+            self._ultimo[tipo] = max(candidatas, key=lambda e: e.get("usado") or e["creado"])["filename"]
+        else:
+            self._ultimo.pop(tipo, None)
+
+    def _vigente(self, secuencia: int, filename: str) -> Optional[Dict]:
+        entrada = self._entradas.get(filename)
+        return entrada if entrada is not None and entrada["_secuencia"] == secuencia else None
+
+    # --- API ---
+
+    def registrar(self, tipo: str, filepath: Path, params: Optional[Dict] = None, clave: Optional[str] = None):
+        """Alta de un reporte recién escrito (la llama el generador, también desde el pool)."""
+        filepath = Path(filepath)
+        entrada = _entrada(tipo, filepath, filepath.stat().st_size, time.time(), params, clave)
+        self._anexar({"op": "add", "entrada": entrada})
+
+    def tocar(self, filename: str):
+        """Marca un reporte reutilizado como el más reciente de su tipo."""
+        self._anexar({"op": "touch", "filename": filename, "ts": time.time()})
+
+    def mover(self, filename: str, path: Path):
+        """Registra la nueva ubicación de un reporte (migración al árbol de artefactos)."""
+        self._anexar({"op": "move", "filename": filename, "path": str(path)})
+
+    def eliminar(self, filename: str):
+        self._anexar({"op": "remove", "filename": filename})
+
+    def obtener(self, filename: str) -> Optional[Dict]:
+        with self._lock:
+            self._sincronizar()
+            entrada = self._entradas.get(filename)
+            return _publica(entrada) if entrada is not None else None
+
+    def vigentes(self, tipo: Optional[str] = None) -> List[Dict]:
+        """
+        Entradas vigentes con su última actividad ("ultimo_uso": creación o última
+        reutilización, en segundos epoch), de la menos a la más reciente.
+        """
+        with self._lock:
+            self._sincronizar()
+            entradas = [
+                {**_publica(e), "ultimo_uso": e.get("usado") or e["creado"]}
+                for e in self._entradas.values() if tipo is None or e["type"] == tipo
+            ]
+        return sorted(entradas, key=lambda e: e["ultimo_uso"])
+
+    def ultimo(self, tipo: str) -> Optional[Dict]:
+        """Último reporte generado o reutilizado del tipo, en O(1)."""
+        with self._lock:
+            self._sincronizar()
+            filename = self._ultimo.get(tipo)
+            entrada = self._entradas.get(filename) if filename else None
+        if entrada is not None and not Path(entrada["path"]).exists():
+            self.eliminar(filename)  # borrado por fuera del manifiesto
+            return self.ultimo(tipo)
+        return _publica(entrada) if entrada is not None else None
+
+    def consultar(
+        self,
+        tipo: Optional[str] = None,
+        desde: Optional[datetime] = None,
+        hasta: Optional[datetime] = None,
+        params: Optional[Dict] = None,
+        limite: Optional[int] = 100,
+        offset: int = 0,
+    ) -> Dict:
+        """
+        Historial paginado, del más reciente al más antiguo, filtrado por tipo,
+        rango de fechas de creación y valores exactos de los parámetros de la predicción.
+        """
+        desde_ts = desde.timestamp() if desde else None
+        hasta_ts = hasta.timestamp() if hasta else None
+        filtros = {k: v for k, v in (params or {}).items() if v is not None}
+        with self._lock:
+            self._sincronizar()
+            self._compactar_si_conviene()
+            total, items = 0, []
+            for secuencia, filename in reversed(self._orden):
+                entrada = self._vigente(secuencia, filename)
+                if entrada is None or (tipo and entrada["type"] != tipo):
+                    continue
+                if (desde_ts and entrada["creado"] < desde_ts) or (hasta_ts and entrada["creado"] > hasta_ts):
+                    continue
+                if filtros and any((entrada.get("params") or {}).get(k) != v for k, v in filtros.items()):
+                    continue
+                if total >= offset and (limite is None or len(items) < limite):
+                    items.append(_publica(entrada))
+                total += 1
+        return {"total": total, "limit": limite, "offset": offset, "items": items}
+
+    def _compactar_si_conviene(self):
+        obsoletas = self._lineas - len(self._entradas)
+        if obsoletas < max(_MIN_LINEAS_COMPACTAR, len(self._entradas)):
+            return
+        with self._bloqueo():
+            self._sincronizar()
+            vigentes = sorted(self._entradas.values(), key=lambda e: e["_secuencia"])
+            eventos = [{"op": "add", "entrada": {k: v for k, v in e.items() if k != "_secuencia"}} for e in vigentes]
+            # El último de cada tipo se restaura con un touch al final
+            for filename in self._ultimo.values():
+                entrada = self._entradas[filename]
+                eventos.append({"op": "touch", "filename": filename, "ts": entrada.get("usado") or entrada["creado"]})
+            self._escribir(eventos)
+        self._reiniciar_indice()
+        self._sincronizar()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._sincronizar()
+            por_tipo: Dict[str, int] = {}
+            for entrada in self._entradas.values():
+                por_tipo[entrada["type"]] = por_tipo.get(entrada["type"], 0) + 1
+            return {"reportes": len(self._entradas), "por_tipo": por_tipo, "lineas": self._lineas, "archivo": str(self.path)}
+
+
+def _entrada(tipo: str, path: Path, size: int, creado: float, params: Optional[Dict] = None, clave: Optional[str] = None) -> Dict:
+    return {
+        "filename": path.name,
+        "type": tipo,
+        "path": str(path),
+        "size": size,
+        "creado": creado,
+        "params": params,
+        "clave": clave,
+    }
+
+
+def _publica(entrada: Dict) -> Dict:
+    """Formato del historial de reportes (mismos campos que devolvía el escaneo de directorios)."""
+    return {
+        "filename": entrada["filename"],
+        "type": entrada["type"],
+        "path": entrada["path"],
+        "size": entrada["size"],
+        "created": datetime.fromtimestamp(entrada["creado"]).strftime('%Y-%m-%d %H:%M:%S'),
+        "params": entrada.get("params"),
+        "clave": entrada.get("clave"),
+    }
+
+
+report_manifest = ReportManifest()
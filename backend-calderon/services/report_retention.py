@@ -0,0 +1,223 @@
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin exclusión entre procesos
+    fcntl = None
+
+from core.config import (
+    REPORTS_ARTIFACTS_DIRS,
+    REPORT_RETENTION,
+    REPORT_RETENTION_INTERVAL_SECONDS,
+    REPORT_RETENTION_BATCH,
+    REPORT_RETENTION_PAUSE_SECONDS,
+)
+from services.report_artifacts import ReportArtifacts, report_artifacts
+from services.report_manifest import ReportManifest, report_manifest
+
+# Temporales de escritura (.reporte_*.tmp) que dejó un proceso caído
+_TEMPORAL_MAX_SEGUNDOS = 3600
+
+
+def _bajar_prioridad():
+    """
+    Baja la prioridad del hilo actual. En Linux el nice es por hilo y, sin una clase
+    de E/S explícita, el planificador de disco deriva de él la prioridad de E/S.
+    """
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+    except (AttributeError, OSError):
+        pass
+
+
+class ReportRetention:
+    """
+    Retención de reportes generados. En cada pasada:
+      1. mueve al árbol de artefactos los reportes que siguen en data4/ o reports/;
+      2. borra los que superan la antigüedad máxima de su tipo (según su último uso);
+      3. si el tipo supera su cuota de espacio, borra los menos usados recientemente;
+      4. elimina temporales de escritura abandonados.
+    El más reciente de cada tipo se conserva siempre (lo usa el chatbot). Todo se
+    decide con el manifiesto, sin recorrer directorios, y cada borrado o movimiento
+    se refleja en el manifiesto y en el índice de artefactos.
+    """
+
+    def __init__(
+        self,
+        manifiesto: Optional[ReportManifest] = None,
+        artefactos: Optional[ReportArtifacts] = None,
+        politicas: Optional[Dict] = None,
+        destinos: Optional[Dict] = None,
+        intervalo: float = REPORT_RETENTION_INTERVAL_SECONDS,
+        tanda: int = REPORT_RETENTION_BATCH,
+        pausa: float = REPORT_RETENTION_PAUSE_SECONDS,
+    ):
+        self.manifiesto = manifiesto if manifiesto is not None else report_manifest
+        self.artefactos = artefactos if artefactos is not None else report_artifacts
+        self.politicas = politicas if politicas is not None else REPORT_RETENTION
+        self.destinos = destinos if destinos is not None else REPORTS_ARTIFACTS_DIRS
+        self.intervalo = intervalo
+        self.tanda = max(1, tanda)
+        self.pausa = pausa
+        self._lock_path = self.manifiesto.path.with_name("report_retention.lock")
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self._operaciones = 0
+        self.ultima: Optional[Dict] = None
+        self.pasadas = 0
+
+    # --- Pasada ---
+
+    @contextmanager
+    def _exclusivo(self):
+        """Con varios procesos de la API, solo uno aplica la retención a la vez."""
+        self._lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self._lock_path, "a") as f:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    yield False
+                    return
+            try:
+                yield True
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def ejecutar(self) -> Dict:
+        """Una pasada completa; devuelve lo que se movió y borró."""
+        inicio = time.perf_counter()
+        resumen = {"migrados": 0, "eliminados": 0, "liberados_bytes": 0, "temporales": 0, "por_motivo": {}}
+        with self._exclusivo() as propio:
+            if not propio:
+                return {**resumen, "omitida": "otro proceso está aplicando la retención"}
+            for tipo, destino in self.destinos.items():
+                self._migrar(tipo, Path(destino), resumen)
+                self._aplicar_politica(tipo, self.politicas.get(tipo, {}), resumen)
+                self._limpiar_temporales(Path(destino), resumen)
+        resumen["duracion_s"] = round(time.perf_counter() - inicio, 3)
+        resumen["fecha"] = time.time()
+        self.ultima = resumen
+        self.pasadas += 1
+        return resumen
+
+    def _ceder(self):
+        """Reparte la E/S en tandas para no competir con las peticiones."""
+        self._operaciones += 1
+        if self._operaciones % self.tanda == 0 and self.pausa > 0:
+            self._detener.wait(self.pausa)
+
+    def _migrar(self, tipo: str, destino: Path, resumen: Dict):
+        for entrada in self.manifiesto.vigentes(tipo):
+            origen = Path(entrada["path"])
+            if origen.parent == destino:
+                continue
+            nueva = destino / entrada["filename"]
+            try:
+                destino.mkdir(parents=True, exist_ok=True)
+                shutil.move(str(origen), str(nueva))  # rename si es el mismo sistema de archivos
+            except FileNotFoundError:
+                self._olvidar(entrada)
+                continue
+            self.manifiesto.mover(entrada["filename"], nueva)
+            if entrada.get("clave"):
+                self.artefactos.reubicar(entrada["clave"], nueva)
+            resumen["migrados"] += 1
+            self._ceder()
+
+    def _aplicar_politica(self, tipo: str, politica: Dict, resumen: Dict):
+        entradas = self.manifiesto.vigentes(tipo)  # del menos al más recientemente usado
+        if len(entradas) <= 1:
+            return
+        conservar = entradas.pop()  # el más reciente nunca se borra
+        max_dias = politica.get("max_dias") or 0
+        max_bytes = (politica.get("max_mb") or 0) * 1024 * 1024
+
+        if max_dias > 0:
+            limite = time.time() - max_dias * 86400
+            while entradas and entradas[0]["ultimo_uso"] < limite:
+                self._borrar(entradas.pop(0), "antiguedad", resumen)
+
+        if max_bytes > 0:
+            ocupado = conservar["size"] + sum(e["size"] for e in entradas)
+            while entradas and ocupado > max_bytes:
+                entrada = entradas.pop(0)
+                ocupado -= entrada["size"]
+                self._borrar(entrada, "cuota", resumen)
+
+    def _borrar(self, entrada: Dict, motivo: str, resumen: Dict):
+        Path(entrada["path"]).unlink(missing_ok=True)
+        self._olvidar(entrada)
+        resumen["eliminados"] += 1
+        resumen["liberados_bytes"] += entrada["size"]
+        resumen["por_motivo"][motivo] = resumen["por_motivo"].get(motivo, 0) + 1
+        self._ceder()
+
+    def _olvidar(self, entrada: Dict):
+        self.manifiesto.eliminar(entrada["filename"])
+        if entrada.get("clave"):
+            self.artefactos.descartar(entrada["clave"])
+
+    def _limpiar_temporales(self, destino: Path, resumen: Dict):
+        if not destino.exists():
+            return
+        limite = time.time() - _TEMPORAL_MAX_SEGUNDOS
+        for temporal in destino.glob(".reporte_consumo_agua_*.tmp"):
+            try:
+                if temporal.stat().st_mtime < limite:
+                    temporal.unlink()
+                    resumen["temporales"] += 1
+            except FileNotFoundError:
+                pass
+
+    # --- Hilo en segundo plano ---
+
+    def _bucle(self):
+        _bajar_prioridad()
+        while not self._detener.is_set():
+            try:
+                resumen = self.ejecutar()
+                if resumen["migrados"] or resumen["eliminados"]:
+                    print(f"[RETENCION] {resumen}")
+            except Exception as e:
+                self.ultima = {"error": str(e), "fecha": time.time()}
+                print(f"[RETENCION] error: {e}")
+            self._detener.wait(self.intervalo)
+
+    def iniciar(self) -> threading.Thread:
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._bucle, name="report-retention", daemon=True)
+            self._hilo.start()
+        return self._hilo
+
+    def detener(self, timeout: float = 5.0):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=timeout)
+            self._hilo = None
+
+    def stats(self) -> Dict:
+        ocupado: Dict[str, Dict] = {}
+        for entrada in self.manifiesto.vigentes():
+            tipo = ocupado.setdefault(entrada["type"], {"reportes": 0, "bytes": 0})
+            tipo["reportes"] += 1
+            tipo["bytes"] += entrada["size"]
+        return {
+            "activa": self._hilo is not None and self._hilo.is_alive(),
+            "intervalo_s": self.intervalo,
+            "politicas": self.politicas,
+            "ocupado": ocupado,
+            "pasadas": self.pasadas,
+            "ultima_pasada": self.ultima,
+        }
+
+
+report_retention = ReportRetention()
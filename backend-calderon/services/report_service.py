@@ -2,52 +2,61 @@ import os
 import pandas as pd
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email import encoders
+from typing import Callable, Dict, List, Optional, Union
 
-# ReportLab imports
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from reportlab.lib.enums import TA_CENTER
+# ReportLab (services.pdf_templates) se importa dentro de generate_pdf_report para no cargarlo al arrancar la API
 
-# Importar función de email
-from core.config_mail import enviar_correo_con_adjunto
+from core.config import REPORTS_ARTIFACTS_DIRS
+
+# Bandeja de salida de correos (envío con reintentos por conexiones SMTP reutilizadas)
+from services.email_outbox import email_outbox
 
 # Importar servicio de consumo
 from services.consumption_service import forecast_future
+from services.report_manifest import report_manifest, DIRECTORIOS_LEGADOS
+
+# Configuración de directorios (los reportes ya no se escriben en data4/, que guarda los datos fuente)
+CSV_REPORTS_DIR = REPORTS_ARTIFACTS_DIRS["CSV"]
+REPORTS_DIR = REPORTS_ARTIFACTS_DIRS["PDF"]
+
+
+# Callback opcional de avance (porcentaje, etapa) usado por la cola de trabajos de reportes
+Progreso = Optional[Callable[[int, str], None]]
 
-# Configuración de directorios
-DATA_DIR = Path("data4")
-REPORTS_DIR = Path("reports")
+def _timestamp() -> str:
+    return datetime.now().strftime("%Y%m%d_%H%M%S")
 
-# Crear directorio de reportes si no existe
-REPORTS_DIR.mkdir(exist_ok=True)
+def _params_reporte(months_ahead, start_year, start_month, poblacion_estimada, precipitacion_promedio) -> Dict:
+    return {
+        "months_ahead": months_ahead,
+        "start_year": start_year,
+        "start_month": start_month,
+        "poblacion_estimada": poblacion_estimada,
+        "precipitacion_promedio": precipitacion_promedio,
+    }
 
-# Configuración de email desde variables de entorno (compatibilidad con ambas configuraciones)
-EMAIL_HOST = os.getenv("EMAIL_HOST") or os.getenv("SMTP_HOST", "smtp.gmail.com")
-EMAIL_PORT = int(os.getenv("EMAIL_PORT") or os.getenv("SMTP_PORT", 587))
-EMAIL_USER = os.getenv("EMAIL_USER") or os.getenv("SMTP_USER")
-EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD") or os.getenv("SMTP_PASSWORD")
+def _ruta_temporal(filepath: Path) -> Path:
+    return filepath.with_name(f".{filepath.name}.{os.getpid()}.tmp")
+
+def _avisar(progreso: Progreso, porcentaje: int, etapa: str):
+    if progreso is not None:
+        progreso(porcentaje, etapa)
 
 def generate_csv_report(
     months_ahead: int,
     start_year: Optional[int] = None,
     start_month: Optional[int] = None,
     poblacion_estimada: Optional[float] = None,
-    precipitacion_promedio: Optional[float] = None
+    precipitacion_promedio: Optional[float] = None,
+    progreso: Progreso = None,
+    report_id: Optional[str] = None
 ) -> Dict:
     """
     Genera un reporte CSV con las predicciones de consumo de agua
     """
     try:
         # Obtener predicciones
+        _avisar(progreso, 10, "prediciendo")
         predictions = forecast_future(
             months_ahead=months_ahead,
             start_year=start_year,
@@ -65,13 +74,19 @@ def generate_csv_report(
         df['mes_nombre'] = df['fecha'].dt.strftime('%B')
         df['consumo_predicho_m3'] = df['consumo_predicho'].round(2)
         
+        _avisar(progreso, 60, "guardando")
         # Generar nombre de archivo
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"reporte_consumo_agua_{timestamp}.csv"
-        filepath = DATA_DIR / filename
-        
-        # Guardar CSV
-        df[['anio', 'mes', 'mes_nombre', 'fecha', 'consumo_predicho_m3']].to_csv(filepath, index=False)
+        filename = f"reporte_consumo_agua_{report_id or _timestamp()}.csv"
+        CSV_REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+        filepath = CSV_REPORTS_DIR / filename
+        
+        # Guardar CSV (archivo temporal + rename: nunca se lee un reporte a medio escribir)
+        temporal = _ruta_temporal(filepath)
+        df[['anio', 'mes', 'mes_nombre', 'fecha', 'consumo_predicho_m3']].to_csv(temporal, index=False)
+        os.replace(temporal, filepath)
+        report_manifest.registrar("CSV", filepath, _params_reporte(
+            months_ahead, start_year, start_month, poblacion_estimada, precipitacion_promedio
+        ), report_id)
         
         # Calcular estadísticas
         total_consumo = df['consumo_predicho_m3'].sum()
@@ -84,8 +99,7 @@ def generate_csv_report(
             "total_records": len(df),
             "total_consumo_predicho": round(total_consumo, 2),
             "promedio_consumo_predicho": round(promedio_consumo, 2),
-            "periodo": f"{df['anio'].min()}-{df['mes'].min():02d} a {df['anio'].max()}-{df['mes'].max():02d}",
-            "data": df.to_dict('records')
+            "periodo": f"{df['anio'].min()}-{df['mes'].min():02d} a {df['anio'].max()}-{df['mes'].max():02d}"
         }
         
     except Exception as e:
@@ -96,13 +110,16 @@ def generate_pdf_report(
     start_year: Optional[int] = None,
     start_month: Optional[int] = None,
     poblacion_estimada: Optional[float] = None,
-    precipitacion_promedio: Optional[float] = None
+    precipitacion_promedio: Optional[float] = None,
+    progreso: Progreso = None,
+    report_id: Optional[str] = None
 ) -> Dict:
     """
     Genera un reporte PDF con las predicciones de consumo de agua
     """
     try:
         # Obtener predicciones
+        _avisar(progreso, 10, "prediciendo")
         predictions = forecast_future(
             months_ahead=months_ahead,
             start_year=start_year,
@@ -120,128 +137,50 @@ def generate_pdf_report(
         df['mes_nombre'] = df['fecha'].dt.strftime('%B')
         df['consumo_predicho_m3'] = df['consumo_predicho'].round(2)
         
+        _avisar(progreso, 40, "maquetando")
+        from services.pdf_templates import construir_reporte
+
         # Generar nombre de archivo
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"reporte_consumo_agua_{timestamp}.pdf"
+        filename = f"reporte_consumo_agua_{report_id or _timestamp()}.pdf"
+        REPORTS_DIR.mkdir(parents=True, exist_ok=True)
         filepath = REPORTS_DIR / filename
         
-        # Crear documento PDF
-        doc = SimpleDocTemplate(str(filepath), pagesize=A4)
-        styles = getSampleStyleSheet()
-        story = []
-        
-        # Título
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            spaceAfter=30,
-            alignment=TA_CENTER,
-            textColor=colors.darkblue
-        )
-        title = Paragraph("Reporte de Predicción de Consumo de Agua", title_style)
-        story.append(title)
-        story.append(Spacer(1, 20))
-        
-        # Información del reporte
-        info_style = ParagraphStyle(
-            'Info',
-            parent=styles['Normal'],
-            fontSize=10,
-            spaceAfter=20
-        )
-        
-        total_consumo = df['consumo_predicho_m3'].sum()
-        promedio_consumo = df['consumo_predicho_m3'].mean()
-        
-        info_text = f"""
-        <b>Información del Reporte:</b><br/>
-        • Fecha de generación: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}<br/>
-        • Período de predicción: {df['anio'].min()}-{df['mes'].min():02d} a {df['anio'].max()}-{df['mes'].max():02d}<br/>
-        • Total de meses predichos: {len(df)}<br/>
-        • Consumo total predicho: {total_consumo:,.2f} m³<br/>
-        • Consumo promedio mensual: {promedio_consumo:,.2f} m³<br/>
-        • Población estimada: {poblacion_estimada or 'No especificada'}<br/>
-        • Precipitación promedio: {precipitacion_promedio or 'No especificada'} mm
-        """
-        
-        info_paragraph = Paragraph(info_text, info_style)
-        story.append(info_paragraph)
-        story.append(Spacer(1, 20))
-        
-        # Tabla de predicciones
-        table_data = [['Año', 'Mes', 'Consumo Predicho (m³)']]
-        
-        for _, row in df.iterrows():
-            table_data.append([
-                str(int(row['anio'])),
-                row['mes_nombre'],
-                f"{row['consumo_predicho_m3']:,.2f}"
-            ])
-        
-        # Crear tabla
-        table = Table(table_data, colWidths=[1*inch, 2*inch, 2*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        story.append(table)
-        story.append(Spacer(1, 20))
-        
-        # Resumen
-        summary_style = ParagraphStyle(
-            'Summary',
-            parent=styles['Normal'],
-            fontSize=11,
-            spaceAfter=20
-        )
-        
-        summary_text = f"""
-        <b>Resumen:</b><br/>
-        El modelo de predicción ha generado un reporte para los próximos {len(df)} meses, 
-        con un consumo total estimado de {total_consumo:,.2f} metros cúbicos de agua. 
-        El consumo promedio mensual se estima en {promedio_consumo:,.2f} m³.
-        """
-        
-        summary_paragraph = Paragraph(summary_text, summary_style)
-        story.append(summary_paragraph)
-        
-        # Generar PDF
-        doc.build(story)
+        # Maquetar y generar el PDF (estilos cacheados, tabla paginada y gráficos del pronóstico)
+        temporal = _ruta_temporal(filepath)
+        _avisar(progreso, 70, "renderizando")
+        resumen = construir_reporte(df, temporal, poblacion_estimada, precipitacion_promedio)
+        os.replace(temporal, filepath)
+        report_manifest.registrar("PDF", filepath, _params_reporte(
+            months_ahead, start_year, start_month, poblacion_estimada, precipitacion_promedio
+        ), report_id)
         
         return {
             "success": True,
             "filename": filename,
             "filepath": str(filepath),
             "total_records": len(df),
-            "total_consumo_predicho": round(total_consumo, 2),
-            "promedio_consumo_predicho": round(promedio_consumo, 2),
-            "periodo": f"{df['anio'].min()}-{df['mes'].min():02d} a {df['anio'].max()}-{df['mes'].max():02d}"
+            "total_consumo_predicho": round(resumen["total_consumo"], 2),
+            "promedio_consumo_predicho": round(resumen["promedio_consumo"], 2),
+            "periodo": resumen["periodo"]
         }
         
     except Exception as e:
         return {"error": f"Error generando reporte PDF: {str(e)}"}
 
 def send_email_with_pdf(
-    email_to: str,
+    email_to: Union[str, List[str]],
     subject: str,
     body: str,
     pdf_filepath: str
 ) -> Dict:
     """
-    Envía un email con el reporte PDF adjunto usando la función de config_mail
+    Encola un email con el reporte PDF adjunto en la bandeja de salida persistente.
+    Con una lista de destinatarios el mismo PDF se envía a cada uno en su propio correo.
     """
     try:
-        print(f"Intentando enviar email a: {email_to}")
+        destinatarios = [email_to] if isinstance(email_to, str) else list(email_to)
+        print(f"Encolando email a: {', '.join(destinatarios)}")
         print(f"Archivo PDF: {pdf_filepath}")
-        print(f"Configuración de email - Host: {EMAIL_HOST}, Port: {EMAIL_PORT}, User: {EMAIL_USER}")
         
         # Verificar que el archivo PDF existe
         if not os.path.exists(pdf_filepath):
@@ -249,58 +188,93 @@ def send_email_with_pdf(
             print(error_msg)
             return {"error": error_msg}
         
-        # Usar la función de config_mail
-        success = enviar_correo_con_adjunto(subject, body, pdf_filepath, email_to)
-        
-        if success:
-            return {
-                "success": True,
-                "message": f"Email enviado exitosamente a {email_to}",
-                "filename": os.path.basename(pdf_filepath)
-            }
-        else:
+        if not email_outbox.pool.configurado:
             return {"error": "No se pudo enviar el email. Revisa la configuración de SMTP."}
         
+        encolado = email_outbox.encolar(destinatarios, subject, body, adjunto=str(pdf_filepath))
+        return {
+            "success": True,
+            "message": f"Email encolado para {', '.join(encolado['destinatarios'])}",
+            "filename": os.path.basename(pdf_filepath),
+            "lote": encolado["lote"],
+            "mensajes": encolado["mensajes"]
+        }
+        
     except Exception as e:
-        error_msg = f"Error enviando email: {str(e)}"
+        error_msg = f"Error encolando email: {str(e)}"
         print(error_msg)
         return {"error": error_msg}
 
-def get_report_history() -> List[Dict]:
+def generate_pdf_report_and_send(
+    email_to: Union[str, List[str]],
+    subject: str,
+    body: str,
+    progreso: Progreso = None,
+    report_id: Optional[str] = None,
+    **forecast_params
+) -> Dict:
+    """
+    Genera el reporte PDF una sola vez y lo encola por email para uno o varios
+    destinatarios (trabajo de la cola de reportes).
+    Con `report_id` reutiliza el PDF si ya se generó con el mismo contenido.
+    """
+    from services.report_artifacts import report_artifacts
+
+    pdf_result = report_artifacts.buscar(report_id) if report_id else None
+    if pdf_result is None:
+        pdf_result = generate_pdf_report(progreso=progreso, report_id=report_id, **forecast_params)
+        if "error" in pdf_result:
+            return pdf_result
+        if report_id:
+            report_artifacts.guardar(report_id, pdf_result)
+
+    _avisar(progreso, 90, "encolando email")
+    email_result = send_email_with_pdf(email_to, subject, body, pdf_result["filepath"])
+    if "error" in email_result:
+        return {"error": f"PDF {pdf_result['filename']} generado, pero falló el envío: {email_result['error']}"}
+
+    return {
+        "pdf_report": pdf_result,
+        "email_sent_to": email_to,
+        "email_batch": email_result["lote"]
+    }
+
+def resolve_report_path(tipo: str, filename: str) -> Optional[Path]:
     """
-    Obtiene el historial de reportes generados
+    Ubicación de un reporte para descargarlo: la del manifiesto y, si no figura,
+    el árbol de artefactos o el directorio anterior (reportes aún sin migrar)
+    """
+    if not filename.startswith("reporte_consumo_agua_") or Path(filename).name != filename:
+        return None
+    entrada = report_manifest.obtener(filename)
+    candidatos = [Path(entrada["path"])] if entrada and entrada["type"] == tipo else []
+    candidatos.append(REPORTS_ARTIFACTS_DIRS[tipo] / filename)
+    if tipo in DIRECTORIOS_LEGADOS:
+        candidatos.append(DIRECTORIOS_LEGADOS[tipo] / filename)
+    return next((ruta for ruta in candidatos if ruta.is_file()), None)
+
+def get_report_history(tipo: Optional[str] = None) -> List[Dict]:
+    """
+    Obtiene el historial completo de reportes generados (más reciente primero)
     """
     try:
-        reports = []
-        
-        # Buscar reportes CSV en data4
-        csv_files = list(DATA_DIR.glob("reporte_consumo_agua_*.csv"))
-        for file in csv_files:
-            stats = file.stat()
-            reports.append({
-                "filename": file.name,
-                "type": "CSV",
-                "path": str(file),
-                "size": stats.st_size,
-                "created": datetime.fromtimestamp(stats.st_ctime).strftime('%Y-%m-%d %H:%M:%S')
-            })
-        
-        # Buscar reportes PDF en reports
-        pdf_files = list(REPORTS_DIR.glob("reporte_consumo_agua_*.pdf"))
-        for file in pdf_files:
-            stats = file.stat()
-            reports.append({
-                "filename": file.name,
-                "type": "PDF",
-                "path": str(file),
-                "size": stats.st_size,
-                "created": datetime.fromtimestamp(stats.st_ctime).strftime('%Y-%m-%d %H:%M:%S')
-            })
-        
-        # Ordenar por fecha de creación (más reciente primero)
-        reports.sort(key=lambda x: x['created'], reverse=True)
-        
-        return reports
-        
+        return report_manifest.consultar(tipo=tipo, limite=None)["items"]
+    except Exception as e:
+        return [{"error": f"Error obteniendo historial: {str(e)}"}]
+
+def query_report_history(
+    tipo: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    params: Optional[Dict] = None,
+    limit: Optional[int] = 100,
+    offset: int = 0
+) -> Dict:
+    """
+    Historial paginado de reportes desde el manifiesto, filtrado por tipo ("CSV"/"PDF"),
+    rango de fechas de creación y parámetros de la predicción
+    """
+    try:
+        return report_manifest.consultar(tipo, desde, hasta, params, limit, offset)
     except Exception as e:
-        return [{"error": f"Error obteniendo historial: {str(e)}"}] 
\ No newline at end of file
+        return {"error": f"Error obteniendo historial: {str(e)}"}
@@ -0,0 +1,285 @@
+import hashlib
+import os
+import tempfile
+import threading
+import unicodedata
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+from urllib.parse import unquote
+
+import numpy as np
+import pandas as pd
+
+from core.cache import SingleFlight, TTLCache
+from core.config import DATA_DIRS, SERIES_CACHE_DIR, SERIES_STORE_MAX_TABLAS
+from core.metrics import PARSEO_DURACION
+from services.climate_stats import meses_absolutos
+
+_MESES_XLSX = ["ENE", "FEB", "MAR", "ABR", "MAY", "JUN", "JUL", "AGO", "SEP", "OCT", "NOV", "DIC"]
+_NA_VALUES = ["", " ", "NaN", "nan", "--"]
+
+
+@dataclass
+class TablaSeries:
+    """Serie de una fuente en formato columnar: fechas ordenadas y una columna por estación."""
+    fechas: np.ndarray                 # datetime64[D]
+    columnas: Dict[str, np.ndarray]    # float64, NaN = sin dato
+    mensual: bool
+
+
+def _nfc(texto: str) -> str:
+    return unicodedata.normalize("NFC", texto)
+
+
+def _columnas_numericas(df: pd.DataFrame, nombres: List[str]) -> Dict[str, np.ndarray]:
+    return {
+        nombre: pd.to_numeric(
+            df[nombre].astype(str).str.replace(",", ".", regex=False), errors="coerce"
+        ).to_numpy(dtype=np.float64)
+        for nombre in nombres
+    }
+
+
+def _leer_csv(path: Path) -> TablaSeries:
+    df = pd.read_csv(path, na_values=_NA_VALUES)
+    if "fecha" in df.columns and "valor" in df.columns:
+        # data/: una estación por archivo, fechas AAAA/MM/DD
+        fechas = pd.to_datetime(df["fecha"], format="%Y/%m/%d", errors="coerce")
+        columnas = _columnas_numericas(df, ["valor"])
+        mensual = False
+    elif "Fecha" in df.columns:
+        # data3/: una columna por estación, fechas AAAA-MM-DD
+        fechas = pd.to_datetime(df["Fecha"], format="%Y-%m-%d", errors="coerce")
+        columnas = _columnas_numericas(df, [c for c in df.columns if c != "Fecha"])
+        mensual = "_Mensual_" in _nfc(path.name)
+    else:
+        raise ValueError("El CSV no tiene columnas 'fecha'/'valor' ni 'Fecha' + estaciones")
+    return _ordenar(fechas.to_numpy(dtype="datetime64[D]"), columnas, mensual)
+
+
+def _leer_xlsx(path: Path) -> TablaSeries:
+    # data2/: registro multianual (fila AÑO, ENE..DIC) que se aplana a una serie mensual
+    crudo = pd.read_excel(path, header=None)
+    fila = next((i for i, row in crudo.iterrows() if "AÑO" in row.values), None)
+    if fila is None:
+        raise ValueError("No se encontró la fila con los encabezados (AÑO, ENE, ... DIC)")
+    df = pd.read_excel(path, header=fila)
+    faltan = [c for c in ["AÑO", *_MESES_XLSX] if c not in df.columns]
+    if faltan:
+        raise ValueError(f"Faltan columnas en el archivo: {faltan}")
+    df = df[df["AÑO"].apply(lambda x: str(x).isdigit())]
+    anios = df["AÑO"].astype(int).to_numpy()
+    valores = np.column_stack(list(_columnas_numericas(df, _MESES_XLSX).values())).ravel()
+    meses = (np.repeat(anios - 1970, 12) * 12 + np.tile(np.arange(12), len(anios))).astype("datetime64[M]")
+    return _ordenar(meses.astype("datetime64[D]"), {"valor": valores}, True)
+
+
+def _ordenar(fechas: np.ndarray, columnas: Dict[str, np.ndarray], mensual: bool) -> TablaSeries:
+    validas = ~np.isnat(fechas)
+    orden = np.argsort(fechas[validas], kind="stable")
+    return TablaSeries(
+        fechas=fechas[validas][orden],
+        columnas={nombre: col[validas][orden] for nombre, col in columnas.items()},
+        mensual=mensual,
+    )
+
+
+class SeriesStore:
+    """
+    Tablas de las fuentes de datos (data/, data2/, data3/) ya convertidas a arreglos
+    numpy, para resolver series en el servidor sin volver a leer ni parsear el archivo.
+    Dos niveles: memoria (LRU) y una copia columnar .npz en disco que evita parsear el
+    CSV/XLSX tras un reinicio. Ambos se invalidan si cambia el mtime o el tamaño del archivo.
+    """
+
+    def __init__(self, max_tablas: int = SERIES_STORE_MAX_TABLAS, cache_dir: Optional[str] = SERIES_CACHE_DIR):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._memoria = TTLCache(max_entries=max_tablas, ttl_seconds=0)
+        self._cargas = SingleFlight()
+        self._lock = threading.Lock()
+        self._contadores = {"memoria": 0, "columnar": 0, "lecturas": 0}
+
+    def _contar(self, origen: str):
+        with self._lock:
+            self._contadores[origen] += 1
+
+    def _ruta_columnar(self, path: Path) -> Path:
+        return self.cache_dir / f"{hashlib.sha1(str(path).encode('utf-8')).hexdigest()[:20]}.npz"
+
+    def tabla(self, path: Path) -> TablaSeries:
+        stat = path.stat()
+        firma = (stat.st_mtime_ns, stat.st_size)
+        entrada = self._memoria.get(str(path))
+        if entrada is not None and entrada[0] == firma:
+            self._contar("memoria")
+            return entrada[1]
+        tabla, _ = self._cargas.do((str(path), firma), lambda: self._cargar(path, firma))
+        return tabla
+
+    def _cargar(self, path: Path, firma: tuple) -> TablaSeries:
+        tabla = self._leer_columnar(path, firma)
+        if tabla is not None:
+            self._contar("columnar")
+        else:
+            formato = path.suffix.lower().lstrip(".")
+            with PARSEO_DURACION.medir(format=formato, source="series_store"):
+                tabla = _leer_xlsx(path) if formato == "xlsx" else _leer_csv(path)
+            self._contar("lecturas")
+            self._guardar_columnar(path, firma, tabla)
+        self._memoria.set(str(path), (firma, tabla))
+        return tabla
+
+    def _leer_columnar(self, path: Path, firma: tuple) -> Optional[TablaSeries]:
+        if not self.cache_dir:
+            return None
+        ruta = self._ruta_columnar(path)
+        try:
+            with np.load(ruta, allow_pickle=False) as npz:
+                if tuple(npz["__firma__"].tolist()) != firma:
+                    return None
+                return TablaSeries(
+                    fechas=npz["__fechas__"],
+                    columnas={k[4:]: npz[k] for k in npz.files if k.startswith("col:")},
+                    mensual=bool(npz["__mensual__"]),
+                )
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _guardar_columnar(self, path: Path, firma: tuple, tabla: TablaSeries):
+        if not self.cache_dir:
+            return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            fd, temporal = tempfile.mkstemp(dir=self.cache_dir, suffix=".npz")
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    __firma__=np.array(firma, dtype=np.int64),
+                    __fechas__=tabla.fechas,
+                    __mensual__=np.array(tabla.mensual),
+                    **{f"col:{nombre}": col for nombre, col in tabla.columnas.items()},
+                )
+            os.replace(temporal, self._ruta_columnar(path))
+        except OSError as e:
+            print(f"[WARN] No se pudo guardar la copia columnar de {path.name}: {e}")
+
+    def anexar(self, path: Path, firma_anterior: tuple, fechas: np.ndarray, columnas: Dict[str, np.ndarray]) -> bool:
+        """
+        Extiende la tabla de un archivo al que se le agregaron filas al final, sin volver a
+        parsearlo: concatena a la versión `firma_anterior` (memoria o copia columnar) y la
+        guarda con la firma actual del archivo. False si esa versión ya no estaba cacheada.
+        """
+        entrada = self._memoria.get(str(path))
+        tabla = entrada[1] if entrada is not None and entrada[0] == firma_anterior else self._leer_columnar(path, firma_anterior)
+        if tabla is None or set(columnas) != set(tabla.columnas):
+            return False
+        stat = path.stat()
+        firma = (stat.st_mtime_ns, stat.st_size)
+        nuevas = _ordenar(
+            np.asarray(fechas, dtype="datetime64[D]"),
+            {nombre: np.asarray(col, dtype=np.float64) for nombre, col in columnas.items()},
+            tabla.mensual,
+        )
+        tabla = TablaSeries(
+            fechas=np.concatenate([tabla.fechas, nuevas.fechas]),
+            columnas={nombre: np.concatenate([col, nuevas.columnas[nombre]]) for nombre, col in tabla.columnas.items()},
+            mensual=tabla.mensual,
+        )
+        self._memoria.set(str(path), (firma, tabla))
+        self._guardar_columnar(path, firma, tabla)
+        return True
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self._contadores,
+                "tablas_en_memoria": len(self._memoria),
+                "directorio_columnar": str(self.cache_dir) if self.cache_dir else None,
+            }
+
+    def clear(self):
+        self._memoria.clear()
+
+
+series_store = SeriesStore()
+
+
+def _archivo_variable(variable: str, frecuencia: str) -> Optional[Path]:
+    """Archivo de data3 de la variable y frecuencia, p. ej. 'Precipitación_Mensual__C05_....csv'."""
+    data_dir = DATA_DIRS.get("data3")
+    if data_dir is None or not data_dir.exists():
+        return None
+    prefijo = _nfc(f"{variable.replace('_', ' ')}_{frecuencia}__").casefold()
+    for archivo in sorted(data_dir.iterdir()):
+        if _nfc(archivo.name).casefold().startswith(prefijo):
+            return archivo
+    return None
+
+
+def _codigo_estacion(estacion: str) -> str:
+    # Acepta el código ("C05") o el nombre completo ("C05-Bellavista")
+    return estacion.split("-", 1)[0].strip().upper()
+
+
+def resolver_serie(
+    directorio: Optional[str] = None,
+    archivo: Optional[str] = None,
+    variable: Optional[str] = None,
+    frecuencia: str = "Mensual",
+    estaciones: Optional[List[str]] = None,
+    desde: Optional[Union[date, str]] = None,
+    hasta: Optional[Union[date, str]] = None,
+) -> Dict:
+    """
+    Resuelve en el servidor la serie de una fuente de datos, identificada por
+    directorio/archivo o por variable de data3 (+ frecuencia), opcionalmente filtrada
+    por estaciones y rango de fechas. Con varias estaciones devuelve su promedio por fecha.
+    Devuelve {"valores", "fechas", "mes_absoluto", "fuente", "estaciones"} o {"error"}.
+    """
+    if variable:
+        path = _archivo_variable(variable, frecuencia)
+        if path is None:
+            return {"error": f"No hay datos de '{variable}' con frecuencia '{frecuencia}' en data3."}
+    else:
+        data_dir = DATA_DIRS.get(directorio or "")
+        if data_dir is None:
+            return {"error": f"Directorio '{directorio}' no configurado."}
+        path = data_dir / unquote(archivo or "")
+        if not archivo or path.resolve().parent != data_dir.resolve() or not path.is_file():
+            return {"error": f"Archivo {archivo} no encontrado en '{directorio}'."}
+
+    try:
+        tabla = series_store.tabla(path)
+    except Exception as e:
+        return {"error": f"No se pudo leer {path.name}: {e}"}
+
+    if len(tabla.columnas) == 1:
+        seleccion = list(tabla.columnas)
+    elif estaciones:
+        seleccion = [_codigo_estacion(e) for e in estaciones]
+        desconocidas = [e for e in seleccion if e not in tabla.columnas]
+        if desconocidas:
+            return {"error": f"Estaciones no disponibles en {path.name}: {desconocidas}. Disponibles: {list(tabla.columnas)}"}
+    else:
+        seleccion = list(tabla.columnas)
+
+    inicio = np.searchsorted(tabla.fechas, np.datetime64(str(desde), "D")) if desde else 0
+    fin = np.searchsorted(tabla.fechas, np.datetime64(str(hasta), "D"), side="right") if hasta else len(tabla.fechas)
+
+    matriz = np.column_stack([tabla.columnas[c][inicio:fin] for c in seleccion])
+    presentes = np.isfinite(matriz)
+    cuenta = presentes.sum(axis=1)
+    con_dato = cuenta > 0
+    valores = np.where(presentes, matriz, 0.0).sum(axis=1)[con_dato] / cuenta[con_dato]
+
+    unidad = "M" if tabla.mensual else "D"
+    fechas = np.datetime_as_string(tabla.fechas[inicio:fin][con_dato], unit=unidad)
+    return {
+        "valores": valores,
+        "fechas": fechas,
+        "mes_absoluto": meses_absolutos(fechas),
+        "fuente": path.name,
+        "estaciones": seleccion if len(tabla.columnas) > 1 else [],
+    }
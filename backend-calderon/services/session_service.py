@@ -0,0 +1,248 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from core.config import (
+    CHAT_SESSIONS_MAX,
+    CHAT_SESSIONS_DB,
+    CHAT_SESSION_RECENT_TURNS,
+    CHAT_SESSION_DIGEST_MAX_TOKENS,
+)
+from core.text import estimate_tokens
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+
+
+def _primera_oracion(texto: str, max_chars: int) -> str:
+    texto = " ".join(texto.split())
+    oracion = _SENTENCE_END_RE.split(texto, maxsplit=1)[0]
+    return oracion if len(oracion) <= max_chars else oracion[:max_chars].rstrip() + "…"
+
+
+@dataclass
+class ChatSession:
+    session_id: str
+    creada: float = field(default_factory=time.time)
+    actualizada: float = field(default_factory=time.time)
+    turnos: List[Dict] = field(default_factory=list)   # turnos recientes completos
+    resumen: List[str] = field(default_factory=list)   # resumen acumulado de turnos antiguos
+    turnos_totales: int = 0
+    tokens_prompt: int = 0
+    tokens_respuesta: int = 0
+
+    def historial(self) -> str:
+        """Texto de la conversación previa que se antepone a la siguiente pregunta."""
+        partes = []
+        if self.resumen:
+            partes.append("Resumen de la conversación anterior:\n" + "\n".join(self.resumen))
+        if self.turnos:
+            recientes = []
+            for turno in self.turnos:
+                recientes.append(f"Usuario: {turno['pregunta']}")
+                recientes.append(f"Asistente: {turno['respuesta']}")
+            partes.append("Mensajes recientes:\n" + "\n".join(recientes))
+        return "\n\n".join(partes)
+
+    def agregar_turno(self, pregunta: str, respuesta: str, tokens_prompt: int):
+        tokens_respuesta = estimate_tokens(respuesta)
+        self.turnos.append({
+            "pregunta": pregunta,
+            "respuesta": respuesta,
+            "tokens_prompt": tokens_prompt,
+            "tokens_respuesta": tokens_respuesta,
+            "timestamp": time.time(),
+        })
+        self.turnos_totales += 1
+        self.tokens_prompt += tokens_prompt
+        self.tokens_respuesta += tokens_respuesta
+        self.actualizada = time.time()
+        self._compactar()
+
+    def _compactar(self):
+        """
+        Pasa los turnos más antiguos al resumen (pregunta + primera oración de la respuesta)
+        y recorta el resumen a un presupuesto fijo de tokens, para que el prompt no crezca
+        con la longitud de la conversación.
+        """
+        while len(self.turnos) > CHAT_SESSION_RECENT_TURNS:
+            turno = self.turnos.pop(0)
+            self.resumen.append(
+                f"- P: {_primera_oracion(turno['pregunta'], 160)} "
+                f"R: {_primera_oracion(turno['respuesta'], 240)}"
+            )
+        while self.resumen and estimate_tokens("\n".join(self.resumen)) > CHAT_SESSION_DIGEST_MAX_TOKENS:
+            self.resumen.pop(0)
+
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        data["tokens_historial"] = estimate_tokens(self.historial()) if (self.turnos or self.resumen) else 0
+        return data
+
+
+class SessionStore:
+    """
+    Almacén de sesiones en memoria con desalojo LRU. Si se configura CHAT_SESSIONS_DB,
+    las sesiones desalojadas se vuelcan a SQLite y se recuperan al volver a usarse.
+    """
+
+    def __init__(self, max_sessions: int = CHAT_SESSIONS_MAX, db_path: Optional[str] = CHAT_SESSIONS_DB):
+        self.max_sessions = max_sessions
+        self.db_path = db_path
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.evicted = 0
+        self.restored = 0
+        self._esquema_listo = False  # la base se crea al volcar o buscar la primera sesión
+
+    def _preparar(self):
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS chat_sessions ("
+                    "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, actualizada REAL NOT NULL)"
+                )
+        finally:
+            conn.close()
+        self._esquema_listo = True
+
+    @contextmanager
+    def _db(self):
+        # Todas las llamadas ocurren con self._lock tomado
+        if not self._esquema_listo:
+            self._preparar()
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _spill(self, session: ChatSession):
+        if not self.db_path:
+            return
+        with self._db() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO chat_sessions (session_id, data, actualizada) VALUES (?, ?, ?)",
+                (session.session_id, json.dumps(asdict(session)), session.actualizada),
+            )
+
+    def _restore(self, session_id: str) -> Optional[ChatSession]:
+        if not self.db_path:
+            return None
+        with self._db() as conn:
+            row = conn.execute("SELECT data FROM chat_sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        self.restored += 1
+        return ChatSession(**json.loads(row[0]))
+
+    def _put(self, session: ChatSession):
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        while len(self._sessions) > self.max_sessions:
+            _, antigua = self._sessions.popitem(last=False)
+            self._spill(antigua)
+            self.evicted += 1
+
+    def create(self) -> ChatSession:
+        with self._lock:
+            session = ChatSession(session_id=uuid.uuid4().hex)
+            self._put(session)
+            return session
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._restore(session_id)
+                if session is None:
+                    return None
+            self._put(session)
+            return session
+
+    def get_or_create(self, session_id: Optional[str]) -> ChatSession:
+        with self._lock:
+            if session_id:
+                session = self.get(session_id)
+                if session is not None:
+                    return session
+                session = ChatSession(session_id=session_id)
+                self._put(session)
+                return session
+            return self.create()
+
+    def add_turn(self, session: ChatSession, pregunta: str, respuesta: str, tokens_prompt: int):
+        with self._lock:
+            session.agregar_turno(pregunta, respuesta, tokens_prompt)
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            existia = self._sessions.pop(session_id, None) is not None
+            if self.db_path:
+                with self._db() as conn:
+                    cursor = conn.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+                    existia = existia or cursor.rowcount > 0
+            return existia
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "sesiones_en_memoria": len(self._sessions),
+                "max_sesiones": self.max_sessions,
+                "desalojadas": self.evicted,
+                "recuperadas_de_sqlite": self.restored,
+                "sqlite": self.db_path or None,
+            }
+
+
+session_store = SessionStore()
+
+
+def responder_en_sesion(
+    session_id: Optional[str],
+    pregunta: str,
+    modelo: str = "openai",
+    estrategia: str = "simple",
+    usar_cache: bool = True
+) -> Dict:
+    """
+    Responde una pregunta dentro de una sesión: antepone el historial acotado
+    (resumen + turnos recientes) y registra el turno con su consumo de tokens.
+    """
+    from services.chatbot import (
+        responder_pregunta_detallada,
+        reiniciar_prompt_tokens,
+        ultimo_prompt_tokens,
+        _es_respuesta_cacheable,
+    )
+
+    session = session_store.get_or_create(session_id)
+    historial = session.historial()
+    reiniciar_prompt_tokens()
+    resultado = responder_pregunta_detallada(
+        pregunta, modelo, usar_cache=usar_cache, estrategia=estrategia, historial=historial
+    )
+    # Solo se guardan en el historial las respuestas válidas (no errores ni rechazos)
+    if _es_respuesta_cacheable(resultado["respuesta"]):
+        # Tokens del prompt realmente enviado: historial, pregunta y secciones de contexto
+        tokens_prompt = ultimo_prompt_tokens()
+        session_store.add_turn(session, pregunta, resultado["respuesta"], tokens_prompt)
+    return {
+        **resultado,
+        "session_id": session.session_id,
+        "tokens": {
+            "historial": estimate_tokens(historial) if historial else 0,
+            "sesion_prompt": session.tokens_prompt,
+            "sesion_respuesta": session.tokens_respuesta,
+        },
+    }
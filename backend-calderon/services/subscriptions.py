@@ -0,0 +1,443 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from core.config import (
+    SUBSCRIPTIONS_DB,
+    SUBSCRIPTIONS_CHECK_SECONDS,
+    SUBSCRIPTIONS_MAX_ATTEMPTS,
+    SUBSCRIPTIONS_MAX_SUBSCRIBERS,
+    SUBSCRIPTIONS_RENDER_LEASE_SECONDS,
+)
+from services.email_outbox import EmailOutbox, email_outbox
+from services.report_artifacts import clave_reporte
+from services.report_jobs import ColaLlena, ReportJobQueue, report_jobs
+from services.report_service import generate_pdf_report
+
+FRECUENCIAS = ("mensual", "semanal")
+# Pronóstico de cada tipo de envío: el mensual cubre el año siguiente, el resumen semanal el trimestre
+PARAMETROS_POR_DEFECTO = {"mensual": {"months_ahead": 12}, "semanal": {"months_ahead": 3}}
+CAMPOS_PRONOSTICO = ("months_ahead", "start_year", "start_month", "poblacion_estimada", "precipitacion_promedio")
+
+# Estados de una ejecución (lista, periodo)
+RENDERIZANDO = "renderizando"
+ENCOLADA = "encolada"
+SIN_SUSCRIPTORES = "sin_suscriptores"
+ERROR = "error"
+
+
+def programacion(frecuencia: str, dia: int, hora: int, ahora: datetime) -> Tuple[str, datetime]:
+    """
+    Clave del periodo en curso ("2026-10" mensual, "2026-W42" semanal) y el momento
+    programado de su envío. `dia`: día del mes (1-28) o de la semana (0 = lunes).
+    """
+    if frecuencia == "mensual":
+        programado = ahora.replace(day=dia, hour=hora, minute=0, second=0, microsecond=0)
+        return ahora.strftime("%Y-%m"), programado
+    anio, semana, dia_semana = ahora.isocalendar()
+    lunes = ahora - timedelta(days=dia_semana - 1)
+    programado = (lunes + timedelta(days=dia)).replace(hour=hora, minute=0, second=0, microsecond=0)
+    return f"{anio}-W{semana:02d}", programado
+
+
+def _params_pronostico(frecuencia: str, params: Optional[Dict]) -> Dict:
+    combinados = {**PARAMETROS_POR_DEFECTO[frecuencia], **{k: v for k, v in (params or {}).items() if v is not None}}
+    return {campo: combinados.get(campo) for campo in CAMPOS_PRONOSTICO}
+
+
+class SubscriptionService:
+    """
+    Listas de distribución con envío programado. El planificador revisa las listas cada
+    `intervalo` segundos; para cada (lista, periodo) vencido reclama la ejecución en
+    SQLite (una sola vez aunque haya varios procesos), agrupa las listas que piden el
+    mismo reporte y lo renderiza una vez en la cola de reportes (que además reutiliza
+    un PDF idéntico ya generado). Al terminar, el PDF se encola en la bandeja de salida
+    para todos los suscriptores: 500 suscriptores cuestan un render y un lote de correos,
+    con estado por destinatario. Una ejecución que quedó "renderizando" más de `lease`
+    segundos (el proceso murió a mitad del render) o que terminó en error se vuelve a
+    reclamar en la siguiente revisión, hasta `max_intentos` veces.
+    """
+
+    def __init__(
+        self,
+        db_path: str = SUBSCRIPTIONS_DB,
+        cola: Optional[ReportJobQueue] = None,
+        outbox: Optional[EmailOutbox] = None,
+        intervalo: float = SUBSCRIPTIONS_CHECK_SECONDS,
+        lease: float = SUBSCRIPTIONS_RENDER_LEASE_SECONDS,
+        max_intentos: int = SUBSCRIPTIONS_MAX_ATTEMPTS,
+    ):
+        self.db_path = db_path
+        self.cola = cola if cola is not None else report_jobs
+        self.outbox = outbox if outbox is not None else email_outbox
+        self.intervalo = intervalo
+        self.lease = lease
+        self.max_intentos = max_intentos
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self.renders = 0
+        # La base se crea en el primer uso, no al importar el módulo
+        self._esquema_lock = threading.Lock()
+        self._esquema_listo = False
+
+    def _preparar(self):
+        with self._esquema_lock:
+            if self._esquema_listo:
+                return
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            try:
+                with conn:
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS listas ("
+                        "id TEXT PRIMARY KEY, nombre TEXT NOT NULL, frecuencia TEXT NOT NULL, dia INTEGER NOT NULL, "
+                        "hora INTEGER NOT NULL, params TEXT NOT NULL, asunto TEXT NOT NULL, cuerpo TEXT NOT NULL, "
+                        "activa INTEGER NOT NULL DEFAULT 1, creada REAL NOT NULL)"
+                    )
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS suscriptores ("
+                        "lista_id TEXT NOT NULL, email TEXT NOT NULL COLLATE NOCASE, alta REAL NOT NULL, "
+                        "PRIMARY KEY (lista_id, email))"
+                    )
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS ejecuciones ("
+                        "lista_id TEXT NOT NULL, periodo TEXT NOT NULL, estado TEXT NOT NULL, clave TEXT, "
+                        "reporte TEXT, lote TEXT, destinatarios INTEGER, error TEXT, creada REAL NOT NULL, "
+                        "terminada REAL, reclamada REAL, intentos INTEGER NOT NULL DEFAULT 1, "
+                        "PRIMARY KEY (lista_id, periodo))"
+                    )
+                    # Bases creadas antes de que existieran los reintentos
+                    columnas = {fila[1] for fila in conn.execute("PRAGMA table_info(ejecuciones)")}
+                    if "reclamada" not in columnas:
+                        conn.execute("ALTER TABLE ejecuciones ADD COLUMN reclamada REAL")
+                        conn.execute("UPDATE ejecuciones SET reclamada = creada")
+                    if "intentos" not in columnas:
+                        conn.execute("ALTER TABLE ejecuciones ADD COLUMN intentos INTEGER NOT NULL DEFAULT 1")
+            finally:
+                conn.close()
+            self._esquema_listo = True
+
+    @contextmanager
+    def _db(self):
+        if not self._esquema_listo:
+            self._preparar()
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # --- Listas y suscriptores ---
+
+    def crear_lista(
+        self,
+        nombre: str,
+        frecuencia: str,
+        dia: int,
+        hora: int,
+        params: Optional[Dict] = None,
+        asunto: str = "Reporte de consumo de agua ({periodo})",
+        cuerpo: str = "Adjunto encontrará el reporte de predicción de consumo de agua del periodo {periodo}.",
+        suscriptores: Optional[List[str]] = None,
+    ) -> Dict:
+        if frecuencia not in FRECUENCIAS:
+            return {"error": f"Frecuencia '{frecuencia}' no válida; use {', '.join(FRECUENCIAS)}"}
+        lista_id = uuid.uuid4().hex
+        with self._db() as conn:
+            conn.execute(
+                "INSERT INTO listas (id, nombre, frecuencia, dia, hora, params, asunto, cuerpo, creada) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (lista_id, nombre, frecuencia, dia, hora, json.dumps(_params_pronostico(frecuencia, params)),
+                 asunto, cuerpo, time.time()),
+            )
+        if suscriptores:
+            resultado = self.agregar_suscriptores(lista_id, suscriptores)
+            if "error" in resultado:
+                self.eliminar_lista(lista_id)
+                return resultado
+        return self.obtener_lista(lista_id)
+
+    @staticmethod
+    def _lista(fila: sqlite3.Row, suscriptores: int) -> Dict:
+        return {
+            "id": fila["id"],
+            "nombre": fila["nombre"],
+            "frecuencia": fila["frecuencia"],
+            "dia": fila["dia"],
+            "hora": fila["hora"],
+            "params": json.loads(fila["params"]),
+            "asunto": fila["asunto"],
+            "cuerpo": fila["cuerpo"],
+            "activa": bool(fila["activa"]),
+            "creada": fila["creada"],
+            "suscriptores": suscriptores,
+        }
+
+    def obtener_lista(self, lista_id: str) -> Optional[Dict]:
+        with self._db() as conn:
+            fila = conn.execute("SELECT * FROM listas WHERE id = ?", (lista_id,)).fetchone()
+            if fila is None:
+                return None
+            total = conn.execute("SELECT COUNT(*) FROM suscriptores WHERE lista_id = ?", (lista_id,)).fetchone()[0]
+        return self._lista(fila, total)
+
+    def listar_listas(self) -> List[Dict]:
+        with self._db() as conn:
+            filas = conn.execute(
+                "SELECT l.*, (SELECT COUNT(*) FROM suscriptores s WHERE s.lista_id = l.id) AS total "
+                "FROM listas l ORDER BY l.creada"
+            ).fetchall()
+        return [self._lista(fila, fila["total"]) for fila in filas]
+
+    def activar(self, lista_id: str, activa: bool) -> Optional[Dict]:
+        with self._db() as conn:
+            conn.execute("UPDATE listas SET activa = ? WHERE id = ?", (int(activa), lista_id))
+        return self.obtener_lista(lista_id)
+
+    def eliminar_lista(self, lista_id: str) -> bool:
+        with self._db() as conn:
+            borradas = conn.execute("DELETE FROM listas WHERE id = ?", (lista_id,)).rowcount
+            conn.execute("DELETE FROM suscriptores WHERE lista_id = ?", (lista_id,))
+            conn.execute("DELETE FROM ejecuciones WHERE lista_id = ?", (lista_id,))
+        return borradas > 0
+
+    def agregar_suscriptores(self, lista_id: str, emails: List[str]) -> Dict:
+        ahora = time.time()
+        with self._db() as conn:
+            if conn.execute("SELECT 1 FROM listas WHERE id = ?", (lista_id,)).fetchone() is None:
+                return {"error": "Lista no encontrada"}
+            antes = conn.execute("SELECT COUNT(*) FROM suscriptores WHERE lista_id = ?", (lista_id,)).fetchone()[0]
+            conn.executemany(
+                "INSERT OR IGNORE INTO suscriptores (lista_id, email, alta) VALUES (?, ?, ?)",
+                [(lista_id, email, ahora) for email in emails],
+            )
+            total = conn.execute("SELECT COUNT(*) FROM suscriptores WHERE lista_id = ?", (lista_id,)).fetchone()[0]
+            if total > SUBSCRIPTIONS_MAX_SUBSCRIBERS:
+                conn.rollback()
+                return {"error": f"La lista superaría el máximo de {SUBSCRIPTIONS_MAX_SUBSCRIBERS} suscriptores"}
+        return {"agregados": total - antes, "total": total}
+
+    def quitar_suscriptor(self, lista_id: str, email: str) -> bool:
+        with self._db() as conn:
+            return conn.execute(
+                "DELETE FROM suscriptores WHERE lista_id = ? AND email = ?", (lista_id, email)
+            ).rowcount > 0
+
+    def suscriptores(self, lista_id: str) -> List[str]:
+        with self._db() as conn:
+            filas = conn.execute(
+                "SELECT email FROM suscriptores WHERE lista_id = ? ORDER BY alta, email", (lista_id,)
+            ).fetchall()
+        return [fila["email"] for fila in filas]
+
+    # --- Planificación ---
+
+    def _reclamar(self, lista_id: str, periodo: str, clave: Optional[str]) -> bool:
+        """
+        Registra la ejecución del periodo, o la vuelve a tomar si quedó huérfana
+        ("renderizando" con el lease vencido) o terminó en error con intentos restantes.
+        False si otro proceso (o una revisión previa) ya la tiene o ya se envió.
+        """
+        ahora = time.time()
+        with self._db() as conn:
+            if conn.execute(
+                "INSERT OR IGNORE INTO ejecuciones (lista_id, periodo, estado, clave, creada, reclamada) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (lista_id, periodo, RENDERIZANDO, clave, ahora, ahora),
+            ).rowcount > 0:
+                return True
+            # Un solo UPDATE condicional: si dos procesos compiten, solo uno lo aplica
+            return conn.execute(
+                "UPDATE ejecuciones SET estado = ?, clave = ?, reclamada = ?, intentos = intentos + 1, "
+                "error = NULL, terminada = NULL WHERE lista_id = ? AND periodo = ? "
+                "AND ((estado = ? AND reclamada < ?) OR (estado = ? AND intentos < ?))",
+                (RENDERIZANDO, clave, ahora, lista_id, periodo,
+                 RENDERIZANDO, ahora - self.lease, ERROR, self.max_intentos),
+            ).rowcount > 0
+
+    def _actualizar(self, lista_id: str, periodo: str, **campos):
+        columnas = ", ".join(f"{columna} = ?" for columna in campos)
+        with self._db() as conn:
+            conn.execute(
+                f"UPDATE ejecuciones SET {columnas} WHERE lista_id = ? AND periodo = ?",
+                (*campos.values(), lista_id, periodo),
+            )
+
+    def revisar(self, ahora: Optional[datetime] = None) -> Dict:
+        """Reclama las ejecuciones vencidas y lanza un render por reporte distinto."""
+        ahora = ahora or datetime.now()
+        grupos: Dict[str, Dict] = {}
+        for lista in self.listar_listas():
+            if not lista["activa"]:
+                continue
+            periodo, programado = programacion(lista["frecuencia"], lista["dia"], lista["hora"], ahora)
+            # Todavía no toca, o la lista se creó después del envío de este periodo
+            if ahora < programado or programado.timestamp() < lista["creada"]:
+                continue
+            self._agrupar(grupos, lista, periodo)
+        return self._despachar(grupos)
+
+    def ejecutar_lista(self, lista_id: str, forzar: bool = False) -> Dict:
+        """
+        Envía ahora el reporte del periodo en curso, aunque todavía no haya vencido.
+        Con `forzar` se envía de nuevo aunque el periodo ya se haya enviado.
+        """
+        lista = self.obtener_lista(lista_id)
+        if lista is None:
+            return {"error": "Lista no encontrada"}
+        ahora = datetime.now()
+        periodo, _ = programacion(lista["frecuencia"], lista["dia"], lista["hora"], ahora)
+        if forzar:
+            periodo = f"{periodo}-manual-{ahora.strftime('%Y%m%d%H%M%S')}"
+        grupos: Dict[str, Dict] = {}
+        self._agrupar(grupos, lista, periodo)
+        resultado = self._despachar(grupos)
+        if resultado["cola_llena"]:
+            return {"error": resultado["cola_llena"], "cola_llena": True, "periodo": periodo}
+        if not resultado["ejecuciones"]:
+            return {"error": f"El periodo {periodo} ya se envió o se está enviando; use forzar para reenviarlo",
+                    "periodo": periodo}
+        return {**resultado, "periodo": periodo}
+
+    def _agrupar(self, grupos: Dict[str, Dict], lista: Dict, periodo: str):
+        try:
+            clave = clave_reporte("pdf", lista["params"])
+        except FileNotFoundError:
+            clave = None  # sin modelo o datos: el render informará el error
+        if not self._reclamar(lista["id"], periodo, clave):
+            return
+        grupo = grupos.setdefault(clave or uuid.uuid4().hex, {"clave": clave, "params": lista["params"], "ejecuciones": []})
+        grupo["ejecuciones"].append((lista, periodo))
+
+    def _despachar(self, grupos: Dict[str, Dict]) -> Dict:
+        ejecuciones = []
+        cola_llena = None
+        for grupo in grupos.values():
+            try:
+                job = self.cola.enviar("pdf", generate_pdf_report, grupo["params"], clave=grupo["clave"])
+            except ColaLlena as e:
+                cola_llena = str(e)
+                # Se libera el reclamo: la próxima revisión lo vuelve a intentar
+                with self._db() as conn:
+                    conn.executemany(
+                        "DELETE FROM ejecuciones WHERE lista_id = ? AND periodo = ?",
+                        [(lista["id"], periodo) for lista, periodo in grupo["ejecuciones"]],
+                    )
+                continue
+            if job.pendiente:
+                self.renders += 1
+            job.future.add_done_callback(lambda future, grupo=grupo: self._entregar(grupo, future))
+            ejecuciones += [{"lista": lista["id"], "periodo": periodo, "job_id": job.job_id}
+                            for lista, periodo in grupo["ejecuciones"]]
+        # Un trabajo por reporte distinto, lo pidan cuantas listas lo pidan
+        return {"ejecuciones": ejecuciones, "reportes": len({e["job_id"] for e in ejecuciones}), "cola_llena": cola_llena}
+
+    def _entregar(self, grupo: Dict, future):
+        """Con el PDF listo, un lote de correos por lista hacia todos sus suscriptores."""
+        try:
+            resultado = future.result()
+        except Exception as e:
+            resultado = {"error": f"{type(e).__name__}: {e}"}
+        for lista, periodo in grupo["ejecuciones"]:
+            try:
+                if "error" in resultado:
+                    self._actualizar(lista["id"], periodo, estado=ERROR, error=resultado["error"], terminada=time.time())
+                    continue
+                destinatarios = self.suscriptores(lista["id"])
+                if not destinatarios:
+                    self._actualizar(lista["id"], periodo, estado=SIN_SUSCRIPTORES,
+                                     reporte=resultado["filename"], terminada=time.time())
+                    continue
+                encolado = self.outbox.encolar(
+                    destinatarios,
+                    lista["asunto"].replace("{periodo}", periodo),
+                    lista["cuerpo"].replace("{periodo}", periodo),
+                    adjunto=resultado["filepath"],
+                )
+                self._actualizar(lista["id"], periodo, estado=ENCOLADA, reporte=resultado["filename"],
+                                 lote=encolado["lote"], destinatarios=len(encolado["mensajes"]), terminada=time.time())
+            except Exception as e:
+                self._actualizar(lista["id"], periodo, estado=ERROR, error=str(e), terminada=time.time())
+
+    # --- Consultas ---
+
+    def ejecuciones(self, lista_id: str, limite: int = 24) -> List[Dict]:
+        """Ejecuciones recientes con el estado de entrega agregado de su lote."""
+        with self._db() as conn:
+            filas = conn.execute(
+                "SELECT * FROM ejecuciones WHERE lista_id = ? ORDER BY creada DESC LIMIT ?", (lista_id, limite)
+            ).fetchall()
+        resultado = []
+        for fila in filas:
+            ejecucion = dict(fila)
+            lote = self.outbox.lote(fila["lote"]) if fila["lote"] else None
+            ejecucion["entrega"] = lote["por_estado"] if lote else None
+            resultado.append(ejecucion)
+        return resultado
+
+    def ejecucion(self, lista_id: str, periodo: str) -> Optional[Dict]:
+        """Una ejecución con el estado de cada destinatario."""
+        with self._db() as conn:
+            fila = conn.execute(
+                "SELECT * FROM ejecuciones WHERE lista_id = ? AND periodo = ?", (lista_id, periodo)
+            ).fetchone()
+        if fila is None:
+            return None
+        ejecucion = dict(fila)
+        lote = self.outbox.lote(fila["lote"]) if fila["lote"] else None
+        ejecucion["entrega"] = lote["por_estado"] if lote else None
+        ejecucion["destinatarios_estado"] = [
+            {k: m[k] for k in ("destinatario", "estado", "intentos", "error", "enviado")}
+            for m in (lote["mensajes"] if lote else [])
+        ]
+        return ejecucion
+
+    def stats(self) -> Dict:
+        with self._db() as conn:
+            listas = conn.execute("SELECT COUNT(*), SUM(activa) FROM listas").fetchone()
+            suscriptores = conn.execute("SELECT COUNT(*) FROM suscriptores").fetchone()[0]
+            por_estado = dict(conn.execute("SELECT estado, COUNT(*) FROM ejecuciones GROUP BY estado").fetchall())
+        return {
+            "listas": listas[0],
+            "activas": listas[1] or 0,
+            "suscriptores": suscriptores,
+            "ejecuciones": por_estado,
+            "renders": self.renders,
+            "planificador_activo": self._hilo is not None and self._hilo.is_alive(),
+        }
+
+    # --- Hilo del planificador ---
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            try:
+                resultado = self.revisar()
+                if resultado["ejecuciones"]:
+                    print(f"[SUSCRIPCIONES] {len(resultado['ejecuciones'])} envíos, {resultado['reportes']} reporte(s)")
+            except Exception as e:
+                print(f"[SUSCRIPCIONES] error: {e}")
+            self._detener.wait(self.intervalo)
+
+    def iniciar(self) -> threading.Thread:
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._bucle, name="subscriptions-scheduler", daemon=True)
+            self._hilo.start()
+        return self._hilo
+
+    def detener(self, timeout: float = 5.0):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=timeout)
+            self._hilo = None
+
+
+subscription_service = SubscriptionService()
@@ -0,0 +1,125 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+from core.config import WARMUP_WORKERS
+
+# Resultado de la última precarga (componente -> segundos o error)
+warmup_status: Dict = {"estado": "pendiente", "componentes": {}}
+_lista = threading.Event()
+
+
+def _timed(nombre: str, fn):
+    inicio = time.perf_counter()
+    try:
+        fn()
+        warmup_status["componentes"][nombre] = round(time.perf_counter() - inicio, 3)
+    except Exception as e:
+        warmup_status["componentes"][nombre] = f"error: {e}"
+    print(f"[WARMUP] {nombre}: {warmup_status['componentes'][nombre]}")
+
+
+def _warm_datasets():
+    # Indexa data/, data2/, data3/ y data4/: cada CSV/XLSX queda parseado en el almacén columnar
+    from services.file_catalog import file_catalog
+    for directorio in file_catalog.directorios:
+        file_catalog.sincronizar(directorio)
+
+
+def _warm_consumption_data():
+    from services import consumption_service as svc
+    svc._load_raw()
+
+
+def _warm_model():
+    from services import consumption_service as svc
+    svc._load_model()
+
+
+def _warm_model_inference():
+    # La primera predicción inicializa BLAS/threadpools de sklearn
+    from services import consumption_service as svc
+    svc.forecast_future(months_ahead=1)
+
+
+def _warm_context_snapshot():
+    # Secciones fijas del contexto del chatbot (las de predicción dependen de la pregunta)
+    from services.chatbot import context_snapshot
+    snapshot = context_snapshot()
+    snapshot.actual()
+    snapshot.historico()
+    snapshot.reporte()
+
+
+def _warm_llm_sdks():
+    from services.chatbot import _openai_sdk, _genai_sdk
+    _openai_sdk()
+    _genai_sdk()
+
+
+def _warm_report_pool():
+    from services.report_jobs import report_jobs
+    report_jobs.precalentar()
+
+
+# Componente -> (función, componentes de los que depende); las dependencias van antes en la lista
+COMPONENTES: List[Tuple[str, Callable, Tuple[str, ...]]] = [
+    ("datos_consumo", _warm_consumption_data, ()),
+    ("modelo", _warm_model, ()),
+    ("datasets", _warm_datasets, ()),
+    ("sdks_llm", _warm_llm_sdks, ()),
+    ("pool_reportes", _warm_report_pool, ()),
+    ("inferencia_modelo", _warm_model_inference, ("datos_consumo", "modelo")),
+    ("snapshot_contexto", _warm_context_snapshot, ("inferencia_modelo",)),
+]
+
+
+def run_warmup(componentes: List[Tuple[str, Callable, Tuple[str, ...]]] = None, workers: int = WARMUP_WORKERS):
+    """
+    Precarga datos, modelo, snapshot de contexto y SDKs en hilos paralelos para que la
+    primera petición no pague el arranque en frío. Cada componente espera solo a sus
+    dependencias; como se encolan después de ellas, un pool pequeño no se bloquea.
+    Al terminar (aunque algún componente falle) el servicio pasa a estar listo.
+    """
+    componentes = COMPONENTES if componentes is None else componentes
+    _lista.clear()
+    warmup_status.update({"estado": "en_curso", "componentes": {}})
+    warmup_status.pop("total_s", None)
+    inicio = time.perf_counter()
+
+    futures: Dict[str, Future] = {}
+
+    def ejecutar(nombre: str, fn: Callable, dependencias: Tuple[str, ...]):
+        for dependencia in dependencias:
+            futures[dependencia].result()
+        _timed(nombre, fn)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="warmup") as pool:
+        for nombre, fn, dependencias in componentes:
+            futures[nombre] = pool.submit(ejecutar, nombre, fn, dependencias)
+
+    warmup_status["estado"] = "completado"
+    warmup_status["total_s"] = round(time.perf_counter() - inicio, 3)
+    print(f"[WARMUP] total: {warmup_status['total_s']}")
+    _lista.set()
+
+
+def start_warmup_thread() -> threading.Thread:
+    """Lanza la precarga en segundo plano: el servidor ya responde al healthcheck mientras tanto."""
+    warmup_status["estado"] = "en_curso"
+    _lista.clear()
+    thread = threading.Thread(target=run_warmup, name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def marcar_listo():
+    """Sin precarga (WARMUP_ON_STARTUP=false) el servicio está listo desde el arranque."""
+    warmup_status["estado"] = "desactivado"
+    _lista.set()
+
+
+def readiness() -> Dict:
+    """Estado para /ready: listo solo cuando terminó la precarga."""
+    return {"listo": _lista.is_set(), **warmup_status}
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para los lotes de preguntas del chatbot (/chat/batch)
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Agregar el directorio actual al path para importar módulos
+sys.path.append(str(Path(__file__).parent))
+
+import services.chatbot as chatbot
+from services.chat_batch_service import ejecutar_lote
+
+
+def _proveedor_simulado(registro: dict):
+    """Sustituye el despacho real: mide la concurrencia por modelo y el snapshot usado."""
+    lock = threading.Lock()
+
+    def despachar(pregunta, modelo, estrategia="simple", historial=""):
+        with lock:
+            registro["en_curso"][modelo] = registro["en_curso"].get(modelo, 0) + 1
+            registro["maximo"][modelo] = max(registro["maximo"].get(modelo, 0), registro["en_curso"][modelo])
+            registro["versiones"].add(chatbot.context_snapshot().version)
+        time.sleep(0.05)
+        with lock:
+            registro["en_curso"][modelo] -= 1
+        return {"respuesta": f"Respuesta de {modelo}", "proveedor": modelo}
+
+    return despachar
+
+
+def test_concurrencia_por_proveedor():
+    """Cada proveedor respeta su límite de concurrencia y todas las preguntas comparten snapshot"""
+    print("=== Probando concurrencia acotada por proveedor ===")
+    registro = {"en_curso": {}, "maximo": {}, "versiones": set()}
+    original = chatbot._despachar_pregunta
+    chatbot._despachar_pregunta = _proveedor_simulado(registro)
+    try:
+        items = [{"pregunta": f"consumo de agua {i}", "id": str(i), "modelo": "gemini" if i % 2 else None}
+                 for i in range(12)]
+        resultados = list(ejecutar_lote(items, modelo="openai", concurrencia=2))
+    finally:
+        chatbot._despachar_pregunta = original
+
+    resumen = resultados[-1]["resumen"]
+    filas = resultados[:-1]
+    print(f"   Máximo en curso por modelo: {registro['maximo']}")
+    assert len(filas) == 12
+    assert sorted(f["indice"] for f in filas) == list(range(12))
+    assert registro["maximo"] == {"openai": 2, "gemini": 2}
+    assert len(registro["versiones"]) == 1
+    assert resumen["preguntas"] == 12 and resumen["validas"] == 12
+    assert set(resumen["por_proveedor"]) == {"openai", "gemini"}
+    assert all(f["latencia_s"] > 0 and f["tokens"]["respuesta"] > 0 for f in filas)
+    print("✅ Concurrencia y resumen correctos")
+    return True
+
+
+def test_snapshot_memoriza_secciones():
+    """Las secciones de contexto se construyen una vez por versión de los insumos"""
+    print("\n=== Probando snapshot de contexto compartido ===")
+    snapshot = chatbot.ContextSnapshot("prueba")
+    llamadas = []
+
+    def construir():
+        llamadas.append(1)
+        return "Contexto de prueba"
+
+    hilos = [threading.Thread(target=snapshot._seccion, args=("x", construir)) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert snapshot._seccion("x", construir) == "Contexto de prueba"
+    assert len(llamadas) == 1
+    # Los errores no se memorizan
+    assert snapshot._seccion("y", lambda: "Error temporal") == "Error temporal"
+    assert snapshot.secciones_construidas() == 1
+    print("✅ Secciones memorizadas una sola vez")
+    return True
+
+
+def main():
+    """Ejecuta todas las pruebas"""
+    print("🧪 Iniciando pruebas de lotes del chatbot\n")
+
+    tests = [
+        test_concurrencia_por_proveedor,
+        test_snapshot_memoriza_secciones,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"❌ Error ejecutando {test.__name__}: {e!r}")
+
+    print(f"\n📊 Resultados: {passed}/{len(tests)} pruebas pasaron")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
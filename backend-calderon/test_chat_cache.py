@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para la caché semántica de respuestas del chatbot
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Agregar el directorio actual al path para importar módulos
+sys.path.append(str(Path(__file__).parent))
+
+from services.chat_cache import ChatResponseCache, normalize_question
+
+
+def test_normalizacion():
+    """Prueba la normalización de preguntas (tildes, mayúsculas y palabras vacías)"""
+    print("=== Probando normalización ===")
+    a = normalize_question("¿Cuál es la PREDICCIÓN de consumo de agua en Calderón?")
+    b = normalize_question("cual es la prediccion del consumo de agua en calderon")
+    print(f"   {a!r} == {b!r}")
+    assert a == b
+    assert "de" not in a.split()
+    print("✅ Normalización correcta")
+    return True
+
+
+def test_acierto_exacto_y_semantico():
+    """Prueba aciertos exactos y por similitud"""
+    print("\n=== Probando aciertos exactos y semánticos ===")
+    cache = ChatResponseCache(max_entries=10, ttl_seconds=60, similarity_threshold=0.6)
+    cache.put("¿Cuál es la tendencia del consumo de agua en Calderón?", "openai", "v1", "Creciente", 1.5)
+
+    assert cache.get("cual es la tendencia del consumo de agua en calderon", "openai", "v1") == "Creciente"
+    assert cache.get("Tendencia del consumo de agua potable en Calderón", "openai", "v1") == "Creciente"
+    # Otro modelo u otra versión del contexto no deben reutilizar la respuesta
+    assert cache.get("¿Cuál es la tendencia del consumo de agua en Calderón?", "gemini", "v1") is None
+    assert cache.get("¿Cuál es la tendencia del consumo de agua en Calderón?", "openai", "v2") is None
+    # Una pregunta distinta no debe coincidir
+    assert cache.get("¿Cuánta lluvia cayó en 2010?", "openai", "v1") is None
+
+    stats = cache.stats()
+    print(f"   Stats: {stats}")
+    assert stats["aciertos_exactos"] == 1
+    assert stats["aciertos_semanticos"] == 1
+    assert stats["latencia_ahorrada_s"] == 3.0
+    print("✅ Aciertos y estadísticas correctos")
+    return True
+
+
+def test_preguntas_opuestas_no_colisionan():
+    """Negaciones, comparativos y marcas temporales forman parte de la clave"""
+    print("\n=== Probando preguntas opuestas ===")
+    pares = [
+        ("consumo sin lluvia", "consumo con lluvia"),
+        ("consumo antes de 2020", "consumo desde 2020"),
+        ("¿Qué mes tuvo más consumo?", "¿Qué mes tuvo menos consumo?"),
+        ("precipitación antes de 2015 en Calderón", "precipitación después de 2015 en Calderón"),
+    ]
+    for a, b in pares:
+        print(f"   {normalize_question(a)!r} != {normalize_question(b)!r}")
+        assert normalize_question(a) != normalize_question(b)
+
+    # Tampoco por similitud, aunque el resto de la pregunta sea idéntica
+    cache = ChatResponseCache(max_entries=10, ttl_seconds=60, similarity_threshold=0.5)
+    for i, (a, _) in enumerate(pares):
+        cache.put(a, "openai", "v1", f"R{i}", 1.0)
+    for a, b in pares:
+        assert cache.get(b, "openai", "v1") is None
+    assert cache.get("consumo sin lluvias", "openai", "v1") == "R0"
+    print("✅ Las preguntas opuestas no comparten respuesta")
+    return True
+
+
+def test_numeros_distintos_no_colisionan():
+    """Preguntas que solo difieren en el horizonte o el año no comparten respuesta"""
+    print("\n=== Probando preguntas con números distintos ===")
+    cache = ChatResponseCache(max_entries=10, ttl_seconds=60, similarity_threshold=0.85)
+    cache.put("¿Cuál será el consumo de agua en Calderón en los próximos 6 meses?", "openai", "v1", "R6", 1.0)
+    cache.put("¿Cuánta lluvia cayó en Calderón en 2010?", "openai", "v1", "R2010", 1.0)
+
+    # Idénticas salvo el número: la similitud sería casi 1 sin exigir las mismas cantidades
+    assert cache.get("¿Cuál será el consumo de agua potable en Calderón en los próximos 24 meses?", "openai", "v1") is None
+    assert cache.get("¿Cuál será el consumo de agua en Calderón en los próximos meses?", "openai", "v1") is None
+    assert cache.get("¿Cuánta lluvia cayó en Calderón en 2011?", "openai", "v1") is None
+    # Mismos números (también escritos con letras) sí coinciden
+    assert cache.get("¿Cuál será el consumo de agua potable en Calderón en los próximos seis meses?", "openai", "v1") == "R6"
+    assert cache.get("cuanta lluvia cayo en calderon el 2010", "openai", "v1") == "R2010"
+    print("✅ Los números forman parte de la coincidencia")
+    return True
+
+
+def test_ttl_y_lru():
+    """Prueba la expiración por TTL y el desalojo LRU"""
+    print("\n=== Probando TTL y LRU ===")
+    cache = ChatResponseCache(max_entries=2, ttl_seconds=60, similarity_threshold=1.0)
+    cache.put("consumo en enero", "openai", "v1", "A", 1.0)
+    cache.put("consumo en febrero", "openai", "v1", "B", 1.0)
+    cache.get("consumo en enero", "openai", "v1")  # enero pasa a ser el más reciente
+    cache.put("consumo en marzo", "openai", "v1", "C", 1.0)
+    assert cache.get("consumo en febrero", "openai", "v1") is None
+    assert cache.get("consumo en enero", "openai", "v1") == "A"
+    assert cache.stats()["desalojadas"] == 1
+
+    cache = ChatResponseCache(max_entries=2, ttl_seconds=0.05, similarity_threshold=1.0)
+    cache.put("consumo en enero", "openai", "v1", "A", 1.0)
+    time.sleep(0.1)
+    assert cache.get("consumo en enero", "openai", "v1") is None
+    assert cache.stats()["expiradas"] == 1
+    print("✅ TTL y LRU correctos")
+    return True
+
+
+def main():
+    """Ejecuta todas las pruebas"""
+    print("🧪 Iniciando pruebas de la caché del chatbot\n")
+
+    tests = [
+        test_normalizacion,
+        test_acierto_exacto_y_semantico,
+        test_preguntas_opuestas_no_colisionan,
+        test_numeros_distintos_no_colisionan,
+        test_ttl_y_lru,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"❌ Error ejecutando {test.__name__}: {e!r}")
+
+    print(f"\n📊 Resultados: {passed}/{len(tests)} pruebas pasaron")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para la clasificación de preguntas del chatbot (secciones de contexto y horizonte)
+"""
+
+import sys
+from pathlib import Path
+
+# Agregar el directorio actual al path para importar módulos
+sys.path.append(str(Path(__file__).parent))
+
+from services.chat_intents import (
+    HORIZONTE_MAXIMO, HORIZONTE_POR_DEFECTO,
+    SECCION_ACTUAL, SECCION_HISTORICO, SECCION_PREDICCION, SECCION_REPORTE,
+    _horizonte, clasificar_pregunta, es_pregunta_del_dominio, normalizar_texto,
+)
+
+
+def test_secciones_por_palabra_clave():
+    """Cada intención anexa solo las secciones que necesita (insensible a tildes y mayúsculas)"""
+    print("=== Probando secciones por palabra clave ===")
+    casos = [
+        ("¿Cuál es la situación actual del consumo?", {SECCION_ACTUAL}),
+        ("¿Qué PREDICCIÓN hay para el consumo?", {SECCION_PREDICCION}),
+        ("Evolución histórica del consumo por década", {SECCION_HISTORICO}),
+        ("Resume el último reporte generado", {SECCION_REPORTE}),
+        ("¿Cuál es la tendencia del consumo?", {SECCION_ACTUAL, SECCION_HISTORICO}),
+        ("Compara el consumo de 2015 con la proyección para 2030", {SECCION_HISTORICO, SECCION_PREDICCION}),
+        ("¿Cuál fue el consumo desde el año 2010?", {SECCION_HISTORICO}),
+    ]
+    for pregunta, esperadas in casos:
+        intencion = clasificar_pregunta(pregunta)
+        print(f"   {pregunta!r} → {sorted(intencion.secciones)}")
+        assert intencion.secciones == frozenset(esperadas)
+    print("✅ Secciones correctas")
+    return True
+
+
+def test_horizonte():
+    """Cantidades en cifras o palabras, unidades, próximo año, límites y valor por defecto"""
+    print("\n=== Probando horizonte de predicción ===")
+    casos = [
+        ("prediccion para 3 meses", 3),
+        ("prediccion para un mes", 1),
+        ("pronostico de dos anos", 24),
+        ("proyeccion de un semestre", 6),
+        ("estimacion de cuatro trimestres", 12),
+        ("prediccion del proximo ano", 12),
+        ("prediccion para el siguiente ano", 12),
+        ("prediccion a 120 meses", HORIZONTE_MAXIMO),
+        ("prediccion a 0 meses", 1),
+        ("prediccion del consumo", HORIZONTE_POR_DEFECTO),
+    ]
+    for texto, meses in casos:
+        assert _horizonte(normalizar_texto(texto)) == meses, (texto, _horizonte(texto))
+
+    assert clasificar_pregunta("¿Cuál será el consumo en los próximos 2 años?").meses_prediccion == 24
+    # Sin intención de predicción el horizonte no se interpreta
+    assert clasificar_pregunta("consumo histórico de 3 meses").meses_prediccion == HORIZONTE_POR_DEFECTO
+    print("✅ Horizonte correcto")
+    return True
+
+
+def test_sin_coincidencias():
+    """Si no se reconoce ninguna intención se usa solo el contexto actual"""
+    print("\n=== Probando respaldo sin coincidencias ===")
+    for pregunta in ("Háblame del agua en Calderón", "datos", ""):
+        intencion = clasificar_pregunta(pregunta)
+        assert intencion.secciones == frozenset({SECCION_ACTUAL})
+        assert intencion.meses_prediccion == HORIZONTE_POR_DEFECTO
+    assert es_pregunta_del_dominio("¿Cuánta LLUVIA cayó en Calderón?")
+    assert not es_pregunta_del_dominio("¿Quién ganó el partido de fútbol?")
+    print("✅ Respaldo correcto")
+    return True
+
+
+def main():
+    """Ejecuta todas las pruebas"""
+    print("🧪 Iniciando pruebas de clasificación de preguntas\n")
+
+    tests = [
+        test_secciones_por_palabra_clave,
+        test_horizonte,
+        test_sin_coincidencias,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"❌ Error ejecutando {test.__name__}: {e!r}")
+
+    print(f"\n📊 Resultados: {passed}/{len(tests)} pruebas pasaron")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para las sesiones del chatbot (historial acotado, LRU con volcado a SQLite)
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Agregar el directorio actual al path para importar módulos
+sys.path.append(str(Path(__file__).parent))
+
+import services.chatbot as chatbot
+import services.session_service as session_service
+from services.chat_intents import es_pregunta_del_dominio
+from core.text import estimate_tokens
+from services.session_service import ChatSession, SessionStore, responder_en_sesion
+
+
+def test_resumen_acotado():
+    """Los turnos antiguos pasan al resumen y el resumen se recorta a su presupuesto de tokens"""
+    print("=== Probando compactación del historial ===")
+    session = ChatSession("s1")
+    for i in range(60):
+        respuesta = f"El consumo del mes {i} fue de {1000 + i} m3. " + "Detalle adicional. " * 30
+        session.agregar_turno(f"¿Cuál fue el consumo del mes {i}?", respuesta, tokens_prompt=100)
+
+    assert len(session.turnos) == session_service.CHAT_SESSION_RECENT_TURNS
+    assert [t["pregunta"] for t in session.turnos][-1] == "¿Cuál fue el consumo del mes 59?"
+    # Solo la primera oración de cada respuesta antigua entra al resumen
+    assert all("Detalle adicional" not in linea for linea in session.resumen)
+    assert estimate_tokens("\n".join(session.resumen)) <= session_service.CHAT_SESSION_DIGEST_MAX_TOKENS
+    # Se descartan primero los turnos más antiguos
+    assert len(session.resumen) < 60 - session_service.CHAT_SESSION_RECENT_TURNS
+    assert "mes 0?" not in session.resumen[0] and "mes 56?" in session.resumen[-1]
+    assert session.turnos_totales == 60 and session.tokens_prompt == 6000
+
+    historial = session.historial()
+    assert historial.startswith("Resumen de la conversación anterior:")
+    assert "Mensajes recientes:\nUsuario: ¿Cuál fue el consumo del mes 57?" in historial
+    print(f"   Historial tras 60 turnos: {estimate_tokens(historial)} tokens")
+    print("✅ Historial acotado")
+    return True
+
+
+def test_lru_y_volcado_sqlite():
+    """Las sesiones desalojadas por LRU se vuelcan a SQLite y se recuperan al volver a usarse"""
+    print("\n=== Probando LRU y volcado a SQLite ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(max_sessions=2, db_path=str(Path(tmp) / "sesiones.db"))
+        a, b = store.create(), store.create()
+        store.add_turn(a, "consumo de enero", "Fue alto.", 10)
+        store.get(a.session_id)  # a pasa a ser la más reciente
+        c = store.create()
+        assert store.stats()["desalojadas"] == 1 and b.session_id not in store._sessions
+
+        recuperada = store.get(b.session_id)
+        assert recuperada is not None and recuperada.session_id == b.session_id
+        assert store.stats()["recuperadas_de_sqlite"] == 1
+        # Recuperar b desaloja a la menos reciente (a), que conserva su historial en SQLite
+        assert a.session_id not in store._sessions
+        restaurada = store.get(a.session_id)
+        assert restaurada.turnos[0]["pregunta"] == "consumo de enero" and restaurada.tokens_prompt == 10
+
+        assert store.delete(c.session_id)  # volcada a SQLite, también se elimina
+        assert store.delete(a.session_id)
+        assert not store.delete(a.session_id)
+        assert store.get("no-existe") is None
+
+        # Sin SQLite las sesiones desalojadas se pierden
+        store = SessionStore(max_sessions=1, db_path=None)
+        a = store.create()
+        store.create()
+        assert store.get(a.session_id) is None
+    print("✅ LRU y volcado correctos")
+    return True
+
+
+def test_responder_en_sesion():
+    """El historial se antepone, las repreguntas heredan el tema de la sesión y se registran los tokens enviados"""
+    print("\n=== Probando responder_en_sesion ===")
+    enviados = []
+
+    def enriquecer(prompt, intencion=None, historial="", snapshot=None):
+        enviado = f"{historial}\n\nPregunta actual: {prompt}\n\nCONTEXTO:\n" + "dato " * 400
+        enviados.append(enviado)
+        chatbot._prompt_stats.tokens = estimate_tokens(enviado)
+        return enviado
+
+    originales = (chatbot._enrich_prompt_with_context, chatbot._llamar_openai, session_service.session_store)
+    clave = os.environ.get("OPENAI_API_KEY")
+    chatbot._enrich_prompt_with_context = enriquecer
+    chatbot._llamar_openai = lambda prompt, cancel_token=None: "El consumo de agua fue estable."
+    session_service.session_store = SessionStore(max_sessions=10, db_path=None)
+    os.environ["OPENAI_API_KEY"] = "prueba"
+    try:
+        primera = responder_en_sesion(None, "¿Cómo fue el consumo de agua en 2023?")
+        sid = primera["session_id"]
+        assert primera["respuesta"] == "El consumo de agua fue estable." and primera["tokens"]["historial"] == 0
+        assert primera["tokens"]["sesion_prompt"] == estimate_tokens(enviados[0])
+
+        segunda = responder_en_sesion(sid, "¿Y la lluvia en el mismo año?")
+        assert "Usuario: ¿Cómo fue el consumo de agua en 2023?" in enviados[1]
+        assert segunda["tokens"]["historial"] > 0
+        assert segunda["tokens"]["sesion_prompt"] == sum(estimate_tokens(e) for e in enviados)
+
+        # Las repreguntas sin palabras del dominio heredan el tema de la sesión
+        for repregunta in ("¿Y el año anterior?", "¿Por qué?", "Explícalo con más detalle"):
+            assert not es_pregunta_del_dominio(repregunta)
+            seguimiento = responder_en_sesion(sid, repregunta)
+            assert seguimiento["respuesta"] == "El consumo de agua fue estable."
+        assert "Pregunta actual: ¿Por qué?" in enviados[3]
+        assert session_service.session_store.get(sid).turnos_totales == 5
+
+        # Sin historial, una pregunta fuera del dominio se rechaza sin llamar al LLM
+        fuera = responder_en_sesion(None, "¿Quién ganó el partido de fútbol?")
+        assert fuera["respuesta"] == chatbot._MENSAJE_FUERA_DE_CONTEXTO
+        assert len(enviados) == 5
+        assert session_service.session_store.get(fuera["session_id"]).turnos_totales == 0
+    finally:
+        chatbot._enrich_prompt_with_context, chatbot._llamar_openai, session_service.session_store = originales
+        if clave is None:
+            os.environ.pop("OPENAI_API_KEY", None)
+        else:
+            os.environ["OPENAI_API_KEY"] = clave
+    print("✅ Sesión correcta")
+    return True
+
+
+def main():
+    """Ejecuta todas las pruebas"""
+    print("🧪 Iniciando pruebas de sesiones del chatbot\n")
+
+    tests = [
+        test_resumen_acotado,
+        test_lru_y_volcado_sqlite,
+        test_responder_en_sesion,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"❌ Error ejecutando {test.__name__}: {e!r}")
+
+    print(f"\n📊 Resultados: {passed}/{len(tests)} pruebas pasaron")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
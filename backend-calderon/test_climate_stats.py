@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para el motor estadístico de interpretación de datos climáticos
+"""
+
+import math
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Agregar el directorio actual al path para importar módulos
+sys.path.append(str(Path(__file__).parent))
+
+from services.climate_stats import contar_pares, mann_kendall, pendiente_sen
+from services.interpretacion_service import analizar_datos_climaticos
+
+
+def _serie_mensual(valores, anio_inicial=2000):
+    return [{"fecha": f"{anio_inicial + i // 12}-{i % 12 + 1:02d}", "valor": float(v)} for i, v in enumerate(valores)]
+
+
+def test_conteo_de_pares():
+    """El conteo O(n log n) coincide con la comparación directa de todos los pares"""
+    print("=== Probando conteo de pares (Mann-Kendall) ===")
+    rng = np.random.default_rng(0)
+    for n in [2, 3, 31, 32, 33, 64, 65, 100, 517, 1000]:
+        x = rng.integers(0, 15, n).astype(float)  # con muchos empates
+        diferencias = np.sign(x[None, :] - x[:, None])[np.triu_indices(n, 1)]
+        esperado = (int((diferencias > 0).sum()), int((diferencias < 0).sum()))
+        assert contar_pares(x) == esperado, (n, contar_pares(x), esperado)
+    print("✅ Conteo exacto en todos los tamaños")
+    return True
+
+
+def test_mann_kendall_y_sen():
+    """Mann-Kendall y Sen sobre una serie con tendencia conocida"""
+    print("\n=== Probando Mann-Kendall y pendiente de Sen ===")
+    rng = np.random.default_rng(1)
+    t = np.arange(200)
+    x = 0.5 * t + rng.normal(0, 5, 200)
+    mk = mann_kendall(x)
+    sen = pendiente_sen(x, mk["varianza"])
+    print(f"   S={mk['s']} z={mk['z']} p={mk['p_valor']:.2e} sen={sen['pendiente']:.3f}")
+    assert mk["significativa"] and mk["s"] > 0
+    assert sen["metodo"] == "exacto"
+    assert abs(sen["pendiente"] - 0.5) < 0.05
+    assert sen["ic95_inferior"] <= sen["pendiente"] <= sen["ic95_superior"]
+    # Varianza sin empates: n(n-1)(2n+5)/18
+    assert math.isclose(mk["varianza"], 200 * 199 * 405 / 18)
+
+    ruido = mann_kendall(rng.normal(0, 1, 200))
+    assert not ruido["significativa"]
+    print("✅ Tendencia detectada y ruido descartado")
+    return True
+
+
+def test_analisis_completo():
+    """Compatibilidad de la respuesta y descomposición estacional mensual"""
+    print("\n=== Probando análisis completo ===")
+    assert analizar_datos_climaticos([])["tendencia"] == "No disponible"
+    assert analizar_datos_climaticos([{"valor": 1}, {"valor": 2}, {"valor": 3}])["tendencia"] == "Creciente"
+    assert analizar_datos_climaticos([{"valor": 3}, {"valor": "x"}, {"valor": 1}])["tendencia"] == "Decreciente"
+
+    meses = np.arange(60)
+    lluvia = 80 + 40 * np.cos((meses - 3) / 12 * 2 * np.pi)  # máximo en abril
+    analisis = analizar_datos_climaticos(_serie_mensual(lluvia))
+    est = analisis["estacionalidad"]
+    print(f"   Estacionalidad: máximo={est['mes_maximo']} fuerza={est['fuerza']}")
+    assert analisis["unidad_tiempo"] == "mes"
+    assert est["mes_maximo"] == "abril" and est["mes_minimo"] == "octubre"
+    assert est["fuerza"] > 0.99
+    assert analisis["tendencia"] == "Variable"
+
+    # Fechas diarias: no es serie mensual
+    assert analizar_datos_climaticos(
+        [{"fecha": f"2024-01-{d:02d}", "valor": d} for d in range(1, 31)]
+    )["estacionalidad"] is None
+    print("✅ Respuesta completa y estacionalidad correctas")
+    return True
+
+
+def test_resumen_tamano_fijo():
+    """El prompt de interpretación no crece con el número de puntos"""
+    print("\n=== Probando resumen de tamaño fijo para el prompt ===")
+    import services.interpretacion_service as servicio
+
+    prompts = []
+    original = servicio.interpretar_datos_gemini
+    servicio.interpretar_datos_gemini = lambda titulo, resumen: prompts.append(resumen) or "ok"
+    try:
+        rng = np.random.default_rng(3)
+        for n in (120, 1200, 12000):
+            valores = rng.normal(50, 5, n)
+            valores[n // 2] = 500  # anomalía evidente
+            servicio.interpretar_datos_climaticos(
+                "Precipitación", "precipitación mensual", _serie_mensual(valores, 1000), usar_cache=False
+            )
+    finally:
+        servicio.interpretar_datos_gemini = original
+
+    tamanos = [len(p) for p in prompts]
+    print(f"   Tamaño del prompt (caracteres): {tamanos}")
+    assert max(tamanos) < 1.3 * min(tamanos)
+    assert "Datos originales" not in prompts[-1]
+    assert "(500, z=" in prompts[-1]  # la anomalía aparece con su fecha
+    print("✅ Tamaño del prompt constante")
+    return True
+
+
+def test_rendimiento_100k():
+    """Una serie de 100 000 puntos se analiza en milisegundos"""
+    print("\n=== Probando rendimiento con 100k puntos ===")
+    rng = np.random.default_rng(2)
+    datos = _serie_mensual(rng.normal(size=100_000) + np.arange(100_000) * 1e-4, anio_inicial=1000)
+    inicio = time.perf_counter()
+    analisis = analizar_datos_climaticos(datos)
+    duracion = time.perf_counter() - inicio
+    print(f"   {duracion * 1000:.0f} ms, tendencia={analisis['tendencia']}, sen={analisis['sen']['metodo']}")
+    assert analisis["n"] == 100_000
+    assert analisis["tendencia"] == "Creciente"
+    assert duracion < 2.0
+    print("✅ Análisis de 100k puntos dentro del presupuesto")
+    return True
+
+
+def main():
+    """Ejecuta todas las pruebas"""
+    print("🧪 Iniciando pruebas del motor estadístico\n")
+
+    tests = [
+        test_conteo_de_pares,
+        test_mann_kendall_y_sen,
+        test_analisis_completo,
+        test_resumen_tamano_fijo,
+        test_rendimiento_100k,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"❌ Error ejecutando {test.__name__}: {e!r}")
+
+    print(f"\n📊 Resultados: {passed}/{len(tests)} pruebas pasaron")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para la capa de descargas: ETag, 304, rangos y variantes comprimidas
+"""
+
+import gzip
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Agregar el directorio actual al path para importar módulos
+sys.path.append(str(Path(__file__).parent))
+
+import brotli
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from core.downloads import Descargas, _codificaciones_aceptadas
+
+
+def _cliente(tmp: Path) -> tuple:
+    descargas = Descargas(cache_dir=str(tmp / "variantes"), min_bytes=1024, cache_control="no-cache")
+    app = FastAPI()
+
+    @app.get("/archivo/{nombre}")
+    def archivo(nombre: str, request: Request):
+        return descargas.responder(request, tmp / nombre)
+
+    return TestClient(app), descargas
+
+
+def _csv(ruta: Path, filas: int = 5000) -> bytes:
+    contenido = "fecha,valor\n" + "".join(f"2024-01-{i % 28 + 1:02d},{i * 0.37:.2f}\n" for i in range(filas))
+    ruta.write_text(contenido)
+    return contenido.encode()
+
+
+def test_revalidacion():
+    """ETag fuerte estable; If-None-Match e If-Modified-Since devuelven 304"""
+    print("=== Probando revalidación ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        contenido = _csv(tmp / "datos.csv")
+        cliente, descargas = _cliente(tmp)
+        sin_comprimir = {"accept-encoding": "identity"}
+
+        primera = cliente.get("/archivo/datos.csv", headers=sin_comprimir)
+        assert primera.status_code == 200 and primera.content == contenido
+        etag = primera.headers["etag"]
+        assert etag.startswith('"') and not etag.startswith("W/")
+        assert cliente.get("/archivo/datos.csv", headers=sin_comprimir).headers["etag"] == etag
+        assert descargas.stats()["huellas_calculadas"] == 1
+
+        condicional = cliente.get("/archivo/datos.csv", headers={**sin_comprimir, "if-none-match": f'"x", W/{etag}'})
+        assert condicional.status_code == 304 and condicional.content == b"" and condicional.headers["etag"] == etag
+        fecha = {**sin_comprimir, "if-modified-since": primera.headers["last-modified"]}
+        assert cliente.get("/archivo/datos.csv", headers=fecha).status_code == 304
+
+        # El archivo cambia: nuevo ETag y el anterior ya no revalida
+        _csv(tmp / "datos.csv", filas=5001)
+        os.utime(tmp / "datos.csv", (1, 2_000_000_000))
+        cambiado = cliente.get("/archivo/datos.csv", headers={**sin_comprimir, "if-none-match": etag})
+        assert cambiado.status_code == 200 and cambiado.headers["etag"] != etag
+    print("✅ Revalidación correcta")
+    return True
+
+
+def test_rangos():
+    """Range devuelve 206 del original; If-Range con otro ETag devuelve el archivo completo"""
+    print("\n=== Probando rangos ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        contenido = _csv(tmp / "datos.csv")
+        cliente, _ = _cliente(tmp)
+        parcial = cliente.get("/archivo/datos.csv", headers={"range": "bytes=100-199", "accept-encoding": "gzip"})
+        assert parcial.status_code == 206 and parcial.content == contenido[100:200]
+        assert "content-encoding" not in parcial.headers
+        assert parcial.headers["content-range"] == f"bytes 100-199/{len(contenido)}"
+        etag = parcial.headers["etag"]
+        reanudada = cliente.get("/archivo/datos.csv", headers={"range": f"bytes={len(contenido) - 10}-", "if-range": etag})
+        assert reanudada.status_code == 206 and reanudada.content == contenido[-10:]
+        obsoleta = cliente.get("/archivo/datos.csv", headers={"range": "bytes=0-9", "if-range": '"otro"'})
+        assert obsoleta.status_code == 200 and len(obsoleta.content) == len(contenido)
+    print("✅ Rangos correctos")
+    return True
+
+
+def test_variantes_comprimidas():
+    """gzip se genera una sola vez en disco, con ETag propio; archivos pequeños van sin comprimir"""
+    print("\n=== Probando variantes comprimidas ===")
+    assert _codificaciones_aceptadas("gzip;q=0.5, br, *;q=0") == {"gzip": 0.5, "br": 1.0, "*": 0.0}
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        contenido = _csv(tmp / "datos.csv")
+        (tmp / "chico.csv").write_text("a,b\n1,2\n")
+        cliente, descargas = _cliente(tmp)
+
+        respuestas = [
+            cliente.get("/archivo/datos.csv", headers={"accept-encoding": "gzip, deflate"}) for _ in range(3)
+        ]
+        # TestClient descomprime el cuerpo; content-length es el de la variante
+        for respuesta in respuestas:
+            assert respuesta.headers["content-encoding"] == "gzip" and respuesta.content == contenido
+            assert int(respuesta.headers["content-length"]) < len(contenido) / 2
+            assert respuesta.headers["vary"] == "Accept-Encoding"
+        assert respuestas[0].headers["etag"].endswith('-gz"')
+        stats = descargas.stats()
+        assert stats["variantes_generadas"] == 1 and stats["variantes_servidas"] == 3
+        variante = next((tmp / "variantes").glob("*.gz"))
+        assert gzip.decompress(variante.read_bytes()) == contenido
+
+        # brotli (en requirements.txt) tiene prioridad cuando el cliente lo acepta
+        respuesta = cliente.get("/archivo/datos.csv", headers={"accept-encoding": "gzip, br"})
+        assert respuesta.headers["content-encoding"] == "br" and respuesta.content == contenido
+        assert respuesta.headers["etag"].endswith('-br"')
+        assert brotli.decompress(next((tmp / "variantes").glob("*.br")).read_bytes()) == contenido
+
+        assert "content-encoding" not in cliente.get("/archivo/chico.csv", headers={"accept-encoding": "gzip"}).headers
+        assert "content-encoding" not in cliente.get("/archivo/datos.csv", headers={"accept-encoding": "gzip;q=0"}).headers
+
+        # Nueva versión del archivo: se reemplaza la variante anterior
+        _csv(tmp / "datos.csv", filas=6000)
+        cliente.get("/archivo/datos.csv", headers={"accept-encoding": "gzip"})
+        assert [v for v in (tmp / "variantes").glob("*.gz")] != [variante]
+        assert len(list((tmp / "variantes").glob("*.gz"))) == 1
+    print("✅ Variantes comprimidas correctas")
+    return True
+
+
+def main():
+    """Ejecuta todas las pruebas"""
+    print("🧪 Iniciando pruebas de descargas\n")
+
+    tests = [
+        test_revalidacion,
+        test_rangos,
+        test_variantes_comprimidas,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"❌ Error ejecutando {test.__name__}: {e!r}")
+
+    print(f"\n📊 Resultados: {passed}/{len(tests)} pruebas pasaron")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para la bandeja de salida de correos contra un servidor SMTP local
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Agregar el directorio actual al path para importar módulos
+sys.path.append(str(Path(__file__).parent))
+sys.path.append(str(Path(__file__).parent / "tools"))
+
+from core.smtp_pool import SMTPPool
+from services.email_outbox import EmailOutbox
+from smtp_sink import SMTPSink
+
+
+def _entorno(tmp: Path, sink: SMTPSink, **kwargs) -> EmailOutbox:
+    pool = SMTPPool(sink.host, sink.port, seguridad="none", timeout=5, max_conexiones=1)
+    opciones = {"backoff_base": 0.05, "backoff_max": 0.2, "max_intentos": 4, **kwargs}
+    return EmailOutbox(db_path=str(tmp / "outbox.sqlite3"), pool=pool, workers=1, **opciones)
+
+
+def _adjunto(tmp: Path) -> Path:
+    ruta = tmp / "reporte_consumo_agua_prueba.pdf"
+    ruta.write_bytes(b"%PDF-1.4 prueba" * 100)
+    return ruta
+
+
+def test_lista_de_distribucion():
+    """Un lote a varios destinatarios sale por una sola conexión SMTP reutilizada"""
+    print("=== Probando envío a una lista de distribución ===")
+    sink = SMTPSink(port=0).iniciar()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            outbox = _entorno(tmp, sink)
+            destinatarios = [f"usuario{i}@example.com" for i in range(5)] + ["USUARIO0@example.com"]
+            encolado = outbox.encolar(destinatarios, "Reporte", "Adjunto el reporte", str(_adjunto(tmp)))
+            assert len(encolado["mensajes"]) == 5  # sin repetidos
+
+            assert outbox.procesar_pendientes() == 5
+            estado = outbox.lote(encolado["lote"])
+            assert estado["por_estado"] == {"enviado": 5}
+            assert sink.conexiones == 1 and outbox.pool.stats()["reutilizadas"] == 4
+            recibidos = sorted(m["para"][0] for m in sink.mensajes)
+            assert recibidos == sorted(destinatarios[:5])
+            adjuntos = {m["mensaje"].get_payload()[1].get_content() for m in sink.mensajes}
+            assert adjuntos == {b"%PDF-1.4 prueba" * 100}
+            assert len({m["mensaje"]["Message-ID"] for m in sink.mensajes}) == 5
+            outbox.pool.cerrar()
+    finally:
+        sink.detener()
+    print("✅ Lista de distribución correcta")
+    return True
+
+
+def test_reintentos_y_fallos():
+    """451 se reintenta con backoff; 550 y adjunto inexistente fallan sin reintentar"""
+    print("\n=== Probando reintentos y fallos permanentes ===")
+    sink = SMTPSink(port=0, fallos_transitorios=2, rechazados={"nadie@example.com"}).iniciar()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            outbox = _entorno(tmp, sink)
+            bueno = outbox.encolar(["ok@example.com"], "Reporte", "Cuerpo")["mensajes"][0]
+            limite = time.monotonic() + 5
+            while outbox.mensaje(bueno)["estado"] != "enviado" and time.monotonic() < limite:
+                outbox.procesar_pendientes()
+                time.sleep(0.05)
+            final = outbox.mensaje(bueno)
+            assert final["estado"] == "enviado" and final["intentos"] == 3, final
+            assert outbox.reintentos == 2
+
+            rechazado = outbox.encolar(["nadie@example.com"], "Reporte", "Cuerpo")["mensajes"][0]
+            sin_adjunto = outbox.encolar(["ok@example.com"], "Reporte", "Cuerpo", str(tmp / "no.pdf"))["mensajes"][0]
+            outbox.procesar_pendientes()
+            for mensaje_id in (rechazado, sin_adjunto):
+                fallido = outbox.mensaje(mensaje_id)
+                assert fallido["estado"] == "fallido" and fallido["intentos"] == 1, fallido
+            assert outbox.reintentar(rechazado) is True and outbox.reintentar(bueno) is False
+            outbox.pool.cerrar()
+    finally:
+        sink.detener()
+    print("✅ Reintentos y fallos correctos")
+    return True
+
+
+def test_persistencia_y_worker():
+    """Lo encolado sobrevive a un reinicio y el hilo de envío lo entrega; servidor caído se reprograma"""
+    print("\n=== Probando persistencia y hilo de envío ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        # Servidor caído: se reprograma sin perder el mensaje
+        caido = SMTPSink(port=0)
+        caido.detener()
+        outbox = _entorno(tmp, caido)
+        lote = outbox.encolar(["a@example.com", "b@example.com"], "Reporte", "Cuerpo")["lote"]
+        outbox.procesar_tanda()
+        estado = outbox.lote(lote)
+        assert estado["por_estado"] == {"pendiente": 2}
+        assert [m["intentos"] for m in estado["mensajes"]] == [1, 0]  # el resto de la tanda no gasta intentos
+
+        # "Reinicio": otra instancia sobre la misma base con el servidor disponible
+        sink = SMTPSink(port=0).iniciar()
+        try:
+            nuevo = _entorno(tmp, sink, sondeo=0.05)
+            nuevo.iniciar()
+            limite = time.monotonic() + 5
+            while nuevo.lote(lote)["por_estado"] != {"enviado": 2} and time.monotonic() < limite:
+                time.sleep(0.05)
+            nuevo.detener()
+            assert nuevo.lote(lote)["por_estado"] == {"enviado": 2}
+            assert len(sink.mensajes) == 2
+        finally:
+            sink.detener()
+    print("✅ Persistencia y hilo de envío correctos")
+    return True
+
+
+def main():
+    """Ejecuta todas las pruebas"""
+    print("🧪 Iniciando pruebas de la bandeja de salida de correos\n")
+
+    tests = [
+        test_lista_de_distribucion,
+        test_reintentos_y_fallos,
+        test_persistencia_y_worker,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"❌ Error ejecutando {test.__name__}: {e!r}")
+
+    print(f"\n📊 Resultados: {passed}/{len(tests)} pruebas pasaron")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
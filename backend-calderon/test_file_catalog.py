@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para el catálogo de archivos de datos (metadatos cacheados y vigilancia de cambios)
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Agregar el directorio actual al path para importar módulos
+sys.path.append(str(Path(__file__).parent))
+
+from services.file_catalog import FileCatalog
+
+
+def _directorio(tmp: Path) -> Path:
+    datos = tmp / "data"
+    datos.mkdir()
+    (datos / "C05-Bellavista_Precipitación-Diario.csv").write_text(
+        "fecha,valor\n2020/01/01,1.5\n2020/01/02,\n2020/01/03,0.2\n"
+    )
+    (datos / "Temperatura ambiente_Mensual__C05_C19.csv").write_text(
+        "Fecha,C05,C19\n2019-01-01,12.1,10.3\n2019-02-01,12.4,10.1\n"
+    )
+    (datos / "Consumo_Calderon.csv").write_text("Anio,Mes,Consumo_m3\n2005,Enero,10\n2005,Febrero,11\n")
+    (datos / "notas.txt").write_text("sin tabla")
+    return datos
+
+
+def _esperar(condicion, segundos: float = 10) -> bool:
+    limite = time.monotonic() + segundos
+    while time.monotonic() < limite:
+        if condicion():
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def test_metadatos_y_filtros():
+    """Filas, rango de fechas, estaciones, variable y frecuencia; filtros y orden"""
+    print("=== Probando metadatos y filtros ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        catalogo = FileCatalog({"data": _directorio(Path(tmp))}, vigilar=False)
+        resultado = catalogo.listar("data")
+        assert resultado["total"] == 4 and resultado["files"] == sorted(resultado["files"])
+        items = {item["nombre"]: item for item in resultado["items"]}
+
+        diario = items["C05-Bellavista_Precipitación-Diario.csv"]
+        assert diario["filas"] == 3 and diario["fecha_inicio"] == "2020-01-01" and diario["fecha_fin"] == "2020-01-03"
+        assert diario["variable"] == "Precipitación" and diario["frecuencia"] == "Diario"
+        assert diario["estaciones"] == [{"codigo": "C05", "nombre": "C05-Bellavista"}]
+        mensual = items["Temperatura ambiente_Mensual__C05_C19.csv"]
+        assert [e["codigo"] for e in mensual["estaciones"]] == ["C05", "C19"]
+        assert mensual["frecuencia"] == "Mensual" and mensual["variable"] == "Temperatura ambiente"
+        consumo = items["Consumo_Calderon.csv"]
+        assert consumo["variable"] == "Consumo" and consumo["frecuencia"] == "Mensual"
+        assert consumo["fecha_fin"] == "2005-02-01"
+        assert items["notas.txt"]["filas"] is None
+
+        assert catalogo.listar("data", estacion="C05-Bellavista")["total"] == 2
+        assert catalogo.listar("data", variable="temperatura_ambiente")["total"] == 1
+        assert catalogo.listar("data", extension=".TXT")["files"] == ["notas.txt"]
+        assert catalogo.listar("data", frecuencia="diario")["total"] == 1
+        por_filas = catalogo.listar("data", orden="filas", desc=True)["files"]
+        assert por_filas[0] == "C05-Bellavista_Precipitación-Diario.csv" and por_filas[-1] == "notas.txt"
+        assert "error" in catalogo.listar("data", orden="color")
+        assert "error" in catalogo.listar("data9")
+
+        # Listar no vuelve a leer archivos
+        lecturas = catalogo.stats()["lecturas"]
+        for _ in range(50):
+            catalogo.listar("data")
+        assert catalogo.stats()["lecturas"] == lecturas == 4
+    print("✅ Metadatos y filtros correctos")
+    return True
+
+
+def test_revalidacion_por_sondeo():
+    """Sin vigilante: altas y bajas se detectan por el mtime del directorio; solo se relee lo cambiado"""
+    print("\n=== Probando revalidación sin vigilante ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        datos = _directorio(Path(tmp))
+        catalogo = FileCatalog({"data": datos}, vigilar=False, intervalo=0.2)
+        catalogo.listar("data")
+        (datos / "notas.txt").unlink()
+        (datos / "P53-Paluguillo_Precipitación-Diario.csv").write_text("fecha,valor\n2021/05/01,3\n")
+        os.utime(datos, ns=(time.time_ns(), time.time_ns() + 10**9))
+        nombres = catalogo.listar("data")["files"]
+        assert "notas.txt" not in nombres and "P53-Paluguillo_Precipitación-Diario.csv" in nombres
+        assert catalogo.stats()["lecturas"] == 5
+
+        # Cambio de contenido sin tocar el directorio: se ve al vencer el intervalo
+        ruta = datos / "C05-Bellavista_Precipitación-Diario.csv"
+        ruta.write_text(ruta.read_text() + "2020/01/04,9\n")
+        time.sleep(0.25)
+        assert catalogo.entrada("data", ruta.name)["filas"] == 4
+        assert catalogo.stats()["lecturas"] == 6
+    print("✅ Revalidación correcta")
+    return True
+
+
+def test_vigilancia():
+    """Con watchfiles el índice se actualiza solo ante altas, cambios y bajas"""
+    print("\n=== Probando vigilancia con watchfiles ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        datos = _directorio(Path(tmp))
+        catalogo = FileCatalog({"data": datos}, vigilar=True, intervalo=0)
+        if not catalogo.vigilar:
+            print("⚠️ watchfiles no está instalado; se omite")
+            return True
+        catalogo.iniciar()
+        try:
+            assert _esperar(lambda: catalogo.stats()["vigilando"])
+            nuevo = datos / "C20-Calderón_Radiación_solar-Diario.csv"
+            nuevo.write_text("fecha,valor\n2022/03/01,200\n2022/03/02,210\n")
+            assert _esperar(lambda: (catalogo.entrada("data", nuevo.name) or {}).get("filas") == 2)
+            nuevo.unlink()
+            assert _esperar(lambda: nuevo.name not in catalogo.listar("data")["files"])
+            assert catalogo.stats()["eventos"] >= 2
+        finally:
+            catalogo.detener()
+    print("✅ Vigilancia correcta")
+    return True
+
+
+def test_directorio_creado_tras_arrancar():
+    """Un directorio que no existía al arrancar el vigilante se revalida por sondeo, no queda congelado"""
+    print("\n=== Probando directorio creado después de arrancar ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        datos = _directorio(Path(tmp))
+        tardio = Path(tmp) / "data9"
+        catalogo = FileCatalog({"data": datos, "data9": tardio}, vigilar=True, intervalo=0.2)
+        if not catalogo.vigilar:
+            print("⚠️ watchfiles no está instalado; se omite")
+            return True
+        catalogo.iniciar()
+        try:
+            assert _esperar(lambda: catalogo.stats()["vigilando"])
+            assert catalogo.stats()["vigilados"] == ["data"]
+            tardio.mkdir()
+            assert catalogo.listar("data9")["files"] == []
+            (tardio / "Consumo_Calderon.csv").write_text("Anio,Mes,Consumo_m3\n2005,Enero,10\n")
+            assert _esperar(lambda: catalogo.listar("data9")["files"] == ["Consumo_Calderon.csv"], 3)
+            assert catalogo.entrada("data9", "Consumo_Calderon.csv")["filas"] == 1
+        finally:
+            catalogo.detener()
+    print("✅ Directorio tardío revalidado por sondeo")
+    return True
+
+
+def test_endpoint():
+    """GET /files/{directory} conserva "files" y acepta filtros y orden"""
+    print("\n=== Probando endpoint de listado ===")
+    from fastapi.testclient import TestClient
+    from main import app
+
+    client = TestClient(app)
+    resp = client.get("/files/data", params={"estacion": "C05", "orden": "fecha_inicio"})
+    assert resp.status_code == 200
+    datos = resp.json()
+    assert datos["files"] and all(n.startswith("C05-") for n in datos["files"])
+    inicios = [item["fecha_inicio"] for item in datos["items"]]
+    assert inicios == sorted(inicios)
+    assert client.get("/files/data", params={"orden": "color"}).status_code == 422
+    assert client.get("/files/nada").status_code == 400
+    print("✅ Endpoint correcto")
+    return True
+
+
+def main():
+    """Ejecuta todas las pruebas"""
+    print("🧪 Iniciando pruebas del catálogo de archivos\n")
+
+    tests = [
+        test_metadatos_y_filtros,
+        test_revalidacion_por_sondeo,
+        test_vigilancia,
+        test_directorio_creado_tras_arrancar,
+        test_endpoint,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"❌ Error ejecutando {test.__name__}: {e!r}")
+
+    print(f"\n📊 Resultados: {passed}/{len(tests)} pruebas pasaron")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para la ingesta en streaming de CSV de estaciones y de consumo
+"""
+
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+# Agregar el directorio actual al path para importar módulos
+sys.path.append(str(Path(__file__).parent))
+
+from fastapi.testclient import TestClient
+
+from main import app
+from services import consumption_service, ingest_service
+from services.series_store import series_store
+
+ESTACION = "fecha,valor,completo_mediciones,completo_umbral\n"
+CONSUMO = "Fecha,Consumo_m3,Precipitacion_mm,Poblacion\n"
+
+
+@contextmanager
+def _directorios():
+    """Directorios de datos temporales para data/ y data4/"""
+    originales = ingest_service.DATA_DIRS, consumption_service.DATA_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        dirs = {"data": tmp / "data", "data4": tmp / "data4"}
+        for d in dirs.values():
+            d.mkdir()
+        ingest_service.DATA_DIRS = dirs
+        consumption_service.DATA_DIR = dirs["data4"]
+        try:
+            yield dirs
+        finally:
+            ingest_service.DATA_DIRS, consumption_service.DATA_DIR = originales
+
+
+def _subir(client, directorio: str, nombre: str, contenido: str, **params):
+    return client.post(
+        f"/files/ingest/{directorio}", files={"file": (nombre, contenido.encode(), "text/csv")}, params=params
+    )
+
+
+def test_crear_y_anexar():
+    """Un archivo nuevo se crea con fechas AAAA/MM/DD; luego solo se agregan las filas nuevas"""
+    print("=== Probando creación y anexado ===")
+    client = TestClient(app)
+    with _directorios() as dirs:
+        nombre = "C99-Prueba_Precipitación-Diario.csv"
+        resp = _subir(client, "data", nombre, ESTACION + "2024-01-01,1.5,100,100\r\n2024-01-02,,50,40\r\n")
+        assert resp.status_code == 200, resp.text
+        datos = resp.json()
+        assert datos["creado"] and datos["filas_nuevas"] == 2 and datos["formato"] == "estacion"
+        ruta = dirs["data"] / nombre
+        assert ruta.read_text() == ESTACION + "2024/01/01,1.5,100,100\n2024/01/02,,50,40\n"
+
+        lecturas = series_store.stats()["lecturas"]
+        assert len(series_store.tabla(ruta).fechas) == 2
+        lecturas += 1
+
+        # Exportación completa más reciente: solo entran los días posteriores al 2024-01-02
+        resp = _subir(client, "data", nombre, ESTACION + "2024/01/01,1.5,100,100\n2024/01/02,,50,40\n2024/01/03,7.25,100,100\n2024/01/04,0,100,100")
+        datos = resp.json()
+        assert resp.status_code == 200 and not datos["creado"]
+        assert datos["filas_nuevas"] == 2 and datos["filas_existentes"] == 2 and datos["fecha_fin"] == "2024-01-04"
+        assert datos["cache_extendida"]
+        assert ruta.read_text().endswith("2024/01/02,,50,40\n2024/01/03,7.25,100,100\n2024/01/04,0,100,100\n")
+
+        # La tabla columnar se extendió sin volver a parsear el CSV
+        tabla = series_store.tabla(ruta)
+        assert series_store.stats()["lecturas"] == lecturas
+        assert [str(f) for f in tabla.fechas] == ["2024-01-01", "2024-01-02", "2024-01-03", "2024-01-04"]
+        assert tabla.columnas["valor"][2] == 7.25
+        series_store.clear()
+        assert len(series_store.tabla(ruta).fechas) == 4  # la copia columnar también está al día
+
+        # Sin filas nuevas no se toca el archivo
+        antes = ruta.stat().st_mtime_ns
+        assert _subir(client, "data", nombre, ESTACION + "2024/01/04,0,100,100\n").json()["filas_nuevas"] == 0
+        assert ruta.stat().st_mtime_ns == antes
+    print("✅ Creación y anexado correctos")
+    return True
+
+
+def test_validacion():
+    """Encabezado, campos, fechas y valores se validan al vuelo con número de línea"""
+    print("\n=== Probando validación ===")
+    client = TestClient(app)
+    recepciones = []
+
+    class _Registrada(ingest_service._Recepcion):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            recepciones.append(self)
+
+    original_recepcion = ingest_service._Recepcion
+    ingest_service._Recepcion = _Registrada
+    try:
+        _probar_validacion(client)
+    finally:
+        ingest_service._Recepcion = original_recepcion
+    # Todas las salidas (también el nombre no válido) cierran el archivo de preparación
+    assert recepciones and all(r._archivo.closed for r in recepciones)
+    print("✅ Validación correcta")
+    return True
+
+
+def _probar_validacion(client):
+    with _directorios() as dirs:
+        resp = _subir(client, "data", "x.csv", "fecha,valor\n2024/01/01,1\n")
+        assert resp.status_code == 400 and "Encabezado" in resp.json()["detail"]
+
+        malo = ESTACION + "2024/01/01,1,2,3\n2024/13/01,1,2,3\n2024/01/02,uno,2,3\n2024/01/03,1,2\n2024/01/01,1,2,3\n"
+        resp = _subir(client, "data", "x.csv", malo)
+        assert resp.status_code == 422
+        errores = resp.json()["detail"]["errores"]
+        assert [e["linea"] for e in errores] == [3, 4, 5, 6]
+        assert "Fecha no válida" in errores[0]["error"] and "no numérico" in errores[1]["error"]
+
+        # Al llegar al máximo de errores se corta la subida
+        muchos = ESTACION + "".join(f"2024/01/{i:02d},x,1,1\n" for i in range(1, 29))
+        errores = _subir(client, "data", "x.csv", muchos).json()["detail"]["errores"]
+        assert len(errores) == ingest_service.INGEST_MAX_ERRORS
+
+        original = ingest_service.INGEST_MAX_MB
+        ingest_service.INGEST_MAX_MB = 0.001
+        try:
+            assert _subir(client, "data", "x.csv", ESTACION + "2024/01/01,1,1,1\n" * 200).status_code == 413
+        finally:
+            ingest_service.INGEST_MAX_MB = original
+
+        assert _subir(client, "data2", "x.csv", ESTACION).status_code == 400
+        assert _subir(client, "data", "../x.csv", ESTACION + "2024/01/01,1,1,1\n").json()["archivo"] == "x.csv"
+        assert _subir(client, "data", "x.xlsx", ESTACION + "2024/01/01,1,1,1\n").status_code == 400
+        # Nada quedó a medias en el directorio ni en el área de preparación
+        assert sorted(p.name for p in dirs["data"].iterdir()) == ["x.csv"]
+        assert not list(Path(ingest_service.INGEST_STAGING_DIR).glob("*.csv"))
+
+
+def test_consumo_mantiene_agregado():
+    """Filas de un mes nuevo extienden el agregado mensual en caché del consumo"""
+    print("\n=== Probando ingesta de consumo ===")
+    client = TestClient(app)
+    with _directorios() as dirs:
+        ruta = dirs["data4"] / consumption_service.CSV_NAME
+        ruta.write_text(CONSUMO + "2024-11-30,100,1.0,1000\n2024-12-01,100,1.0,1000\n2024-12-31,50,2.0,1000\n")
+        assert len(consumption_service._load_raw()) == 2
+
+        resp = _subir(client, "data4", "export.csv", CONSUMO + "2024-12-31,50,2.0,1000\n2025-01-01,80,0.5,1010\n2025-01-02,20,0.5,1010\n",
+                      filename=consumption_service.CSV_NAME)
+        assert resp.status_code == 200 and resp.json()["filas_nuevas"] == 2
+        entrada = consumption_service._raw_cache[str(ruta)]
+        assert entrada[0] == ruta.stat().st_mtime_ns  # la caché sigue vigente tras el anexado
+        mensual = consumption_service._load_raw()
+        assert mensual[["anio", "mes"]].values.tolist() == [[2024, 11], [2024, 12], [2025, 1]]
+        assert mensual["consumo_m3"].tolist() == [100, 150, 100] and mensual["poblacion"].iloc[-1] == 1010
+        consumption_service._raw_cache.clear()
+        assert consumption_service._load_raw().equals(mensual)
+
+        assert _subir(client, "data4", "x.csv", "Anio,Mes,Consumo_m3\n2025,1,10\n").status_code == 400
+    print("✅ Ingesta de consumo correcta")
+    return True
+
+
+def main():
+    """Ejecuta todas las pruebas"""
+    print("🧪 Iniciando pruebas de ingesta\n")
+
+    tests = [
+        test_crear_y_anexar,
+        test_validacion,
+        test_consumo_mantiene_agregado,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"❌ Error ejecutando {test.__name__}: {e!r}")
+
+    print(f"\n📊 Resultados: {passed}/{len(tests)} pruebas pasaron")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para la caché de interpretaciones (/ia/interpretar)
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Agregar el directorio actual al path para importar módulos
+sys.path.append(str(Path(__file__).parent))
+
+import services.interpretacion_service as servicio
+from core.metrics import PROMPT_TOKENS
+from services.interpretacion_cache import InterpretacionCache
+
+DATOS = [{"fecha": f"2024-{m:02d}", "valor": 10 * m} for m in range(1, 13)]
+
+
+class _GeminiSimulado:
+    def __init__(self, respuesta="Interpretación simulada", demora=0.0):
+        self.respuesta = respuesta
+        self.demora = demora
+        self.llamadas = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, titulo, resumen):
+        with self._lock:
+            self.llamadas += 1
+        time.sleep(self.demora)
+        return self.respuesta
+
+
+def _con_cache(cache: InterpretacionCache, gemini: _GeminiSimulado, fn):
+    originales = (servicio.interpretacion_cache, servicio.interpretar_datos_gemini)
+    servicio.interpretacion_cache, servicio.interpretar_datos_gemini = cache, gemini
+    try:
+        return fn()
+    finally:
+        servicio.interpretacion_cache, servicio.interpretar_datos_gemini = originales
+
+
+def test_memoria_disco_y_clave_canonica():
+    """Aciertos en memoria, en disco tras un reinicio y con datos equivalentes"""
+    print("=== Probando niveles de memoria y disco ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        db = str(Path(tmp) / "interpretaciones.sqlite3")
+        gemini = _GeminiSimulado()
+        cache = InterpretacionCache(max_entries=10, ttl_seconds=60, db_path=db)
+        interpretar = servicio.interpretar_datos_climaticos_detallado
+        resumenes = PROMPT_TOKENS.cuenta(stage="interpretacion")
+
+        r1 = _con_cache(cache, gemini, lambda: interpretar("Lluvia", "precipitación", DATOS))
+        r2 = _con_cache(cache, gemini, lambda: interpretar("Lluvia", "precipitación", DATOS))
+        # Mismos datos con enteros como float, otro orden de claves y campos extra
+        equivalentes = [{"valor": float(d["valor"]), "fecha": d["fecha"], "estacion": "M0024"} for d in DATOS]
+        r3 = _con_cache(cache, gemini, lambda: interpretar("Lluvia", "precipitación", equivalentes))
+        assert (r1["cache"], r2["cache"], r3["cache"]) == (None, "memoria", "memoria")
+
+        # Un proceso nuevo (memoria vacía) encuentra la interpretación en disco
+        reiniciada = InterpretacionCache(max_entries=10, ttl_seconds=60, db_path=db)
+        r4 = _con_cache(reiniciada, gemini, lambda: interpretar("Lluvia", "precipitación", DATOS))
+        assert r4["cache"] == "disco"
+        assert r4["interpretacion"] == r1["interpretacion"]
+
+        otro_titulo = _con_cache(reiniciada, gemini, lambda: interpretar("Otra estación", "precipitación", DATOS))
+        assert otro_titulo["cache"] is None
+        assert gemini.llamadas == 2
+        # Solo las interpretaciones calculadas registran el tamaño de su resumen
+        assert PROMPT_TOKENS.cuenta(stage="interpretacion") == resumenes + 2
+    print("✅ Memoria, disco y clave canónica correctos")
+    return True
+
+
+def test_agrupacion_y_errores():
+    """Las peticiones idénticas concurrentes hacen una sola llamada; los errores no se cachean"""
+    print("\n=== Probando agrupación de peticiones concurrentes ===")
+    gemini = _GeminiSimulado(demora=0.2)
+    cache = InterpretacionCache(max_entries=10, ttl_seconds=60, db_path=None)
+    origenes = []
+
+    def peticion():
+        origenes.append(servicio.interpretar_datos_climaticos_detallado("Lluvia", "precipitación", DATOS)["cache"])
+
+    def lanzar():
+        hilos = [threading.Thread(target=peticion) for _ in range(8)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+    _con_cache(cache, gemini, lanzar)
+    print(f"   Orígenes: {sorted(map(str, origenes))}")
+    assert gemini.llamadas == 1
+    assert origenes.count(None) == 1 and origenes.count("compartida") + origenes.count("memoria") == 7
+
+    fallo = _GeminiSimulado(respuesta="Error en análisis con Gemini: 429")
+    cache_errores = InterpretacionCache(max_entries=10, ttl_seconds=60, db_path=None)
+    for _ in range(2):
+        _con_cache(cache_errores, fallo, lambda: servicio.interpretar_datos_climaticos_detallado("X", "y", DATOS))
+    assert fallo.llamadas == 2
+    print("✅ Una sola llamada a Gemini y errores sin cachear")
+    return True
+
+
+def test_bases_se_crean_en_el_primer_uso():
+    """Importar la API o construir los servicios no crea archivos SQLite; el primer uso sí"""
+    print("\n=== Probando creación diferida de las bases SQLite ===")
+    from services.email_outbox import EmailOutbox
+    from services.report_artifacts import ReportArtifacts
+    from services.subscriptions import SubscriptionService
+
+    with tempfile.TemporaryDirectory() as tmp:
+        entorno = {**os.environ, "PYTHONPATH": str(Path(__file__).parent)}
+        subprocess.run([sys.executable, "-c", "import main"], cwd=tmp, env=entorno, check=True, capture_output=True)
+        assert list(Path(tmp).iterdir()) == [], list(Path(tmp).rglob("*"))
+
+        base = Path(tmp) / "cache"
+        cache = InterpretacionCache(db_path=str(base / "interpretaciones.sqlite3"))
+        artefactos = ReportArtifacts(db_path=str(base / "reportes.sqlite3"))
+        outbox = EmailOutbox(db_path=str(base / "outbox.sqlite3"))
+        suscripciones = SubscriptionService(db_path=str(base / "suscripciones.sqlite3"), outbox=outbox)
+        assert not base.exists()
+        assert cache.stats()["entradas_disco"] == 0  # consultar estadísticas tampoco crea la base
+        assert not base.exists()
+
+        assert artefactos.buscar("x") is None
+        assert outbox.stats()["por_estado"] == {} and suscripciones.listar_listas() == []
+        cache.obtener("clave", lambda: {"texto": "ok"}, lambda r: True)
+        assert {p.name for p in base.iterdir()} >= {
+            "interpretaciones.sqlite3", "reportes.sqlite3", "outbox.sqlite3", "suscripciones.sqlite3"
+        }
+    print("✅ Sin archivos al importar; las bases se crean al usarse")
+    return True
+
+
+def main():
+    """Ejecuta todas las pruebas"""
+    print("🧪 Iniciando pruebas de la caché de interpretaciones\n")
+
+    tests = [
+        test_memoria_disco_y_clave_canonica,
+        test_agrupacion_y_errores,
+        test_bases_se_crean_en_el_primer_uso,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"❌ Error ejecutando {test.__name__}: {e!r}")
+
+    print(f"\n📊 Resultados: {passed}/{len(tests)} pruebas pasaron")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
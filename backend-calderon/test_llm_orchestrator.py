@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para el orquestador de proveedores LLM (respaldo y cobertura)
+"""
+
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Agregar el directorio actual al path para importar módulos
+sys.path.append(str(Path(__file__).parent))
+
+import services.chatbot as chatbot
+import services.llm_orchestrator as llm_orchestrator
+from services.chat_cache import chat_cache
+from services.llm_orchestrator import ProviderOrchestrator
+
+
+def _responde(texto: str, demora: float = 0.0):
+    def proveedor(prompt, cancel_token=None):
+        time.sleep(demora)
+        return texto
+    return proveedor
+
+
+def _falla(mensaje: str):
+    def proveedor(prompt, cancel_token=None):
+        raise RuntimeError(mensaje)
+    return proveedor
+
+
+def test_plan():
+    """El preferido va primero; los respaldos se ordenan por errores y p95; un preferido que falla se degrada"""
+    print("=== Probando el plan de proveedores ===")
+    orq = ProviderOrchestrator({n: _responde(n) for n in ("a", "b", "c")})
+    for _ in range(5):
+        orq.stats["b"].record_success(2.0)
+        orq.stats["c"].record_success(0.5)
+    assert orq.plan("a", ["a", "b", "c"]) == ["a", "c", "b"]
+    # El preferido no disponible (sin API key o circuito abierto) queda fuera
+    assert orq.plan("a", ["b", "c"]) == ["c", "b"]
+    # Un respaldo con errores recientes pasa detrás aunque sea más rápido
+    for _ in range(5):
+        orq.stats["c"].record_error(RuntimeError("500"))
+    assert orq.plan("a", ["a", "b", "c"]) == ["a", "b", "c"]
+    # Con la mitad o más de errores recientes el preferido pasa al final
+    for _ in range(2):
+        orq.stats["a"].record_error(RuntimeError("500"))
+    assert orq.plan("a", ["a", "b", "c"]) == ["b", "c", "a"]
+    assert orq.plan("a", ["a"]) == ["a"]
+    print("✅ Plan correcto")
+    return True
+
+
+def test_respaldo_ante_error():
+    """Si un proveedor falla o responde vacío se prueba el siguiente"""
+    print("\n=== Probando respaldo ante errores ===")
+    orq = ProviderOrchestrator({"a": _falla("503"), "b": _responde("   "), "c": _responde("ok")})
+    resultado = orq.execute("p", ["a", "b", "c"], hedged=False)
+    assert resultado == {"respuesta": "ok", "proveedor": "c", "intentos": ["a", "b", "c"]}
+    assert orq.stats["a"].errors == 1 and orq.stats["b"].errors == 1 and orq.stats["c"].successes == 1
+
+    orq = ProviderOrchestrator({"a": _falla("503"), "b": _falla("429")})
+    try:
+        orq.execute("p", ["a", "b"], hedged=False)
+        raise AssertionError("Se esperaba RuntimeError")
+    except RuntimeError as e:
+        assert "a: 503" in str(e) and "b: 429" in str(e)
+    print("✅ Respaldo correcto")
+    return True
+
+
+def test_cobertura_tras_p95_y_cancelacion():
+    """Pasado el p95 del proveedor en curso se lanza la cobertura; el perdedor se cancela"""
+    print("\n=== Probando peticiones de cobertura ===")
+    cancelado = threading.Event()
+    lanzamientos = {}
+
+    def lento(prompt, cancel_token=None):
+        lanzamientos["lento"] = time.perf_counter()
+        cancel_token.on_cancel(cancelado.set)  # p. ej. client.close()
+        if cancelado.wait(5):
+            raise ConnectionError("cliente cerrado")
+        return "tarde"
+
+    def rapido(prompt, cancel_token=None):
+        lanzamientos["rapido"] = time.perf_counter()
+        return "a tiempo"
+
+    orq = ProviderOrchestrator({"lento": lento, "rapido": rapido})
+    for _ in range(5):
+        orq.stats["lento"].record_success(0.2)
+    minimo = llm_orchestrator.LLM_HEDGE_MIN_DELAY
+    llm_orchestrator.LLM_HEDGE_MIN_DELAY = 0.05
+    try:
+        inicio = time.perf_counter()
+        resultado = orq.execute("p", ["lento", "rapido"], hedged=True)
+        total = time.perf_counter() - inicio
+    finally:
+        llm_orchestrator.LLM_HEDGE_MIN_DELAY = minimo
+
+    espera = lanzamientos["rapido"] - lanzamientos["lento"]
+    print(f"   Cobertura lanzada a los {espera:.3f} s, respuesta en {total:.3f} s")
+    assert resultado["proveedor"] == "rapido" and resultado["intentos"] == ["lento", "rapido"]
+    assert 0.15 <= espera < 1.0 and total < 1.0
+    assert cancelado.wait(1)
+    time.sleep(0.05)  # el hilo del perdedor registra la cancelación al salir
+    # La cancelación no cuenta como error del proveedor lento
+    assert orq.stats["lento"].cancelled == 1 and orq.stats["lento"].errors == 0
+    print("✅ Cobertura y cancelación correctas")
+    return True
+
+
+def _cancelar_tras(token, segundos: float):
+    threading.Timer(segundos, token.cancel).start()
+
+
+def test_cancelacion_de_gemini_y_backoff_de_zephyr():
+    """Cancelar libera al instante a Gemini (que no se puede abortar) y corta el backoff de Zephyr"""
+    print("\n=== Probando cancelación de Gemini y Zephyr ===")
+    from services.llm_orchestrator import CancelToken
+    from services.llm_resilience import llm_guards
+
+    class _Modelo:
+        def __init__(self, nombre):
+            pass
+
+        def generate_content(self, *args, **kwargs):
+            time.sleep(3)  # petición que el SDK no permite interrumpir
+            raise AssertionError("no debería esperarse")
+
+    class _GenAI:
+        GenerativeModel = _Modelo
+
+    class _Completions:
+        llamadas = 0
+
+        def create(self, **kwargs):
+            _Completions.llamadas += 1
+            raise RuntimeError("503 Service Unavailable")
+
+    class _Cliente:
+        def __init__(self, **kwargs):
+            self.chat = type("Chat", (), {"completions": _Completions()})()
+
+        def close(self):
+            pass
+
+    class _OpenAI:
+        OpenAI = _Cliente
+
+    originales = (chatbot._configurar_gemini, chatbot._openai_sdk)
+    chatbot._configurar_gemini = lambda: _GenAI
+    chatbot._openai_sdk = lambda: (_OpenAI, True)
+    clave = os.environ.get("HF_API_KEY")
+    os.environ["HF_API_KEY"] = "prueba"
+    gemini = llm_guards["gemini"]
+    canceladas = gemini.cancelled
+    try:
+        token = CancelToken()
+        _cancelar_tras(token, 0.1)
+        inicio = time.perf_counter()
+        try:
+            chatbot._llamar_gemini("p", cancel_token=token)
+            raise AssertionError("Se esperaba la cancelación")
+        except ConnectionAbortedError:
+            pass
+        assert time.perf_counter() - inicio < 1.0
+        assert gemini.cancelled == canceladas + 1 and gemini.snapshot()["concurrencia"]["en_curso"] == 0
+
+        token = CancelToken()
+        _cancelar_tras(token, 0.1)
+        inicio = time.perf_counter()
+        try:
+            chatbot._llamar_zephyr("p", cancel_token=token, max_retries=3, backoff=10)
+            raise AssertionError("Se esperaba el error de Zephyr")
+        except RuntimeError as e:
+            assert "503" in str(e)
+        assert time.perf_counter() - inicio < 1.0 and _Completions.llamadas == 1
+    finally:
+        chatbot._configurar_gemini, chatbot._openai_sdk = originales
+        if clave is None:
+            os.environ.pop("HF_API_KEY", None)
+        else:
+            os.environ["HF_API_KEY"] = clave
+    print("✅ Cancelación inmediata en Gemini y Zephyr")
+    return True
+
+
+def test_respuesta_de_respaldo_no_se_cachea_bajo_el_modelo():
+    """Una respuesta de un proveedor de respaldo no se sirve después como si fuera del solicitado"""
+    print("\n=== Probando caché con respuestas de respaldo ===")
+    llamadas = []
+
+    def despachar(pregunta, modelo, estrategia="simple", historial=""):
+        llamadas.append(modelo)
+        proveedor = "gemini" if len(llamadas) == 1 else modelo
+        return {"respuesta": f"Respuesta de {proveedor}", "proveedor": proveedor}
+
+    original = chatbot._despachar_pregunta
+    chatbot._despachar_pregunta = despachar
+    chat_cache.clear()
+    try:
+        pregunta = "¿Cuál fue el consumo de agua en 2023?"
+        primera = chatbot.responder_pregunta_detallada(pregunta, "openai", estrategia="fallback")
+        segunda = chatbot.responder_pregunta_detallada(pregunta, "openai", estrategia="fallback")
+        tercera = chatbot.responder_pregunta_detallada(pregunta, "openai", estrategia="fallback")
+    finally:
+        chatbot._despachar_pregunta = original
+        chat_cache.clear()
+    assert primera == {"respuesta": "Respuesta de gemini", "proveedor": "gemini", "cache": False}
+    assert segunda == {"respuesta": "Respuesta de openai", "proveedor": "openai", "cache": False}
+    assert tercera == {"respuesta": "Respuesta de openai", "proveedor": "openai", "cache": True}
+    assert len(llamadas) == 2
+    print("✅ Solo se cachean respuestas del proveedor solicitado")
+    return True
+
+
+def main():
+    """Ejecuta todas las pruebas"""
+    print("🧪 Iniciando pruebas del orquestador LLM\n")
+
+    tests = [
+        test_plan,
+        test_respaldo_ante_error,
+        test_cobertura_tras_p95_y_cancelacion,
+        test_cancelacion_de_gemini_y_backoff_de_zephyr,
+        test_respuesta_de_respaldo_no_se_cachea_bajo_el_modelo,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"❌ Error ejecutando {test.__name__}: {e!r}")
+
+    print(f"\n📊 Resultados: {passed}/{len(tests)} pruebas pasaron")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
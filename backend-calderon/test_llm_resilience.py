@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para la capa de resiliencia de proveedores LLM (circuito, cuota y cancelación)
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Agregar el directorio actual al path para importar módulos
+sys.path.append(str(Path(__file__).parent))
+
+from core.metrics import LLM_ERRORES
+from services.llm_orchestrator import CancelToken
+from services.llm_resilience import CircuitBreaker, ProveedorNoDisponible, ProviderGuard, TokenBucket
+
+
+def _fallar(error: Exception):
+    raise error
+
+
+def test_transiciones_del_circuito():
+    """closed → open tras N fallos → half_open al vencer el reinicio → closed u open según la prueba"""
+    print("=== Probando transiciones del circuito ===")
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_success()  # un éxito reinicia los fallos consecutivos
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+    assert 0 < breaker.retry_in() <= 0.1 and breaker.times_opened == 1
+
+    time.sleep(0.12)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # solo una llamada de prueba a la vez
+    breaker.record_failure()  # la prueba falla: se reabre
+    assert breaker.state == CircuitBreaker.OPEN and breaker.times_opened == 2
+
+    time.sleep(0.12)
+    assert breaker.allow()
+    breaker.record_cancelled()  # una prueba cancelada libera el turno sin decidir nada
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+    print("✅ Transiciones correctas")
+    return True
+
+
+def test_token_bucket():
+    """Ráfaga hasta la capacidad, espera acotada por la recarga y vaciado tras un 429"""
+    print("\n=== Probando token bucket ===")
+    bucket = TokenBucket(rate=20, capacity=3)
+    assert all(bucket.acquire() for _ in range(3))
+    assert not bucket.acquire(0) and bucket.rejected == 1
+
+    inicio = time.perf_counter()
+    assert bucket.acquire(max_wait=0.5)
+    espera = time.perf_counter() - inicio
+    print(f"   Espera por una ficha: {espera:.3f} s")
+    assert 0.03 <= espera < 0.3
+
+    time.sleep(0.2)  # se recargan las 3 fichas
+    assert bucket.snapshot()["fichas_disponibles"] == 3
+    bucket.drain()
+    assert bucket.snapshot()["fichas_disponibles"] < 1
+    assert not bucket.acquire(0.01)  # la siguiente ficha tarda 50 ms en llegar
+    assert bucket.rejected == 2
+    print("✅ Token bucket correcto")
+    return True
+
+
+def test_guard_abre_el_circuito_y_rechaza():
+    """Los fallos reales abren el circuito y las llamadas siguientes fallan de inmediato; un 429 vacía la cuota"""
+    print("\n=== Probando ProviderGuard con fallos reales ===")
+    guard = ProviderGuard("prueba_fallos", requests_per_minute=6000, burst=10, max_concurrency=2,
+                          failure_threshold=2, reset_seconds=60, max_wait=0.01)
+    for _ in range(2):
+        try:
+            guard.call(_fallar, RuntimeError("Error 429: rate limit"))
+        except RuntimeError:
+            pass
+    assert guard.failures == 2 and guard.breaker.state == CircuitBreaker.OPEN and not guard.available()
+    assert guard.bucket.snapshot()["fichas_disponibles"] < 1
+    try:
+        guard.call(lambda: "no debería llamarse")
+        raise AssertionError("Se esperaba ProveedorNoDisponible")
+    except ProveedorNoDisponible as e:
+        assert "circuito abierto" in e.motivo
+    assert guard.fast_failures == 1
+    print("✅ Circuito abierto por fallos reales")
+    return True
+
+
+def test_cancelacion_no_cuenta_como_fallo():
+    """Cerrar el cliente de una petición de cobertura perdedora no abre el circuito"""
+    print("\n=== Probando cancelaciones ===")
+    guard = ProviderGuard("prueba_cancelada", requests_per_minute=6000, burst=10, max_concurrency=2,
+                          failure_threshold=1, reset_seconds=60)
+
+    def perdedora(token):
+        token.cancel()  # el orquestador cierra el cliente mientras la llamada está en curso
+        raise ConnectionError("Connection closed")
+
+    for _ in range(3):
+        token = CancelToken()
+        try:
+            guard.call(perdedora, token, cancel_token=token)
+            raise AssertionError("La excepción de la cancelación debe propagarse")
+        except ConnectionError:
+            pass
+    assert guard.cancelled == 3 and guard.failures == 0
+    assert guard.breaker.state == CircuitBreaker.CLOSED
+    assert LLM_ERRORES.valor(provider="prueba_cancelada", error="ConnectionError") == 0
+
+    # Sin cancelación el mismo error sí es un fallo del proveedor
+    try:
+        guard.call(_fallar, ConnectionError("Connection reset"), cancel_token=CancelToken())
+    except ConnectionError:
+        pass
+    assert guard.failures == 1 and guard.breaker.state == CircuitBreaker.OPEN
+    assert guard.snapshot()["canceladas"] == 3
+    print("✅ Las cancelaciones no cuentan como fallos")
+    return True
+
+
+def main():
+    """Ejecuta todas las pruebas"""
+    print("🧪 Iniciando pruebas de resiliencia LLM\n")
+
+    tests = [
+        test_transiciones_del_circuito,
+        test_token_bucket,
+        test_guard_abre_el_circuito_y_rechaza,
+        test_cancelacion_no_cuenta_como_fallo,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"❌ Error ejecutando {test.__name__}: {e!r}")
+
+    print(f"\n📊 Resultados: {passed}/{len(tests)} pruebas pasaron")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
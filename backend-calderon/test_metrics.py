@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para el endpoint /metrics (formato Prometheus) y sus ganchos
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+# Agregar el directorio actual al path para importar módulos
+sys.path.append(str(Path(__file__).parent))
+
+from fastapi.testclient import TestClient
+
+from core.metrics import (
+    HTTP_DURACION, INFERENCIA_LOTE, LLM_DURACION, LLM_ERRORES, PARSEO_DURACION, PROMPT_TOKENS, Registro, metricas
+)
+
+
+def _muestras(texto: str) -> dict:
+    """Líneas de muestra del texto expuesto → {nombre{etiquetas}: valor}"""
+    muestras = {}
+    for linea in texto.splitlines():
+        if linea and not linea.startswith("#"):
+            nombre, _, valor = linea.rpartition(" ")
+            muestras[nombre] = float(valor)
+    return muestras
+
+
+def test_formato():
+    """Contadores e histogramas con buckets acumulados, +Inf, _sum/_count y escape de etiquetas"""
+    print("=== Probando formato de exposición ===")
+    registro = Registro()
+    contador = registro.contador("pruebas_total", "Pruebas", ("tipo",))
+    histograma = registro.histograma("espera_seconds", "Espera", ("ruta",), buckets=(0.1, 1))
+    contador.inc(tipo='a"b')
+    contador.inc(2, tipo='a"b')
+    for valor in (0.05, 0.5, 0.5, 3):
+        histograma.observar(valor, ruta="/x")
+    registro.colector(lambda: [("cola", "gauge", "Cola", [({"q": "uno"}, 4), ({"q": "dos"}, None)])])
+    registro.colector(lambda: 1 / 0)  # un colector roto no rompe el scrape
+
+    texto = registro.exponer()
+    assert "# TYPE pruebas_total counter" in texto and "# TYPE espera_seconds histogram" in texto
+    muestras = _muestras(texto)
+    assert muestras['pruebas_total{tipo="a\\"b"}'] == 3
+    assert muestras['espera_seconds_bucket{ruta="/x",le="0.1"}'] == 1
+    assert muestras['espera_seconds_bucket{ruta="/x",le="1"}'] == 3
+    assert muestras['espera_seconds_bucket{ruta="/x",le="+Inf"}'] == 4
+    assert muestras['espera_seconds_count{ruta="/x"}'] == 4 and muestras['espera_seconds_sum{ruta="/x"}'] == 4.05
+    assert muestras['cola{q="uno"}'] == 4 and 'cola{q="dos"}' not in muestras
+    assert registro.contador("pruebas_total", "otra") is contador
+    print("✅ Formato correcto")
+    return True
+
+
+def test_middleware_y_endpoint():
+    """Latencia por plantilla de ruta y código; /metrics incluye cachés y colas"""
+    print("\n=== Probando middleware y /metrics ===")
+    from main import app
+
+    client = TestClient(app)
+    etiquetas = {"method": "GET", "route": "/files/{directory}", "status": "200"}
+    antes = HTTP_DURACION.cuenta(**etiquetas)
+    client.get("/files/data")
+    client.get("/files/data3")
+    client.get("/files/nada")
+    client.get("/no/existe")
+    assert HTTP_DURACION.cuenta(**etiquetas) == antes + 2
+    assert HTTP_DURACION.cuenta(method="GET", route="/files/{directory}", status="400") >= 1
+    assert HTTP_DURACION.cuenta(method="GET", route="sin_ruta", status="404") >= 1
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200 and resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    muestras = _muestras(resp.text)
+    assert muestras['http_request_duration_seconds_count{method="GET",route="/files/{directory}",status="200"}'] == antes + 2
+    assert 'queue_depth{queue="report_jobs"}' in muestras and 'queue_depth{queue="email_outbox"}' in muestras
+    assert 'cache_requests_total{cache="series"}' in muestras and 'llm_in_flight{provider="openai"}' in muestras
+    print("✅ Middleware y /metrics correctos")
+    return True
+
+
+def test_ganchos_de_servicios():
+    """LLM, inferencia del modelo, parseo de archivos y prompts del chatbot alimentan sus métricas"""
+    print("\n=== Probando ganchos de servicios ===")
+    from services import consumption_service
+    from services.llm_resilience import ProviderGuard
+    from services.series_store import SeriesStore
+
+    guard = ProviderGuard("prueba", requests_per_minute=600, burst=10, max_concurrency=2)
+    assert guard.call(lambda: "ok") == "ok"
+    try:
+        guard.call(lambda: (_ for _ in ()).throw(TimeoutError("lento")))
+    except TimeoutError:
+        pass
+    assert LLM_DURACION.cuenta(provider="prueba", outcome="ok") == 1
+    assert LLM_DURACION.cuenta(provider="prueba", outcome="error") == 1
+    assert LLM_ERRORES.valor(provider="prueba", error="TimeoutError") == 1
+
+    antes = INFERENCIA_LOTE.cuenta(operation="forecast")
+    consumption_service.forecast_arrays(18)
+    assert INFERENCIA_LOTE.cuenta(operation="forecast") == antes + 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = Path(tmp) / "serie.csv"
+        ruta.write_text("fecha,valor\n2024/01/01,1\n")
+        store = SeriesStore(cache_dir=None)
+        antes = PARSEO_DURACION.cuenta(format="csv", source="series_store")
+        store.tabla(ruta)
+        store.tabla(ruta)  # desde memoria: no se vuelve a parsear
+        assert PARSEO_DURACION.cuenta(format="csv", source="series_store") == antes + 1
+
+    # Tokens del prompt antes y después de anexar el contexto selectivo
+    from services.chatbot import _enrich_prompt_with_context
+
+    class _Snapshot:
+        def actual(self):
+            return "Consumo mensual promedio: 1000 m3\n" * 50
+
+    antes = {etapa: PROMPT_TOKENS.cuenta(stage=etapa) for etapa in ("pregunta", "enriquecido")}
+    _enrich_prompt_with_context("¿Cuál es el consumo de agua actual?", snapshot=_Snapshot())
+    assert all(PROMPT_TOKENS.cuenta(stage=etapa) == n + 1 for etapa, n in antes.items())
+    texto = metricas.exponer()
+    assert 'llm_prompt_tokens_bucket{stage="pregunta",le="100"}' in texto
+    assert _muestras(texto)['llm_prompt_tokens_sum{stage="enriquecido"}'] > _muestras(texto)['llm_prompt_tokens_sum{stage="pregunta"}']
+    print("✅ Ganchos correctos")
+    return True
+
+
+def main():
+    """Ejecuta todas las pruebas"""
+    print("🧪 Iniciando pruebas de métricas\n")
+
+    tests = [
+        test_formato,
+        test_middleware_y_endpoint,
+        test_ganchos_de_servicios,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"❌ Error ejecutando {test.__name__}: {e!r}")
+
+    print(f"\n📊 Resultados: {passed}/{len(tests)} pruebas pasaron")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para la maquetación del reporte PDF (filas vectorizadas, LongTable y gráficos)
+"""
+
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+# Agregar el directorio actual al path para importar módulos
+sys.path.append(str(Path(__file__).parent))
+
+from services import pdf_templates
+
+
+def _predicciones(meses: int) -> pd.DataFrame:
+    fechas = pd.date_range("2026-10-01", periods=meses, freq="MS")
+    df = pd.DataFrame({"anio": fechas.year, "mes": fechas.month, "fecha": fechas})
+    df["mes_nombre"] = df["fecha"].dt.strftime("%B")
+    df["consumo_predicho_m3"] = (80000 + 1234.567 * (df.index % 12)).round(2)
+    return df
+
+
+def test_filas_vectorizadas():
+    """Las filas vectorizadas coinciden con las que armaba iterrows"""
+    print("=== Probando filas de la tabla ===")
+    df = _predicciones(30)
+    esperadas = [["Año", "Mes", "Consumo Predicho (m³)"]] + [
+        [str(int(row["anio"])), row["mes_nombre"], f"{row['consumo_predicho_m3']:,.2f}"]
+        for _, row in df.iterrows()
+    ]
+    assert pdf_templates.filas_tabla(df) == esperadas
+    assert pdf_templates.estilos() is pdf_templates.estilos()  # una vez por proceso
+    print("✅ Filas correctas")
+    return True
+
+
+def test_horizonte_largo():
+    """Un pronóstico de 30 años se parte en páginas repitiendo el encabezado de la tabla"""
+    print("\n=== Probando reporte de horizonte largo ===")
+    df = _predicciones(360)
+    with tempfile.TemporaryDirectory() as tmp:
+        destino = Path(tmp) / "reporte.pdf"
+        resumen = pdf_templates.construir_reporte(df, destino, poblacion_estimada=250000)
+        contenido = destino.read_bytes()
+    paginas = max(int(n) for n in re.findall(rb"/Count (\d+)", contenido))
+    assert paginas >= 360 * pdf_templates.ALTO_FILA // 800, paginas
+    assert round(resumen["total_consumo"], 2) == round(df["consumo_predicho_m3"].sum(), 2)
+    tabla = pdf_templates.tabla_predicciones(df)
+    partes = tabla.split(450, 700)
+    assert len(partes) == 2 and partes[1]._cellvalues[0] == pdf_templates.ENCABEZADO_TABLA
+    print(f"✅ {paginas} páginas con encabezado repetido")
+    return True
+
+
+def test_graficos():
+    """Gráfico mensual siempre; el anual solo si el horizonte abarca más de un año"""
+    print("\n=== Probando gráficos del pronóstico ===")
+    from reportlab.graphics import renderSVG
+
+    df = _predicciones(48)
+    svg = renderSVG.drawToString(pdf_templates.grafico_mensual(df))
+    assert "2027" in svg and "2030" in svg
+    svg = renderSVG.drawToString(pdf_templates.grafico_anual(df))
+    assert svg.count("2026") >= 1 and "2029" in svg
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_templates.construir_reporte(_predicciones(2), Path(tmp) / "corto.pdf")
+    print("✅ Gráficos correctos")
+    return True
+
+
+def main():
+    """Ejecuta todas las pruebas"""
+    print("🧪 Iniciando pruebas de la maquetación PDF\n")
+
+    tests = [
+        test_filas_vectorizadas,
+        test_horizonte_largo,
+        test_graficos,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"❌ Error ejecutando {test.__name__}: {e!r}")
+
+    print(f"\n📊 Resultados: {passed}/{len(tests)} pruebas pasaron")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
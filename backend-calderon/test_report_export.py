@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para las exportaciones CSV/XLSX en streaming
+"""
+
+import io
+import sys
+import tempfile
+from pathlib import Path
+
+# Agregar el directorio actual al path para importar módulos
+sys.path.append(str(Path(__file__).parent))
+
+import openpyxl
+
+from services import report_export
+from services.consumption_service import forecast_future
+from services.report_manifest import ReportManifest
+
+
+def test_csv_un_escenario():
+    """Con un escenario el CSV exportado tiene las columnas y valores del reporte CSV"""
+    print("=== Probando exportación CSV ===")
+    resultado = report_export.exportar("csv", [{"months_ahead": 24, "start_year": 2030, "start_month": 6}])
+    lineas = b"".join(resultado["bloques"]).decode().splitlines()
+    assert lineas[0] == "anio,mes,mes_nombre,fecha,consumo_predicho_m3"
+    assert len(lineas) == 25
+    esperado = forecast_future(24, 2030, 6)
+    assert lineas[1] == f"2030,6,June,2030-06-01,{round(esperado[0]['consumo_predicho'], 2)!r}"
+    assert lineas[-1].startswith("2032,5,May,2032-05-01,")
+    assert resultado["filename"].startswith("reporte_consumo_agua_") and resultado["filename"].endswith(".csv")
+    assert "error" in report_export.exportar("ods", [{"months_ahead": 1}])
+    print("✅ CSV correcto")
+    return True
+
+
+def test_xlsx_varios_escenarios_en_bloques():
+    """El XLSX se entrega en varios bloques, abre con openpyxl y trae una columna por escenario"""
+    print("\n=== Probando exportación XLSX de varios escenarios ===")
+    escenarios = [{"nombre": "base", "months_ahead": 600}, {"months_ahead": 600, "poblacion_estimada": 300000}]
+    bloques = list(report_export.exportar("xlsx", escenarios * 5)["bloques"])
+    assert len(bloques) > 2  # la descarga empieza antes de terminar el libro
+    hoja = openpyxl.load_workbook(io.BytesIO(b"".join(bloques)), read_only=True).active
+    filas = list(hoja.iter_rows(values_only=True))
+    assert filas[0] == ("escenario", "anio", "mes", "mes_nombre", "fecha", "consumo_predicho_m3")
+    assert len(filas) == 1 + 10 * 600
+    assert filas[1][0] == "base" and filas[601][0] == "escenario_2"
+    assert filas[1][4].day == 1 and isinstance(filas[1][5], float)
+    print(f"✅ XLSX correcto ({len(bloques)} bloques)")
+    return True
+
+
+def test_guardar_y_cancelar():
+    """guardar=true registra el archivo solo si la exportación se completa"""
+    print("\n=== Probando exportaciones guardadas ===")
+    originales = report_export.REPORTS_ARTIFACTS_DIRS, report_export.report_manifest
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        report_export.REPORTS_ARTIFACTS_DIRS = {"CSV": tmp / "csv", "XLSX": tmp / "xlsx"}
+        report_export.report_manifest = ReportManifest(
+            path=str(tmp / "manifest.jsonl"), directorios={"CSV": [tmp / "csv"], "XLSX": [tmp / "xlsx"]}
+        )
+        try:
+            resultado = report_export.exportar("xlsx", [{"months_ahead": 12}], guardar=True)
+            contenido = b"".join(resultado["bloques"])
+            guardado = tmp / "xlsx" / resultado["filename"]
+            assert guardado.read_bytes() == contenido
+            entrada = report_export.report_manifest.ultimo("XLSX")
+            assert entrada["filename"] == resultado["filename"] and entrada["params"]["months_ahead"] == 12
+
+            # Cliente que corta la descarga: no queda archivo ni temporal
+            cancelada = report_export.exportar("csv", [{"months_ahead": 1200}] * 3, guardar=True)
+            next(cancelada["bloques"])
+            cancelada["bloques"].close()
+            assert list((tmp / "csv").iterdir()) == []
+            assert report_export.report_manifest.ultimo("CSV") is None
+        finally:
+            report_export.REPORTS_ARTIFACTS_DIRS, report_export.report_manifest = originales
+    print("✅ Exportaciones guardadas correctas")
+    return True
+
+
+def test_endpoints():
+    """POST con escenarios y GET de un escenario devuelven descargas en streaming"""
+    print("\n=== Probando endpoints de exportación ===")
+    from fastapi.testclient import TestClient
+    from main import app
+
+    client = TestClient(app)
+    resp = client.post("/reports/export/csv", json={"escenarios": [{"months_ahead": 3}, {"months_ahead": 3, "nombre": "b"}]})
+    assert resp.status_code == 200 and resp.headers["content-type"].startswith("text/csv")
+    assert "attachment" in resp.headers["content-disposition"]
+    assert resp.text.splitlines()[0].startswith("escenario,") and len(resp.text.splitlines()) == 7
+    resp = client.get("/reports/export/xlsx", params={"months_ahead": 6})
+    assert resp.status_code == 200 and resp.content[:2] == b"PK"
+    assert client.post("/reports/export/csv", json={"escenarios": []}).status_code == 422
+    assert client.get("/reports/export/pdf", params={"months_ahead": 6}).status_code == 400
+    print("✅ Endpoints correctos")
+    return True
+
+
+def main():
+    """Ejecuta todas las pruebas"""
+    print("🧪 Iniciando pruebas de exportación en streaming\n")
+
+    tests = [
+        test_csv_un_escenario,
+        test_xlsx_varios_escenarios_en_bloques,
+        test_guardar_y_cancelar,
+        test_endpoints,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"❌ Error ejecutando {test.__name__}: {e!r}")
+
+    print(f"\n📊 Resultados: {passed}/{len(tests)} pruebas pasaron")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
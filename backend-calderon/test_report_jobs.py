@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para la cola de trabajos de reportes (pool de procesos)
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Agregar el directorio actual al path para importar módulos
+sys.path.append(str(Path(__file__).parent))
+
+from services.report_jobs import ReportJobQueue, ColaLlena, ConflictoIdempotencia
+from services.report_artifacts import ReportArtifacts
+
+
+# Las tareas deben ser funciones de módulo: se serializan hacia el proceso hijo
+def _tarea_lenta(segundos: float, progreso=None):
+    progreso(50, "a mitad")
+    time.sleep(segundos)
+    return {"success": True, "segundos": segundos}
+
+
+def _tarea_fallida(progreso=None):
+    return {"error": "fallo simulado"}
+
+
+def _tarea_archivo(directorio: str, progreso=None, report_id=None):
+    time.sleep(0.5)
+    ruta = Path(directorio) / f"reporte_consumo_agua_{report_id}.csv"
+    ruta.write_text("anio,mes\n")
+    return {"success": True, "filename": ruta.name, "filepath": str(ruta)}
+
+
+def _esperar(cola: ReportJobQueue, job_id: str, timeout: float = 60.0) -> dict:
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        estado = cola.obtener(job_id).to_dict()
+        if estado["estado"] not in ("en_cola", "en_curso"):
+            return estado
+        time.sleep(0.05)
+    raise TimeoutError(job_id)
+
+
+def test_estados_y_progreso():
+    """Los trabajos pasan por en_curso con su avance y terminan completados o con error"""
+    print("=== Probando estados y progreso de los trabajos ===")
+    cola = ReportJobQueue(workers=1, max_pendientes=4, historial=10)
+    try:
+        job = cola.enviar("prueba", _tarea_lenta, {"segundos": 1.0})
+        vistos = set()
+        while job.estado in ("en_cola", "en_curso"):
+            vistos.add((job.estado, job.etapa))
+            time.sleep(0.02)
+        print(f"   Estados observados: {sorted(vistos)}")
+        assert ("en_curso", "a mitad") in vistos
+        final = job.to_dict()
+        assert final["estado"] == "completado" and final["progreso"] == 100
+        assert final["resultado"] == {"success": True, "segundos": 1.0}
+
+        fallido = _esperar(cola, cola.enviar("prueba", _tarea_fallida, {}).job_id)
+        assert fallido["estado"] == "error" and fallido["error"] == "fallo simulado"
+        assert cola.stats()["por_estado"] == {"completado": 1, "error": 1}
+    finally:
+        cola.shutdown()
+    print("✅ Estados y progreso correctos")
+    return True
+
+
+def test_cola_acotada():
+    """Con la cola llena se rechazan trabajos nuevos hasta que termina alguno"""
+    print("\n=== Probando límite de trabajos pendientes ===")
+    cola = ReportJobQueue(workers=1, max_pendientes=2, historial=10)
+    try:
+        primeros = [cola.enviar("prueba", _tarea_lenta, {"segundos": 0.5}) for _ in range(2)]
+        try:
+            cola.enviar("prueba", _tarea_lenta, {"segundos": 0.5})
+            raise AssertionError("Se esperaba ColaLlena")
+        except ColaLlena:
+            pass
+        assert cola.stats()["rechazados"] == 1
+        for job in primeros:
+            _esperar(cola, job.job_id)
+        _esperar(cola, cola.enviar("prueba", _tarea_lenta, {"segundos": 0.0}).job_id)
+    finally:
+        cola.shutdown()
+    print("✅ Cola acotada correcta")
+    return True
+
+
+def test_deduplicacion_por_contenido():
+    """Peticiones idénticas comparten render, luego reutilizan el artefacto; idempotencia"""
+    print("\n=== Probando deduplicación de reportes ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        artefactos = ReportArtifacts(db_path=str(Path(tmp) / "reportes.sqlite3"))
+        guardados = []
+        guardar = artefactos.guardar
+        artefactos.guardar = lambda clave, resultado: (guardados.append(clave), guardar(clave, resultado))
+        cola = ReportJobQueue(workers=2, max_pendientes=4, historial=10, artefactos=artefactos)
+        try:
+            params = {"directorio": tmp}
+            concurrentes = [cola.enviar("csv", _tarea_archivo, params, clave="abc123") for _ in range(3)]
+            assert len({job.job_id for job in concurrentes}) == 1 and cola.compartidos == 2
+            primero = _esperar(cola, concurrentes[0].job_id)
+            assert primero["resultado"]["filename"] == "reporte_consumo_agua_abc123.csv"
+            # El render compartido se registra una sola vez, no una por petición agrupada
+            time.sleep(0.1)
+            assert guardados == ["abc123"]
+
+            # Ya generado: trabajo completado al instante, sin pasar por el pool
+            reutilizado = cola.enviar("csv", _tarea_archivo, params, clave="abc123")
+            assert reutilizado.estado == "completado" and reutilizado.resultado["reutilizado"] is True
+            assert len(list(Path(tmp).glob("reporte_consumo_agua_*"))) == 1
+
+            # Si el archivo desaparece se vuelve a generar
+            Path(primero["resultado"]["filepath"]).unlink()
+            regenerado = cola.enviar("csv", _tarea_archivo, params, clave="abc123")
+            assert regenerado.pendiente
+            _esperar(cola, regenerado.job_id)
+
+            con_clave = cola.enviar("csv", _tarea_archivo, params, clave="otro", idempotency_key="k1")
+            assert cola.enviar("csv", _tarea_archivo, params, clave="otro", idempotency_key="k1") is con_clave
+            try:
+                cola.enviar("csv", _tarea_archivo, {"directorio": "/tmp"}, clave="x", idempotency_key="k1")
+                raise AssertionError("Se esperaba ConflictoIdempotencia")
+            except ConflictoIdempotencia:
+                pass
+            _esperar(cola, con_clave.job_id)
+        finally:
+            cola.shutdown()
+    print("✅ Render compartido, artefacto reutilizado e idempotencia correctos")
+    return True
+
+
+def test_endpoints():
+    """/reports/jobs responde 429 con la cola llena y 404 para trabajos inexistentes"""
+    print("\n=== Probando endpoints de trabajos ===")
+    from fastapi.testclient import TestClient
+    from main import app
+    import routers.reports_router as reports_router
+
+    original = reports_router.report_jobs
+    reports_router.report_jobs = ReportJobQueue(workers=1, max_pendientes=0)
+    try:
+        client = TestClient(app)
+        resp = client.post("/reports/jobs/csv", json={"months_ahead": 3})
+        assert resp.status_code == 429 and resp.headers["retry-after"] == "5"
+        assert client.get("/reports/jobs/no-existe").status_code == 404
+        assert client.get("/reports/jobs").json()["cola"]["rechazados"] == 1
+    finally:
+        reports_router.report_jobs = original
+    print("✅ Endpoints correctos")
+    return True
+
+
+def main():
+    """Ejecuta todas las pruebas"""
+    print("🧪 Iniciando pruebas de la cola de reportes\n")
+
+    tests = [
+        test_estados_y_progreso,
+        test_cola_acotada,
+        test_deduplicacion_por_contenido,
+        test_endpoints,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"❌ Error ejecutando {test.__name__}: {e!r}")
+
+    print(f"\n📊 Resultados: {passed}/{len(tests)} pruebas pasaron")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para el manifiesto de reportes generados
+"""
+
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Agregar el directorio actual al path para importar módulos
+sys.path.append(str(Path(__file__).parent))
+
+from services import report_manifest as modulo
+from services.report_manifest import ReportManifest
+
+
+def _crear(directorio: Path, nombre: str, contenido: str = "anio,mes\n") -> Path:
+    ruta = directorio / nombre
+    ruta.write_text(contenido)
+    return ruta
+
+
+def _manifiesto(tmp: Path) -> ReportManifest:
+    directorios = {"CSV": [tmp / "data4"], "PDF": [tmp / "reports"]}
+    return ReportManifest(path=str(tmp / "cache" / "manifest.jsonl"), directorios=directorios)
+
+
+def test_construccion_y_ultimo():
+    """El manifiesto se construye con los reportes existentes y sigue altas, usos y bajas"""
+    print("=== Probando construcción y último reporte ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        (tmp / "data4").mkdir()
+        (tmp / "reports").mkdir()
+        viejo = _crear(tmp / "data4", "reporte_consumo_agua_20250101_000000.csv")
+        _crear(tmp / "reports", "reporte_consumo_agua_20250101_000000.pdf")
+
+        manifiesto = _manifiesto(tmp)
+        assert manifiesto.stats()["por_tipo"] == {"CSV": 1, "PDF": 1}
+        assert manifiesto.ultimo("CSV")["filename"] == viejo.name
+
+        nuevo = _crear(tmp / "data4", "reporte_consumo_agua_abc.csv")
+        manifiesto.registrar("CSV", nuevo, {"months_ahead": 6}, "abc")
+        assert manifiesto.ultimo("CSV")["filename"] == nuevo.name
+
+        # Un reporte reutilizado pasa a ser el último
+        manifiesto.tocar(viejo.name)
+        assert manifiesto.ultimo("CSV")["filename"] == viejo.name
+
+        # Borrado por fuera del manifiesto: se descarta y se recalcula el último
+        viejo.unlink()
+        assert manifiesto.ultimo("CSV")["filename"] == nuevo.name
+        manifiesto.eliminar(nuevo.name)
+        assert manifiesto.ultimo("CSV") is None
+        assert manifiesto.ultimo("PDF") is not None
+    print("✅ Construcción y último reporte correctos")
+    return True
+
+
+def test_sincronizacion_entre_instancias():
+    """Otra instancia (p. ej. un proceso del pool) ve las altas leyendo solo las líneas nuevas"""
+    print("\n=== Probando sincronización entre instancias ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        (tmp / "data4").mkdir()
+        api, worker = _manifiesto(tmp), _manifiesto(tmp)
+        assert api.consultar()["total"] == 0
+
+        for i in range(3):
+            worker.registrar("CSV", _crear(tmp / "data4", f"reporte_consumo_agua_{i}.csv"), {"months_ahead": i})
+        offset = api._offset
+        assert api.consultar()["total"] == 3
+        assert api._offset > offset and api.stats()["lineas"] == 3
+        assert api.ultimo("CSV")["filename"] == "reporte_consumo_agua_2.csv"
+    print("✅ Sincronización entre instancias correcta")
+    return True
+
+
+def test_filtros_y_paginacion():
+    """Consultas por tipo, fecha y parámetros, del más reciente al más antiguo"""
+    print("\n=== Probando filtros y paginación ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        (tmp / "data4").mkdir()
+        (tmp / "reports").mkdir()
+        manifiesto = _manifiesto(tmp)
+        for i in range(10):
+            tipo, directorio, ext = ("CSV", "data4", "csv") if i % 2 == 0 else ("PDF", "reports", "pdf")
+            ruta = _crear(tmp / directorio, f"reporte_consumo_agua_{i}.{ext}")
+            manifiesto.registrar(tipo, ruta, {"months_ahead": 12 if i < 6 else 24, "start_year": 2030})
+
+        pagina = manifiesto.consultar(tipo="CSV", limite=2, offset=1)
+        assert pagina["total"] == 5
+        assert [e["filename"] for e in pagina["items"]] == ["reporte_consumo_agua_6.csv", "reporte_consumo_agua_4.csv"]
+
+        filtrado = manifiesto.consultar(params={"months_ahead": 24, "start_month": None})
+        assert filtrado["total"] == 4
+        assert all(e["params"]["months_ahead"] == 24 for e in filtrado["items"])
+
+        futuro = datetime.fromtimestamp(time.time() + 3600)
+        assert manifiesto.consultar(desde=futuro)["total"] == 0
+        assert manifiesto.consultar(hasta=futuro)["total"] == 10
+    print("✅ Filtros y paginación correctos")
+    return True
+
+
+def test_compactacion():
+    """Con muchas líneas obsoletas el archivo se reescribe sin perder el índice"""
+    print("\n=== Probando compactación del manifiesto ===")
+    original = modulo._MIN_LINEAS_COMPACTAR
+    modulo._MIN_LINEAS_COMPACTAR = 5
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            (tmp / "data4").mkdir()
+            manifiesto = _manifiesto(tmp)
+            a = _crear(tmp / "data4", "reporte_consumo_agua_a.csv")
+            b = _crear(tmp / "data4", "reporte_consumo_agua_b.csv")
+            manifiesto.registrar("CSV", a)
+            manifiesto.registrar("CSV", b)
+            for _ in range(6):
+                manifiesto.tocar(a.name)
+            lineas_antes = manifiesto.stats()["lineas"]
+
+            otra = _manifiesto(tmp)
+            assert otra.consultar()["total"] == 2  # dispara la compactación
+            assert otra.stats()["lineas"] < lineas_antes
+            assert otra.ultimo("CSV")["filename"] == a.name
+            # La primera instancia detecta el reemplazo del archivo y relee
+            assert manifiesto.ultimo("CSV")["filename"] == a.name
+            assert manifiesto.stats()["lineas"] == otra.stats()["lineas"]
+    finally:
+        modulo._MIN_LINEAS_COMPACTAR = original
+    print("✅ Compactación correcta")
+    return True
+
+
+def main():
+    """Ejecuta todas las pruebas"""
+    print("🧪 Iniciando pruebas del manifiesto de reportes\n")
+
+    tests = [
+        test_construccion_y_ultimo,
+        test_sincronizacion_entre_instancias,
+        test_filtros_y_paginacion,
+        test_compactacion,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"❌ Error ejecutando {test.__name__}: {e!r}")
+
+    print(f"\n📊 Resultados: {passed}/{len(tests)} pruebas pasaron")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para la retención de reportes generados
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Agregar el directorio actual al path para importar módulos
+sys.path.append(str(Path(__file__).parent))
+
+from services.report_artifacts import ReportArtifacts
+from services.report_manifest import ReportManifest
+from services.report_retention import ReportRetention
+
+
+def _entorno(tmp: Path, politicas: dict):
+    legados = {"CSV": tmp / "data4", "PDF": tmp / "reports"}
+    destinos = {"CSV": tmp / "artifacts" / "reports" / "csv", "PDF": tmp / "artifacts" / "reports" / "pdf"}
+    for directorio in list(legados.values()) + list(destinos.values()):
+        directorio.mkdir(parents=True, exist_ok=True)
+    manifiesto = ReportManifest(
+        path=str(tmp / "cache" / "manifest.jsonl"),
+        directorios={tipo: [destinos[tipo], legados[tipo]] for tipo in destinos},
+    )
+    artefactos = ReportArtifacts(db_path=str(tmp / "cache" / "reportes.sqlite3"))
+    retencion = ReportRetention(manifiesto, artefactos, politicas, destinos, tanda=2, pausa=0)
+    return legados, destinos, manifiesto, artefactos, retencion
+
+
+def _reporte(directorio: Path, nombre: str, bytes_: int = 100, dias: float = 0) -> Path:
+    ruta = directorio / nombre
+    ruta.write_bytes(b"x" * bytes_)
+    if dias:
+        antes = time.time() - dias * 86400
+        os.utime(ruta, (antes, antes))
+    return ruta
+
+
+def test_migracion():
+    """Los reportes de data4/ y reports/ pasan al árbol de artefactos con manifiesto e índice al día"""
+    print("=== Probando migración al árbol de artefactos ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        legados, destinos, manifiesto, artefactos, retencion = _entorno(tmp, {})
+        fuente = _reporte(legados["CSV"], "Consumo_Lluvia_Poblacion_Calderon_2005_2025.csv")
+        _reporte(legados["CSV"], "reporte_consumo_agua_20250101_000000.csv")
+        _reporte(legados["PDF"], "reporte_consumo_agua_20250101_000000.pdf")
+
+        nuevo = _reporte(legados["CSV"], "reporte_consumo_agua_abc.csv")
+        manifiesto.registrar("CSV", nuevo, {"months_ahead": 6}, "abc")
+        artefactos.guardar("abc", {"filename": nuevo.name, "filepath": str(nuevo)})
+
+        resumen = retencion.ejecutar()
+        assert resumen["migrados"] == 3 and resumen["eliminados"] == 0
+        assert sorted(p.name for p in legados["CSV"].iterdir()) == [fuente.name]
+        assert not any(legados["PDF"].iterdir())
+        assert manifiesto.ultimo("CSV")["path"] == str(destinos["CSV"] / nuevo.name)
+        assert artefactos.buscar("abc")["filepath"] == str(destinos["CSV"] / nuevo.name)
+        assert retencion.ejecutar()["migrados"] == 0
+    print("✅ Migración correcta")
+    return True
+
+
+def test_antiguedad_y_cuota():
+    """Se borran los vencidos y, sobre la cuota, los menos usados; el último se conserva"""
+    print("\n=== Probando antigüedad y cuota por tipo ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        politicas = {"CSV": {"max_dias": 10, "max_mb": 200 / (1024 * 1024)}, "PDF": {"max_dias": 1, "max_mb": 0}}
+        _, destinos, manifiesto, artefactos, retencion = _entorno(tmp, politicas)
+        # Viejos (construcción inicial con su mtime) y recientes
+        _reporte(destinos["CSV"], "reporte_consumo_agua_viejo.csv", dias=30)
+        _reporte(destinos["PDF"], "reporte_consumo_agua_unico.pdf", dias=30)
+        assert manifiesto.stats()["reportes"] == 2
+        for nombre in ("a", "b", "c", "d"):
+            ruta = _reporte(destinos["CSV"], f"reporte_consumo_agua_{nombre}.csv")
+            manifiesto.registrar("CSV", ruta, clave=nombre)
+            artefactos.guardar(nombre, {"filepath": str(ruta)})
+        manifiesto.tocar("reporte_consumo_agua_a.csv")  # reutilizado: pasa a ser el más reciente
+
+        resumen = retencion.ejecutar()
+        assert resumen["por_motivo"] == {"antiguedad": 1, "cuota": 2}
+        restantes = sorted(e["filename"] for e in manifiesto.vigentes("CSV"))
+        assert restantes == ["reporte_consumo_agua_a.csv", "reporte_consumo_agua_d.csv"]
+        assert sorted(p.name for p in destinos["CSV"].iterdir()) == restantes
+        assert artefactos.buscar("b") is None and artefactos.buscar("a") is not None
+        # El único PDF está vencido pero es el último de su tipo
+        assert manifiesto.ultimo("PDF")["filename"] == "reporte_consumo_agua_unico.pdf"
+        assert retencion.stats()["ocupado"]["CSV"] == {"reportes": 2, "bytes": 200}
+    print("✅ Antigüedad y cuota correctas")
+    return True
+
+
+def test_descarga_con_respaldo():
+    """Las descargas encuentran reportes migrados y rechazan nombres fuera del patrón"""
+    print("\n=== Probando descargas tras la migración ===")
+    from fastapi.testclient import TestClient
+    from main import app
+    from services.report_manifest import report_manifest
+    from services.report_service import generate_csv_report
+
+    resultado = generate_csv_report(months_ahead=2, start_year=2031, start_month=1)
+    assert "error" not in resultado, resultado
+    ruta = Path(resultado["filepath"])
+    try:
+        assert ruta.parent.parts[-3:] == ("artifacts", "reports", "csv")
+        client = TestClient(app)
+        resp = client.get(f"/reports/download/csv/{ruta.name}")
+        assert resp.status_code == 200 and resp.content == ruta.read_bytes()
+        assert client.get("/reports/download/csv/reporte_consumo_agua_no_existe.csv").status_code == 404
+        assert client.get("/reports/download/csv/Consumo_Lluvia_Poblacion_Calderon_2005_2025.csv").status_code == 400
+    finally:
+        ruta.unlink(missing_ok=True)
+        report_manifest.eliminar(ruta.name)
+    print("✅ Descargas correctas")
+    return True
+
+
+def main():
+    """Ejecuta todas las pruebas"""
+    print("🧪 Iniciando pruebas de retención de reportes\n")
+
+    tests = [
+        test_migracion,
+        test_antiguedad_y_cuota,
+        test_descarga_con_respaldo,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"❌ Error ejecutando {test.__name__}: {e!r}")
+
+    print(f"\n📊 Resultados: {passed}/{len(tests)} pruebas pasaron")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
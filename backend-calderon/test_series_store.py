@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para la interpretación por referencia (series resueltas en el servidor)
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# Agregar el directorio actual al path para importar módulos
+sys.path.append(str(Path(__file__).parent))
+
+import services.series_store as store
+from core.config import DATA_DIRS
+
+CSV_DATA3 = (
+    "Fecha,C05,C20\n"
+    "2020-01-01,10.0,20.0\n"
+    "2020-02-01,,40.0\n"
+    "2020-03-01,,\n"
+    "2020-04-01,30.0,50.0\n"
+)
+
+
+def _con_data3(tmp: str, fn):
+    directorio = Path(tmp) / "data3"
+    directorio.mkdir()
+    (directorio / "Precipitación_Mensual__C05_C20.csv").write_text(CSV_DATA3, encoding="utf-8")
+    originales = (DATA_DIRS.get("data3"), store.series_store)
+    DATA_DIRS["data3"] = directorio
+    store.series_store = store.SeriesStore(max_tablas=4, cache_dir=str(Path(tmp) / "series"))
+    try:
+        return fn(directorio)
+    finally:
+        DATA_DIRS["data3"], store.series_store = originales
+
+
+def test_resolver_variable_estaciones_y_rango():
+    """Selección de estaciones, promedio por fecha, rango de fechas y errores"""
+    print("=== Probando resolución por variable de data3 ===")
+
+    def prueba(_):
+        ambas = store.resolver_serie(variable="Precipitación", estaciones=["C05", "C20-Calderón"])
+        # Marzo no tiene datos; febrero solo tiene C20
+        assert list(ambas["fechas"]) == ["2020-01", "2020-02", "2020-04"]
+        assert np.allclose(ambas["valores"], [15.0, 40.0, 40.0])
+        assert list(ambas["mes_absoluto"]) == [2020 * 12, 2020 * 12 + 1, 2020 * 12 + 3]
+
+        rango = store.resolver_serie(variable="precipitación", estaciones=["C20"], desde="2020-02-01", hasta="2020-03-31")
+        assert list(rango["fechas"]) == ["2020-02"] and list(rango["valores"]) == [40.0]
+
+        assert "error" in store.resolver_serie(variable="Precipitación", estaciones=["X99"])
+        assert "error" in store.resolver_serie(variable="Precipitación", frecuencia="Diario")
+        assert "error" in store.resolver_serie(directorio="data3", archivo="../secreto.csv")
+        return True
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _con_data3(tmp, prueba)
+    print("✅ Estaciones, rango y errores correctos")
+    return True
+
+
+def test_memoria_columnar_e_invalidacion():
+    """Aciertos en memoria, en la copia .npz tras un reinicio y relectura si cambia el archivo"""
+    print("\n=== Probando niveles de memoria y columnar ===")
+
+    def prueba(directorio):
+        store.resolver_serie(variable="Precipitación")
+        store.resolver_serie(variable="Precipitación")
+        assert store.series_store.stats()["lecturas"] == 1
+        assert store.series_store.stats()["memoria"] == 1
+
+        # Un proceso nuevo (memoria vacía) usa la copia columnar sin parsear el CSV
+        store.series_store = store.SeriesStore(max_tablas=4, cache_dir=store.series_store.cache_dir)
+        store.resolver_serie(variable="Precipitación")
+        assert store.series_store.stats()["columnar"] == 1 and store.series_store.stats()["lecturas"] == 0
+
+        # Si el archivo cambia se vuelve a leer
+        archivo = directorio / "Precipitación_Mensual__C05_C20.csv"
+        archivo.write_text(CSV_DATA3 + "2020-05-01,100.0,\n", encoding="utf-8")
+        os.utime(archivo, ns=(0, 10**18))
+        nueva = store.resolver_serie(variable="Precipitación", estaciones=["C05"])
+        assert store.series_store.stats()["lecturas"] == 1
+        assert nueva["valores"][-1] == 100.0
+        return True
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _con_data3(tmp, prueba)
+    print("✅ Memoria, copia columnar e invalidación correctas")
+    return True
+
+
+def test_endpoint_por_referencia():
+    """/ia/interpretar acepta una referencia en lugar de datos"""
+    print("\n=== Probando /ia/interpretar por referencia ===")
+    from fastapi.testclient import TestClient
+    from main import app
+    import services.interpretacion_service as servicio
+
+    originales = servicio.interpretar_datos_gemini
+    servicio.interpretar_datos_gemini = lambda titulo, resumen: "Interpretación simulada"
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            def prueba(_):
+                client = TestClient(app)
+                cuerpo = {"modelo": "gemini", "titulo": "Lluvia", "tipo_dato": "precipitación mensual", "usar_cache": False}
+                resp = client.post("/ia/interpretar", json={
+                    **cuerpo, "referencia": {"variable": "Precipitación", "estaciones": ["C05", "C20"]},
+                })
+                assert resp.status_code == 200, resp.text
+                assert resp.json()["analisis_estadistico"]["n"] == 3
+                assert resp.json()["fuente"]["estaciones"] == ["C05", "C20"]
+
+                assert client.post("/ia/interpretar", json=cuerpo).status_code == 422
+                assert client.post("/ia/interpretar", json={
+                    **cuerpo, "referencia": {"variable": "Nieve"},
+                }).status_code == 400
+                return True
+
+            _con_data3(tmp, prueba)
+    finally:
+        servicio.interpretar_datos_gemini = originales
+    print("✅ Endpoint por referencia correcto")
+    return True
+
+
+def main():
+    """Ejecuta todas las pruebas"""
+    print("🧪 Iniciando pruebas del almacén de series\n")
+
+    tests = [
+        test_resolver_variable_estaciones_y_rango,
+        test_memoria_columnar_e_invalidacion,
+        test_endpoint_por_referencia,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"❌ Error ejecutando {test.__name__}: {e!r}")
+
+    print(f"\n📊 Resultados: {passed}/{len(tests)} pruebas pasaron")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
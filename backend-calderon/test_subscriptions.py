@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para las suscripciones: programación, un render por periodo y envío masivo
+"""
+
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from datetime import datetime
+from pathlib import Path
+
+# Agregar el directorio actual al path para importar módulos
+sys.path.append(str(Path(__file__).parent))
+sys.path.append(str(Path(__file__).parent / "tools"))
+
+from core.smtp_pool import SMTPPool
+from services.email_outbox import EmailOutbox
+from services.subscriptions import SubscriptionService, programacion
+from smtp_sink import SMTPSink
+
+
+class _ColaFalsa:
+    """Cola de reportes mínima: un "render" por clave distinta, que escribe un PDF de prueba."""
+
+    def __init__(self, directorio: Path):
+        self.directorio = directorio
+        self.renders = 0
+        self._jobs = {}
+
+    def enviar(self, tipo, fn, params, clave=None):
+        if clave in self._jobs and not self._jobs[clave].future.done():
+            return self._jobs[clave]
+        self.renders += 1
+        job = type("Job", (), {})()
+        job.job_id, job.pendiente, job.future = uuid.uuid4().hex, True, Future()
+        ruta = self.directorio / f"reporte_consumo_agua_{clave}.pdf"
+
+        def renderizar():
+            ruta.write_bytes(b"%PDF-1.4 " + repr(params).encode())
+            job.future.set_result({"success": True, "filename": ruta.name, "filepath": str(ruta)})
+
+        threading.Timer(0.1, renderizar).start()
+        self._jobs[clave] = job
+        return job
+
+
+def _esperar(condicion, timeout: float = 10.0):
+    limite = time.monotonic() + timeout
+    while not condicion():
+        if time.monotonic() > limite:
+            raise TimeoutError("La condición no se cumplió a tiempo")
+        time.sleep(0.05)
+
+
+def test_programacion():
+    """Periodos mensuales y semanales y su momento de envío"""
+    print("=== Probando la programación de periodos ===")
+    ahora = datetime(2026, 10, 19, 9, 30)  # lunes
+    assert programacion("mensual", 1, 6, ahora) == ("2026-10", datetime(2026, 10, 1, 6))
+    assert programacion("mensual", 20, 6, ahora)[1] > ahora
+    assert programacion("semanal", 0, 8, ahora) == ("2026-W43", datetime(2026, 10, 19, 8))
+    assert programacion("semanal", 4, 8, ahora)[1] == datetime(2026, 10, 23, 8)
+    print("✅ Programación correcta")
+    return True
+
+
+def test_un_render_para_muchos_suscriptores():
+    """500 suscriptores en dos listas con el mismo reporte: un render, un correo por persona"""
+    print("\n=== Probando envío masivo con un solo render ===")
+    sink = SMTPSink(port=0).iniciar()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            cola = _ColaFalsa(tmp)
+            pool = SMTPPool(sink.host, sink.port, seguridad="none", max_conexiones=1)
+            outbox = EmailOutbox(db_path=str(tmp / "outbox.sqlite3"), pool=pool, sondeo=0.05)
+            servicio = SubscriptionService(db_path=str(tmp / "suscripciones.sqlite3"), cola=cola, outbox=outbox)
+
+            emails = [f"vecino{i}@example.com" for i in range(500)]
+            a = servicio.crear_lista("Juntas parroquiales", "mensual", 1, 6, {"months_ahead": 12}, suscriptores=emails[:300])
+            b = servicio.crear_lista("Municipio", "mensual", 1, 6, {"months_ahead": 12}, suscriptores=emails[300:])
+            c = servicio.crear_lista("Resumen", "semanal", 0, 6, suscriptores=emails[:2])
+            # Creadas "antes" del envío programado de este periodo
+            with servicio._db() as conn:
+                conn.execute("UPDATE listas SET creada = 0")
+
+            ahora = datetime(2026, 10, 19, 9, 0)
+            resultado = servicio.revisar(ahora)
+            assert len(resultado["ejecuciones"]) == 3 and resultado["reportes"] == 2
+            assert servicio.revisar(ahora)["ejecuciones"] == []  # periodo ya reclamado
+
+            _esperar(lambda: servicio.ejecucion(a["id"], "2026-10")["estado"] == "encolada")
+            _esperar(lambda: servicio.ejecucion(b["id"], "2026-10")["estado"] == "encolada")
+            assert cola.renders == 2  # mensual (compartido por dos listas) + semanal
+
+            outbox.iniciar()
+            _esperar(lambda: len(sink.mensajes) == 502, timeout=30)
+            outbox.detener()
+            ejecucion = servicio.ejecucion(a["id"], "2026-10")
+            assert ejecucion["entrega"] == {"enviado": 300} and ejecucion["destinatarios"] == 300
+            assert {d["estado"] for d in ejecucion["destinatarios_estado"]} == {"enviado"}
+            assert servicio.ejecucion(c["id"], "2026-W43")["destinatarios"] == 2
+            assert sink.mensajes[0]["mensaje"]["Subject"] in ("Reporte de consumo de agua (2026-10)",
+                                                              "Reporte de consumo de agua (2026-W43)")
+            assert sink.conexiones < len(sink.mensajes) / 50  # conexiones reutilizadas
+    finally:
+        sink.detener()
+    print("✅ Un render por reporte y un correo por suscriptor")
+    return True
+
+
+def test_ejecucion_manual_y_listas_nuevas():
+    """Una lista creada después del envío no se dispara sola; el envío manual no se repite"""
+    print("\n=== Probando listas nuevas y envío manual ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        cola = _ColaFalsa(tmp)
+        outbox = EmailOutbox(db_path=str(tmp / "outbox.sqlite3"), pool=SMTPPool("127.0.0.1", 1, seguridad="none"))
+        servicio = SubscriptionService(db_path=str(tmp / "suscripciones.sqlite3"), cola=cola, outbox=outbox)
+        lista = servicio.crear_lista("Nueva", "mensual", 1, 0, suscriptores=["a@example.com"])
+        assert servicio.revisar()["ejecuciones"] == []
+
+        primera = servicio.ejecutar_lista(lista["id"])
+        assert len(primera["ejecuciones"]) == 1
+        assert "error" in servicio.ejecutar_lista(lista["id"])
+        forzada = servicio.ejecutar_lista(lista["id"], forzar=True)
+        assert "manual" in forzada["periodo"]
+        _esperar(lambda: all(e["estado"] == "encolada" for e in servicio.ejecuciones(lista["id"])))
+        assert outbox.stats()["por_estado"] == {"pendiente": 2}
+        assert servicio.agregar_suscriptores(lista["id"], ["A@example.com", "b@example.com"])["agregados"] == 1
+    print("✅ Listas nuevas y envío manual correctos")
+    return True
+
+
+class _ColaConFallos(_ColaFalsa):
+    """Falla los primeros `fallos` renders; con `llena` rechaza todo con ColaLlena."""
+
+    def __init__(self, directorio: Path, fallos: int = 0):
+        super().__init__(directorio)
+        self.fallos = fallos
+        self.llena = False
+
+    def enviar(self, tipo, fn, params, clave=None):
+        from services.report_jobs import ColaLlena
+        if self.llena:
+            raise ColaLlena("Hay 16 reportes pendientes; intente más tarde")
+        if self.fallos:
+            self.fallos -= 1
+            self.renders += 1
+            job = type("Job", (), {})()
+            job.job_id, job.pendiente, job.future = uuid.uuid4().hex, True, Future()
+            job.future.set_result({"error": "Modelo no encontrado"})
+            return job
+        return super().enviar(tipo, fn, params, clave)
+
+
+def test_reintentos_y_reclamos_huerfanos():
+    """Un render con error se reintenta hasta el máximo; uno huérfano se reclama al vencer el lease"""
+    print("\n=== Probando reintentos y reclamos huérfanos ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        cola = _ColaConFallos(tmp, fallos=1)
+        outbox = EmailOutbox(db_path=str(tmp / "outbox.sqlite3"), pool=SMTPPool("127.0.0.1", 1, seguridad="none"))
+        servicio = SubscriptionService(db_path=str(tmp / "suscripciones.sqlite3"), cola=cola, outbox=outbox,
+                                       lease=60, max_intentos=2)
+        lista = servicio.crear_lista("Reintentos", "mensual", 1, 0, suscriptores=["a@example.com"])
+        with servicio._db() as conn:
+            conn.execute("UPDATE listas SET creada = 0")
+        ahora = datetime(2026, 10, 19, 9, 0)
+
+        assert len(servicio.revisar(ahora)["ejecuciones"]) == 1
+        _esperar(lambda: servicio.ejecucion(lista["id"], "2026-10")["estado"] == "error")
+        # La siguiente revisión vuelve a tomar el periodo con error
+        assert len(servicio.revisar(ahora)["ejecuciones"]) == 1
+        _esperar(lambda: servicio.ejecucion(lista["id"], "2026-10")["estado"] == "encolada")
+        ejecucion = servicio.ejecucion(lista["id"], "2026-10")
+        assert ejecucion["intentos"] == 2 and ejecucion["error"] is None and cola.renders == 2
+        assert servicio.revisar(ahora)["ejecuciones"] == []  # ya enviado: no se repite
+
+        # Con los intentos agotados el error queda registrado
+        otra = servicio.crear_lista("Agotada", "semanal", 0, 0, {"months_ahead": 5}, suscriptores=["b@example.com"])
+        cola.fallos = 2
+        for _ in range(3):
+            servicio.ejecutar_lista(otra["id"])
+            _esperar(lambda: servicio.ejecuciones(otra["id"])[0]["estado"] == "error")
+        assert servicio.ejecuciones(otra["id"])[0]["intentos"] == 2 and cola.fallos == 0
+
+        # El proceso murió a mitad del render: la fila queda "renderizando"
+        huerfana = servicio.crear_lista("Huérfana", "semanal", 0, 0, {"months_ahead": 7}, suscriptores=["c@example.com"])
+        periodo, _ = programacion("semanal", 0, 0, datetime.now())
+        assert servicio._reclamar(huerfana["id"], periodo, None)
+        assert "ya se envió o se está enviando" in servicio.ejecutar_lista(huerfana["id"])["error"]
+        with servicio._db() as conn:
+            conn.execute("UPDATE ejecuciones SET reclamada = reclamada - 120 WHERE lista_id = ?", (huerfana["id"],))
+        assert len(servicio.ejecutar_lista(huerfana["id"])["ejecuciones"]) == 1
+        _esperar(lambda: servicio.ejecucion(huerfana["id"], periodo)["estado"] == "encolada")
+    print("✅ Reintentos y reclamos correctos")
+    return True
+
+
+def test_endpoints():
+    """Validación de la programación y 404 en /subscriptions"""
+    print("\n=== Probando endpoints de suscripciones ===")
+    from fastapi.testclient import TestClient
+    from main import app
+    import routers.subscriptions_router as subscriptions_router
+
+    original = subscriptions_router.subscription_service
+    with tempfile.TemporaryDirectory() as tmp:
+        subscriptions_router.subscription_service = SubscriptionService(
+            db_path=str(Path(tmp) / "suscripciones.sqlite3"), cola=_ColaFalsa(Path(tmp))
+        )
+        try:
+            client = TestClient(app)
+            assert client.post("/subscriptions", json={"nombre": "x", "frecuencia": "semanal", "dia": 9}).status_code == 422
+            resp = client.post("/subscriptions", json={"nombre": "x", "frecuencia": "semanal", "dia": 2,
+                                                      "suscriptores": ["a@example.com"]})
+            assert resp.status_code == 201 and resp.json()["params"]["months_ahead"] == 3
+            lista_id = resp.json()["id"]
+            assert client.patch(f"/subscriptions/{lista_id}", json={"activa": False}).json()["activa"] is False
+            assert client.get("/subscriptions/no-existe").status_code == 404
+            assert client.get(f"/subscriptions/{lista_id}/runs/2026-W01").status_code == 404
+
+            # Cola de reportes llena: 429 (no "ya se envió") y el periodo queda libre para reintentar
+            cola = _ColaConFallos(Path(tmp))
+            subscriptions_router.subscription_service.cola = cola
+            cola.llena = True
+            resp = client.post(f"/subscriptions/{lista_id}/run")
+            assert resp.status_code == 429 and resp.headers["retry-after"] == "5"
+            cola.llena = False
+            assert client.post(f"/subscriptions/{lista_id}/run").status_code == 202
+            assert client.post(f"/subscriptions/{lista_id}/run").status_code == 409
+        finally:
+            subscriptions_router.subscription_service = original
+    print("✅ Endpoints correctos")
+    return True
+
+
+def main():
+    """Ejecuta todas las pruebas"""
+    print("🧪 Iniciando pruebas de suscripciones\n")
+
+    tests = [
+        test_programacion,
+        test_un_render_para_muchos_suscriptores,
+        test_ejecucion_manual_y_listas_nuevas,
+        test_reintentos_y_reclamos_huerfanos,
+        test_endpoints,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"❌ Error ejecutando {test.__name__}: {e!r}")
+
+    print(f"\n📊 Resultados: {passed}/{len(tests)} pruebas pasaron")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para la precarga en paralelo y el endpoint de readiness
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Agregar el directorio actual al path para importar módulos
+sys.path.append(str(Path(__file__).parent))
+
+from fastapi.testclient import TestClient
+
+from services import warmup_service
+
+
+def _componente(nombre: str, segundos: float, orden: list, fallar: bool = False):
+    def fn():
+        time.sleep(segundos)
+        orden.append(nombre)
+        if fallar:
+            raise RuntimeError("sin datos")
+    return fn
+
+
+def test_paralelo_con_dependencias():
+    """Componentes independientes corren a la vez; los dependientes esperan a sus dependencias"""
+    print("=== Probando precarga en paralelo ===")
+    orden = []
+    componentes = [
+        ("a", _componente("a", 0.3, orden), ()),
+        ("b", _componente("b", 0.3, orden), ()),
+        ("c", _componente("c", 0.3, orden, fallar=True), ()),
+        ("d", _componente("d", 0.05, orden), ("a", "b")),
+    ]
+    inicio = time.perf_counter()
+    warmup_service.run_warmup(componentes, workers=4)
+    duracion = time.perf_counter() - inicio
+    assert duracion < 0.6, duracion  # en serie serían 0.95 s
+    assert orden[-1] == "d"
+    estado = warmup_service.readiness()
+    assert estado["listo"] and estado["estado"] == "completado"
+    assert estado["componentes"]["c"] == "error: sin datos" and estado["componentes"]["a"] >= 0.3
+
+    # Con un solo hilo tampoco se bloquea: las dependencias se encolan antes
+    orden.clear()
+    warmup_service.run_warmup(componentes, workers=1)
+    assert orden == ["a", "b", "c", "d"]
+    print(f"✅ Precarga en paralelo correcta ({duracion:.2f} s)")
+    return True
+
+
+def test_ready():
+    """/ready responde 503 durante la precarga y 200 al terminar; "/" siempre responde"""
+    print("\n=== Probando /ready ===")
+    from main import app
+
+    client = TestClient(app)
+    liberar = threading.Event()
+    componentes = [("lento", liberar.wait, ())]
+    hilo = threading.Thread(target=warmup_service.run_warmup, args=(componentes,))
+    hilo.start()
+    try:
+        time.sleep(0.05)
+        resp = client.get("/ready")
+        assert resp.status_code == 503 and resp.json()["estado"] == "en_curso"
+        assert client.get("/").status_code == 200
+    finally:
+        liberar.set()
+        hilo.join()
+    resp = client.get("/ready")
+    assert resp.status_code == 200 and "lento" in resp.json()["componentes"]
+
+    warmup_service.marcar_listo()
+    assert client.get("/ready").json()["estado"] == "desactivado"
+    print("✅ /ready correcto")
+    return True
+
+
+def main():
+    """Ejecuta todas las pruebas"""
+    print("🧪 Iniciando pruebas de precarga\n")
+
+    tests = [
+        test_paralelo_con_dependencias,
+        test_ready,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"❌ Error ejecutando {test.__name__}: {e!r}")
+
+    print(f"\n📊 Resultados: {passed}/{len(tests)} pruebas pasaron")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la latencia del event loop mientras se generan reportes.
+
+Levanta la API y, mientras varios clientes piden reportes PDF sin pausa, sondea
+GET / cada pocos milisegundos. Si el render bloquea el event loop, el sondeo
+acumula la duración de cada PDF; si corre en el pool de procesos, apenas cambia.
+
+Modos:
+  - pool:       la API real (main:app), el render va a la cola de trabajos
+  - bloqueante: el comportamiento anterior, un `async def` que llama a
+                generate_pdf_report directamente (servido por este mismo script)
+
+Uso (desde backend-calderon/):
+    python tools/bench_event_loop.py --modos bloqueante pool --duracion 15 --concurrencia 4
+    python tools/bench_event_loop.py --modos pool --meses 36 --json bench_event_loop.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DIRECTORIOS_SALIDA = [BACKEND_DIR / "artifacts" / "reports" / "pdf", BACKEND_DIR / "artifacts" / "reports" / "csv"]
+
+
+def app_bloqueante():
+    """La ruta de generación tal como era antes de la cola de trabajos."""
+    sys.path.insert(0, str(BACKEND_DIR))
+    from fastapi import FastAPI
+    from services.report_service import generate_pdf_report
+
+    app = FastAPI()
+
+    @app.get("/")
+    def root():
+        return {"message": "API funcionando correctamente"}
+
+    @app.post("/reports/generate/pdf")
+    async def generate(request: dict):
+        return {"data": generate_pdf_report(**request)}
+
+    return app
+
+
+def percentil(valores: list, q: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    k = (len(ordenados) - 1) * q
+    bajo, alto = math.floor(k), math.ceil(k)
+    return ordenados[bajo] + (ordenados[alto] - ordenados[bajo]) * (k - bajo)
+
+
+async def medir(url: str, duracion: float, concurrencia: int, meses: int, intervalo: float) -> dict:
+    import httpx
+
+    sondeos, reportes, rechazos = [], [], 0
+    fin = time.perf_counter() + duracion
+
+    async with httpx.AsyncClient(base_url=url, timeout=120.0) as client:
+        async def sondear():
+            while time.perf_counter() < fin:
+                inicio = time.perf_counter()
+                await client.get("/")
+                sondeos.append(time.perf_counter() - inicio)
+                await asyncio.sleep(intervalo)
+
+        async def generar():
+            nonlocal rechazos
+            while time.perf_counter() < fin:
+                inicio = time.perf_counter()
+                resp = await client.post("/reports/generate/pdf", json={"months_ahead": meses})
+                if resp.status_code == 429:
+                    rechazos += 1
+                    await asyncio.sleep(0.5)
+                else:
+                    resp.raise_for_status()
+                    reportes.append(time.perf_counter() - inicio)
+
+        await asyncio.gather(sondear(), *(generar() for _ in range(concurrencia)))
+
+    return {
+        "sondeos": len(sondeos),
+        "sondeo_ms": {
+            "p50": round(percentil(sondeos, 0.50) * 1000, 1),
+            "p95": round(percentil(sondeos, 0.95) * 1000, 1),
+            "p99": round(percentil(sondeos, 0.99) * 1000, 1),
+            "max": round(max(sondeos) * 1000, 1) if sondeos else 0.0,
+        },
+        "reportes": len(reportes),
+        "reportes_por_s": round(len(reportes) / duracion, 2),
+        "reporte_p50_s": round(percentil(reportes, 0.50), 2),
+        "rechazos_429": rechazos,
+    }
+
+
+def _esperar(url: str, timeout: float = 60.0):
+    import httpx
+
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.3)
+    raise SystemExit(f"{url} no respondió en {timeout:.0f} s")
+
+
+def levantar(modo: str, port: int) -> subprocess.Popen:
+    if modo == "pool":
+        comando = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"]
+    else:
+        comando = [sys.executable, str(Path(__file__).resolve()), "--servir-bloqueante", "--port", str(port)]
+    proceso = subprocess.Popen(comando, cwd=BACKEND_DIR)
+    _esperar(f"http://127.0.0.1:{port}/")
+    return proceso
+
+
+def _archivos_salida() -> set:
+    return {p for d in DIRECTORIOS_SALIDA if d.exists() for p in d.glob("reporte_consumo_agua_*")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia del event loop durante la generación de reportes")
+    parser.add_argument("--modos", nargs="+", default=["bloqueante", "pool"], choices=["bloqueante", "pool"])
+    parser.add_argument("--duracion", type=float, default=15.0, help="Segundos de medición por fase")
+    parser.add_argument("--concurrencia", type=int, default=4, help="Clientes pidiendo PDFs en paralelo")
+    parser.add_argument("--meses", type=int, default=24, help="months_ahead de cada reporte")
+    parser.add_argument("--intervalo", type=float, default=0.02, help="Pausa entre sondeos de GET /")
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--conservar", action="store_true", help="No borrar los reportes generados")
+    parser.add_argument("--json", help="Ruta opcional donde guardar los resultados")
+    parser.add_argument("--servir-bloqueante", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.servir_bloqueante:
+        import uvicorn
+        uvicorn.run(app_bloqueante(), host="127.0.0.1", port=args.port, log_level="warning")
+        return
+
+    previos = _archivos_salida()
+    resultados = {}
+    try:
+        for modo in args.modos:
+            proceso = levantar(modo, args.port)
+            url = f"http://127.0.0.1:{args.port}"
+            try:
+                # Una ronda de calentamiento para no medir la carga del modelo ni el arranque del pool
+                asyncio.run(medir(url, 0.1, args.concurrencia, args.meses, args.intervalo))
+                reposo = asyncio.run(medir(url, min(3.0, args.duracion), 0, args.meses, args.intervalo))
+                carga = asyncio.run(medir(url, args.duracion, args.concurrencia, args.meses, args.intervalo))
+            finally:
+                proceso.terminate()
+                proceso.wait(timeout=10)
+            resultados[modo] = {"reposo": reposo, "carga": carga}
+            for fase, r in resultados[modo].items():
+                s = r["sondeo_ms"]
+                print(
+                    f"{modo:<10} {fase:<6} GET / p50 {s['p50']:>7.1f} ms  p95 {s['p95']:>7.1f} ms  "
+                    f"p99 {s['p99']:>7.1f} ms  max {s['max']:>7.1f} ms  "
+                    f"reportes {r['reportes']:>4} ({r['reportes_por_s']} /s)  429: {r['rechazos_429']}"
+                )
+    finally:
+        if not args.conservar:
+            for archivo in _archivos_salida() - previos:
+                archivo.unlink(missing_ok=True)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(resultados, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark del render del reporte PDF en función de `months_ahead`.
+
+Para cada horizonte genera el pronóstico una vez y mide por separado la maquetación
+y escritura del PDF (services.pdf_templates.construir_reporte): mediana de tiempo,
+páginas, tamaño y pico de memoria de Python (tracemalloc, en una pasada aparte). Los PDF se escriben en un
+directorio temporal: no tocan artifacts/ ni el manifiesto de reportes.
+
+Con --comparar mide también la maquetación anterior (estilos creados en cada llamada,
+filas con iterrows y un único Table sin gráficos) para ver la diferencia.
+
+Uso (desde backend-calderon/):
+    python tools/bench_pdf.py --months 12 60 120 240 480 --runs 3
+    python tools/bench_pdf.py --comparar --json bench_pdf.json
+"""
+
+import argparse
+import json
+import re
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+def _dataframe(months_ahead: int):
+    import pandas as pd
+    from services.consumption_service import forecast_future
+
+    df = pd.DataFrame(forecast_future(months_ahead=months_ahead))
+    df['fecha'] = pd.to_datetime(df['anio'].astype(str) + '-' + df['mes'].astype(str) + '-01')
+    df['mes_nombre'] = df['fecha'].dt.strftime('%B')
+    df['consumo_predicho_m3'] = df['consumo_predicho'].round(2)
+    return df
+
+
+def _render_anterior(df, destino: Path):
+    """Maquetación previa a LongTable, para comparar."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    doc = SimpleDocTemplate(str(destino), pagesize=A4)
+    styles = getSampleStyleSheet()
+    titulo = ParagraphStyle('CustomTitle', parent=styles['Heading1'], fontSize=18, spaceAfter=30)
+    story = [Paragraph("Reporte de Predicción de Consumo de Agua", titulo), Spacer(1, 20)]
+    table_data = [['Año', 'Mes', 'Consumo Predicho (m³)']]
+    for _, row in df.iterrows():
+        table_data.append([str(int(row['anio'])), row['mes_nombre'], f"{row['consumo_predicho_m3']:,.2f}"])
+    table = Table(table_data, colWidths=[1 * inch, 2 * inch, 2 * inch])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ]))
+    story.append(table)
+    doc.build(story)
+
+
+def _paginas(ruta: Path) -> int:
+    conteos = re.findall(rb"/Count (\d+)", ruta.read_bytes())
+    return max(map(int, conteos)) if conteos else 0
+
+
+def medir(render, df, directorio: Path, runs: int) -> dict:
+    tiempos = []
+    destino = directorio / "bench.pdf"
+    for _ in range(runs):
+        inicio = time.perf_counter()
+        render(df, destino)
+        tiempos.append(time.perf_counter() - inicio)
+    # La memoria se mide en una pasada aparte: tracemalloc distorsiona los tiempos
+    tracemalloc.start()
+    render(df, destino)
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "render_s": statistics.median(tiempos),
+        "peak_mb": pico / 1e6,
+        "paginas": _paginas(destino),
+        "kb": destino.stat().st_size / 1e3,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del render PDF según months_ahead")
+    parser.add_argument("--months", type=int, nargs="+", default=[12, 60, 120, 240, 480])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--comparar", action="store_true", help="Medir también la maquetación anterior")
+    parser.add_argument("--json", help="Ruta opcional donde guardar los resultados")
+    args = parser.parse_args()
+
+    from services.pdf_templates import construir_reporte
+
+    variantes = {"actual": lambda df, destino: construir_reporte(df, destino)}
+    if args.comparar:
+        variantes["anterior"] = _render_anterior
+
+    # Calentamiento: imports de ReportLab y estilos cacheados fuera de la medición
+    with tempfile.TemporaryDirectory() as tmp:
+        construir_reporte(_dataframe(1), Path(tmp) / "warmup.pdf")
+
+    resultados = []
+    print(f"{'meses':>6} {'variante':>9} {'pronóstico':>11} {'render':>9} {'ms/mes':>7} {'páginas':>8} {'KB':>8} {'pico MB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for meses in args.months:
+            inicio = time.perf_counter()
+            df = _dataframe(meses)
+            pronostico = time.perf_counter() - inicio
+            for nombre, render in variantes.items():
+                r = {"months_ahead": meses, "variante": nombre, "forecast_s": pronostico,
+                     **medir(render, df, Path(tmp), args.runs)}
+                resultados.append(r)
+                print(f"{meses:>6} {nombre:>9} {pronostico:>10.3f}s {r['render_s']:>8.3f}s "
+                      f"{r['render_s'] * 1e3 / meses:>7.2f} {r['paginas']:>8} {r['kb']:>8.1f} {r['peak_mb']:>8.1f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"runs": args.runs, "resultados": resultados}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
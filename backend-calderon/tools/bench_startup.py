@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark del arranque en frío de la API basado en `python -X importtime`.
+
+Importa `main` en un proceso nuevo varias veces y reporta el tiempo total de
+importación y los módulos más costosos (tiempo acumulado).
+
+Uso (desde backend-calderon/):
+    python tools/bench_startup.py --runs 5 --top 15
+    python tools/bench_startup.py --json bench_startup.json
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def _parse_importtime(stderr: str) -> dict:
+    """Devuelve {módulo: tiempo acumulado en µs} a partir de la salida de -X importtime."""
+    tiempos = {}
+    for linea in stderr.splitlines():
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        _, acumulado, modulo = linea[len("import time:"):].split("|")
+        tiempos[modulo.strip()] = int(acumulado)
+    return tiempos
+
+
+def run_once(module: str) -> tuple:
+    inicio = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - inicio
+    if proc.returncode != 0:
+        raise RuntimeError(f"Fallo al importar {module}:\n{proc.stderr[-2000:]}")
+    return wall, _parse_importtime(proc.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de arranque con -X importtime")
+    parser.add_argument("--module", default="main", help="Módulo a importar (por defecto: main)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Cantidad de módulos más lentos a mostrar")
+    parser.add_argument("--json", help="Ruta opcional donde guardar los resultados")
+    args = parser.parse_args()
+
+    walls, totales, ultimo = [], [], {}
+    for _ in range(args.runs):
+        wall, tiempos = run_once(args.module)
+        walls.append(wall)
+        totales.append(tiempos.get(args.module, 0) / 1e6)
+        ultimo = tiempos
+
+    print(f"Importación de '{args.module}' ({args.runs} ejecuciones)")
+    print(f"  Tiempo de proceso (mediana): {statistics.median(walls):.3f} s")
+    print(f"  Importación acumulada (mediana): {statistics.median(totales):.3f} s")
+    print(f"\nTop {args.top} módulos por tiempo acumulado (última ejecución):")
+    top = sorted(ultimo.items(), key=lambda kv: kv[1], reverse=True)[:args.top]
+    for modulo, us in top:
+        print(f"  {us / 1e3:10.1f} ms  {modulo}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({
+            "module": args.module,
+            "runs": args.runs,
+            "wall_s": walls,
+            "import_s": totales,
+            "top": [{"module": m, "cumulative_ms": us / 1e3} for m, us in top],
+        }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Ejecuta un lote de preguntas contra el chatbot (/chat/batch) y guarda los
+resultados en NDJSON. Sirve para correr los sets de regresión cuando cambian
+los prompts o los modelos.
+
+El archivo de entrada puede ser:
+  - .txt: una pregunta por línea (las líneas vacías o que empiezan con # se ignoran)
+  - .jsonl: un objeto por línea con "pregunta" y opcionalmente "id" y "modelo"
+  - .json: una lista de esos objetos
+
+Uso (desde backend-calderon/):
+    python tools/chat_batch.py preguntas.txt --modelo gemini --out resultados.ndjson
+    python tools/chat_batch.py casos.jsonl --url http://localhost:8000 --concurrencia 8
+    python tools/chat_batch.py casos.jsonl --local   # sin servidor, en este proceso
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def cargar_preguntas(ruta: Path) -> list:
+    texto = ruta.read_text(encoding="utf-8")
+    if ruta.suffix == ".json":
+        items = json.loads(texto)
+    elif ruta.suffix == ".jsonl":
+        items = [json.loads(linea) for linea in texto.splitlines() if linea.strip()]
+    else:
+        items = [
+            {"pregunta": linea.strip()}
+            for linea in texto.splitlines()
+            if linea.strip() and not linea.lstrip().startswith("#")
+        ]
+    return [item if isinstance(item, dict) else {"pregunta": str(item)} for item in items]
+
+
+def resultados_remotos(url: str, payload: dict, timeout: float):
+    import httpx
+
+    with httpx.stream("POST", f"{url.rstrip('/')}/chat/batch", json=payload, timeout=timeout) as resp:
+        if resp.status_code != 200:
+            resp.read()
+            raise SystemExit(f"Error {resp.status_code}: {resp.text}")
+        for linea in resp.iter_lines():
+            if linea.strip():
+                yield json.loads(linea)
+
+
+def resultados_locales(payload: dict):
+    sys.path.insert(0, str(BACKEND_DIR))
+    from services.chat_batch_service import ejecutar_lote
+
+    yield from ejecutar_lote(
+        payload["preguntas"],
+        modelo=payload["modelo"],
+        estrategia=payload["estrategia"],
+        usar_cache=payload["usar_cache"],
+        concurrencia=payload.get("concurrencia"),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lote de preguntas al chatbot con salida NDJSON")
+    parser.add_argument("entrada", type=Path, help="Archivo .txt, .jsonl o .json con las preguntas")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--modelo", default="openai", choices=["openai", "zephyr", "gemini"])
+    parser.add_argument("--estrategia", default="simple", choices=["simple", "fallback", "hedged"])
+    parser.add_argument("--concurrencia", type=int, help="Preguntas simultáneas por proveedor")
+    parser.add_argument("--cache", action="store_true", help="Permitir respuestas desde la caché")
+    parser.add_argument("--timeout", type=float, default=3600.0, help="Timeout total del lote en segundos")
+    parser.add_argument("--local", action="store_true", help="Ejecutar en este proceso en lugar de llamar a la API")
+    parser.add_argument("--out", type=Path, help="Archivo NDJSON de salida (por defecto, stdout)")
+    args = parser.parse_args()
+
+    payload = {
+        "preguntas": cargar_preguntas(args.entrada),
+        "modelo": args.modelo,
+        "estrategia": args.estrategia,
+        "usar_cache": args.cache,
+    }
+    if args.concurrencia:
+        payload["concurrencia"] = args.concurrencia
+
+    resultados = resultados_locales(payload) if args.local else resultados_remotos(args.url, payload, args.timeout)
+    salida = args.out.open("w", encoding="utf-8") if args.out else sys.stdout
+    total = len(payload["preguntas"])
+    hechas = 0
+    try:
+        for resultado in resultados:
+            salida.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+            salida.flush()
+            if "resumen" in resultado:
+                resumen = resultado["resumen"]
+                print(
+                    f"\n{resumen['validas']}/{resumen['preguntas']} válidas en {resumen['duracion_s']} s "
+                    f"(p50 {resumen['latencia_p50_s']} s, p95 {resumen['latencia_p95_s']} s, "
+                    f"tokens prompt {resumen['tokens_prompt']}, respuesta {resumen['tokens_respuesta']})",
+                    file=sys.stderr,
+                )
+            else:
+                hechas += 1
+                estado = "ok" if resultado["valida"] else "ERROR"
+                print(f"[{hechas}/{total}] {estado} {resultado['latencia_s']:.2f} s  {resultado['pregunta'][:60]}", file=sys.stderr)
+    finally:
+        if args.out:
+            salida.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Servidor LLM simulado para pruebas de carga sin claves reales.
+
+Implementa los protocolos que usa el backend:
+  - OpenAI chat completions:  POST /v1/chat/completions  (también sirve para Zephyr/HF,
+    que usa el mismo protocolo), con streaming SSE si la petición trae "stream": true
+  - Gemini: POST /v1beta/models/{modelo}:generateContent
+            POST /v1beta/models/{modelo}:streamGenerateContent  (arreglo JSON o SSE con ?alt=sse)
+
+Latencia, errores y límites de tasa son configurables para reproducir el comportamiento
+de los proveedores reales (colas largas, 5xx intermitentes, 429 por cuota).
+
+Uso (desde backend-calderon/):
+    python tools/fake_llm_server.py --port 8100 --latencia-mediana 0.8 --latencia-sigma 0.6 \\
+        --tasa-errores 0.02 --tasa-429 0.01 --rpm 600
+
+Y en el backend:
+    OPENAI_API_KEY=fake HF_API_KEY=fake GEMINI_API_KEY=fake \\
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 HF_BASE_URL=http://127.0.0.1:8100/v1 \\
+    GEMINI_API_ENDPOINT=http://127.0.0.1:8100 uvicorn main:app
+
+GET /stats devuelve los contadores y POST /config cambia los parámetros en caliente
+(mismo nombre que los argumentos, con guiones bajos).
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass, asdict, fields
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+_FRASES = [
+    "El consumo de agua en Calderón mantiene una tendencia creciente asociada al aumento de población.",
+    "La precipitación mensual muestra una marcada estacionalidad con máximos entre marzo y mayo.",
+    "Se recomienda reforzar la gestión de la demanda durante los meses secos.",
+    "Las predicciones del modelo indican un consumo estable para los próximos meses.",
+    "Los datos históricos no muestran anomalías significativas en el último año.",
+]
+
+
+@dataclass
+class FakeConfig:
+    distribucion: str = "lognormal"     # constante | uniforme | normal | lognormal
+    latencia_mediana: float = 0.5       # segundos hasta el primer byte
+    latencia_sigma: float = 0.5         # dispersión (sigma del log en lognormal, desvío en normal)
+    latencia_max: float = 30.0
+    tasa_errores: float = 0.0           # probabilidad de 500/503
+    tasa_429: float = 0.0               # probabilidad de 429 aleatorio
+    rpm: float = 0.0                    # cuota real de peticiones por minuto (0 = sin límite)
+    tokens_respuesta: int = 120
+    tokens_por_segundo: float = 80.0    # velocidad de generación en streaming
+    seed: int = 0
+
+
+class FakeState:
+    def __init__(self, config: FakeConfig):
+        self.config = config
+        self.rng = random.Random(config.seed or None)
+        self._lock = threading.Lock()
+        self._ventana = []  # marcas de tiempo del último minuto para la cuota
+        self.contadores = {"peticiones": 0, "ok": 0, "errores_5xx": 0, "errores_429": 0, "streaming": 0}
+        self.en_curso = 0
+
+    def latencia(self) -> float:
+        c = self.config
+        if c.distribucion == "constante":
+            valor = c.latencia_mediana
+        elif c.distribucion == "uniforme":
+            valor = self.rng.uniform(max(0.0, c.latencia_mediana - c.latencia_sigma), c.latencia_mediana + c.latencia_sigma)
+        elif c.distribucion == "normal":
+            valor = self.rng.gauss(c.latencia_mediana, c.latencia_sigma)
+        else:
+            valor = c.latencia_mediana * self.rng.lognormvariate(0.0, c.latencia_sigma)
+        return min(max(0.0, valor), c.latencia_max)
+
+    def decidir_fallo(self):
+        """Devuelve el código de error a simular o None si la petición debe tener éxito."""
+        with self._lock:
+            self.contadores["peticiones"] += 1
+            if self.config.rpm > 0:
+                ahora = time.monotonic()
+                self._ventana = [t for t in self._ventana if ahora - t < 60]
+                if len(self._ventana) >= self.config.rpm:
+                    self.contadores["errores_429"] += 1
+                    return 429
+                self._ventana.append(ahora)
+            sorteo = self.rng.random()
+            if sorteo < self.config.tasa_429:
+                self.contadores["errores_429"] += 1
+                return 429
+            if sorteo < self.config.tasa_429 + self.config.tasa_errores:
+                self.contadores["errores_5xx"] += 1
+                return self.rng.choice([500, 503])
+            self.contadores["ok"] += 1
+            return None
+
+    def texto(self) -> str:
+        palabras = []
+        while len(palabras) < self.config.tokens_respuesta * 3 // 4:
+            palabras.extend(self.rng.choice(_FRASES).split())
+        return " ".join(palabras)
+
+
+def _trozos(texto: str, tamano: int = 4):
+    palabras = texto.split(" ")
+    for i in range(0, len(palabras), tamano):
+        yield " ".join(palabras[i:i + tamano]) + (" " if i + tamano < len(palabras) else "")
+
+
+def _tokens(texto: str) -> int:
+    return max(1, len(texto) // 4)
+
+
+def _error_openai(codigo: int) -> JSONResponse:
+    if codigo == 429:
+        cuerpo = {"error": {"message": "Rate limit reached for requests", "type": "rate_limit_error", "code": "rate_limit_exceeded"}}
+        return JSONResponse(cuerpo, status_code=429, headers={"retry-after": "1"})
+    cuerpo = {"error": {"message": "The server had an error while processing your request.", "type": "server_error", "code": None}}
+    return JSONResponse(cuerpo, status_code=codigo)
+
+
+def _error_gemini(codigo: int) -> JSONResponse:
+    estados = {429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE"}
+    mensajes = {429: "Resource has been exhausted (e.g. check quota).", 500: "Internal error encountered.",
+                503: "The model is overloaded. Please try again later."}
+    return JSONResponse(
+        {"error": {"code": codigo, "message": mensajes[codigo], "status": estados[codigo]}},
+        status_code=codigo,
+    )
+
+
+def crear_app(config: FakeConfig) -> FastAPI:
+    app = FastAPI(title="Servidor LLM simulado")
+    app.state.fake = FakeState(config)
+
+    async def _simular(fake: FakeState):
+        """Espera la latencia simulada y devuelve el código de error a responder (o None)."""
+        codigo = fake.decidir_fallo()
+        await asyncio.sleep(fake.latencia() if codigo is None else fake.latencia() * 0.1)
+        return codigo
+
+    async def _stream_sse(fake: FakeState, texto: str, evento):
+        pausa = 4 / fake.config.tokens_por_segundo if fake.config.tokens_por_segundo > 0 else 0
+        for trozo in _trozos(texto):
+            yield f"data: {json.dumps(evento(trozo, None), ensure_ascii=False)}\n\n"
+            await asyncio.sleep(pausa)
+
+    async def _stream_json_array(fake: FakeState, texto: str, evento):
+        # Sin alt=sse la API REST de Gemini transmite un arreglo JSON incremental
+        pausa = 4 / fake.config.tokens_por_segundo if fake.config.tokens_por_segundo > 0 else 0
+        separador = "["
+        for trozo in _trozos(texto):
+            yield separador + json.dumps(evento(trozo, None), ensure_ascii=False)
+            separador = ",\n"
+            await asyncio.sleep(pausa)
+        yield "]"
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        fake: FakeState = app.state.fake
+        cuerpo = await request.json()
+        prompt = " ".join(str(m.get("content", "")) for m in cuerpo.get("messages", []))
+        modelo = cuerpo.get("model", "gpt-4o-mini")
+        fake.en_curso += 1
+        try:
+            codigo = await _simular(fake)
+        finally:
+            fake.en_curso -= 1
+        if codigo is not None:
+            return _error_openai(codigo)
+
+        texto = fake.texto()
+        id_respuesta = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        creado = int(time.time())
+        if cuerpo.get("stream"):
+            fake.contadores["streaming"] += 1
+
+            def evento(trozo, fin):
+                return {
+                    "id": id_respuesta, "object": "chat.completion.chunk", "created": creado, "model": modelo,
+                    "choices": [{"index": 0, "delta": {"content": trozo} if trozo else {}, "finish_reason": fin}],
+                }
+
+            async def eventos():
+                async for linea in _stream_sse(fake, texto, evento):
+                    yield linea
+                yield f"data: {json.dumps(evento(None, 'stop'))}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(eventos(), media_type="text/event-stream")
+
+        return {
+            "id": id_respuesta,
+            "object": "chat.completion",
+            "created": creado,
+            "model": modelo,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": texto}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": _tokens(prompt),
+                "completion_tokens": _tokens(texto),
+                "total_tokens": _tokens(prompt) + _tokens(texto),
+            },
+        }
+
+    @app.post("/{version}/models/{recurso}")
+    async def gemini(version: str, recurso: str, request: Request):
+        fake: FakeState = app.state.fake
+        _, _, accion = recurso.partition(":")
+        if accion not in ("generateContent", "streamGenerateContent"):
+            return _error_gemini(500)
+        cuerpo = await request.json()
+        prompt = " ".join(
+            str(parte.get("text", ""))
+            for contenido in cuerpo.get("contents", [])
+            for parte in contenido.get("parts", [])
+        )
+        fake.en_curso += 1
+        try:
+            codigo = await _simular(fake)
+        finally:
+            fake.en_curso -= 1
+        if codigo is not None:
+            return _error_gemini(codigo)
+
+        texto = fake.texto()
+
+        def evento(trozo, fin):
+            return {
+                "candidates": [{
+                    "content": {"parts": [{"text": trozo}], "role": "model"},
+                    "finishReason": fin or "STOP",
+                    "index": 0,
+                }],
+                "usageMetadata": {
+                    "promptTokenCount": _tokens(prompt),
+                    "candidatesTokenCount": _tokens(trozo),
+                    "totalTokenCount": _tokens(prompt) + _tokens(trozo),
+                },
+            }
+
+        if accion == "streamGenerateContent":
+            fake.contadores["streaming"] += 1
+            if request.query_params.get("alt") == "sse":
+                return StreamingResponse(_stream_sse(fake, texto, evento), media_type="text/event-stream")
+            return StreamingResponse(_stream_json_array(fake, texto, evento), media_type="application/json")
+        return evento(texto, "STOP")
+
+    @app.get("/stats")
+    def stats():
+        fake: FakeState = app.state.fake
+        return {**fake.contadores, "en_curso": fake.en_curso, "config": asdict(fake.config)}
+
+    @app.post("/config")
+    async def actualizar_config(request: Request):
+        fake: FakeState = app.state.fake
+        cambios = await request.json()
+        validos = {f.name for f in fields(FakeConfig)}
+        for nombre, valor in cambios.items():
+            if nombre in validos:
+                setattr(fake.config, nombre, type(getattr(fake.config, nombre))(valor))
+        return asdict(fake.config)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor LLM simulado (OpenAI + Gemini)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    for campo in fields(FakeConfig):
+        parser.add_argument(
+            f"--{campo.name.replace('_', '-')}",
+            type=type(campo.default),
+            default=campo.default,
+        )
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = FakeConfig(**{f.name: getattr(args, f.name) for f in fields(FakeConfig)})
+    uvicorn.run(crear_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga de la API a tasa fija (lazo abierto).
+
+Envía peticiones a una tasa constante (RPS) durante un tiempo dado, sin esperar a
+que terminen las anteriores, y reporta latencia p50/p95/p99 y throughput por
+endpoint. La latencia se mide desde el instante programado de envío, de modo que
+las esperas por saturación del cliente también cuentan (sin omisión coordinada).
+
+Escenarios: chat (/chat/chatbot), interpretar (/ia/interpretar), forecast (/water/forecast).
+
+Uso (desde backend-calderon/):
+    # contra una API ya levantada
+    python tools/load_test.py --url http://127.0.0.1:8000 --rps 20 --duracion 30
+
+    # levanta el servidor LLM simulado y la API apuntando a él
+    python tools/load_test.py --levantar --rps 10 --duracion 20 --escenarios chat interpretar
+    python tools/load_test.py --levantar --fake-args "--tasa-429 0.05 --latencia-mediana 1.5"
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import shlex
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+PREGUNTAS = [
+    "¿Cuál es el consumo actual de agua en Calderón?",
+    "¿Cuál será el consumo de agua en los próximos 6 meses?",
+    "¿Cómo ha evolucionado históricamente el consumo de agua?",
+    "¿Qué relación hay entre la precipitación y el consumo de agua?",
+    "¿Cuál es la tendencia del consumo de agua en Calderón?",
+    "¿Qué dice el último reporte de predicción?",
+]
+
+
+def _datos_climaticos(n: int = 36) -> list:
+    return [
+        {"fecha": f"{2022 + i // 12}-{i % 12 + 1:02d}", "valor": round(60 + 40 * math.sin(i / 12 * 2 * math.pi), 1)}
+        for i in range(n)
+    ]
+
+
+def escenario(nombre: str, modelo: str, i: int) -> tuple:
+    """Devuelve (método, ruta, cuerpo JSON) de la i-ésima petición del escenario."""
+    if nombre == "chat":
+        return "POST", "/chat/chatbot", {"pregunta": PREGUNTAS[i % len(PREGUNTAS)], "modelo": modelo, "usar_cache": False}
+    if nombre == "interpretar":
+        return "POST", "/ia/interpretar", {
+            "modelo": "gemini",
+            "titulo": "Precipitación mensual Calderón",
+            "tipo_dato": "precipitación mensual",
+            "datos": _datos_climaticos(),
+            "usar_cache": False,
+        }
+    if nombre == "forecast":
+        return "POST", "/water/forecast", {"months_ahead": 6 + i % 7}
+    raise ValueError(f"Escenario desconocido: {nombre}")
+
+
+def percentil(valores: list, q: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    k = (len(ordenados) - 1) * q
+    bajo, alto = math.floor(k), math.ceil(k)
+    return ordenados[bajo] + (ordenados[alto] - ordenados[bajo]) * (k - bajo)
+
+
+async def ejecutar_escenario(url: str, nombre: str, modelo: str, rps: float, duracion: float, timeout: float) -> dict:
+    import httpx
+
+    total = int(rps * duracion)
+    resultados = []
+    limites = httpx.Limits(max_connections=None, max_keepalive_connections=200)
+
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limites) as client:
+        inicio = time.perf_counter()
+
+        async def disparar(i: int):
+            programado = inicio + i / rps
+            await asyncio.sleep(max(0.0, programado - time.perf_counter()))
+            metodo, ruta, cuerpo = escenario(nombre, modelo, i)
+            try:
+                resp = await client.request(metodo, ruta, json=cuerpo)
+                estado = resp.status_code
+                # Los servicios devuelven los fallos del LLM como texto con prefijo "Error"
+                if estado == 200 and nombre == "chat" and resp.json().get("respuesta", "").startswith("Error"):
+                    estado = "error_llm"
+                elif estado == 200 and nombre == "interpretar" and resp.json().get("interpretacion", {}).get("texto", "").startswith("Error"):
+                    estado = "error_llm"
+            except httpx.TimeoutException:
+                estado = "timeout"
+            except httpx.HTTPError as e:
+                estado = type(e).__name__
+            resultados.append((time.perf_counter() - programado, estado))
+
+        await asyncio.gather(*(disparar(i) for i in range(total)))
+        transcurrido = time.perf_counter() - inicio
+
+    ok = [lat for lat, estado in resultados if estado == 200]
+    estados = {}
+    for _, estado in resultados:
+        estados[str(estado)] = estados.get(str(estado), 0) + 1
+    return {
+        "escenario": nombre,
+        "rps_objetivo": rps,
+        "peticiones": total,
+        "ok": len(ok),
+        "estados": estados,
+        "duracion_s": round(transcurrido, 2),
+        "throughput_ok_rps": round(len(ok) / transcurrido, 2) if transcurrido else 0.0,
+        "latencia_ms": {
+            "p50": round(percentil(ok, 0.50) * 1000, 1),
+            "p95": round(percentil(ok, 0.95) * 1000, 1),
+            "p99": round(percentil(ok, 0.99) * 1000, 1),
+            "max": round(max(ok) * 1000, 1) if ok else 0.0,
+        },
+    }
+
+
+def _esperar(url: str, timeout: float = 60.0):
+    import httpx
+
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.3)
+    raise SystemExit(f"{url} no respondió en {timeout:.0f} s")
+
+
+def levantar_servidores(api_port: int, fake_port: int, fake_args: str) -> list:
+    """Arranca el servidor LLM simulado y la API configurada para usarlo."""
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    fake = subprocess.Popen(
+        [sys.executable, str(BACKEND_DIR / "tools" / "fake_llm_server.py"), "--port", str(fake_port), *shlex.split(fake_args)],
+        cwd=BACKEND_DIR,
+    )
+    _esperar(f"{fake_url}/stats")
+    entorno = {
+        **os.environ,
+        "OPENAI_API_KEY": "fake", "HF_API_KEY": "fake", "GEMINI_API_KEY": "fake",
+        "OPENAI_BASE_URL": f"{fake_url}/v1",
+        "HF_BASE_URL": f"{fake_url}/v1",
+        "GEMINI_API_ENDPOINT": fake_url,
+    }
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(api_port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=entorno,
+    )
+    _esperar(f"http://127.0.0.1:{api_port}/")
+    return [api, fake]
+
+
+def imprimir(resultado: dict):
+    lat = resultado["latencia_ms"]
+    print(
+        f"{resultado['escenario']:<12} {resultado['peticiones']:>6} pet. {resultado['ok']:>6} ok  "
+        f"{resultado['throughput_ok_rps']:>7.2f} rps  p50 {lat['p50']:>8.1f} ms  p95 {lat['p95']:>8.1f} ms  "
+        f"p99 {lat['p99']:>8.1f} ms  estados={resultado['estados']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga a tasa fija de la API")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--escenarios", nargs="+", default=["chat", "interpretar", "forecast"],
+                        choices=["chat", "interpretar", "forecast"])
+    parser.add_argument("--modelo", default="openai", choices=["openai", "zephyr", "gemini"], help="Modelo del escenario chat")
+    parser.add_argument("--rps", type=float, default=10.0)
+    parser.add_argument("--duracion", type=float, default=20.0, help="Segundos por escenario")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--levantar", action="store_true", help="Arrancar el servidor LLM simulado y la API")
+    parser.add_argument("--api-port", type=int, default=8000)
+    parser.add_argument("--fake-port", type=int, default=8100)
+    parser.add_argument("--fake-args", default="", help="Argumentos extra para tools/fake_llm_server.py")
+    parser.add_argument("--json", help="Ruta opcional donde guardar los resultados")
+    args = parser.parse_args()
+
+    procesos = []
+    url = args.url
+    if args.levantar:
+        procesos = levantar_servidores(args.api_port, args.fake_port, args.fake_args)
+        url = f"http://127.0.0.1:{args.api_port}"
+    try:
+        resultados = []
+        for nombre in args.escenarios:
+            resultado = asyncio.run(ejecutar_escenario(url, nombre, args.modelo, args.rps, args.duracion, args.timeout))
+            imprimir(resultado)
+            resultados.append(resultado)
+    finally:
+        for proceso in procesos:
+            proceso.terminate()
+            proceso.wait(timeout=10)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(resultados, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
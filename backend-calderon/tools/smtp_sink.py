@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Servidor SMTP local que acepta y guarda los correos sin entregarlos, para probar la
+bandeja de salida sin un proveedor real.
+
+Habla SMTP sin TLS ni autenticación (EHLO, MAIL, RCPT, DATA, RSET, NOOP, QUIT) y puede
+simular fallos: respuestas 451 transitorias en los primeros N mensajes, destinatarios
+rechazados con 550 y latencia por mensaje.
+
+Uso (desde backend-calderon/):
+    python tools/smtp_sink.py --port 2525 --directorio cache/smtp_sink
+
+Y en el backend:
+    EMAIL_HOST=127.0.0.1 EMAIL_PORT=2525 EMAIL_SMTP_SECURITY=none EMAIL_FROM=reportes@localhost \\
+    uvicorn main:app
+
+También se puede usar desde las pruebas: SMTPSink(port=0).iniciar() y leer .mensajes.
+"""
+
+import argparse
+import socketserver
+import threading
+import time
+from email import message_from_bytes, policy
+from pathlib import Path
+from typing import List, Optional, Set
+
+
+class SMTPSink:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 2525,
+        directorio: Optional[str] = None,
+        fallos_transitorios: int = 0,
+        rechazados: Optional[Set[str]] = None,
+        latencia: float = 0.0,
+    ):
+        self.directorio = Path(directorio) if directorio else None
+        self.fallos_transitorios = fallos_transitorios
+        self.rechazados = {r.lower() for r in (rechazados or set())}
+        self.latencia = latencia
+        self.mensajes: List = []
+        self.conexiones = 0
+        self._lock = threading.Lock()
+        sink = self
+
+        class Manejador(socketserver.StreamRequestHandler):
+            def responder(self, linea: str):
+                self.wfile.write((linea + "\r\n").encode("utf-8"))
+
+            def handle(self):
+                with sink._lock:
+                    sink.conexiones += 1
+                self.responder("220 smtp-sink listo")
+                remitente, destinatarios = None, []
+                while True:
+                    linea = self.rfile.readline()
+                    if not linea:
+                        return
+                    comando = linea.decode("utf-8", "replace").strip()
+                    verbo = comando[:4].upper()
+                    if verbo in ("EHLO", "HELO"):
+                        self.wfile.write(b"250-smtp-sink\r\n250-8BITMIME\r\n250 SIZE 52428800\r\n")
+                    elif verbo == "MAIL":
+                        remitente, destinatarios = comando.split(":", 1)[1].split()[0].strip("<>"), []
+                        self.responder("250 OK")
+                    elif verbo == "RCPT":
+                        destinatario = comando.split(":", 1)[1].split()[0].strip("<>")
+                        if destinatario.lower() in sink.rechazados:
+                            self.responder("550 Buzón inexistente")
+                        else:
+                            destinatarios.append(destinatario)
+                            self.responder("250 OK")
+                    elif verbo == "DATA":
+                        self.responder("354 Termine con <CRLF>.<CRLF>")
+                        datos = self.leer_datos()
+                        if sink.latencia:
+                            time.sleep(sink.latencia)
+                        self.responder(sink._recibir(remitente, destinatarios, datos))
+                    elif verbo == "RSET":
+                        remitente, destinatarios = None, []
+                        self.responder("250 OK")
+                    elif verbo == "NOOP":
+                        self.responder("250 OK")
+                    elif verbo == "QUIT":
+                        self.responder("221 Adiós")
+                        return
+                    else:
+                        self.responder("502 Comando no implementado")
+
+            def leer_datos(self) -> bytes:
+                lineas = []
+                while True:
+                    linea = self.rfile.readline()
+                    if not linea or linea in (b".\r\n", b".\n"):
+                        return b"".join(lineas)
+                    lineas.append(linea[1:] if linea.startswith(b"..") else linea)
+
+        class Servidor(socketserver.ThreadingTCPServer):
+            allow_reuse_address = True
+            daemon_threads = True
+
+        self._servidor = Servidor((host, port), Manejador)
+        self.host, self.port = self._servidor.server_address[:2]
+        self._hilo: Optional[threading.Thread] = None
+
+    def _recibir(self, remitente: str, destinatarios: List[str], datos: bytes) -> str:
+        with self._lock:
+            if self.fallos_transitorios > 0:
+                self.fallos_transitorios -= 1
+                return "451 Intente más tarde"
+            mensaje = message_from_bytes(datos, policy=policy.default)
+            self.mensajes.append({"de": remitente, "para": destinatarios, "mensaje": mensaje, "bytes": len(datos)})
+            numero = len(self.mensajes)
+        if self.directorio:
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            (self.directorio / f"{numero:06d}.eml").write_bytes(datos)
+        return "250 Mensaje aceptado"
+
+    def iniciar(self) -> "SMTPSink":
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, name="smtp-sink", daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        if self._hilo is not None:
+            self._servidor.shutdown()
+            self._hilo = None
+        self._servidor.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor SMTP local que guarda los correos sin entregarlos")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--directorio", help="Guardar cada correo como .eml en este directorio")
+    parser.add_argument("--fallos-transitorios", type=int, default=0, help="Responder 451 a los primeros N mensajes")
+    parser.add_argument("--rechazar", nargs="*", default=[], help="Destinatarios a rechazar con 550")
+    parser.add_argument("--latencia", type=float, default=0.0, help="Segundos de espera por mensaje")
+    args = parser.parse_args()
+
+    sink = SMTPSink(args.host, args.port, args.directorio, args.fallos_transitorios, set(args.rechazar), args.latencia)
+    print(f"smtp-sink escuchando en {sink.host}:{sink.port}")
+    try:
+        sink.iniciar()._hilo.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"{len(sink.mensajes)} mensajes recibidos en {sink.conexiones} conexiones")
+        sink.detener()
+
+
+if __name__ == "__main__":
+    main()